@@ -0,0 +1,6 @@
+"""
+Benchmarks for LMMS-Claude-MCP.
+
+Run individual benchmarks from the repository root, e.g.
+``python -m benchmarks.bench_bulk_notes``.
+"""
@@ -0,0 +1,62 @@
+"""
+Benchmark bulk note ingestion through LMMSInterface.add_notes_to_pattern.
+
+Measures notes/second for converting note dicts to columns, packing them and
+streaming the resulting OSC bundles to a local fake LMMS that acknowledges
+every bundle.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from lmms_mcp.lmms_interface import LMMSInterface
+from lmms_mcp.notes import NoteColumns, np
+
+from .fake_lmms import start_fake_lmms
+
+
+def make_notes(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    return [{"note": rng.randrange(36, 96), "velocity": rng.randrange(40, 127),
+             "start": i * 0.25, "length": 0.25} for i in range(count)]
+
+
+async def bench(count: int, repeat: int, max_datagram_size: int):
+    notes = make_notes(count)
+    fake, port = await start_fake_lmms()
+    interface = LMMSInterface("127.0.0.1", port, max_datagram_size=max_datagram_size)
+    await interface.start_server()
+    await interface.create_track("instrument", "Bench")
+    await interface.create_pattern(0, 16)
+
+    best_convert = best_total = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        NoteColumns.from_dicts(notes).to_records()
+        best_convert = min(best_convert, time.perf_counter() - started)
+
+        started = time.perf_counter()
+        result = await interface.add_notes_to_pattern(0, 0, notes)
+        best_total = min(best_total, time.perf_counter() - started)
+
+    await interface.close()
+    fake.transport.close()
+    print(f"{count:>7} notes  convert+pack {count / best_convert:>12,.0f} notes/s  "
+          f"end-to-end {count / best_total:>10,.0f} notes/s  ({result['bundles']} bundles)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk note ingestion benchmark")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-datagram-size", type=int, default=1472)
+    parser.add_argument("--counts", type=int, nargs="+", default=[10_000, 100_000])
+    args = parser.parse_args()
+    print(f"NumPy: {'yes' if np is not None else 'no'}, datagram limit {args.max_datagram_size} bytes")
+    for count in args.counts:
+        asyncio.run(bench(count, args.repeat, args.max_datagram_size))
+
+
+if __name__ == "__main__":
+    main()
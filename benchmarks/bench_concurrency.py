@@ -0,0 +1,85 @@
+"""
+Benchmark concurrent clients editing one project through the MCP server.
+
+Runs the MCP server in-process against a local fake LMMS with a fixed reply
+latency, then lets a growing number of clients call tools at once through
+FastMCP's tool layer. Each client has its own track with one pattern and
+adds notes to it, one tool call at a time. With per-track locks the clients
+run in parallel, so tool calls per second should grow with the client count
+until the event loop saturates. With ``--shared`` every client edits the same
+pattern instead, which the pattern lock serializes.
+
+After each run, the note count of every pattern is checked against both the
+fake LMMS and the server's mirror, so a lost update fails the benchmark::
+
+    python -m benchmarks.bench_concurrency --latency 2 --clients 1 2 4 8 16 32
+"""
+
+import argparse
+import asyncio
+import time
+from typing import List
+
+from lmms_mcp.server import MCPServer
+
+from .fake_lmms import start_fake_lmms
+
+NOTES_PER_EDIT = 16
+
+
+def edit(step: int) -> List[dict]:
+    return [{"note": 48 + i, "velocity": 100, "start": step * 4 + i * 0.25, "length": 0.25}
+            for i in range(NOTES_PER_EDIT)]
+
+
+async def run(clients: int, edits: int, latency: float, shared: bool) -> float:
+    fake, port = await start_fake_lmms(latency=latency)
+    server = MCPServer(lmms_port=port, snapshots=False)
+    call = server.server.call_tool
+
+    async def client(number: int):
+        track = 0 if shared else number
+        for step in range(edits):
+            await call("add_notes_to_pattern", {"track_index": track, "pattern_index": 0,
+                                                "notes": edit(number * edits + step)})
+
+    await server.get_session_info()
+    # Tracks are numbered in creation order, so they are created before the clients start
+    for number in range(1 if shared else clients):
+        await call("create_track", {"name": "Shared" if shared else f"Client {number}"})
+        await call("create_pattern", {"track_index": number})
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(number) for number in range(clients)))
+    elapsed = time.perf_counter() - started
+
+    expected = NOTES_PER_EDIT * edits * (clients if shared else 1)
+    for index, track in enumerate(fake.tracks):
+        mirrored = len(server.session_state.pattern_notes(index, 0))
+        if track["patterns"][0]["notes"] != expected or mirrored != expected:
+            raise AssertionError(f"Track {index}: LMMS has {track['patterns'][0]['notes']} notes, "
+                                 f"the server {mirrored}, expected {expected}")
+    stats = (await server.get_server_stats())["locks"]
+    await server.lmms_interface.close()
+    fake.transport.close()
+    calls = clients * edits
+    print(f"{clients:>4} clients  {calls / elapsed:>9,.0f} calls/s  {elapsed * 1000:>8.1f} ms  "
+          f"{stats['contended']:>6} contended of {stats['acquired']} locks")
+    return calls / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent client throughput benchmark")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--edits", type=int, default=50, help="Tool calls per client")
+    parser.add_argument("--latency", type=float, default=2.0, help="LMMS reply latency in milliseconds")
+    parser.add_argument("--shared", action="store_true", help="All clients edit one pattern")
+    args = parser.parse_args()
+    print(f"{'one shared pattern' if args.shared else 'one track per client'}, "
+          f"{args.edits} edits per client, LMMS latency {args.latency} ms")
+    for clients in args.clients:
+        asyncio.run(run(clients, args.edits, args.latency / 1000.0, args.shared))
+
+
+if __name__ == "__main__":
+    main()
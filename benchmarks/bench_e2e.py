@@ -0,0 +1,452 @@
+"""
+End-to-end benchmark of the MCP server against a fake LMMS.
+
+Starts a fake LMMS OSC endpoint (``benchmarks.fake_lmms``) with configurable
+latency and jitter, then starts the MCP server as a separate process and
+drives it through a real MCP client over the stdio and streamable HTTP
+transports. For every registered tool the latency percentiles and
+throughput are measured, followed by mixed workloads:
+
+* ``song_32_tracks``: build a 32-track song one tool call at a time
+* ``song_32_tracks_batch``: build the same song with a single ``batch`` call
+* ``mixed_read_write``: concurrent clients issuing mostly reads with some edits
+
+Results are printed (or written with ``--output``) as JSON so runs on the
+same hardware can be compared across releases::
+
+    python -m benchmarks.bench_e2e --latency 1 --jitter 0.5 --output e2e.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from mcp.client.streamable_http import streamablehttp_client
+
+import lmms_mcp
+from lmms_mcp.midi_file import MidiWriter
+from lmms_mcp.pattern import Pattern
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TRANSPORTS = ("stdio", "http")
+
+SONG_TRACKS = 32
+SONG_NOTES_PER_PATTERN = 64
+
+# Seconds to wait for a server process to accept connections
+STARTUP_TIMEOUT = 30.0
+
+
+def percentiles(samples: List[float], elapsed: Optional[float] = None) -> Dict[str, Any]:
+    """Summarise latency samples (seconds) in milliseconds."""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+
+    total = elapsed if elapsed is not None else sum(samples)
+    return {
+        "count": len(samples),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+        "p50_ms": pick(0.50),
+        "p90_ms": pick(0.90),
+        "p99_ms": pick(0.99),
+        "max_ms": round(ordered[-1] * 1000, 3),
+        "throughput_per_s": round(len(samples) / total, 1) if total > 0 else None,
+    }
+
+
+def make_notes(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    return [{"note": rng.randrange(36, 96), "velocity": rng.randrange(40, 127),
+             "start": i * 0.25, "length": 0.25} for i in range(count)]
+
+
+def write_fixtures(root: str) -> Dict[str, str]:
+    """Create the project file, MIDI file and instrument directory the file-based tools read."""
+    instruments = os.path.join(root, "instruments")
+    os.makedirs(instruments)
+    for name in ("libtripleoscillator.so", "libkicker.so", "Bass01.xpf", "kick01.wav", "snare01.wav"):
+        open(os.path.join(instruments, name), "w").close()
+
+    tracks = []
+    for t in range(8):
+        notes = "".join(f'<note key="{48 + n % 24}" vol="100" pos="{n * 12}" len="12"/>' for n in range(64))
+        tracks.append(f'<track type="0" name="Track {t}"><instrumenttrack>'
+                      f'<instrument name="tripleoscillator"/></instrumenttrack>'
+                      f'<pattern name="p" pos="0" steps="16">{notes}</pattern></track>')
+    project = os.path.join(root, "bench.mmp")
+    with open(project, "w") as f:
+        f.write(f'<?xml version="1.0"?><lmms-project version="1.0" creator="LMMS">'
+                f'<head bpm="120" timesig_numerator="4" timesig_denominator="4"/>'
+                f'<song><trackcontainer>{"".join(tracks)}</trackcontainer></song></lmms-project>')
+    midi = os.path.join(root, "bench.mid")
+    with MidiWriter(midi, tempo=120) as writer:
+        for t in range(4):
+            writer.write_track(f"Track {t}", Pattern.from_dicts(make_notes(64, t)))
+    return {"instruments": instruments, "project": project, "save": os.path.join(root, "saved.mmp"),
+            "midi": midi, "export": os.path.join(root, "exported.mid")}
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def server_env(fixtures: Dict[str, str], root: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [REPO_ROOT, env.get("PYTHONPATH")]))
+    env["XDG_CACHE_HOME"] = os.path.join(root, "cache")
+    env["LMMS_MCP_INSTRUMENT_PATHS"] = fixtures["instruments"]
+    return env
+
+
+def start_fake_lmms_process(latency_ms: float, jitter_ms: float, seed: int) -> Tuple[subprocess.Popen, int]:
+    """Run the fake LMMS in its own process so it does not share the client's event loop."""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_lmms", "--port", "0", "--latency", str(latency_ms),
+         "--jitter", str(jitter_ms), "--seed", str(seed)],
+        cwd=REPO_ROOT, stdout=subprocess.PIPE, text=True)
+    port = int(process.stdout.readline())
+    return process, port
+
+
+@asynccontextmanager
+async def connect(transport: str, lmms_port: int, env: Dict[str, str]):
+    """Start the MCP server for one transport and yield an initialized client session."""
+    if transport == "stdio":
+        params = StdioServerParameters(
+            command=sys.executable, args=["-m", "lmms_mcp.cli", "server", "--lmms-port", str(lmms_port)],
+            env=env, cwd=REPO_ROOT)
+        with open(os.devnull, "w") as errlog:
+            async with stdio_client(params, errlog=errlog) as (read, write):
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    yield session
+        return
+
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "lmms_mcp.server", "--port", str(port), "--lmms-port", str(lmms_port)],
+        env=env, cwd=REPO_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while True:
+            try:
+                _, writer = await asyncio.open_connection("127.0.0.1", port)
+                writer.close()
+                break
+            except OSError:
+                if time.monotonic() > deadline or process.poll() is not None:
+                    raise RuntimeError(f"MCP HTTP server did not start on port {port}")
+                await asyncio.sleep(0.05)
+        async with streamablehttp_client(f"http://127.0.0.1:{port}/mcp") as (read, write, _):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                yield session
+    finally:
+        process.terminate()
+        process.wait()
+
+
+class Client:
+    """Thin wrapper that times tool calls and decodes their JSON results."""
+
+    def __init__(self, session: ClientSession):
+        self.session = session
+
+    async def call(self, tool: str, args: Optional[Dict[str, Any]] = None) -> Tuple[float, bool, Any]:
+        """
+        Call a tool.
+
+        Returns:
+            Latency in seconds, whether the call failed, and the decoded result
+        """
+        started = time.perf_counter()
+        result = await self.session.call_tool(tool, args or {})
+        elapsed = time.perf_counter() - started
+        payload: Any = None
+        if result.content and getattr(result.content[0], "text", None) is not None:
+            try:
+                payload = json.loads(result.content[0].text)
+            except ValueError:
+                payload = result.content[0].text
+        failed = bool(result.isError) or (isinstance(payload, dict) and payload.get("success") is False)
+        return elapsed, failed, payload
+
+    async def reset(self):
+        """Start from a project with one track holding one empty pattern."""
+        await self.call("new_project")
+        await self.call("create_track", {"track_type": "instrument", "name": "Bench"})
+        await self.call("create_pattern", {"track_index": 0, "steps": 16})
+
+
+def tool_args(fixtures: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
+    """Arguments for one call of each tool, valid against the project built by ``Client.reset``."""
+    notes = make_notes(16)
+    return {
+        "get_session_info": {},
+        "get_track_info": {"track_index": 0},
+        "read_project_file": {"path": fixtures["project"]},
+        "read_project_track": {"path": fixtures["project"], "track_index": 3, "include_notes": True},
+        "create_track": {"track_type": "instrument", "name": "Bench"},
+        "set_track_name": {"track_index": 0, "name": "Renamed"},
+        "create_pattern": {"track_index": 0, "steps": 16},
+        "add_notes_to_pattern": {"track_index": 0, "pattern_index": 0, "notes": notes},
+        "remove_notes_from_pattern": {"track_index": 0, "pattern_index": 0, "notes": notes},
+        "set_pattern_notes": {"track_index": 0, "pattern_index": 0, "notes": notes},
+        "generate_pattern": {"track_index": 0, "pattern_index": 0, "spec": "euclid pulses=5 steps=16 note=36 repeat=16",
+                             "replace": True},
+        "load_instrument": {"track_index": 0, "instrument_path": "tripleoscillator"},
+        "set_tempo": {"tempo": 128},
+        "play": {},
+        "stop": {},
+        "new_project": {},
+        "save_project": {"path": fixtures["save"]},
+        "get_instruments_list": {"query": "kick"},
+        "get_server_stats": {},
+        "import_midi": {"path": fixtures["midi"]},
+        "export_midi": {"path": fixtures["export"], "project_path": fixtures["project"]},
+        "get_job_status": {},
+        "list_snapshots": {},
+        "diff_snapshots": {"from_snapshot": 1},
+        "restore_snapshot": {"snapshot_id": 1},
+        "render_preview": {"patterns": [{"track_index": 0, "pattern_index": 0}], "project_path": fixtures["project"]},
+        "analyze_project": {"project_path": fixtures["project"]},
+        "subscribe_playback": {"max_rate": 10},
+        "get_pattern_notes": {"track_index": 0, "pattern_index": 0},
+        "batch": {"operations": [
+            {"id": "t", "tool": "create_track", "args": {"name": "Batch"}},
+            {"tool": "set_track_name", "args": {"track_index": "$t.track_index", "name": "Batched"}},
+            {"tool": "create_pattern", "args": {"track_index": "$t.track_index"}},
+            {"tool": "set_tempo", "args": {"tempo": 126}},
+        ]},
+    }
+
+
+# Tools that consume what they operate on: an untimed call creates a fresh target before every timed call
+SETUP: Dict[str, Tuple[str, Dict[str, Any], Callable[[Dict[str, Any]], Dict[str, Any]]]] = {
+    "delete_track": ("create_track", {"name": "Doomed"},
+                     lambda r: {"track_index": r["track_index"]}),
+    "delete_pattern": ("create_pattern", {"track_index": 0},
+                       lambda r: {"track_index": 0, "pattern_index": r["pattern_index"]}),
+    "cancel_job": ("save_project", {"path": os.devnull, "background": True},
+                   lambda r: {"job_id": r["job_id"]}),
+    "unsubscribe_playback": ("subscribe_playback", {"max_rate": 10}, lambda r: {}),
+}
+
+
+def missing_tool_args(tools: List[str], fixtures: Dict[str, str]) -> List[str]:
+    """The tools neither ``tool_args`` nor ``SETUP`` knows how to call."""
+    args_by_tool = tool_args(fixtures)
+    return [tool for tool in tools if tool not in args_by_tool and tool not in SETUP]
+
+
+async def bench_tools(client: Client, tools: List[str], fixtures: Dict[str, str],
+                      iterations: int) -> Dict[str, Any]:
+    """
+    Time each registered tool in isolation.
+
+    Raises:
+        RuntimeError: If a registered tool has no benchmark arguments
+    """
+    missing = missing_tool_args(tools, fixtures)
+    if missing:
+        raise RuntimeError(f"No benchmark arguments for {', '.join(missing)}; add them to tool_args or SETUP")
+    args_by_tool = tool_args(fixtures)
+    results: Dict[str, Any] = {}
+    for tool in tools:
+        await client.reset()
+        samples: List[float] = []
+        errors = 0
+        for _ in range(iterations):
+            if tool in SETUP:
+                setup_tool, setup_args, make_args = SETUP[tool]
+                _, failed, created = await client.call(setup_tool, setup_args)
+                if failed:
+                    errors += 1
+                    continue
+                args = make_args(created)
+            else:
+                args = args_by_tool[tool]
+            elapsed, failed, _ = await client.call(tool, args)
+            samples.append(elapsed)
+            errors += failed
+        results[tool] = dict(percentiles(samples), errors=errors)
+    return results
+
+
+async def song_calls(client: Client, samples: List[float]) -> int:
+    """Build a song one tool call at a time, tracks in parallel. Returns the error count."""
+    errors = 0
+
+    async def call(tool: str, args: Dict[str, Any]) -> Any:
+        nonlocal errors
+        elapsed, failed, payload = await client.call(tool, args)
+        samples.append(elapsed)
+        errors += failed
+        return payload
+
+    async def build_track(i: int):
+        created = await call("create_track", {"track_type": "instrument", "name": f"Track {i}"})
+        track = created.get("track_index") if isinstance(created, dict) else None
+        if track is None:
+            return
+        await call("load_instrument", {"track_index": track, "instrument_path": "tripleoscillator"})
+        await call("set_track_name", {"track_index": track, "name": f"Part {i}"})
+        pattern = await call("create_pattern", {"track_index": track, "steps": 16})
+        await call("add_notes_to_pattern", {"track_index": track, "pattern_index": pattern.get("pattern_index", 0),
+                                            "notes": make_notes(SONG_NOTES_PER_PATTERN, i)})
+
+    await call("new_project", {})
+    await call("set_tempo", {"tempo": 124})
+    await asyncio.gather(*(build_track(i) for i in range(SONG_TRACKS)))
+    await call("get_session_info", {})
+    await call("play", {})
+    await call("stop", {})
+    return errors
+
+
+def song_batch() -> List[Dict[str, Any]]:
+    """The operations of ``song_calls`` after ``new_project`` as one batch."""
+    operations: List[Dict[str, Any]] = [{"tool": "set_tempo", "args": {"tempo": 124}}]
+    for i in range(SONG_TRACKS):
+        track = f"$t{i}.track_index"
+        operations += [
+            {"id": f"t{i}", "tool": "create_track", "args": {"track_type": "instrument", "name": f"Track {i}"}},
+            {"tool": "load_instrument", "args": {"track_index": track, "instrument_path": "tripleoscillator"}},
+            {"tool": "set_track_name", "args": {"track_index": track, "name": f"Part {i}"}},
+            {"id": f"p{i}", "tool": "create_pattern", "args": {"track_index": track, "steps": 16}},
+            {"tool": "add_notes_to_pattern", "args": {"track_index": track, "pattern_index": f"$p{i}.pattern_index",
+                                                      "notes": make_notes(SONG_NOTES_PER_PATTERN, i)}},
+        ]
+    operations += [{"tool": "get_session_info"}, {"tool": "play"}, {"tool": "stop"}]
+    return operations
+
+
+async def bench_workloads(client: Client, repeat: int, concurrency: int, mixed_ops: int) -> Dict[str, Any]:
+    """Time the mixed workloads."""
+    results: Dict[str, Any] = {}
+
+    totals, calls, errors = [], [], 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        errors += await song_calls(client, calls)
+        totals.append(time.perf_counter() - started)
+    results["song_32_tracks"] = {"total": percentiles(totals), "calls": percentiles(calls, sum(totals)),
+                                 "errors": errors}
+
+    operations = song_batch()
+    totals, errors = [], 0
+    for _ in range(repeat):
+        await client.call("new_project")
+        elapsed, failed, _ = await client.call("batch", {"operations": operations})
+        totals.append(elapsed)
+        errors += failed
+    results["song_32_tracks_batch"] = {"total": percentiles(totals), "operations": len(operations),
+                                       "errors": errors}
+
+    await client.reset()
+    rng = random.Random(0)
+    mix = [("get_session_info", {}), ("get_track_info", {"track_index": 0})] * 4 + [
+        ("set_tempo", {"tempo": 120}), ("set_track_name", {"track_index": 0, "name": "Mixed"})]
+    queue = [rng.choice(mix) for _ in range(mixed_ops)]
+    samples: List[float] = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        while queue:
+            tool, args = queue.pop()
+            elapsed, failed, _ = await client.call(tool, args)
+            samples.append(elapsed)
+            errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    results["mixed_read_write"] = dict(percentiles(samples, time.perf_counter() - started),
+                                       concurrency=concurrency, errors=errors)
+    return results
+
+
+async def bench_transport(transport: str, lmms_port: int, env: Dict[str, str], fixtures: Dict[str, str],
+                          args: argparse.Namespace) -> Dict[str, Any]:
+    started = time.perf_counter()
+    async with connect(transport, lmms_port, env) as session:
+        startup = time.perf_counter() - started
+        client = Client(session)
+        tools = [tool.name for tool in (await session.list_tools()).tools]
+        return {
+            "startup_ms": round(startup * 1000, 1),
+            "tools": await bench_tools(client, tools, fixtures, args.iterations),
+            "workloads": await bench_workloads(client, args.repeat, args.concurrency, args.mixed_ops),
+        }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    report: Dict[str, Any] = {
+        "meta": {
+            "version": lmms_mcp.__version__,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "latency_ms": args.latency,
+            "jitter_ms": args.jitter,
+            "iterations": args.iterations,
+        },
+        "transports": {},
+    }
+    fake, lmms_port = start_fake_lmms_process(args.latency, args.jitter, args.seed)
+    try:
+        with tempfile.TemporaryDirectory() as root:
+            fixtures = write_fixtures(root)
+            env = server_env(fixtures, root)
+            for transport in args.transports:
+                report["transports"][transport] = await bench_transport(transport, lmms_port, env, fixtures, args)
+    finally:
+        fake.terminate()
+        fake.wait()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end MCP server benchmark")
+    parser.add_argument("--transports", nargs="+", choices=TRANSPORTS, default=list(TRANSPORTS))
+    parser.add_argument("--latency", type=float, default=0.0, help="Fake LMMS mean reply delay in milliseconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Fake LMMS delay deviation in milliseconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--iterations", type=int, default=50, help="Timed calls per tool")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions of each song workload")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent callers in the mixed workload")
+    parser.add_argument("--mixed-ops", type=int, default=1000, help="Calls in the mixed workload")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark the instrument index on a synthetic sample library.
+
+Builds a directory tree with the requested number of files, then reports the
+cold build time, warm refresh time, incremental refresh time after one file
+is added, and prefix/fuzzy query latencies.
+"""
+
+import argparse
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from lmms_mcp.instrument_index import InstrumentIndex
+
+WORDS = ["kick", "snare", "hat", "clap", "bass", "lead", "pad", "pluck", "vox", "fx", "perc", "tom", "ride",
+         "crash", "sub", "keys", "organ", "brass", "string", "choir"]
+
+
+def make_library(root: str, files: int, per_dir: int, seed: int = 0):
+    rng = random.Random(seed)
+    for i in range(files):
+        directory = os.path.join(root, f"pack{i // (per_dir * 20):03d}", f"folder{i // per_dir:04d}")
+        if i % per_dir == 0:
+            os.makedirs(directory, exist_ok=True)
+        ext = rng.choice([".wav", ".ogg", ".flac", ".xpf"])
+        name = f"{rng.choice(WORDS)}_{rng.choice(WORDS)}_{i:06d}{ext}"
+        open(os.path.join(directory, name), "w").close()
+
+
+def timed(fn, repeat=1):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Instrument index benchmark")
+    parser.add_argument("--files", type=int, default=100_000)
+    parser.add_argument("--per-dir", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="lmms-mcp-bench-")
+    try:
+        library = os.path.join(workdir, "library")
+        print(f"Creating {args.files} files ...")
+        make_library(library, args.files, args.per_dir)
+        db_path = os.path.join(workdir, "index.sqlite")
+
+        index = InstrumentIndex(db_path, [library], refresh_interval=0)
+        cold = timed(lambda: index.refresh(force=True))[0]
+        warm = timed(lambda: index.refresh(force=True), 3)
+        open(os.path.join(library, "pack000", "folder0000", "new_kick.wav"), "w").close()
+        incremental = timed(lambda: index.refresh(force=True))[0]
+        index.close()
+
+        # Queries as the server issues them: refreshes are rate-limited
+        index = InstrumentIndex(db_path, [library])
+        first_query = timed(lambda: index.search("kick"))[0]
+        prefix = timed(lambda: index.search("snare_c", fuzzy=False), args.queries)
+        fuzzy = timed(lambda: index.search("clphat"), args.queries)
+        resolve = timed(lambda: index.resolve("new_kick"), args.queries)
+        index.close()
+
+        ms = 1000.0
+        print(f"cold build           {cold * ms:9.1f} ms")
+        print(f"warm refresh         {statistics.median(warm) * ms:9.1f} ms (no changes)")
+        print(f"incremental refresh  {incremental * ms:9.1f} ms (1 file added)")
+        print(f"first query          {first_query * ms:9.1f} ms (new process, includes refresh)")
+        print(f"prefix query         {statistics.median(prefix) * ms:9.2f} ms median")
+        print(f"fuzzy query          {statistics.median(fuzzy) * ms:9.2f} ms median")
+        print(f"resolve short name   {statistics.median(resolve) * ms:9.2f} ms median")
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
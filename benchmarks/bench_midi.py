@@ -0,0 +1,111 @@
+"""
+Benchmark MIDI file parsing and writing.
+
+Builds an orchestral-sized Standard MIDI File (many tracks of dense,
+overlapping notes with controller traffic and running status, like a
+sequencer would write it) and measures how fast ``MidiReader`` turns it into
+patterns, in events per second, along with the peak memory of the parse
+compared to the file size. Then it measures writing the parsed notes back
+out with ``MidiWriter``.
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from lmms_mcp.midi_file import MidiReader, MidiWriter, _varlen
+from lmms_mcp.notes import np
+
+
+def make_track(rng: random.Random, channel: int, notes: int, division: int) -> bytes:
+    """One track of ``notes`` notes with interleaved modulation, using running status."""
+    events = []
+    tick = 0
+    for _ in range(notes):
+        tick += rng.choice((0, 0, division // 4, division // 2))
+        length = rng.choice((division // 4, division // 2, division, 2 * division))
+        pitch = rng.randrange(36, 96)
+        events.append((tick, 0x90 | channel, pitch, rng.randrange(40, 127)))
+        events.append((tick + length, 0x90 | channel, pitch, 0))
+        if rng.random() < 0.5:
+            events.append((tick, 0xB0 | channel, 1, rng.randrange(128)))
+    events.sort(key=lambda e: e[0])
+    out = bytearray(b"\x00\xff\x03\x04Part")
+    previous = running = 0
+    for tick, status, a, b in events:
+        out += _varlen(tick - previous)
+        previous = tick
+        if status != running:
+            out.append(status)
+            running = status
+        out += bytes((a, b))
+    out += b"\x00\xff\x2f\x00"
+    return bytes(out)
+
+
+def make_file(path: str, tracks: int, notes_per_track: int, division: int = 480, seed: int = 0):
+    rng = random.Random(seed)
+    with open(path, "wb") as f:
+        f.write(b"MThd" + (6).to_bytes(4, "big") + (1).to_bytes(2, "big") + tracks.to_bytes(2, "big")
+                + division.to_bytes(2, "big"))
+        for index in range(tracks):
+            data = make_track(rng, index % 16, notes_per_track, division)
+            f.write(b"MTrk" + len(data).to_bytes(4, "big") + data)
+
+
+def parse(path: str):
+    with MidiReader(path) as reader:
+        return list(reader.tracks())
+
+
+def bench(tracks: int, notes_per_track: int, repeat: int):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "orchestra.mid")
+        make_file(path, tracks, notes_per_track)
+        size = os.path.getsize(path)
+
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            parsed = parse(path)
+            best = min(best, time.perf_counter() - started)
+        events = sum(t.events for t in parsed)
+        notes = sum(len(p.notes) for t in parsed for p in t.parts)
+
+        tracemalloc.start()
+        parse(path)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print(f"{tracks} tracks, {events:,} events, {notes:,} notes, file {size / 1024 / 1024:.1f} MiB")
+        print(f"  parse   {best * 1000:9.1f} ms  {events / best:12,.0f} events/s  "
+              f"peak memory {peak / 1024 / 1024:.1f} MiB")
+
+        out = os.path.join(directory, "export.mid")
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            with MidiWriter(out) as writer:
+                for track in parsed:
+                    for part in track.parts:
+                        writer.write_track(part.name, part.notes, part.channel)
+            best = min(best, time.perf_counter() - started)
+        print(f"  write   {best * 1000:9.1f} ms  {2 * notes / best:12,.0f} events/s  "
+              f"file {os.path.getsize(out) / 1024 / 1024:.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MIDI file parse and write benchmark")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tracks", type=int, default=32)
+    parser.add_argument("--notes-per-track", type=int, default=5000)
+    args = parser.parse_args()
+    print(f"NumPy: {'yes' if np is not None else 'no'}")
+    bench(args.tracks, args.notes_per_track, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark the two forms of notes accepted by the note tools.
+
+Notes reach ``add_notes_to_pattern`` either as a list of note dicts or as
+``records``: base64 of packed :data:`~lmms_mcp.notes.NOTE_RECORD` records.
+For each form this measures, per 100k notes, the steps between the JSON-RPC
+request arriving and the notes being ready to send to LMMS:
+
+* parse: decoding the request's JSON arguments
+* validate: FastMCP's pydantic validation of the arguments
+* convert: turning the arguments into checked note columns
+
+and the way back, turning a pattern into the JSON of a ``get_pattern_notes``
+result. Request sizes are reported too::
+
+    python -m benchmarks.bench_note_encoding --counts 10000 100000 1000000
+"""
+
+import argparse
+import json
+import random
+import time
+from typing import Any, Callable, Dict
+
+from lmms_mcp.notes import np
+from lmms_mcp.pattern import Pattern
+from lmms_mcp.server import MCPServer
+
+PER = 100_000
+
+
+def make_notes(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    return [{"note": rng.randrange(36, 96), "velocity": rng.randrange(40, 127),
+             "start": i * 0.25, "length": 0.25} for i in range(count)]
+
+
+def best(fn: Callable[[], Any], repeat: int) -> float:
+    fastest = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        fastest = min(fastest, time.perf_counter() - started)
+    return fastest
+
+
+def bench(count: int, repeat: int) -> Dict[str, Any]:
+    server = MCPServer(snapshots=False)
+    arg_model = server.server._tool_manager.get_tool("add_notes_to_pattern").fn_metadata.arg_model
+    notes = make_notes(count)
+    pattern = Pattern.from_dicts(notes)
+    requests = {
+        "dicts": json.dumps({"track_index": 0, "pattern_index": 0, "notes": notes}),
+        "records": json.dumps({"track_index": 0, "pattern_index": 0, "records": pattern.to_base64()}),
+    }
+    convert = {
+        "dicts": lambda args: Pattern.from_dicts(args.notes),
+        "records": lambda args: Pattern.from_base64(args.records),
+    }
+    encode = {
+        "dicts": lambda: json.dumps({"count": len(pattern), "notes": pattern.to_dicts()}),
+        "records": lambda: json.dumps({"count": len(pattern), "records": pattern.to_base64()}),
+    }
+
+    scale = 1000.0 * PER / count
+    report: Dict[str, Any] = {"notes": count}
+    for form, text in requests.items():
+        arguments = json.loads(text)
+        validated = arg_model.model_validate(arguments)
+        assert len(convert[form](validated)) == count
+        times = {
+            "parse_ms": best(lambda: json.loads(text), repeat),
+            "validate_ms": best(lambda: arg_model.model_validate(arguments), repeat),
+            "convert_ms": best(lambda: convert[form](validated), repeat),
+        }
+        times["total_ms"] = sum(times.values())
+        report[form] = {name: round(seconds * scale, 2) for name, seconds in times.items()}
+        report[form]["request_bytes"] = len(text)
+        report[form]["read_ms"] = round(best(encode[form], repeat) * scale, 2)
+    report["speedup"] = round(report["dicts"]["total_ms"] / report["records"]["total_ms"], 1)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Note dicts versus base64 note records")
+    parser.add_argument("--counts", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    print(f"NumPy: {'yes' if np is not None else 'no'}; times in ms per {PER:,} notes")
+    for count in args.counts:
+        report = bench(count, args.repeat)
+        for form in ("dicts", "records"):
+            r = report[form]
+            print(f"{count:>8} {form:<8} parse {r['parse_ms']:>9.2f}  validate {r['validate_ms']:>9.2f}  "
+                  f"convert {r['convert_ms']:>9.2f}  total {r['total_ms']:>9.2f}  read {r['read_ms']:>9.2f}  "
+                  f"({r['request_bytes']:,} bytes)")
+        print(f"{count:>8} records are {report['speedup']}x faster to take in")
+
+
+if __name__ == "__main__":
+    main()
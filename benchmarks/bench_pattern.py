@@ -0,0 +1,126 @@
+"""
+Benchmark Pattern against the list-of-dicts note representation.
+
+Measures the memory held by each representation (with ``tracemalloc``) and
+the time taken by transpose, quantize, humanize and slice, plus conversion
+between the two at the MCP boundary. Finally it simulates repeated
+one-bar edits of a large pattern and compares the note bytes a full resend
+would put on the wire with those of the diff ``set_pattern_notes`` sends.
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+
+from lmms_mcp.notes import NOTE_RECORD, TICKS_PER_BEAT, np
+from lmms_mcp.pattern import Pattern, diff_patterns
+
+
+def make_notes(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    return [{"note": rng.randrange(36, 96), "velocity": rng.randrange(40, 127),
+             "start": i * 0.25 + rng.uniform(-0.02, 0.02) if i else 0.0, "length": 0.25, "pan": 0}
+            for i in range(count)]
+
+
+def measure_memory(build):
+    tracemalloc.start()
+    value = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, size
+
+
+def best_time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+# Dict-based equivalents of the Pattern transforms
+def dict_transpose(notes, semitones):
+    return [dict(n, note=n["note"] + semitones) for n in notes]
+
+
+def dict_quantize(notes, grid):
+    return [dict(n, start=round(n["start"] / grid) * grid) for n in notes]
+
+
+def dict_humanize(notes, timing, velocity, seed):
+    rng = random.Random(seed)
+    return [dict(n, start=max(0.0, n["start"] + rng.uniform(-timing, timing)),
+                 velocity=min(max(n["velocity"] + rng.randint(-velocity, velocity), 1), 127)) for n in notes]
+
+
+def dict_slice(notes, start, end):
+    return [n for n in notes if start <= n["start"] < end]
+
+
+def bench(count: int, repeat: int):
+    notes, dict_bytes = measure_memory(lambda: make_notes(count))
+    pattern, pattern_bytes = measure_memory(lambda: Pattern.from_dicts(notes))
+    window = (count * 0.25 / 4, count * 0.25 / 2)
+
+    print(f"{count:>9,} notes  memory: dicts {dict_bytes / count:6.1f} B/note, "
+          f"Pattern {pattern_bytes / count:5.1f} B/note ({dict_bytes / pattern_bytes:.0f}x smaller)")
+    operations = [
+        ("transpose", lambda: dict_transpose(notes, 7), lambda: pattern.transpose(7)),
+        ("quantize", lambda: dict_quantize(notes, 0.25), lambda: pattern.quantize(0.25)),
+        ("humanize", lambda: dict_humanize(notes, 1 / TICKS_PER_BEAT, 8, 0),
+         lambda: pattern.humanize(1 / TICKS_PER_BEAT, 8, 0)),
+        ("slice", lambda: dict_slice(notes, *window), lambda: pattern.slice(*window)),
+        ("from_dicts", None, lambda: Pattern.from_dicts(notes)),
+        ("to_dicts", None, lambda: pattern.to_dicts()),
+    ]
+    for name, with_dicts, with_pattern in operations:
+        pattern_time = best_time(with_pattern, repeat)
+        line = f"{'':>16}{name:<11} Pattern {pattern_time * 1000:9.3f} ms"
+        if with_dicts is not None:
+            dict_time = best_time(with_dicts, repeat)
+            line += f"   dicts {dict_time * 1000:9.3f} ms   ({dict_time / pattern_time:5.1f}x)"
+        print(line)
+
+
+def bench_edits(count: int, edits: int, seed: int = 0):
+    rng = random.Random(seed)
+    notes = make_notes(count, seed)
+    current = Pattern.from_dicts(notes)
+    bars = max(1, count // 16)
+    full_bytes = delta_bytes = 0
+    diff_time = 0.0
+    for _ in range(edits):
+        # Rewrite one bar (16 sixteenth notes) of the pattern
+        first = rng.randrange(bars) * 16
+        for note in notes[first:first + 16]:
+            note["note"] = rng.randrange(36, 96)
+        edited = Pattern.from_dicts(notes)
+        started = time.perf_counter()
+        removed, added = diff_patterns(current, edited)
+        diff_time += time.perf_counter() - started
+        full_bytes += len(edited) * NOTE_RECORD.size
+        delta_bytes += (len(removed) + len(added)) * NOTE_RECORD.size
+        current = edited
+    print(f"{count:>9,} notes, {edits} one-bar edits: full resend {full_bytes / 1024:10,.1f} KiB, "
+          f"diff {delta_bytes / 1024:7,.1f} KiB ({full_bytes / max(delta_bytes, 1):,.0f}x less), "
+          f"diff {diff_time / edits * 1000:.2f} ms/edit")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pattern memory and transform benchmark")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--counts", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--edits", type=int, default=20)
+    args = parser.parse_args()
+    print(f"NumPy: {'yes' if np is not None else 'no'}")
+    for count in args.counts:
+        bench(count, args.repeat)
+    for count in args.counts:
+        bench_edits(count, args.edits)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark offline pattern previews.
+
+Renders patterns of growing note density and reports render speed as a
+multiple of realtime (seconds of audio per second of rendering), then renders
+several patterns one after another and on the process pool, as
+``render_preview`` does for a mix::
+
+    python -m benchmarks.bench_preview --bars 64 --patterns 8
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import wait
+
+import numpy as np
+
+from lmms_mcp.pattern import Pattern
+from lmms_mcp.preview import DEFAULT_SAMPLE_RATE, render_pattern, render_pool
+from lmms_mcp.snapshots import pack_pattern
+
+TEMPO = 120.0
+
+
+def pattern(bars: int, notes_per_beat: int, polyphony: int, seed: int = 0) -> Pattern:
+    """Chords of ``polyphony`` notes, ``notes_per_beat`` times a beat, each held for two steps."""
+    rng = np.random.default_rng(seed)
+    onsets = bars * 4 * notes_per_beat
+    count = onsets * polyphony
+    start = np.repeat(np.arange(onsets) * (48 // notes_per_beat), polyphony)
+    return Pattern.from_ticks(rng.integers(36, 84, count), rng.integers(60, 128, count), start,
+                              np.full(count, 24))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline preview render benchmark")
+    parser.add_argument("--bars", type=int, default=32)
+    parser.add_argument("--patterns", type=int, default=8, help="Patterns rendered for the mix")
+    parser.add_argument("--sample-rate", type=int, default=DEFAULT_SAMPLE_RATE)
+    parser.add_argument("--waveform", default="saw")
+    args = parser.parse_args()
+    seconds = args.bars * 4 * 60.0 / TEMPO
+
+    print(f"{args.bars} bars ({seconds:.0f} s of audio) at {args.sample_rate} Hz, {args.waveform}")
+    for notes_per_beat, polyphony in ((1, 1), (4, 1), (4, 4), (8, 8)):
+        data = pack_pattern(pattern(args.bars, notes_per_beat, polyphony))
+        started = time.perf_counter()
+        render_pattern(data, TEMPO, args.sample_rate, args.waveform)
+        elapsed = time.perf_counter() - started
+        print(f"  {notes_per_beat * polyphony:>3} notes per beat  {elapsed * 1000:>8.1f} ms  "
+              f"{seconds / elapsed:>7.1f}x realtime")
+
+    jobs = [pack_pattern(pattern(args.bars, 4, 4, seed)) for seed in range(args.patterns)]
+    started = time.perf_counter()
+    for data in jobs:
+        render_pattern(data, TEMPO, args.sample_rate, args.waveform)
+    serial = time.perf_counter() - started
+
+    pool = render_pool()
+    # Start the workers before timing
+    wait([pool.submit(render_pattern, jobs[0], TEMPO, args.sample_rate, args.waveform)
+          for _ in range(os.cpu_count() or 1)])
+    started = time.perf_counter()
+    wait([pool.submit(render_pattern, data, TEMPO, args.sample_rate, args.waveform) for data in jobs])
+    parallel = time.perf_counter() - started
+    total = seconds * args.patterns
+    print(f"{args.patterns} patterns of 16 notes per beat")
+    print(f"  one after another  {serial * 1000:>8.1f} ms  {total / serial:>7.1f}x realtime")
+    print(f"  process pool       {parallel * 1000:>8.1f} ms  {total / parallel:>7.1f}x realtime")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark session query responses on a large synthetic project.
+
+Loads a synthetic project (500 tracks by default, each with several
+patterns) into the session mirror and compares, for ``get_session_info``:
+
+* the full answer encoded the way FastMCP encodes a dict result (indented
+  text plus the same object again as structured output), as the tool was
+  before it was served as compact JSON
+* the full answer as compact JSON from the fast encoder
+* a page of 50 tracks, a field projection and a ``since_version`` query
+  after a few edits
+
+reporting response size and build plus encode time for each.
+"""
+
+import argparse
+import time
+
+import pydantic_core
+
+from lmms_mcp import encoding
+from lmms_mcp.session_state import SessionState
+
+
+def make_project(tracks: int, patterns: int):
+    return {"tempo": 128, "tracks": [
+        {"index": i, "name": f"Track {i}", "type": "instrument", "instrument": "tripleoscillator",
+         "muted": False, "volume": 100, "panning": 0,
+         "patterns": [{"index": p, "name": f"Pattern {p}", "position": p * 192, "steps": 16, "notes": 32}
+                      for p in range(patterns)]}
+        for i in range(tracks)]}
+
+
+def best_time(fn, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        value = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, value
+
+
+def fastmcp_default(state: SessionState) -> bytes:
+    info = state.session_info()
+    text = pydantic_core.to_json(info, fallback=str, indent=2)
+    structured = pydantic_core.to_json({"result": info}, fallback=str)
+    return text + structured
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Session query size and encode-time benchmark")
+    parser.add_argument("--tracks", type=int, default=500)
+    parser.add_argument("--patterns", type=int, default=12)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    state = SessionState()
+    state.load_session(make_project(args.tracks, args.patterns))
+    seen = state.version
+    for index in range(0, args.tracks, args.tracks // 5 or 1):
+        state.track_renamed(index, f"Edited {index}")
+
+    print(f"{args.tracks} tracks x {args.patterns} patterns, encoder: "
+          f"{'orjson' if encoding.orjson is not None else 'json'}")
+    queries = [
+        ("full, FastMCP default", lambda: fastmcp_default(state)),
+        ("full, compact", lambda: encoding.dumps(state.session_info())),
+        ("page of 50", lambda: encoding.dumps(state.session_info(limit=50))),
+        ("fields name+note_count", lambda: encoding.dumps(state.session_info(fields=["name", "note_count"]))),
+        ("since_version", lambda: encoding.dumps(state.session_info(since_version=seen))),
+    ]
+    baseline = None
+    for name, query in queries:
+        elapsed, response = best_time(query, args.repeat)
+        size = len(response)
+        baseline = baseline or size
+        print(f"  {name:<24} {size / 1024:9.1f} KiB ({baseline / size:6.1f}x smaller)  {elapsed * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark the cold start of the stdio MCP server.
+
+Starts ``lmms-mcp`` (``python -m lmms_mcp.cli``) repeatedly and measures the
+time from process start to the ``initialize`` reply, to the ``tools/list``
+reply and to the reply of the first tool call (which needs the full server).
+No LMMS is required: the tool called is ``get_server_stats``.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TARGET_INITIALIZE_MS = 150.0
+
+REQUESTS = [
+    {"jsonrpc": "2.0", "id": 1, "method": "initialize",
+     "params": {"protocolVersion": "2025-06-18", "capabilities": {},
+                "clientInfo": {"name": "bench", "version": "0"}}},
+    {"jsonrpc": "2.0", "method": "notifications/initialized"},
+    {"jsonrpc": "2.0", "id": 2, "method": "tools/list"},
+    {"jsonrpc": "2.0", "id": 3, "method": "tools/call", "params": {"name": "get_server_stats", "arguments": {}}},
+]
+
+MILESTONES = {1: "initialize", 2: "tools_list", 3: "first_tool_call"}
+
+
+def run_once(command) -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [REPO_ROOT, env.get("PYTHONPATH")]))
+    started = time.perf_counter()
+    process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                               stderr=subprocess.DEVNULL, env=env, cwd=REPO_ROOT)
+    # The client writes its whole opening at once, as MCP clients do
+    process.stdin.write(b"".join(json.dumps(r).encode() + b"\n" for r in REQUESTS))
+    process.stdin.flush()
+    timings = {}
+    while len(timings) < len(MILESTONES):
+        line = process.stdout.readline()
+        if not line:
+            raise RuntimeError("server exited before answering")
+        reply = json.loads(line)
+        if reply.get("id") in MILESTONES:
+            timings[MILESTONES[reply["id"]]] = (time.perf_counter() - started) * 1000
+    process.stdin.close()
+    process.wait()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MCP stdio cold start benchmark")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--command", nargs="+", default=[sys.executable, "-m", "lmms_mcp.cli"],
+                        help="Server command line")
+    args = parser.parse_args()
+
+    runs = [run_once(args.command) for _ in range(args.runs)]
+    report = {}
+    for milestone in MILESTONES.values():
+        samples = [r[milestone] for r in runs]
+        report[milestone] = {"median_ms": round(statistics.median(samples), 1),
+                             "min_ms": round(min(samples), 1), "max_ms": round(max(samples), 1)}
+    report["target_initialize_ms"] = TARGET_INITIALIZE_MS
+    report["meets_target"] = report["initialize"]["median_ms"] < TARGET_INITIALIZE_MS
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
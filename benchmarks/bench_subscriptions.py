@@ -0,0 +1,229 @@
+"""
+Load test of playback subscriptions over the streamable HTTP transport.
+
+Starts the MCP server as its own process, with a fake LMMS in this process
+pushing the playhead and per-track peak meters at a fixed rate (and the
+tempo once a second), as LMMS does while playing. Many MCP clients connect
+over streamable HTTP and subscribe to every topic at a chosen maximum rate.
+Some of them stall after their first update, like a client that stopped
+reading its event stream; the server should drop those without holding back
+anyone else. A stalled client is only noticed once the socket buffers
+between it and the server are full, so stalled clients ask for the highest
+rate and read through a small socket receive buffer.
+
+The report gives, per topic, the update rate each healthy client saw (which
+must not exceed its maximum rate), the delay from an LMMS push to a client
+receiving the position it carried, and the server's own subscription
+counters, including the stalled clients it dropped::
+
+    python -m benchmarks.bench_subscriptions --clients 50 --stalled 5 --max-rate 10 --push-rate 60
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+from mcp import ClientSession, types
+from mcp.client.streamable_http import streamablehttp_client
+from mcp.shared._httpx_utils import create_mcp_http_client
+
+from lmms_mcp.playback import MAX_RATE, TOPICS
+
+from .bench_e2e import REPO_ROOT, STARTUP_TIMEOUT, free_port, percentiles
+from .fake_lmms import FakeLMMS, start_fake_lmms
+
+# Bytes of socket receive buffer of the stalled clients
+STALLED_RECEIVE_BUFFER = 4096
+
+
+class Listener:
+    """One MCP client's subscription and what it received."""
+
+    def __init__(self, pushed: Dict[int, float], stall: bool):
+        self.pushed = pushed
+        self.stall = stall
+        self.counts = dict.fromkeys(TOPICS, 0)
+        self.delays: List[float] = []
+        self.started: Optional[float] = None
+        self._stalled = asyncio.Event()
+
+    async def handle(self, message):
+        if not isinstance(message, types.ServerNotification):
+            return
+        update = message.root
+        if not isinstance(update, types.ResourceUpdatedNotification):
+            return
+        topic = str(update.params.uri).rsplit("/", 1)[-1]
+        self.counts[topic] += 1
+        if topic == "position":
+            pushed = self.pushed.get(update.params.value["ticks"])
+            if pushed is not None:
+                self.delays.append(time.perf_counter() - pushed)
+        if self.stall:
+            # Stop reading the event stream, as a stuck client would
+            await self._stalled.wait()
+
+
+async def wait_for_server(port: int, process: subprocess.Popen):
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while True:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline or process.poll() is not None:
+                raise RuntimeError(f"MCP HTTP server did not start on port {port}")
+            await asyncio.sleep(0.05)
+
+
+def stalled_http_client(headers: Optional[Dict[str, str]] = None, timeout: Optional[httpx.Timeout] = None,
+                        auth: Optional[httpx.Auth] = None) -> httpx.AsyncClient:
+    """An HTTP client with a small socket receive buffer, so a stall reaches the server sooner."""
+    transport = httpx.AsyncHTTPTransport(socket_options=[(socket.SOL_SOCKET, socket.SO_RCVBUF,
+                                                          STALLED_RECEIVE_BUFFER)])
+    return httpx.AsyncClient(transport=transport, headers=headers, auth=auth,
+                             timeout=timeout or httpx.Timeout(30.0, read=300.0))
+
+
+async def client(url: str, listener: Listener, max_rate: float, ready: asyncio.Event, done: asyncio.Event):
+    """Subscribe to every topic and listen until the run is done."""
+    factory = stalled_http_client if listener.stall else create_mcp_http_client
+    async with streamablehttp_client(url, httpx_client_factory=factory) as (read, write, _):
+        async with ClientSession(read, write, message_handler=listener.handle) as session:
+            await session.initialize()
+            await session.call_tool("subscribe_playback", {"max_rate": max_rate})
+            listener.started = time.perf_counter()
+            ready.set()
+            await done.wait()
+
+
+async def feed(fake: FakeLMMS, pushed: Dict[int, float], push_rate: float, tracks: int, stop: asyncio.Event):
+    """Push the playhead and meters at ``push_rate``, and the tempo once a second, until stopped."""
+    ticks = 0
+    step = 0
+    while not stop.is_set():
+        ticks += 4
+        step += 1
+        pushed[ticks] = time.perf_counter()
+        fake.push("/lmms/notify/position", ticks, 1)
+        levels = []
+        for track in range(tracks):
+            level = ((step * (track + 3)) % 100) / 100.0
+            levels += [track, level, level * 0.9]
+        fake.push("/lmms/notify/meters", *levels)
+        if step % max(1, int(push_rate)) == 0:
+            fake.push("/lmms/notify/tempo", 120.0 + step % 7)
+        await asyncio.sleep(1.0 / push_rate)
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    fake, lmms_port = await start_fake_lmms()
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/mcp"
+    with tempfile.TemporaryDirectory() as root:
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [REPO_ROOT, env.get("PYTHONPATH")]))
+        env["XDG_CACHE_HOME"] = os.path.join(root, "cache")
+        process = subprocess.Popen(
+            [sys.executable, "-m", "lmms_mcp.server", "--port", str(port), "--lmms-port", str(lmms_port),
+             "--no-snapshots"], env=env, cwd=REPO_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            await wait_for_server(port, process)
+            return await measure(args, fake, url)
+        finally:
+            process.terminate()
+            process.wait()
+            fake.transport.close()
+
+
+async def measure(args: argparse.Namespace, fake: FakeLMMS, url: str) -> Dict[str, Any]:
+    pushed: Dict[int, float] = {}
+    done = asyncio.Event()
+    listeners = [Listener(pushed, stall=i < args.stalled) for i in range(args.clients + args.stalled)]
+    readies = [asyncio.Event() for _ in listeners]
+    tasks = [asyncio.ensure_future(client(url, listener, args.stalled_rate if listener.stall else args.max_rate,
+                                          ready, done))
+             for listener, ready in zip(listeners, readies)]
+
+    async with streamablehttp_client(url) as (read, write, _):
+        async with ClientSession(read, write) as control:
+            await control.initialize()
+            # LMMS pushes to servers it has heard from
+            await control.call_tool("get_session_info", {})
+            await asyncio.wait_for(asyncio.gather(*(ready.wait() for ready in readies)), STARTUP_TIMEOUT)
+
+            stop = asyncio.Event()
+            feeder = asyncio.ensure_future(feed(fake, pushed, args.push_rate, args.tracks, stop))
+            started = time.perf_counter()
+            await asyncio.sleep(args.seconds)
+            stop.set()
+            elapsed = time.perf_counter() - started
+            await feeder
+            # Before the clients leave, which unsubscribes them
+            result = await control.call_tool("get_server_stats", {})
+            server = json.loads(result.content[0].text)["playback"]
+            done.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    healthy = [listener for listener in listeners if not listener.stall]
+    rates = {}
+    for topic in TOPICS:
+        seen = sorted(listener.counts[topic] / elapsed for listener in healthy)
+        rates[topic] = {"min_per_s": round(seen[0], 2), "mean_per_s": round(sum(seen) / len(seen), 2),
+                        "max_per_s": round(seen[-1], 2)} if seen else {}
+    return {
+        "clients": args.clients,
+        "stalled_clients": args.stalled,
+        "stalled_rate": args.stalled_rate,
+        "max_rate": args.max_rate,
+        "push_rate": args.push_rate,
+        "tracks": args.tracks,
+        "seconds": round(elapsed, 2),
+        "lmms_pushes": len(pushed),
+        # Below push_rate when this process cannot keep up with its clients
+        "lmms_pushes_per_s": round(len(pushed) / elapsed, 1),
+        "updates_per_client": rates,
+        "within_max_rate": all(listener.counts["position"] / elapsed <= args.max_rate * 1.1 + 1
+                               for listener in healthy),
+        "position_delay": percentiles([d for listener in healthy for d in listener.delays], elapsed),
+        "stalled_updates": [listener.counts["position"] for listener in listeners if listener.stall],
+        "server": server,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test playback subscriptions over streamable HTTP")
+    parser.add_argument("--clients", type=int, default=50, help="Subscribed clients that keep up")
+    parser.add_argument("--stalled", type=int, default=5, help="Subscribed clients that stop reading")
+    parser.add_argument("--max-rate", type=float, default=10.0, help="Updates per second each client asks for")
+    parser.add_argument("--stalled-rate", type=float, default=MAX_RATE,
+                        help="Updates per second the stalled clients ask for; higher rates fill the "
+                             "buffers between server and client sooner")
+    parser.add_argument("--push-rate", type=float, default=60.0, help="LMMS pushes per second")
+    parser.add_argument("--tracks", type=int, default=64, help="Tracks in each meters push")
+    parser.add_argument("--seconds", type=float, default=30.0, help="Length of the run")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    # Stalled clients are torn down with updates still in flight, which the MCP client logs at length
+    logging.getLogger("mcp.client.streamable_http").setLevel(logging.CRITICAL)
+    text = json.dumps(asyncio.run(run(args)), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Local stand-in for LMMS that speaks the OSC request/reply protocol.
+
+The fake keeps a small in-memory project (tracks, patterns, tempo, transport)
+so every command the MCP server sends gets a plausible answer. Replies can be
+delayed by a fixed latency plus uniform jitter to model a real DAW.
+Notifications such as the playhead position can be pushed to every client
+that has sent a request with :meth:`FakeLMMS.push`.
+
+Run it as a standalone process with::
+
+    python -m benchmarks.fake_lmms --port 9000 --latency 2 --jitter 1
+"""
+
+import argparse
+import asyncio
+import json
+import random
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from pythonosc.osc_message_builder import OscMessageBuilder
+from pythonosc.osc_packet import OscPacket
+
+from lmms_mcp.lmms_interface import ADDRESS_PREFIX, REPLY_ADDRESS
+from lmms_mcp.notes import NOTE_RECORD
+
+
+def build_reply(request_id: int, result: Dict[str, Any]) -> bytes:
+    """Encode a ``/lmms/reply`` datagram."""
+    builder = OscMessageBuilder(REPLY_ADDRESS)
+    builder.add_arg(request_id)
+    builder.add_arg(json.dumps(result))
+    return builder.build().dgram
+
+
+class FakeLMMS(asyncio.DatagramProtocol):
+    """Answers requests from an in-memory project after a configurable delay."""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, seed: Optional[int] = None):
+        """
+        Initialize the fake.
+
+        Args:
+            latency: Mean reply delay in seconds
+            jitter: Maximum deviation from the mean delay in seconds
+            seed: Seed for the jitter random generator
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.transport = None
+        self.requests = 0
+        self.notes = 0
+        self.clients: Set[Tuple[str, int]] = set()
+        self._random = random.Random(seed)
+        self.reset()
+
+    def reset(self):
+        """Start a new, empty project."""
+        self.tempo = 120.0
+        self.playing = False
+        self.tracks: List[Dict[str, Any]] = []
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def push(self, address: str, *args: Any):
+        """Send a notification, e.g. ``/lmms/notify/position``, to every client."""
+        builder = OscMessageBuilder(address)
+        for arg in args:
+            builder.add_arg(arg)
+        data = builder.build().dgram
+        for client in self.clients:
+            self.transport.sendto(data, client)
+
+    def datagram_received(self, data: bytes, addr: Tuple[str, int]):
+        self.clients.add(addr)
+        for timed in OscPacket(data).messages:
+            message = timed.message
+            command = message.address[len(ADDRESS_PREFIX):]
+            self.requests += 1
+            try:
+                result = self.handle(command, list(message.params[1:]))
+            except (IndexError, KeyError, TypeError, ValueError) as e:
+                result = {"error": f"{command}: {e!r}"}
+            reply = build_reply(message.params[0], result)
+            delay = self.delay()
+            if delay > 0:
+                asyncio.get_running_loop().call_later(delay, self.transport.sendto, reply, addr)
+            else:
+                self.transport.sendto(reply, addr)
+
+    def delay(self) -> float:
+        """Draw the delay for one reply."""
+        if self.jitter:
+            return max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+        return self.latency
+
+    def _track(self, index: Any) -> Dict[str, Any]:
+        if not isinstance(index, int) or not 0 <= index < len(self.tracks):
+            raise IndexError(f"no track {index}")
+        return self.tracks[index]
+
+    def _pattern(self, track_index: Any, pattern_index: Any) -> Dict[str, Any]:
+        patterns = self._track(track_index)["patterns"]
+        if not isinstance(pattern_index, int) or not 0 <= pattern_index < len(patterns):
+            raise IndexError(f"no pattern {pattern_index} on track {track_index}")
+        return patterns[pattern_index]
+
+    def handle(self, command: str, args: List[Any]) -> Dict[str, Any]:
+        """Apply one command to the in-memory project and produce its result."""
+        if command == "get_session_info":
+            return {"tempo": self.tempo, "playing": self.playing,
+                    "tracks": [dict(t, index=i) for i, t in enumerate(self.tracks)]}
+        if command == "get_track_info":
+            return dict(self._track(args[0]), index=args[0])
+        if command == "create_track":
+            self.tracks.append({"name": args[1] or f"Track {len(self.tracks) + 1}", "type": args[0],
+                                "instrument": "tripleoscillator", "patterns": []})
+            return {"success": True, "track_index": len(self.tracks) - 1}
+        if command == "delete_track":
+            self._track(args[0])
+            del self.tracks[args[0]]
+            return {"success": True}
+        if command == "set_track_name":
+            self._track(args[0])["name"] = args[1]
+            return {"success": True}
+        if command == "create_pattern":
+            patterns = self._track(args[0])["patterns"]
+            patterns.append({"index": len(patterns), "steps": args[1], "notes": 0})
+            return {"success": True, "pattern_index": len(patterns) - 1}
+        if command == "delete_pattern":
+            patterns = self._track(args[0])["patterns"]
+            self._pattern(args[0], args[1])
+            del patterns[args[1]]
+            for i, pattern in enumerate(patterns):
+                pattern["index"] = i
+            return {"success": True}
+        if command in ("add_notes", "remove_notes"):
+            count = len(args[3]) // NOTE_RECORD.size
+            pattern = self._pattern(args[0], args[1])
+            pattern["notes"] = max(0, pattern["notes"] + (count if command == "add_notes" else -count))
+            self.notes += count
+            return {"success": True}
+        if command == "load_instrument":
+            self._track(args[0])["instrument"] = args[1]
+            return {"success": True}
+        if command == "set_tempo":
+            self.tempo = float(args[0])
+            return {"success": True}
+        if command in ("play", "stop"):
+            self.playing = command == "play"
+            return {"success": True}
+        if command == "new_project":
+            self.reset()
+            return {"success": True}
+        if command == "save_project":
+            return {"success": True, "path": args[0]}
+        if command == "get_instruments_list":
+            return {"instruments": ["tripleoscillator", "kicker", "audiofileprocessor"]}
+        return {"error": f"unknown command '{command}'"}
+
+
+async def start_fake_lmms(host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                          jitter: float = 0.0, seed: Optional[int] = None):
+    """
+    Start a fake LMMS endpoint on the running event loop.
+
+    Returns:
+        The protocol instance and the port it listens on
+    """
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.create_datagram_endpoint(
+        lambda: FakeLMMS(latency, jitter, seed), local_addr=(host, port))
+    return protocol, transport.get_extra_info("sockname")[1]
+
+
+def main():
+    """Run a fake LMMS until interrupted."""
+    parser = argparse.ArgumentParser(description="Fake LMMS OSC endpoint")
+    parser.add_argument("--host", default="127.0.0.1", help="Listening host")
+    parser.add_argument("--port", type=int, default=9000, help="Listening port (0 picks a free port)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Mean reply delay in milliseconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Maximum delay deviation in milliseconds")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for jitter")
+    args = parser.parse_args()
+
+    async def run():
+        _, port = await start_fake_lmms(args.host, args.port, args.latency / 1000.0, args.jitter / 1000.0, args.seed)
+        # The chosen port is the first line on stdout so a parent process can read it
+        print(port, flush=True)
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
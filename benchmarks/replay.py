@@ -0,0 +1,122 @@
+"""
+Replay a recorded LMMS wire log through the MCP server.
+
+A log written by ``lmms-mcp server --record-wire session.wire`` holds every
+datagram exchanged with LMMS. The requests in it are turned back into the
+tool calls that sent them (see :func:`lmms_mcp.wire_log.tool_calls`) and
+played through FastMCP's tool layer of an in-process ``MCPServer`` against
+the fake LMMS, so a real session becomes a repeatable benchmark:
+
+* at the original pacing (``--speed 1``, the default), or faster or slower,
+  each call starting at its recorded time whether or not earlier calls have
+  finished, as they did in the session
+* as fast as possible (``--speed 0``), one call after another
+
+The report gives per-tool latency percentiles, errors and overall throughput,
+next to the LMMS round trips recorded in the log::
+
+    python -m benchmarks.replay session.wire --speed 0 --latency 2 --output replay.json
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Dict, List
+
+from lmms_mcp.server import MCPServer
+from lmms_mcp.wire_log import ToolCall, WireLog, round_trips, tool_calls
+
+from .bench_e2e import percentiles
+from .fake_lmms import start_fake_lmms
+
+
+async def replay(calls: List[ToolCall], speed: float = 1.0, latency: float = 0.0, jitter: float = 0.0,
+                 seed: int = 0) -> Dict[str, Any]:
+    """
+    Play tool calls through an MCP server against a fresh fake LMMS.
+
+    Args:
+        calls: The calls to make, with their times in seconds
+        speed: Multiple of the original pacing; 0 makes the calls back to back
+        latency: Fake LMMS reply delay in seconds
+        jitter: Largest deviation from the reply delay in seconds
+        seed: Seed of the jitter
+
+    Returns:
+        Latencies by tool, errors, lateness of paced calls and throughput
+    """
+    fake, port = await start_fake_lmms(latency=latency, jitter=jitter, seed=seed)
+    server = MCPServer(lmms_port=port, snapshots=False)
+    samples: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    late: List[float] = []
+
+    async def run(call: ToolCall):
+        begun = time.perf_counter()
+        try:
+            await server.server.call_tool(call.tool, call.arguments)
+        except Exception:
+            errors[call.tool] = errors.get(call.tool, 0) + 1
+        samples.setdefault(call.tool, []).append(time.perf_counter() - begun)
+
+    started = time.perf_counter()
+    if speed > 0:
+        tasks = []
+        for call in calls:
+            due = started + call.time / speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            late.append(max(0.0, time.perf_counter() - due))
+            tasks.append(asyncio.ensure_future(run(call)))
+        await asyncio.gather(*tasks)
+    else:
+        for call in calls:
+            await run(call)
+    elapsed = time.perf_counter() - started
+
+    await server.lmms_interface.close()
+    fake.transport.close()
+    return {
+        "calls": len(calls),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_per_s": round(len(calls) / elapsed, 1) if elapsed > 0 else None,
+        "tools": {tool: percentiles(values) for tool, values in sorted(samples.items())},
+        "late": percentiles(late) if late else None,
+        "lmms_requests": fake.requests,
+        "notes": fake.notes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded LMMS wire log through the MCP server")
+    parser.add_argument("log", help="Wire log written with --record-wire")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Multiple of the recorded pacing; 0 replays as fast as possible")
+    parser.add_argument("--latency", type=float, default=0.0, help="Fake LMMS reply delay in milliseconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Largest reply delay deviation in milliseconds")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for jitter")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+
+    with WireLog(args.log) as log:
+        calls = tool_calls(log)
+        recorded = {command: percentiles(seconds) for command, seconds in sorted(round_trips(log).items())}
+    report = {
+        "log": args.log,
+        "speed": args.speed,
+        "recorded": {"seconds": round(calls[-1].time, 3) if calls else 0.0, "round_trips": recorded},
+        "replay": asyncio.run(replay(calls, args.speed, args.latency / 1000.0, args.jitter / 1000.0, args.seed)),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
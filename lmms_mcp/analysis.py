@@ -0,0 +1,213 @@
+"""
+Whole-project analysis of notes: key, density, pitch ranges and collisions.
+
+The notes of every pattern are concatenated into one set of columns, tagged
+with their track and pattern, and analysed in a single vectorized pass:
+
+* key: a duration-weighted pitch-class histogram is correlated with the
+  Krumhansl-Kessler major and minor key profiles; the scales of
+  :data:`~lmms_mcp.generators.SCALES` are ranked by the share of the
+  histogram they cover, so the estimate can be fed to ``generate_pattern``
+* density: notes starting in each bar (4/4), for the project and per track
+* ranges: the lowest, median and highest pitch of each track, and the track
+  pairs whose ranges overlap most
+* collisions: notes of one pattern at the same pitch that overlap in time,
+  either exact duplicates (same start) or partial overlaps
+
+NumPy is required; it is an optional dependency of the package
+(``pip install lmms-mcp[numpy]``).
+"""
+
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from .generators import SCALES
+from .notes import TICKS_PER_BEAT, NoteColumns
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+BAR_TICKS = 4 * TICKS_PER_BEAT
+
+# Entries in each ranked list of the result
+DEFAULT_TOP = 10
+
+PITCH_CLASSES = ("C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B")
+
+# Krumhansl-Kessler probe-tone profiles, from the tonic up
+MAJOR_PROFILE = (6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88)
+MINOR_PROFILE = (6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17)
+
+
+class AnalysisError(ValueError):
+    """Raised when notes cannot be analysed."""
+
+
+class Part(NamedTuple):
+    """The notes of one pattern, placed in the project."""
+
+    track_index: int
+    name: str
+    pattern_index: int
+    position: int
+    notes: NoteColumns
+
+
+def _require_numpy():
+    if np is None:
+        raise AnalysisError("Analysing projects needs NumPy (pip install lmms-mcp[numpy])")
+
+
+def _zscore(values):
+    return (values - values.mean(axis=-1, keepdims=True)) / values.std(axis=-1, keepdims=True)
+
+
+def _key(weights, top: int) -> Dict[str, Any]:
+    """Estimate the key and the best-fitting scales from a pitch-class histogram."""
+    total = weights.sum()
+    if not total:
+        return {"name": None, "tonic": None, "mode": None, "confidence": 0.0, "candidates": [], "in_key": 0.0,
+                "out_of_key": [], "scales": []}
+    # Row 12 * mode + tonic holds the profile rotated to start on the tonic
+    profiles = np.array([np.roll(profile, tonic) for profile in (MAJOR_PROFILE, MINOR_PROFILE)
+                         for tonic in range(12)])
+    if weights.std():
+        scores = _zscore(profiles) @ _zscore(weights) / 12
+    else:
+        scores = np.zeros(len(profiles))
+    best = int(scores.argmax())
+    tonic, mode = best % 12, ("major", "minor")[best // 12]
+    scale_names = [name for name in SCALES if name != "chromatic"]
+    masks = np.zeros((len(scale_names), 12, 12))
+    for row, name in enumerate(scale_names):
+        for root in range(12):
+            masks[row, root, [(root + step) % 12 for step in SCALES[name]]] = 1
+    # Entry 12 * scale + root
+    shares = (masks @ weights / total).ravel()
+    sizes = np.repeat([len(SCALES[name]) for name in scale_names], 12)
+    elsewhere = np.tile(np.arange(12) != tonic, len(scale_names))
+    # Best coverage first, then the smaller scale, then the estimated tonic
+    order = np.lexsort((elsewhere, sizes, -shares))
+    scales = [{"name": f"{PITCH_CLASSES[i % 12]} {scale_names[i // 12]}", "root": PITCH_CLASSES[i % 12],
+               "scale": scale_names[i // 12], "in_scale": round(float(shares[i]), 3)} for i in order[:top]]
+    in_key = masks[scale_names.index(mode), tonic].astype(bool)
+    outside = [(PITCH_CLASSES[pc], round(float(weights[pc] / total), 3)) for pc in np.argsort(-weights)
+               if not in_key[pc] and weights[pc]]
+    return {"name": f"{PITCH_CLASSES[tonic]} {mode}", "tonic": PITCH_CLASSES[tonic], "mode": mode,
+            "confidence": round(float(scores[best]), 3),
+            "candidates": [{"name": f"{PITCH_CLASSES[i % 12]} {('major', 'minor')[i // 12]}",
+                            "score": round(float(scores[i]), 3)} for i in np.argsort(-scores)[:3]],
+            "in_key": round(float(weights[in_key].sum() / total), 3),
+            "out_of_key": [{"pitch_class": name, "share": share} for name, share in outside],
+            "scales": scales}
+
+
+def _collisions(group, pitch, start, end):
+    """
+    Flag notes overlapping an earlier note of the same pattern and pitch.
+
+    Returns:
+        The sort order used, and for each sorted note whether it overlaps an
+        earlier one and whether it starts together with the previous one
+    """
+    order = np.lexsort((end, start, pitch, group))
+    group, pitch, start, end = group[order], pitch[order], start[order], end[order]
+    voice = np.empty(len(order), dtype=bool)
+    voice[:1] = True
+    voice[1:] = (group[1:] != group[:-1]) | (pitch[1:] != pitch[:-1])
+    # Offsetting each voice past the previous one keeps the running maximum within a voice
+    offset = (np.cumsum(voice) - 1) * (int(end.max()) + 1)
+    latest = np.maximum.accumulate(end + offset) - offset
+    overlapping = np.zeros(len(order), dtype=bool)
+    overlapping[1:] = ~voice[1:] & (start[1:] < latest[:-1])
+    duplicate = np.zeros(len(order), dtype=bool)
+    duplicate[1:] = ~voice[1:] & (start[1:] == start[:-1])
+    return order, overlapping, duplicate
+
+
+def analyze(parts: List[Part], tempo: Optional[float] = None, top: int = DEFAULT_TOP) -> Dict[str, Any]:
+    """
+    Analyse the notes of many patterns together.
+
+    Args:
+        parts: The patterns to analyse with their tracks and song positions in ticks
+        tempo: The project tempo, reported alongside the results
+        top: Entries in each ranked list (scales, range overlaps, busiest bars,
+             collision examples)
+
+    Returns:
+        Key, density, range and collision reports; bars and pattern positions
+        count from 0, and note starts are in beats from the start of their pattern
+    """
+    _require_numpy()
+    parts = [part for part in parts if len(part.notes)]
+    track_ids = sorted({part.track_index for part in parts})
+    names = {part.track_index: part.name for part in parts}
+    result: Dict[str, Any] = {"tempo": tempo, "tracks_analyzed": len(track_ids), "patterns": len(parts),
+                              "notes": sum(len(part.notes) for part in parts)}
+    if not parts:
+        result.update(key=_key(np.zeros(12), top), pitch_classes=dict.fromkeys(PITCH_CLASSES, 0.0),
+                      density={"bars": 0, "per_bar": [], "mean": 0.0, "empty_bars": 0, "busiest": []},
+                      collisions={"overlapping": 0, "duplicates": 0, "examples": []}, tracks=[],
+                      range_overlaps=[])
+        return result
+
+    sizes = [len(part.notes) for part in parts]
+    slot_of = {track: slot for slot, track in enumerate(track_ids)}
+    pitch = np.concatenate([np.asarray(part.notes.pitch, dtype=np.int64) for part in parts])
+    local = np.concatenate([np.asarray(part.notes.start, dtype=np.int64) for part in parts])
+    length = np.concatenate([np.asarray(part.notes.length, dtype=np.int64) for part in parts])
+    start = local + np.repeat([part.position for part in parts], sizes)
+    slot = np.repeat([slot_of[part.track_index] for part in parts], sizes)
+    group = np.repeat(np.arange(len(parts)), sizes)
+
+    weights = np.bincount(pitch % 12, weights=length, minlength=12).astype(float)
+    result["key"] = _key(weights, top)
+    result["pitch_classes"] = dict(zip(PITCH_CLASSES, np.round(weights / weights.sum(), 3).tolist()))
+
+    bar = start // BAR_TICKS
+    bars = int(bar.max()) + 1
+    per_bar = np.bincount(bar, minlength=bars)
+    track_bars = np.bincount(slot * bars + bar, minlength=len(track_ids) * bars).reshape(len(track_ids), bars)
+    busiest = np.argsort(-per_bar, kind="stable")[:top]
+    result["density"] = {"bars": bars, "per_bar": per_bar.tolist(),
+                         "mean": round(float(per_bar.mean()), 2), "empty_bars": int((per_bar == 0).sum()),
+                         "busiest": [{"bar": int(b), "notes": int(per_bar[b])} for b in busiest if per_bar[b]]}
+
+    by_pitch = np.lexsort((pitch, slot))
+    first = np.searchsorted(slot[by_pitch], np.arange(len(track_ids)))
+    last = np.append(first[1:], len(pitch)) - 1
+    sorted_pitch = pitch[by_pitch]
+    low, high, median = sorted_pitch[first], sorted_pitch[last], sorted_pitch[(first + last) // 2]
+
+    order, overlapping, duplicate = _collisions(group, pitch, local, local + length)
+    colliding = overlapping | duplicate
+    per_track = np.bincount(slot[order][colliding], minlength=len(track_ids))
+    examples = []
+    for i in np.flatnonzero(colliding)[:top]:
+        part = parts[group[order[i]]]
+        examples.append({"track_index": part.track_index, "pattern_index": part.pattern_index,
+                         "pitch": int(pitch[order[i]]), "start": float(local[order[i]]) / TICKS_PER_BEAT,
+                         "kind": "duplicate" if duplicate[i] else "overlap"})
+    result["collisions"] = {"overlapping": int(colliding.sum()), "duplicates": int(duplicate.sum()),
+                            "examples": examples}
+
+    active = (track_bars > 0).sum(axis=1)
+    result["tracks"] = [{"track_index": track, "name": names[track], "notes": int(track_bars[i].sum()),
+                         "range": [int(low[i]), int(high[i])], "median_pitch": int(median[i]),
+                         "bars_active": int(active[i]),
+                         "notes_per_active_bar": round(float(track_bars[i].sum() / active[i]), 2),
+                         "busiest_bar": int(track_bars[i].argmax()), "collisions": int(per_track[i])}
+                        for i, track in enumerate(track_ids)]
+
+    # Semitones shared by each pair of track ranges, and their share of the narrower range
+    shared = np.minimum(high[:, None], high[None, :]) - np.maximum(low[:, None], low[None, :]) + 1
+    width = high - low + 1
+    share = shared / np.minimum(width[:, None], width[None, :])
+    a, b = np.triu_indices(len(track_ids), k=1)
+    pairs = np.flatnonzero(shared[a, b] > 0)
+    pairs = pairs[np.lexsort((-shared[a, b][pairs], -share[a, b][pairs]))][:top]
+    result["range_overlaps"] = [{"tracks": [track_ids[a[i]], track_ids[b[i]]], "semitones": int(shared[a[i], b[i]]),
+                                 "share": round(float(share[a[i], b[i]]), 3)} for i in pairs]
+    return result
@@ -0,0 +1,260 @@
+"""
+Pool of LMMS instances shared by one MCP server.
+
+Each LMMS endpoint gets its own ``LMMSInterface``, ``SessionState`` mirror
+and ``PlaybackHub`` of playback subscriptions. Every MCP session is pinned to one backend, so all of its tool calls
+go to the same DAW; a session that starts a new project is placed afresh on
+the least-loaded healthy backend. When more than one backend is configured a
+background task pings every backend, takes the ones that stop answering out
+of rotation and puts them back once they answer again.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import json
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .lmms_interface import LMMSError, LMMSTimeoutError
+from .locks import ProjectLocks
+from .playback import PlaybackHub
+from .session_state import SessionState
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEALTH_INTERVAL = 5.0
+DEFAULT_HEALTH_TIMEOUT = 1.0
+DEFAULT_FAILURE_THRESHOLD = 2
+
+# Session key used outside of an MCP request, e.g. by the stdio server's only session
+DEFAULT_SESSION = "default"
+
+_current_session: "contextvars.ContextVar[str]" = contextvars.ContextVar("lmms_mcp_session", default=DEFAULT_SESSION)
+
+
+@contextlib.contextmanager
+def session_scope(key: str):
+    """Route the LMMS calls made inside the block to the session ``key``."""
+    token = _current_session.set(key)
+    try:
+        yield
+    finally:
+        _current_session.reset(token)
+
+
+def current_session() -> str:
+    """The session key of the current task."""
+    return _current_session.get()
+
+
+class Backend:
+    """One LMMS instance with its session mirror and health."""
+
+    def __init__(self, interface: Any):
+        self.interface = interface
+        self.session_state = SessionState()
+        self.locks = ProjectLocks()
+        self.healthy = True
+        self.failures = 0
+        self.sessions = 0
+        self.playback = PlaybackHub()
+        interface.add_listener(self.session_state.handle_notification)
+        interface.add_listener(self.playback.handle_notification)
+
+    @property
+    def address(self) -> str:
+        return f"{self.interface.host}:{self.interface.port}"
+
+    @property
+    def load(self) -> Tuple[int, int]:
+        """Sort key for placement: pinned sessions first, then requests awaiting a reply."""
+        return self.sessions, self.interface.in_flight
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "address": self.address,
+            "healthy": self.healthy,
+            "sessions": self.sessions,
+            "in_flight": self.interface.in_flight,
+        }
+
+
+class BackendPool:
+    """Places MCP sessions on LMMS instances and tracks their health."""
+
+    def __init__(self, endpoints: Sequence[Tuple[str, int]], interface_factory: Callable[[str, int], Any],
+                 health_interval: float = DEFAULT_HEALTH_INTERVAL, health_timeout: float = DEFAULT_HEALTH_TIMEOUT,
+                 failure_threshold: int = DEFAULT_FAILURE_THRESHOLD):
+        """
+        Initialize the pool.
+
+        Args:
+            endpoints: ``(host, port)`` of every LMMS instance
+            interface_factory: Builds the interface for one endpoint, normally ``LMMSInterface``
+            health_interval: Seconds between health checks
+            health_timeout: Seconds a backend has to answer a health check
+            failure_threshold: Consecutive failed checks before a backend leaves rotation
+        """
+        if not endpoints:
+            raise ValueError("At least one LMMS endpoint is required")
+        self.backends = [Backend(interface_factory(host, port)) for host, port in endpoints]
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.failure_threshold = failure_threshold
+        self._pins: Dict[str, Backend] = {}
+        self._health_task: Optional[asyncio.Task] = None
+
+    def current(self) -> Backend:
+        """The backend of the current session, placing the session if needed."""
+        return self.backend_for(current_session())
+
+    def backend_for(self, session: str) -> Backend:
+        """
+        The backend a session is pinned to.
+
+        A session without a backend, or whose backend has left rotation, is
+        pinned to the least-loaded healthy backend.
+
+        Raises:
+            LMMSError: If no backend is healthy
+        """
+        self._ensure_health_checks()
+        backend = self._pins.get(session)
+        if backend is not None and backend.healthy:
+            return backend
+        if backend is not None:
+            logger.warning(f"LMMS at {backend.address} is unavailable, moving session {session}")
+            self.release(session)
+        return self._place(session)
+
+    def place_new_project(self) -> Backend:
+        """Move the current session to the least-loaded healthy backend for a new project."""
+        session = current_session()
+        self.release(session)
+        return self._place(session)
+
+    def release(self, session: str):
+        """Unpin a session, e.g. when it ends."""
+        backend = self._pins.pop(session, None)
+        if backend is not None:
+            backend.sessions -= 1
+
+    def _place(self, session: str) -> Backend:
+        healthy = [b for b in self.backends if b.healthy]
+        if not healthy:
+            raise LMMSError("No LMMS instance is available")
+        backend = min(healthy, key=lambda b: b.load)
+        backend.sessions += 1
+        self._pins[session] = backend
+        if len(self.backends) > 1:
+            logger.info(f"Session {session} uses LMMS at {backend.address}")
+        return backend
+
+    async def check(self):
+        """Ping every backend once and update its health."""
+        await asyncio.gather(*(self._check(backend) for backend in self.backends))
+
+    async def _check(self, backend: Backend):
+        try:
+            await backend.interface.request("ping", timeout=self.health_timeout)
+            alive = True
+        except LMMSTimeoutError:
+            alive = False
+        except LMMSError:
+            # An error reply still means LMMS is answering
+            alive = True
+        except OSError:
+            alive = False
+
+        if alive:
+            if not backend.healthy:
+                logger.info(f"LMMS at {backend.address} is back in rotation")
+            backend.healthy = True
+            backend.failures = 0
+            return
+        backend.failures += 1
+        if backend.healthy and backend.failures >= self.failure_threshold:
+            logger.warning(f"LMMS at {backend.address} stopped answering, taking it out of rotation")
+            backend.healthy = False
+            # Whatever it held is unknown by the time it returns
+            backend.session_state.invalidate()
+
+    def _ensure_health_checks(self):
+        """Start the health check loop on first use when there is a choice of backends."""
+        if len(self.backends) < 2 or self._health_task is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._health_task = loop.create_task(self._health_loop())
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await self.check()
+
+    async def close(self):
+        """Stop health checks and close every backend."""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        for backend in self.backends:
+            await backend.playback.close()
+            await backend.interface.close()
+
+    def status(self) -> List[Dict[str, Any]]:
+        """Health and load of every backend."""
+        return [backend.status() for backend in self.backends]
+
+
+def parse_endpoints(hosts: Optional[List[str]], ports: Optional[List[int]], config: Optional[str] = None,
+                    default_host: str = "127.0.0.1", default_port: int = 9000) -> List[Tuple[str, int]]:
+    """
+    Build the list of LMMS endpoints from command-line options.
+
+    Repeated ``--lmms-host``/``--lmms-port`` options are paired in order; a
+    single host is used with every port and a single port with every host.
+    A config file is JSON of the form
+    ``{"backends": [{"host": "...", "port": 9000}, ...]}`` and its endpoints
+    come after those given on the command line.
+
+    Args:
+        hosts: Values of ``--lmms-host``, or None
+        ports: Values of ``--lmms-port``, or None
+        config: Path of a JSON config file, or None
+        default_host: Host used when none is given
+        default_port: Port used when none is given
+
+    Returns:
+        ``(host, port)`` pairs, at least one
+
+    Raises:
+        ValueError: If the host and port counts cannot be paired
+    """
+    hosts = list(hosts or [])
+    ports = list(ports or [])
+    endpoints: List[Tuple[str, int]] = []
+    if hosts or ports or not config:
+        hosts = hosts or [default_host]
+        ports = ports or [default_port]
+        if len(hosts) == 1:
+            hosts = hosts * len(ports)
+        elif len(ports) == 1:
+            ports = ports * len(hosts)
+        if len(hosts) != len(ports):
+            raise ValueError(f"Cannot pair {len(hosts)} LMMS hosts with {len(ports)} ports")
+        endpoints.extend(zip(hosts, ports))
+    if config:
+        endpoints.extend(_read_config(config, default_host, default_port))
+    return endpoints
+
+
+def _read_config(path: str, default_host: str, default_port: int) -> Iterable[Tuple[str, int]]:
+    with open(path) as f:
+        data = json.load(f)
+    backends = data.get("backends") if isinstance(data, dict) else data
+    if not isinstance(backends, list) or not backends:
+        raise ValueError(f"{path} lists no LMMS backends")
+    return [(entry.get("host", default_host), int(entry.get("port", default_port))) for entry in backends]
@@ -0,0 +1,322 @@
+"""
+Batched execution of MCP tools in a single call.
+
+A batch is an ordered list of operations, for example::
+
+    [
+        {"id": "bass", "tool": "create_track", "args": {"name": "Bass"}},
+        {"tool": "load_instrument",
+         "args": {"track_index": "$bass.track_index", "instrument_path": "tripleoscillator"}},
+    ]
+
+A string argument of the form ``$<ref>.<field>`` is replaced by a field of the
+result of an earlier operation, where ``<ref>`` is that operation's ``id`` or
+its position in the list. Referencing an operation makes the referring
+operation wait for it.
+
+Operations that touch different resources (tracks, tempo, transport) run
+concurrently; operations on the same resource run in list order, and
+project-wide operations such as ``new_project`` act as barriers. In atomic
+mode every completed operation is undone, in reverse order, as soon as one
+operation fails.
+"""
+
+import asyncio
+import logging
+import re
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Tools that may appear in a batch
+BATCH_TOOLS = (
+    "get_session_info", "get_track_info", "create_track", "delete_track", "set_track_name",
+    "create_pattern", "delete_pattern", "add_notes_to_pattern", "remove_notes_from_pattern",
+    "set_pattern_notes", "generate_pattern", "load_instrument", "set_tempo", "play", "stop", "new_project", "save_project",
+    "get_instruments_list", "get_pattern_notes",
+)
+
+# Tools that must see every earlier operation complete and that every later operation waits for
+BARRIER_TOOLS = {"new_project", "save_project", "delete_track", "get_session_info"}
+
+READ_ONLY_TOOLS = {"get_session_info", "get_track_info", "get_instruments_list", "get_pattern_notes"}
+
+# Tools that cannot be undone, and so cannot be part of an atomic batch
+IRREVERSIBLE_TOOLS = {"new_project", "save_project", "delete_track", "delete_pattern", "remove_notes_from_pattern",
+                      "set_pattern_notes", "generate_pattern"}
+
+_REFERENCE = re.compile(r"^\$([A-Za-z0-9_-]+)((?:\.[A-Za-z0-9_]+)+)$")
+
+Tool = Callable[..., Awaitable[Dict[str, Any]]]
+
+
+class BatchError(Exception):
+    """Raised when a batch is malformed or an operation cannot be prepared."""
+
+
+class _Operation:
+    """One parsed batch entry and its scheduling state."""
+
+    __slots__ = ("index", "id", "tool", "args", "deps", "done", "status", "result", "error", "inverse")
+
+    def __init__(self, index: int, op_id: Optional[str], tool: str, args: Dict[str, Any]):
+        self.index = index
+        self.id = op_id
+        self.tool = tool
+        self.args = args
+        self.deps: set = set()
+        self.done = asyncio.Event()
+        self.status = "pending"
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.inverse: Optional[Tuple[str, Dict[str, Any]]] = None
+
+
+def _references(value: Any) -> List[Tuple[str, List[str]]]:
+    """Find every ``$ref.field`` reference inside an argument value."""
+    if isinstance(value, str):
+        match = _REFERENCE.match(value)
+        return [(match.group(1), match.group(2)[1:].split("."))] if match else []
+    if isinstance(value, dict):
+        return [ref for v in value.values() for ref in _references(v)]
+    if isinstance(value, list):
+        return [ref for v in value for ref in _references(v)]
+    return []
+
+
+def resource_access(tool: str, args: Dict[str, Any]) -> List[Tuple[str, bool]]:
+    """
+    Describe which resources a tool call reads or writes.
+
+    Returns:
+        ``(resource, is_write)`` pairs; barrier tools are handled separately
+    """
+    if tool in READ_ONLY_TOOLS:
+        if "track_index" in args:
+            return [("tracks", False), (f"track:{args['track_index']}", False)]
+        return []
+    if tool == "create_track":
+        return [("tracks", True)]
+    if "track_index" in args:
+        return [("tracks", False), (f"track:{args['track_index']}", True)]
+    if tool == "set_tempo":
+        return [("tempo", True)]
+    if tool in ("play", "stop"):
+        return [("transport", True)]
+    return []
+
+
+class BatchRunner:
+    """Executes a batch of operations against a set of tools."""
+
+    def __init__(self, tools: Dict[str, Tool]):
+        """
+        Initialize the runner.
+
+        Args:
+            tools: Tool implementations by name; must cover :data:`BATCH_TOOLS`
+                   used by the batch, including the read tools atomic mode
+                   uses to capture undo information
+        """
+        self.tools = tools
+
+    def _parse(self, operations: List[Dict[str, Any]], atomic: bool) -> List[_Operation]:
+        ops: List[_Operation] = []
+        by_ref: Dict[str, int] = {}
+        last_writer: Dict[str, int] = {}
+        readers: Dict[str, List[int]] = {}
+        last_barrier: Optional[int] = None
+
+        for index, spec in enumerate(operations):
+            if not isinstance(spec, dict) or "tool" not in spec:
+                raise BatchError(f"Operation {index}: expected an object with a 'tool' field")
+            tool = spec["tool"]
+            if tool not in BATCH_TOOLS or tool not in self.tools:
+                raise BatchError(f"Operation {index}: unknown tool '{tool}'")
+            if atomic and tool in IRREVERSIBLE_TOOLS:
+                raise BatchError(f"Operation {index}: '{tool}' cannot be rolled back, so it is not "
+                                 f"allowed in an atomic batch")
+            args = spec.get("args") or {}
+            if not isinstance(args, dict):
+                raise BatchError(f"Operation {index}: 'args' must be an object")
+            op_id = spec.get("id")
+            op = _Operation(index, op_id, tool, args)
+
+            for ref, _ in _references(args):
+                if ref not in by_ref:
+                    raise BatchError(f"Operation {index}: reference to unknown or later operation '${ref}'")
+                op.deps.add(by_ref[ref])
+
+            if tool in BARRIER_TOOLS:
+                op.deps.update(range(last_barrier + 1 if last_barrier is not None else 0, index))
+                if last_barrier is not None:
+                    op.deps.add(last_barrier)
+                last_barrier = index
+                last_writer.clear()
+                readers.clear()
+            else:
+                if last_barrier is not None:
+                    op.deps.add(last_barrier)
+                # Name referenced resources by operation position, so "$bass.track_index"
+                # and "$0.track_index" are recognised as the same track
+                canonical = {k: self._canonical(v, by_ref) for k, v in args.items()}
+                for resource, write in resource_access(tool, canonical):
+                    if resource in last_writer:
+                        op.deps.add(last_writer[resource])
+                    if write:
+                        op.deps.update(readers.pop(resource, []))
+                        last_writer[resource] = index
+                    else:
+                        readers.setdefault(resource, []).append(index)
+
+            if op_id is not None:
+                if str(op_id) in by_ref:
+                    raise BatchError(f"Operation {index}: duplicate id '{op_id}'")
+                by_ref[str(op_id)] = index
+            by_ref[str(index)] = index
+            ops.append(op)
+        return ops
+
+    @staticmethod
+    def _canonical(value: Any, by_ref: Dict[str, int]) -> Any:
+        if isinstance(value, str):
+            match = _REFERENCE.match(value)
+            if match:
+                return f"${by_ref[match.group(1)]}{match.group(2)}"
+        return value
+
+    @staticmethod
+    def _resolve(value: Any, by_ref: Dict[str, _Operation]) -> Any:
+        if isinstance(value, str):
+            match = _REFERENCE.match(value)
+            if not match:
+                return value
+            source = by_ref[match.group(1)]
+            result: Any = source.result
+            for field in match.group(2)[1:].split("."):
+                if not isinstance(result, dict) or field not in result:
+                    raise BatchError(f"'{value}': operation {source.index} result has no field '{field}'")
+                result = result[field]
+            return result
+        if isinstance(value, dict):
+            return {k: BatchRunner._resolve(v, by_ref) for k, v in value.items()}
+        if isinstance(value, list):
+            return [BatchRunner._resolve(v, by_ref) for v in value]
+        return value
+
+    async def _capture_undo(self, tool: str, args: Dict[str, Any]) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Collect what is needed to undo a call before it runs."""
+        if tool in ("set_track_name", "load_instrument"):
+            field = "name" if tool == "set_track_name" else "instrument"
+            previous = (await self.tools["get_track_info"](args["track_index"])).get(field)
+            if previous is None:
+                raise BatchError(f"Cannot roll back {tool}: current {field} of track "
+                                 f"{args['track_index']} is unknown")
+            key = "name" if tool == "set_track_name" else "instrument_path"
+            return tool, {"track_index": args["track_index"], key: previous}
+        if tool in ("set_tempo", "play", "stop"):
+            session = await self.tools["get_session_info"]()
+            if tool == "set_tempo":
+                if session.get("tempo") is None:
+                    raise BatchError("Cannot roll back set_tempo: current tempo is unknown")
+                return "set_tempo", {"tempo": session["tempo"]}
+            return ("play" if session.get("playing") else "stop"), {}
+        return None
+
+    @staticmethod
+    def _undo_from_result(tool: str, args: Dict[str, Any], result: Dict[str, Any]) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Build the undo call for tools whose inverse depends on their result."""
+        if tool == "create_track":
+            return "delete_track", {"track_index": result["track_index"]}
+        if tool == "create_pattern":
+            return "delete_pattern", {"track_index": args["track_index"], "pattern_index": result["pattern_index"]}
+        if tool == "add_notes_to_pattern":
+            return "remove_notes_from_pattern", dict(args)
+        return None
+
+    async def run(self, operations: List[Dict[str, Any]], atomic: bool = False) -> Dict[str, Any]:
+        """
+        Execute a batch.
+
+        Args:
+            operations: Ordered list of ``{"tool", "args", "id"}`` objects
+            atomic: Undo all completed operations if any operation fails
+
+        Returns:
+            One entry per operation plus overall success and rollback status
+        """
+        ops = self._parse(operations, atomic)
+        by_ref: Dict[str, _Operation] = {}
+        for op in ops:
+            by_ref[str(op.index)] = op
+            if op.id is not None:
+                by_ref[str(op.id)] = op
+        completed: List[_Operation] = []
+        # Tracks created by this batch, whose undo (delete_track) also undoes every later change to them
+        created_tracks = set()
+        aborted = False
+
+        async def execute(op: _Operation):
+            nonlocal aborted
+            try:
+                for dep in sorted(op.deps):
+                    await ops[dep].done.wait()
+                    if ops[dep].status != "ok":
+                        op.status = "skipped"
+                        op.error = f"operation {dep} did not complete"
+                        return
+                if aborted:
+                    op.status = "skipped"
+                    op.error = "batch aborted"
+                    return
+                args = self._resolve(op.args, by_ref)
+                if atomic and op.tool not in READ_ONLY_TOOLS and args.get("track_index") not in created_tracks:
+                    op.inverse = await self._capture_undo(op.tool, args)
+                op.result = await self.tools[op.tool](**args)
+                if atomic and op.inverse is None:
+                    op.inverse = self._undo_from_result(op.tool, args, op.result)
+                if op.tool == "create_track":
+                    created_tracks.add(op.result["track_index"])
+                op.status = "ok"
+                completed.append(op)
+            except Exception as e:
+                op.status = "error"
+                op.error = str(e) or type(e).__name__
+                if atomic:
+                    aborted = True
+            finally:
+                op.done.set()
+
+        await asyncio.gather(*(execute(op) for op in ops))
+
+        rolled_back = False
+        rollback_errors = []
+        if atomic and aborted:
+            for op in reversed(completed):
+                if op.inverse is None:
+                    continue
+                tool, args = op.inverse
+                try:
+                    await self.tools[tool](**args)
+                except Exception as e:
+                    logger.error(f"Rollback of operation {op.index} ({op.tool}) failed: {e}")
+                    rollback_errors.append({"index": op.index, "error": str(e)})
+            rolled_back = True
+
+        results = []
+        for op in ops:
+            entry: Dict[str, Any] = {"id": op.id} if op.id is not None else {}
+            if op.status == "ok":
+                entry["result"] = op.result
+            elif op.status == "skipped":
+                entry["skipped"] = op.error
+            else:
+                entry["error"] = op.error
+            results.append(entry)
+
+        summary = {"success": all(op.status == "ok" for op in ops), "results": results}
+        if atomic:
+            summary["rolled_back"] = rolled_back
+            if rollback_errors:
+                summary["rollback_errors"] = rollback_errors
+        return summary
@@ -1,23 +1,32 @@
 """
 Command-line interface for LMMS-Claude-MCP.
+
+The default stdio server runs on every session start of the MCP client, so
+this module imports nothing beyond ``sys`` up front: argument parsing,
+logging setup and the server itself are only loaded when needed.
 """
 
 import sys
-import argparse
-import logging
-import asyncio
 
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+
+def serve_stdio(host: str = "127.0.0.1", port: int = 8000, lmms_host: str = "127.0.0.1", lmms_port: int = 9000,
+                lmms_endpoints=None, job_log=None, max_jobs=None, snapshot_dir=None, snapshots=True,
+                record_wire=None):
+    """Run the MCP server over stdio, answering the session start before the server is loaded."""
+    from .fast_stdio import serve
+
+    def create_server():
+        from .jobs import DEFAULT_MAX_CONCURRENT
+        from .server import MCPServer
+        return MCPServer(host, port, lmms_host, lmms_port, lmms_endpoints, job_log=job_log,
+                         max_jobs=max_jobs or DEFAULT_MAX_CONCURRENT, snapshot_dir=snapshot_dir,
+                         snapshots=snapshots, record_wire=record_wire)
+
+    serve(create_server)
+
 
 def main():
     """Main entry point for the CLI."""
-    import sys
-
     # Handle case where command might be passed as first arg (e.g., from uvx)
     # Filter out 'lmms-mcp' if it appears as an argument, and handle empty args
     filtered_args = [arg for arg in sys.argv[1:] if arg != 'lmms-mcp' and arg not in ['server', 'remote']]
@@ -29,11 +38,18 @@ def main():
     # default to server mode with stdio
     if not has_command and (len(sys.argv) == 1 or (len(sys.argv) == 2 and sys.argv[1] == 'lmms-mcp')):
         # Run as MCP server with stdio transport (for Claude Desktop)
-        from .server import MCPServer
-        server = MCPServer()
-        asyncio.run(server.start(use_stdio=True))
+        serve_stdio()
         return
 
+    import argparse
+    import logging
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    logger = logging.getLogger(__name__)
+
     parser = argparse.ArgumentParser(description="LMMS-Claude-MCP: LMMS integration with Claude AI")
     subparsers = parser.add_subparsers(dest="command", help="Command to run", required=False)
 
@@ -41,15 +57,28 @@ def main():
     server_parser = subparsers.add_parser("server", help="Run the MCP server")
     server_parser.add_argument("--host", default="127.0.0.1", help="Server host")
     server_parser.add_argument("--port", type=int, default=8000, help="Server port")
-    server_parser.add_argument("--lmms-host", default="127.0.0.1", help="LMMS host")
-    server_parser.add_argument("--lmms-port", type=int, default=9000, help="LMMS port")
+    server_parser.add_argument("--lmms-host", action="append",
+                               help="LMMS host (default 127.0.0.1); repeat for several instances")
+    server_parser.add_argument("--lmms-port", type=int, action="append",
+                               help="LMMS port (default 9000); repeat for several instances")
+    server_parser.add_argument("--lmms-config", help="JSON file listing LMMS instances as "
+                                                     "{\"backends\": [{\"host\": ..., \"port\": ...}]}")
+    server_parser.add_argument("--job-log", help="File recording background jobs across restarts "
+                                                 "(default: jobs.jsonl in the user's cache directory)")
+    server_parser.add_argument("--max-jobs", type=int, help="Most background jobs running at once (default 4)")
+    server_parser.add_argument("--snapshot-dir", help="Where session snapshots are stored "
+                                                      "(default: snapshots in the user's cache directory)")
+    server_parser.add_argument("--no-snapshots", action="store_true",
+                               help="Do not snapshot the session after every change")
+    server_parser.add_argument("--record-wire", metavar="PATH",
+                               help="Append all traffic with LMMS to a wire log for replaying")
 
     # Remote command
-    remote_parser = subparsers.add_parser("remote", help="Run the LMMS remote script")
-    remote_parser.add_argument("--listening-host", default="127.0.0.1", help="Listening host")
-    remote_parser.add_argument("--listening-port", type=int, default=9000, help="Listening port")
-    remote_parser.add_argument("--client-host", default="127.0.0.1", help="Client host")
-    remote_parser.add_argument("--client-port", type=int, default=9001, help="Client port")
+    remote_parser = subparsers.add_parser("remote", help="Run the bridge that lets several MCP servers share one LMMS")
+    remote_parser.add_argument("--listening-host", default="127.0.0.1", help="Host LMMS listens on")
+    remote_parser.add_argument("--listening-port", type=int, default=9000, help="Port LMMS listens on")
+    remote_parser.add_argument("--client-host", default="127.0.0.1", help="Host to accept MCP servers on")
+    remote_parser.add_argument("--client-port", type=int, default=9001, help="Port to accept MCP servers on")
 
     # Parse arguments
     args = parser.parse_args()
@@ -69,20 +98,23 @@ def main():
 
     try:
         if args.command == "server":
-            from .server import MCPServer
             # Get server arguments (they should always exist now)
             host = getattr(args, 'host', '127.0.0.1')
             port = getattr(args, 'port', 8000)
-            lmms_host = getattr(args, 'lmms_host', '127.0.0.1')
-            lmms_port = getattr(args, 'lmms_port', 9000)
-            server = MCPServer(host, port, lmms_host, lmms_port)
+            from .backend_pool import parse_endpoints
+            endpoints = parse_endpoints(getattr(args, 'lmms_host', None), getattr(args, 'lmms_port', None),
+                                        getattr(args, 'lmms_config', None))
             # Use stdio transport for MCP (required by Claude Desktop)
-            asyncio.run(server.start(use_stdio=True))
+            serve_stdio(host, port, lmms_endpoints=endpoints, job_log=getattr(args, 'job_log', None),
+                        max_jobs=getattr(args, 'max_jobs', None), snapshot_dir=getattr(args, 'snapshot_dir', None),
+                        snapshots=not getattr(args, 'no_snapshots', False),
+                        record_wire=getattr(args, 'record_wire', None))
         elif args.command == "remote":
-            from .lmms_remote import LMMSRemoteScript, main as remote_main
+            import asyncio
+            from .lmms_remote import LMMSRemoteScript
             remote = LMMSRemoteScript(args.listening_host, args.listening_port,
                                       args.client_host, args.client_port)
-            remote_main()
+            asyncio.run(remote.run())
         else:
             parser.print_help()
             sys.exit(1)
@@ -0,0 +1,40 @@
+"""
+Compact JSON encoding of large tool results.
+
+FastMCP turns a dict returned by a tool into indented JSON text and, for tools
+with structured output, validates and serializes it a second time. For the
+session queries, whose results grow with the project, the server instead
+returns the result already encoded as compact JSON text, once. ``orjson`` is
+used when it is installed (``pip install lmms-mcp[fastjson]``) and the
+standard library ``json`` module otherwise.
+"""
+
+import functools
+import json
+from typing import Any, Awaitable, Callable
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+
+def dumps(value: Any) -> str:
+    """Encode a value as compact JSON text; values JSON does not know are encoded as strings."""
+    if orjson is not None:
+        return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(value, separators=(",", ":"), default=str)
+
+
+def encoded(fn: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[str]]:
+    """
+    Wrap a tool coroutine function so that it returns its result as JSON text.
+
+    The wrapper keeps the signature and docstring of ``fn``, so the MCP
+    framework derives the same input schema from it.
+    """
+    @functools.wraps(fn)
+    async def encode(*args, **kwargs) -> str:
+        return dumps(await fn(*args, **kwargs))
+
+    return encode
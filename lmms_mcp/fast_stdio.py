@@ -0,0 +1,289 @@
+"""
+Fast-starting stdio transport for the MCP server.
+
+Importing FastMCP, pydantic and the server takes far longer than an MCP
+client is willing to wait for its ``initialize`` reply, so this front end
+answers the opening of a session itself, from the manifest precomputed in
+:mod:`lmms_mcp.tool_manifest`:
+
+* ``initialize`` is answered immediately, after which the real server is
+  imported and built on a background thread
+* ``ping`` and ``tools/list`` are answered from the manifest until the real
+  server is ready
+* every other message is queued
+
+Once the server is ready the queued messages, starting with the original
+``initialize`` request, are replayed into FastMCP's own stdio session and all
+further traffic goes straight to it. The reply FastMCP produces for the
+replayed ``initialize`` is dropped, since the client already has one.
+
+Only the standard library is imported before the first reply. The manifest
+must be regenerated whenever a tool's name, description or signature
+changes::
+
+    python -m lmms_mcp.fast_stdio --write-manifest
+"""
+
+import json
+import os
+import sys
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from . import tool_manifest
+
+MANIFEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tool_manifest.py")
+
+# JSON-RPC error code for failures inside the server
+INTERNAL_ERROR = -32603
+
+
+class _QueuedLines:
+    """Async iterator over the lines handed to the real server."""
+
+    def __init__(self, queue):
+        self._queue = queue
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> str:
+        line = await self._queue.get()
+        if line is None:
+            raise StopAsyncIteration
+        return line.decode("utf-8", errors="replace")
+
+
+class _FilteredOutput:
+    """Writable text sink for the real server that drops its ``initialize`` reply."""
+
+    def __init__(self, front_end: "StdioFrontEnd", initialize_id: Any):
+        self._front_end = front_end
+        self._initialize_id = initialize_id
+        self._suppress = initialize_id is not None
+
+    async def write(self, text: str):
+        if self._suppress:
+            message = json.loads(text)
+            if message.get("id") == self._initialize_id and "method" not in message:
+                self._suppress = False
+                return
+        self._front_end.write_line(text.encode("utf-8"))
+
+    async def flush(self):
+        pass
+
+
+class StdioFrontEnd:
+    """Answers the start of an MCP stdio session while the real server loads."""
+
+    def __init__(self, server_factory: Callable[[], Any], stdin=None, stdout=None):
+        """
+        Initialize the front end.
+
+        Args:
+            server_factory: Builds the ``MCPServer``; called on the background thread
+            stdin: Binary stream to read requests from, defaults to the process stdin
+            stdout: Binary stream to write replies to, defaults to the process stdout
+        """
+        self.server_factory = server_factory
+        self._stdin = stdin if stdin is not None else sys.stdin.buffer
+        self._stdout = stdout if stdout is not None else sys.stdout.buffer
+        self._write_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._pending: List[bytes] = []
+        self._feed: Optional[Callable[[Optional[bytes]], None]] = None
+        self._failed: Optional[str] = None
+        self._closed = False
+        self._initialize_id: Any = None
+        self._backend: Optional[threading.Thread] = None
+
+    def write_line(self, data: bytes):
+        """Write one newline-terminated message to the client."""
+        with self._write_lock:
+            self._stdout.write(data if data.endswith(b"\n") else data + b"\n")
+            self._stdout.flush()
+
+    def _reply(self, request_id: Any, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        message: Dict[str, Any] = {"jsonrpc": "2.0", "id": request_id}
+        if error is not None:
+            message["error"] = {"code": INTERNAL_ERROR, "message": error}
+        else:
+            message["result"] = result
+        self.write_line(json.dumps(message, separators=(",", ":")).encode("utf-8"))
+
+    def serve(self):
+        """Read messages until stdin closes, then wait for the server to finish."""
+        for line in self._stdin:
+            if line.strip():
+                self._received(line)
+        with self._lock:
+            self._closed = True
+            if self._feed is not None:
+                self._feed(None)
+        if self._backend is not None:
+            self._backend.join()
+
+    def _received(self, line: bytes):
+        with self._lock:
+            if self._feed is not None:
+                self._feed(line)
+                return
+            try:
+                message = json.loads(line)
+            except ValueError:
+                message = None
+            method = message.get("method") if isinstance(message, dict) else None
+            request_id = message.get("id") if isinstance(message, dict) else None
+
+            if self._failed is not None:
+                if request_id is not None and method is not None:
+                    self._reply(request_id, error=self._failed)
+                return
+            if method == "initialize" and request_id is not None and self._initialize_id is None:
+                self._initialize_id = request_id
+                self._pending.append(line)
+                self._reply(request_id, self._initialize_result(message.get("params") or {}))
+                self._start_backend()
+                return
+            if method == "ping" and request_id is not None:
+                self._reply(request_id, {})
+                return
+            if method == "tools/list" and request_id is not None and self._initialize_id is not None:
+                self._reply(request_id, {"tools": tool_manifest.TOOLS})
+                return
+            self._pending.append(line)
+            self._start_backend()
+
+    @staticmethod
+    def _initialize_result(params: Dict[str, Any]) -> Dict[str, Any]:
+        """The ``initialize`` result FastMCP would send, with the same version negotiation."""
+        result = dict(tool_manifest.INITIALIZE_RESULT)
+        requested = params.get("protocolVersion")
+        result["protocolVersion"] = (requested if requested in tool_manifest.PROTOCOL_VERSIONS
+                                     else tool_manifest.LATEST_PROTOCOL_VERSION)
+        return result
+
+    def _start_backend(self):
+        if self._backend is None:
+            self._backend = threading.Thread(target=self._run_backend, name="lmms-mcp-server", daemon=True)
+            self._backend.start()
+
+    def _run_backend(self):
+        import asyncio
+
+        try:
+            asyncio.run(self._serve_backend())
+        except Exception as e:
+            import logging
+            logging.getLogger(__name__).exception("MCP server failed")
+            self._fail(f"Server failed: {e}")
+
+    def _fail(self, error: str):
+        """Answer every queued and future request with an error."""
+        with self._lock:
+            self._failed = error
+            self._feed = None
+            pending, self._pending = self._pending, []
+        for line in pending:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(message, dict) and message.get("method") not in (None, "initialize") \
+                    and message.get("id") is not None:
+                self._reply(message["id"], error=error)
+
+    async def _serve_backend(self):
+        import asyncio
+        from mcp.server.stdio import stdio_server
+
+        server = self.server_factory()
+        loop = asyncio.get_running_loop()
+        queue: "asyncio.Queue[Optional[bytes]]" = asyncio.Queue()
+        with self._lock:
+            for line in self._pending:
+                queue.put_nowait(line)
+            self._pending = []
+            if self._closed:
+                queue.put_nowait(None)
+            self._feed = lambda line: loop.call_soon_threadsafe(queue.put_nowait, line)
+            initialize_id = self._initialize_id
+
+        lowlevel = server.server._mcp_server
+        async with stdio_server(stdin=_QueuedLines(queue),
+                                stdout=_FilteredOutput(self, initialize_id)) as (read_stream, write_stream):
+            await lowlevel.run(read_stream, write_stream, lowlevel.create_initialization_options())
+
+
+def serve(server_factory: Callable[[], Any]):
+    """
+    Serve MCP over the process's stdio with a fast start.
+
+    Args:
+        server_factory: Builds the ``MCPServer`` once the session has started
+    """
+    try:
+        StdioFrontEnd(server_factory).serve()
+    except KeyboardInterrupt:
+        pass
+
+
+def build_manifest() -> Dict[str, Any]:
+    """Introspect the server's tools and initialization options the way FastMCP reports them."""
+    import asyncio
+    from mcp import types
+    from mcp.shared.version import SUPPORTED_PROTOCOL_VERSIONS
+    from .server import MCPServer
+
+    server = MCPServer()
+    options = server.server._mcp_server.create_initialization_options()
+    initialize = types.InitializeResult(
+        protocolVersion=types.LATEST_PROTOCOL_VERSION,
+        capabilities=options.capabilities,
+        serverInfo=types.Implementation(name=options.server_name, version=options.server_version,
+                                        websiteUrl=options.website_url, icons=options.icons),
+        instructions=options.instructions,
+    )
+    tools = asyncio.run(server.server.list_tools())
+    return {
+        "INITIALIZE_RESULT": initialize.model_dump(by_alias=True, mode="json", exclude_none=True),
+        "PROTOCOL_VERSIONS": list(SUPPORTED_PROTOCOL_VERSIONS),
+        "LATEST_PROTOCOL_VERSION": types.LATEST_PROTOCOL_VERSION,
+        "TOOLS": [tool.model_dump(by_alias=True, mode="json", exclude_none=True) for tool in tools],
+    }
+
+
+def render_manifest(manifest: Dict[str, Any]) -> str:
+    """Render a manifest as the source of :mod:`lmms_mcp.tool_manifest`."""
+    import pprint
+
+    lines = ['"""', "Precomputed MCP initialize result and tool list for the fast stdio start.", "",
+             "Generated by ``python -m lmms_mcp.fast_stdio --write-manifest``; do not edit.", '"""', ""]
+    for name, value in manifest.items():
+        lines.append(f"{name} = {pprint.pformat(value, width=110, sort_dicts=False)}")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def main():
+    """Regenerate the tool manifest, or check that it is current."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Maintain the precomputed MCP tool manifest")
+    parser.add_argument("--write-manifest", action="store_true", help=f"Rewrite {MANIFEST_PATH}")
+    args = parser.parse_args()
+
+    source = render_manifest(build_manifest())
+    if args.write_manifest:
+        with open(MANIFEST_PATH, "w") as f:
+            f.write(source)
+        return
+    with open(MANIFEST_PATH) as f:
+        if f.read() != source:
+            print("tool_manifest.py is out of date; run with --write-manifest", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
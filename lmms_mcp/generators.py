@@ -0,0 +1,339 @@
+"""
+Server-side pattern generators for the ``generate_pattern`` tool.
+
+A generator turns a compact spec into a :class:`~lmms_mcp.pattern.Pattern`,
+so long drum parts and arpeggios do not have to be spelled out note by note
+in the tool arguments. A spec is either a dict or a single line of the form
+``"<generator> key=value key=value ..."``::
+
+    euclid pulses=5 steps=16 note=36 repeat=64
+    steps 36=x...x...x...x... 38=....x.......x... 42=x-x-x-x-x-x-x-x- repeat=32
+    arp chords=Am,F,C,G mode=updown octaves=2 repeat=8
+    walk root=A scale=minor count=2000 low=45 high=81 seed=7
+
+Generators:
+
+* ``euclid``: ``pulses`` hits spread as evenly as possible over ``steps``
+  steps, optionally rotated by ``rotate`` steps
+* ``steps``: step-sequencer strings, one per pitch: ``x`` is a hit, ``X`` an
+  accented hit, ``-`` holds the previous hit and anything else is a rest. In
+  the one-line form each ``<pitch>=<string>`` is a row; otherwise use
+  ``pattern`` with ``note``, or ``rows`` as a pitch-to-string dict
+* ``arp``: arpeggios over chord symbols (``C``, ``Am``, ``F#m7``, ``Bbmaj7``,
+  ``Gsus4``, ``Ddim``...), ``mode`` up, down, updown or random, over
+  ``octaves`` octaves, ``beats`` beats per chord
+* ``walk``: a random walk of ``count`` notes over a scale (``root`` and
+  ``scale``), moving at most ``max_step`` scale degrees at a time and folded
+  back between ``low`` and ``high``; ``density`` below 1 leaves random rests
+
+Common keys are ``step`` (grid in beats, default 0.25), ``length`` (note
+length in beats, default one step), ``velocity`` (default 100), ``start``
+(beat offset of the first cycle), ``repeat`` (number of cycles) and
+``seed``. One cycle is built in Python; repeating it and the random walk are
+done on whole columns with NumPy when it is installed.
+"""
+
+import random
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from .notes import DEFAULT_VELOCITY, TICKS_PER_BEAT, np
+from .pattern import Pattern
+
+DEFAULT_STEP = 0.25
+ACCENT_VELOCITY = 127
+MAX_GENERATED_NOTES = 1_000_000
+
+NOTE_NAMES = {"C": 0, "D": 2, "E": 4, "F": 5, "G": 7, "A": 9, "B": 11}
+
+SCALES = {
+    "major": (0, 2, 4, 5, 7, 9, 11),
+    "minor": (0, 2, 3, 5, 7, 8, 10),
+    "harmonic_minor": (0, 2, 3, 5, 7, 8, 11),
+    "melodic_minor": (0, 2, 3, 5, 7, 9, 11),
+    "dorian": (0, 2, 3, 5, 7, 9, 10),
+    "phrygian": (0, 1, 3, 5, 7, 8, 10),
+    "lydian": (0, 2, 4, 6, 7, 9, 11),
+    "mixolydian": (0, 2, 4, 5, 7, 9, 10),
+    "locrian": (0, 1, 3, 5, 6, 8, 10),
+    "pentatonic": (0, 2, 4, 7, 9),
+    "minor_pentatonic": (0, 3, 5, 7, 10),
+    "blues": (0, 3, 5, 6, 7, 10),
+    "chromatic": tuple(range(12)),
+}
+
+CHORD_QUALITIES = {
+    "": (0, 4, 7),
+    "maj": (0, 4, 7),
+    "m": (0, 3, 7),
+    "min": (0, 3, 7),
+    "dim": (0, 3, 6),
+    "aug": (0, 4, 8),
+    "sus2": (0, 2, 7),
+    "sus4": (0, 5, 7),
+    "6": (0, 4, 7, 9),
+    "m6": (0, 3, 7, 9),
+    "7": (0, 4, 7, 10),
+    "maj7": (0, 4, 7, 11),
+    "m7": (0, 3, 7, 10),
+    "dim7": (0, 3, 6, 9),
+    "m7b5": (0, 3, 6, 10),
+    "9": (0, 4, 7, 10, 14),
+    "add9": (0, 4, 7, 14),
+}
+
+_CHORD = re.compile(r"^([A-G])([#b]?)(.*)$")
+
+Cycle = Tuple[List[int], List[int], List[int], List[int]]
+
+
+class PatternSpecError(ValueError):
+    """Raised when a generator spec cannot be understood."""
+
+
+def _value(text: str) -> Any:
+    for convert in (int, float):
+        try:
+            return convert(text)
+        except ValueError:
+            pass
+    return text
+
+
+def parse_spec(spec: Union[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Normalise a generator spec.
+
+    Args:
+        spec: A dict with a ``type`` key, or a one-line ``"<type> key=value ..."`` string
+
+    Returns:
+        The spec as a dict; ``<pitch>=<string>`` pairs of a one-line ``steps``
+        spec are collected under ``rows``
+    """
+    if isinstance(spec, dict):
+        if "type" not in spec:
+            raise PatternSpecError("The spec needs a 'type'")
+        return dict(spec)
+    words = str(spec).split()
+    if not words:
+        raise PatternSpecError("The spec is empty")
+    result: Dict[str, Any] = {"type": words[0]}
+    for word in words[1:]:
+        key, sep, text = word.partition("=")
+        if not sep:
+            raise PatternSpecError(f"Expected key=value, got '{word}'")
+        if key.isdigit():
+            result.setdefault("rows", {})[key] = text
+        else:
+            result[key] = _value(text)
+    return result
+
+
+def _ticks(beats: float) -> int:
+    return int(round(float(beats) * TICKS_PER_BEAT))
+
+
+def _pitch_class(name: str) -> int:
+    match = _CHORD.match(name.strip().capitalize())
+    if not match:
+        raise PatternSpecError(f"Unknown note name '{name}'")
+    return (NOTE_NAMES[match.group(1)] + {"#": 1, "b": -1, "": 0}[match.group(2)]) % 12
+
+
+def parse_chord(symbol: str, octave: int = 4) -> List[int]:
+    """
+    MIDI pitches of a chord symbol such as ``Am``, ``F#7`` or ``Bbmaj7``.
+
+    Args:
+        symbol: Root, optional ``#``/``b`` and quality
+        octave: Octave of the root, 4 puts C at MIDI note 60
+    """
+    match = _CHORD.match(symbol.strip())
+    quality = match.group(3) if match else None
+    if quality not in CHORD_QUALITIES:
+        raise PatternSpecError(f"Unknown chord '{symbol}'")
+    root = 12 * (octave + 1) + _pitch_class(match.group(1) + match.group(2))
+    return [root + interval for interval in CHORD_QUALITIES[quality]]
+
+
+def _scale(spec: Dict[str, Any]) -> Tuple[int, Sequence[int]]:
+    """Root pitch class and intervals from ``root``/``scale`` (``scale`` may be ``"D dorian"``)."""
+    name = str(spec.get("scale", "major")).replace(":", " ").split()
+    root = spec.get("root", "C")
+    if len(name) == 2:
+        root, name = name[0], name[1:]
+    key = name[0].lower() if name else "major"
+    if key not in SCALES:
+        raise PatternSpecError(f"Unknown scale '{key}'; known scales: {', '.join(SCALES)}")
+    return (root % 12 if isinstance(root, int) else _pitch_class(str(root))), SCALES[key]
+
+
+# One cycle of each generator, as (pitch, velocity, start ticks, length ticks) lists
+
+
+def _euclid(spec: Dict[str, Any], step: int, length: int, velocity: int) -> Tuple[Cycle, int]:
+    steps = int(spec.get("steps", 16))
+    pulses = int(spec.get("pulses", 4))
+    rotate = int(spec.get("rotate", 0))
+    if steps < 1 or not 0 <= pulses <= steps:
+        raise PatternSpecError("euclid needs 1 <= steps and 0 <= pulses <= steps")
+    hits = sorted((i + rotate) % steps for i in range(steps) if (i * pulses) % steps < pulses)
+    note = int(spec.get("note", 36))
+    return ([note] * len(hits), [velocity] * len(hits), [h * step for h in hits], [length] * len(hits)), steps * step
+
+
+def _steps(spec: Dict[str, Any], step: int, length: Optional[int], velocity: int) -> Tuple[Cycle, int]:
+    rows = dict(spec.get("rows") or {})
+    if "pattern" in spec:
+        rows[str(spec.get("note", 36))] = spec["pattern"]
+    if not rows:
+        raise PatternSpecError("steps needs 'pattern' or one '<pitch>=<string>' row")
+    pitch: List[int] = []
+    velocities: List[int] = []
+    starts: List[int] = []
+    lengths: List[int] = []
+    period = 0
+    for note, row in rows.items():
+        row = str(row)
+        period = max(period, len(row))
+        for i, char in enumerate(row):
+            if char not in "xX":
+                continue
+            held = 1
+            while i + held < len(row) and row[i + held] == "-":
+                held += 1
+            pitch.append(int(note))
+            velocities.append(ACCENT_VELOCITY if char == "X" else velocity)
+            starts.append(i * step)
+            lengths.append(held * step if length is None or held > 1 else length)
+    return (pitch, velocities, starts, lengths), period * step
+
+
+def _arp(spec: Dict[str, Any], step: int, length: int, velocity: int, rng: random.Random) -> Tuple[Cycle, int]:
+    chords = spec.get("chords", "C")
+    if isinstance(chords, str):
+        chords = chords.replace(",", " ").split()
+    octave = int(spec.get("octave", 4))
+    octaves = max(1, int(spec.get("octaves", 1)))
+    mode = str(spec.get("mode", "up"))
+    per_chord = max(1, _ticks(spec.get("beats", 4)) // step)
+    pitch: List[int] = []
+    for symbol in chords:
+        tones = [p + 12 * o for o in range(octaves) for p in parse_chord(symbol, octave)]
+        if mode == "up":
+            order = tones
+        elif mode == "down":
+            order = tones[::-1]
+        elif mode == "updown":
+            order = tones + tones[-2:0:-1]
+        elif mode == "random":
+            order = [rng.choice(tones) for _ in range(per_chord)]
+        else:
+            raise PatternSpecError(f"Unknown arp mode '{mode}'; use up, down, updown or random")
+        pitch.extend(order[i % len(order)] for i in range(per_chord))
+    count = len(pitch)
+    return (pitch, [velocity] * count, [i * step for i in range(count)], [length] * count), count * step
+
+
+def _walk(spec: Dict[str, Any], step: int, length: int, velocity: int, seed: Optional[int]):
+    """The whole walk (it does not repeat), as columns."""
+    root, intervals = _scale(spec)
+    table = [p for p in range(128) if (p - root) % 12 in intervals]
+    low, high = int(spec.get("low", 48)), int(spec.get("high", 84))
+    first = next((i for i, p in enumerate(table) if p >= low), 0)
+    last = max(first, max((i for i, p in enumerate(table) if p <= high), default=first))
+    start_note = int(spec.get("start_note", (low + high) // 2))
+    origin = min(max(next((i for i, p in enumerate(table) if p >= start_note), last), first), last)
+    count = int(spec.get("count", 64))
+    max_step = max(0, int(spec.get("max_step", 2)))
+    density = float(spec.get("density", 1.0))
+    if not 0 < count <= MAX_GENERATED_NOTES:
+        raise PatternSpecError(f"walk needs 0 < count <= {MAX_GENERATED_NOTES}")
+    span = last - first
+    period = 2 * span if span else 1
+
+    if np is not None:
+        rng = np.random.default_rng(seed)
+        moves = rng.integers(-max_step, max_step + 1, count)
+        moves[0] = 0
+        offset = (origin - first + np.cumsum(moves)) % period
+        degrees = first + np.where(offset > span, period - offset, offset)
+        pitch = np.asarray(table)[degrees]
+        starts = np.arange(count, dtype=np.int64) * step
+        if density < 1:
+            keep = rng.random(count) < density
+            pitch, starts = pitch[keep], starts[keep]
+        return pitch, np.full(len(pitch), velocity), starts, np.full(len(pitch), length)
+
+    rng = random.Random(seed)
+    pitch, starts = [], []
+    position = origin - first
+    for i in range(count):
+        if i:
+            position += rng.randint(-max_step, max_step)
+        offset = position % period
+        degree = first + (period - offset if offset > span else offset)
+        if density >= 1 or rng.random() < density:
+            pitch.append(table[degree])
+            starts.append(i * step)
+    return pitch, [velocity] * len(pitch), starts, [length] * len(pitch)
+
+
+def _tile(cycle: Cycle, period: int, repeat: int, offset: int):
+    """Repeat one cycle ``repeat`` times, ``period`` ticks apart, from ``offset`` ticks."""
+    pitch, velocity, start, length = cycle
+    if np is not None:
+        shifts = np.repeat(np.arange(repeat, dtype=np.int64) * period, len(pitch)) + offset
+        return (np.tile(np.asarray(pitch, dtype=np.int64), repeat), np.tile(np.asarray(velocity), repeat),
+                np.tile(np.asarray(start, dtype=np.int64), repeat) + shifts, np.tile(np.asarray(length), repeat))
+    starts = [s + offset + r * period for r in range(repeat) for s in start]
+    return pitch * repeat, velocity * repeat, starts, length * repeat
+
+
+def generate(spec: Union[str, Dict[str, Any]]) -> Pattern:
+    """
+    Expand a generator spec into notes.
+
+    Args:
+        spec: A dict or one-line string spec, see the module documentation
+
+    Returns:
+        The generated, validated notes
+
+    Raises:
+        PatternSpecError: If the spec is not understood
+        NoteValidationError: If generated notes fall outside the MIDI range
+    """
+    spec = parse_spec(spec)
+    kind = spec["type"]
+    try:
+        step = _ticks(spec.get("step", DEFAULT_STEP))
+        length = _ticks(spec["length"]) if "length" in spec else None
+        velocity = int(spec.get("velocity", DEFAULT_VELOCITY))
+        offset = _ticks(spec.get("start", 0))
+        repeat = int(spec.get("repeat", 1))
+        seed = spec.get("seed")
+        if step < 1 or repeat < 1 or offset < 0:
+            raise PatternSpecError("step and repeat must be positive and start not negative")
+        if kind == "walk":
+            pitch, velocities, starts, lengths = _walk(spec, step, length or step, velocity, seed)
+            starts = starts + offset if np is not None else [s + offset for s in starts]
+            columns = (pitch, velocities, starts, lengths)
+        elif kind == "euclid":
+            cycle, period = _euclid(spec, step, length or step, velocity)
+        elif kind == "steps":
+            cycle, period = _steps(spec, step, length, velocity)
+        elif kind == "arp":
+            cycle, period = _arp(spec, step, length or step, velocity, random.Random(seed))
+        else:
+            raise PatternSpecError(f"Unknown generator '{kind}'; use euclid, steps, arp or walk")
+    except (TypeError, ValueError, KeyError) as e:
+        if isinstance(e, PatternSpecError):
+            raise
+        raise PatternSpecError(f"Invalid {kind} spec: {e}") from None
+    if kind != "walk":
+        if len(cycle[0]) * repeat > MAX_GENERATED_NOTES:
+            raise PatternSpecError(f"The spec would generate more than {MAX_GENERATED_NOTES} notes")
+        columns = _tile(cycle, period, repeat, offset)
+    return Pattern.from_ticks(*columns)
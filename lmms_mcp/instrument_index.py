@@ -0,0 +1,337 @@
+"""
+Persistent index of LMMS instrument plugins, presets and samples.
+
+Walking LMMS's plugin, preset and sample directories on every call is too slow
+for large sample libraries, so the results are kept in a SQLite database. The
+first refresh walks everything; later refreshes only re-list directories whose
+modification time changed and reuse the stored subdirectory list for the
+rest. Refreshes are rate-limited, so back-to-back queries only hit SQLite.
+
+Directories to index default to the usual LMMS install and user locations and
+can be replaced through the ``LMMS_MCP_INSTRUMENT_PATHS`` environment variable
+(a ``os.pathsep`` separated list).
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Default settings
+DEFAULT_REFRESH_INTERVAL = 60.0
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+PATHS_ENV_VAR = "LMMS_MCP_INSTRUMENT_PATHS"
+
+DEFAULT_ROOTS = (
+    # Instrument plugins
+    "/usr/lib/lmms",
+    "/usr/lib64/lmms",
+    "/usr/local/lib/lmms",
+    "/usr/lib/x86_64-linux-gnu/lmms",
+    "/Applications/LMMS.app/Contents/lib/lmms",
+    "C:\\Program Files\\LMMS\\plugins",
+    # Factory and user presets and samples
+    "/usr/share/lmms/presets",
+    "/usr/local/share/lmms/presets",
+    "/usr/share/lmms/samples",
+    "/usr/local/share/lmms/samples",
+    "/Applications/LMMS.app/Contents/share/lmms",
+    "C:\\Program Files\\LMMS\\data",
+    "~/lmms",
+    "~/Documents/lmms",
+)
+
+KINDS_BY_EXTENSION = {
+    ".so": "plugin",
+    ".dll": "plugin",
+    ".dylib": "plugin",
+    ".xpf": "preset",
+    ".sf2": "soundfont",
+    ".sf3": "soundfont",
+    ".gig": "soundfont",
+    ".wav": "sample",
+    ".ogg": "sample",
+    ".flac": "sample",
+    ".mp3": "sample",
+    ".aif": "sample",
+    ".aiff": "sample",
+    ".ds": "sample",
+}
+
+# Preferred kind when a short name is the exact name of several entries
+_RESOLVE_ORDER = ("plugin", "preset", "soundfont", "sample")
+
+# Candidates listed when a short name is ambiguous
+_AMBIGUOUS_SHOWN = 5
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    parent TEXT,
+    mtime REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS dirs_parent ON dirs(parent);
+CREATE TABLE IF NOT EXISTS entries (
+    path TEXT PRIMARY KEY,
+    dir TEXT NOT NULL,
+    name TEXT NOT NULL,
+    name_lower TEXT NOT NULL,
+    kind TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_dir ON entries(dir);
+CREATE INDEX IF NOT EXISTS entries_name ON entries(name_lower);
+"""
+
+
+class AmbiguousInstrumentError(ValueError):
+    """Raised when a short instrument name could mean several instruments."""
+
+
+def default_db_path() -> str:
+    """Location of the index database in the user's cache directory."""
+    cache = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache, "lmms-mcp", "instruments.sqlite")
+
+
+def default_roots() -> List[str]:
+    """Directories to index, from the environment or the usual LMMS locations."""
+    configured = os.environ.get(PATHS_ENV_VAR)
+    roots = configured.split(os.pathsep) if configured else DEFAULT_ROOTS
+    return [os.path.abspath(os.path.expanduser(r)) for r in roots if r]
+
+
+def _entry_name(filename: str, kind: str) -> str:
+    stem = os.path.splitext(filename)[0]
+    if kind == "plugin" and stem.startswith("lib"):
+        stem = stem[3:]
+    return stem
+
+
+def _like_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _fuzzy_rank(query: str, name: str) -> Tuple[int, int, int]:
+    """Sort key for a name that contains the query's characters in order."""
+    if name.startswith(query):
+        return (0, 0, len(name))
+    position = name.find(query)
+    if position >= 0:
+        return (1, position, len(name))
+    # Subsequence match: rank by how spread out the matched characters are
+    start = last = name.find(query[0])
+    for char in query[1:]:
+        last = name.find(char, last + 1)
+    return (2, last - start, len(name))
+
+
+class InstrumentIndex:
+    """On-disk, incrementally refreshed index of instruments, presets and samples."""
+
+    def __init__(self, db_path: Optional[str] = None, roots: Optional[Iterable[str]] = None,
+                 refresh_interval: float = DEFAULT_REFRESH_INTERVAL):
+        """
+        Initialize the index. Nothing is opened or scanned until the first query.
+
+        Args:
+            db_path: SQLite database file, defaults to :func:`default_db_path`
+            roots: Directories to index, defaults to :func:`default_roots`
+            refresh_interval: Minimum number of seconds between automatic refreshes
+        """
+        self.db_path = db_path or default_db_path()
+        self.roots = [os.path.abspath(os.path.expanduser(r)) for r in roots] if roots is not None else default_roots()
+        self.refresh_interval = refresh_interval
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+        self._last_refresh = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            if self.db_path != ":memory:":
+                os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.executescript(_SCHEMA)
+        return self._db
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    # Refreshing
+
+    def refresh(self, force: bool = False) -> Dict[str, int]:
+        """
+        Bring the index up to date with the filesystem.
+
+        Only directories whose mtime changed since the last refresh are listed
+        again. Unless ``force`` is set, nothing happens if the last refresh was
+        less than ``refresh_interval`` seconds ago.
+
+        Returns:
+            Number of directories checked and rescanned
+        """
+        with self._lock:
+            if not force and time.monotonic() - self._last_refresh < self.refresh_interval:
+                return {"checked": 0, "rescanned": 0}
+            db = self._connect()
+            stats = {"checked": 0, "rescanned": 0}
+            with db:
+                # Forget roots that are no longer configured
+                for (path,) in db.execute("SELECT path FROM dirs WHERE parent IS NULL").fetchall():
+                    if path not in self.roots:
+                        self._forget_tree(db, path)
+                for root in self.roots:
+                    self._refresh_tree(db, root, stats)
+            self._last_refresh = time.monotonic()
+            return stats
+
+    def _refresh_tree(self, db: sqlite3.Connection, root: str, stats: Dict[str, int]):
+        stack: List[Tuple[str, Optional[str]]] = [(root, None)]
+        while stack:
+            path, parent = stack.pop()
+            stats["checked"] += 1
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                self._forget_tree(db, path)
+                continue
+            row = db.execute("SELECT mtime FROM dirs WHERE path = ?", (path,)).fetchone()
+            if row is not None and row[0] == mtime:
+                stack.extend((child, path) for (child,) in
+                             db.execute("SELECT path FROM dirs WHERE parent = ?", (path,)))
+                continue
+            stats["rescanned"] += 1
+            stack.extend((child, path) for child in self._rescan_dir(db, path, parent, mtime))
+
+    def _rescan_dir(self, db: sqlite3.Connection, path: str, parent: Optional[str], mtime: float) -> List[str]:
+        """List one directory, replace its entries and return its subdirectories."""
+        entries = []
+        subdirs = []
+        try:
+            with os.scandir(path) as it:
+                for item in it:
+                    if item.name.startswith("."):
+                        continue
+                    try:
+                        if item.is_dir():
+                            subdirs.append(item.path)
+                            continue
+                    except OSError:
+                        continue
+                    kind = KINDS_BY_EXTENSION.get(os.path.splitext(item.name)[1].lower())
+                    if kind is not None:
+                        name = _entry_name(item.name, kind)
+                        entries.append((item.path, path, name, name.lower(), kind))
+        except OSError as e:
+            logger.warning(f"Cannot list {path}: {e}")
+        db.execute("DELETE FROM entries WHERE dir = ?", (path,))
+        db.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)", entries)
+        known = {child for (child,) in db.execute("SELECT path FROM dirs WHERE parent = ?", (path,))}
+        for gone in known.difference(subdirs):
+            self._forget_tree(db, gone)
+        db.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?, ?)", (path, parent, mtime))
+        return subdirs
+
+    @staticmethod
+    def _forget_tree(db: sqlite3.Connection, path: str):
+        prefix = _like_escape(path.rstrip(os.sep) + os.sep) + "%"
+        db.execute("DELETE FROM entries WHERE dir = ? OR dir LIKE ? ESCAPE '\\'", (path, prefix))
+        db.execute("DELETE FROM dirs WHERE path = ? OR path LIKE ? ESCAPE '\\'", (path, prefix))
+
+    # Queries
+
+    def search(self, query: Optional[str] = None, kind: Optional[str] = None,
+               offset: int = 0, limit: int = DEFAULT_PAGE_SIZE, fuzzy: bool = True) -> Dict[str, Any]:
+        """
+        Search the index.
+
+        Names starting with the query come first. With ``fuzzy`` set, names
+        containing the query's characters in order follow, closest first.
+
+        Args:
+            query: Case-insensitive name query; everything matches if empty
+            kind: Restrict to one kind (plugin, preset, soundfont, sample)
+            offset: Number of results to skip
+            limit: Maximum number of results to return
+            fuzzy: Include non-prefix matches
+
+        Returns:
+            The page of results and the total number of matches
+        """
+        self.refresh()
+        limit = max(0, min(limit, MAX_PAGE_SIZE))
+        offset = max(0, offset)
+        q = (query or "").strip().lower()
+        kind_sql, kind_args = ("AND kind = ?", [kind]) if kind else ("", [])
+
+        with self._lock:
+            db = self._connect()
+            if not q or not fuzzy:
+                where = "name_lower >= ? AND name_lower < ?" if q else "1"
+                args = [q, q + "\uffff"] if q else []
+                total = db.execute(f"SELECT COUNT(*) FROM entries WHERE {where} {kind_sql}",
+                                   args + kind_args).fetchone()[0]
+                rows = db.execute(f"SELECT name, kind, path FROM entries WHERE {where} {kind_sql} "
+                                  f"ORDER BY name_lower, path LIMIT ? OFFSET ?",
+                                  args + kind_args + [limit, offset]).fetchall()
+            else:
+                pattern = "%" + "%".join(_like_escape(c) for c in q) + "%"
+                candidates = db.execute(f"SELECT name, kind, path, name_lower FROM entries "
+                                        f"WHERE name_lower LIKE ? ESCAPE '\\' {kind_sql}",
+                                        [pattern] + kind_args).fetchall()
+                candidates.sort(key=lambda r: (_fuzzy_rank(q, r[3]), r[3], r[2]))
+                total = len(candidates)
+                rows = [r[:3] for r in candidates[offset:offset + limit]]
+
+        return {
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "results": [{"name": name, "kind": k, "path": path} for name, k, path in rows],
+        }
+
+    def resolve(self, name: str) -> Optional[str]:
+        """
+        Resolve a short instrument name to what LMMS should load.
+
+        Plugins resolve to their plugin name, presets and samples to their
+        full path. Exact (case-insensitive) name matches come first, preferring
+        plugins over presets, soundfonts and samples; otherwise the name must
+        be the start of exactly one entry's name. Fuzzy matches are never
+        used, so an unrelated instrument is not loaded by accident.
+
+        Returns:
+            The plugin name or file path, or None if nothing matches
+
+        Raises:
+            AmbiguousInstrumentError: If the name starts several entries' names
+        """
+        query = name.strip().lower()
+        if not query:
+            return None
+        self.refresh()
+        with self._lock:
+            rows = self._connect().execute("SELECT name, kind, path FROM entries WHERE name_lower = ?",
+                                           (query,)).fetchall()
+        if not rows:
+            matches = self.search(query, offset=0, limit=_AMBIGUOUS_SHOWN, fuzzy=False)
+            if matches["total"] > 1:
+                shown = ", ".join(f"{m['name']} ({m['kind']})" for m in matches["results"])
+                more = matches["total"] - len(matches["results"])
+                raise AmbiguousInstrumentError(f"'{name}' matches {matches['total']} instruments: {shown}"
+                                               + (f" and {more} more" if more else ""))
+            rows = [(m["name"], m["kind"], m["path"]) for m in matches["results"]]
+        if not rows:
+            return None
+        rows.sort(key=lambda r: (_RESOLVE_ORDER.index(r[1]) if r[1] in _RESOLVE_ORDER else len(_RESOLVE_ORDER), r[2]))
+        entry_name, kind, path = rows[0]
+        return entry_name if kind == "plugin" else path
@@ -0,0 +1,447 @@
+"""
+Background jobs for long-running tool calls.
+
+Saving a project, loading a heavy instrument or importing a large MIDI file
+can take longer than an MCP client is willing to wait for a tool result. Such
+operations run as jobs: a coroutine started by :class:`JobManager` and
+reporting its progress as it goes. The server waits briefly for a job and
+returns its result inline if it finishes in time; otherwise the tool call
+answers with the job's id right away and the job carries on, to be followed
+with ``get_job_status`` and stopped with ``cancel_job``.
+
+At most ``max_concurrent`` jobs run at once; further jobs wait their turn in
+the ``queued`` state. Jobs whose id was handed to a client are recorded in a
+JSON-lines log, one line per state change, so their outcome is still known
+after the server restarts. Jobs that were still queued or running when the
+server that ran them stopped are reported as ``interrupted``.
+
+Several servers may share the log. Each line records the process that owns
+the job, so a server only interrupts jobs whose owner is no longer running,
+and the log is only compacted by a server that finds no other one using it.
+Servers hold a lock on ``<log>.lock`` while they use the log; without
+``fcntl`` (on Windows) the log is assumed to have a single user.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: the log is assumed to have a single user
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+INTERRUPTED = "interrupted"
+
+FINISHED = {SUCCEEDED, FAILED, CANCELLED, INTERRUPTED}
+
+DEFAULT_MAX_CONCURRENT = 4
+
+# Finished jobs kept in memory and in the log
+DEFAULT_KEEP_FINISHED = 200
+
+# Reports progress: (progress, total, message)
+ProgressCallback = Callable[[float, Optional[float], Optional[str]], Any]
+Work = Callable[[ProgressCallback], Awaitable[Dict[str, Any]]]
+
+
+def default_log_path() -> str:
+    """Location of the job log in the user's cache directory."""
+    cache = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache, "lmms-mcp", "jobs.jsonl")
+
+
+def _owner_running(pid: Optional[int]) -> bool:
+    """Whether another process that may still run the job it owns is alive."""
+    # A job this process owns but does not know of was left by an earlier
+    # server that had the same pid
+    if pid is None or pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+class Job:
+    """One long-running operation and its progress."""
+
+    __slots__ = ("id", "kind", "args", "owner", "status", "progress", "total", "message", "result", "error",
+                 "created", "started", "finished", "registered", "exception", "task", "_watchers")
+
+    def __init__(self, kind: str, args: Optional[Dict[str, Any]] = None, job_id: Optional[str] = None):
+        self.id = job_id or uuid.uuid4().hex[:16]
+        self.kind = kind
+        self.args = args or {}
+        # Process running the job
+        self.owner: Optional[int] = os.getpid()
+        self.status = QUEUED
+        self.progress = 0.0
+        self.total: Optional[float] = None
+        self.message: Optional[str] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        # Whether a client has been given the job's id, which makes it listed and logged
+        self.registered = False
+        self.exception: Optional[BaseException] = None
+        self.task: Optional["asyncio.Task"] = None
+        self._watchers: List[asyncio.Queue] = []
+
+    @property
+    def done(self) -> bool:
+        """Whether the job has finished, one way or another."""
+        return self.status in FINISHED
+
+    def report(self, progress: float, total: Optional[float] = None, message: Optional[str] = None):
+        """Record progress and pass it on to anyone waiting for the job."""
+        self.progress = progress
+        if total is not None:
+            self.total = total
+        if message is not None:
+            self.message = message
+        self._notify()
+
+    def _notify(self):
+        for queue in self._watchers:
+            queue.put_nowait(None)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Describe the job, with its result once it has succeeded."""
+        result = {"job_id": self.id, "kind": self.kind, "status": self.status, "progress": self.progress,
+                  "total": self.total, "message": self.message, "created": self.created,
+                  "started": self.started, "finished": self.finished}
+        if self.status == SUCCEEDED:
+            result["result"] = self.result
+        if self.error is not None:
+            result["error"] = self.error
+        return result
+
+    def _record(self) -> Dict[str, Any]:
+        record = self.to_dict()
+        record["args"] = self.args
+        record["pid"] = self.owner
+        return record
+
+    @classmethod
+    def _from_record(cls, record: Dict[str, Any]) -> "Job":
+        job = cls(record["kind"], record.get("args"), record["job_id"])
+        job.owner = record.get("pid")
+        job.status = record["status"]
+        job.progress = record.get("progress", 0.0)
+        job.total = record.get("total")
+        job.message = record.get("message")
+        job.result = record.get("result")
+        job.error = record.get("error")
+        job.created = record.get("created", job.created)
+        job.started = record.get("started")
+        job.finished = record.get("finished")
+        job.registered = True
+        return job
+
+
+class JobManager:
+    """Runs jobs with bounded concurrency and keeps a persistent log of them."""
+
+    def __init__(self, log_path: Optional[str] = None, max_concurrent: int = DEFAULT_MAX_CONCURRENT,
+                 keep_finished: int = DEFAULT_KEEP_FINISHED):
+        """
+        Initialize the manager. The log is not read or written until a job is registered or looked up.
+
+        Args:
+            log_path: JSON-lines job log, defaults to :func:`default_log_path`
+            max_concurrent: Most jobs running at once
+            keep_finished: Finished jobs remembered, in memory and in the log
+        """
+        self.log_path = log_path or default_log_path()
+        self.max_concurrent = max_concurrent
+        self.keep_finished = keep_finished
+        self._jobs: Dict[str, Job] = {}
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._log = None
+        self._users = None
+        self._loaded = False
+
+    # Persistence
+
+    def _load(self):
+        """
+        Read the log once: the last record of every job, interrupting those whose server stopped.
+
+        With no other server using the log, every unfinished job is
+        interrupted and the log is compacted. Otherwise only jobs whose owner
+        is gone are interrupted, by appending their new state.
+        """
+        if self._loaded:
+            return
+        self._loaded = True
+        alone = self._join()
+        records: Dict[str, Dict[str, Any]] = {}
+        try:
+            with open(self.log_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        records[record["job_id"]] = record
+                    except (ValueError, KeyError, TypeError):
+                        # A line cut short by a crash
+                        continue
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Could not read job log {self.log_path}: {e}")
+        interrupted = []
+        for record in records.values():
+            if record["job_id"] in self._jobs:
+                continue
+            job = Job._from_record(record)
+            if not job.done and (alone or not _owner_running(job.owner)):
+                job.status = INTERRUPTED
+                job.error = "The server stopped before the job finished"
+                interrupted.append(job)
+            self._jobs[job.id] = job
+        self._prune()
+        if alone:
+            self._rewrite()
+            if self._users is not None:
+                # Let other servers in, now that the log has been replaced
+                fcntl.flock(self._users, fcntl.LOCK_SH)
+        else:
+            for job in interrupted:
+                if job.id in self._jobs:
+                    self._write(job)
+
+    def _join(self) -> bool:
+        """
+        Become one of the log's users until :meth:`close`.
+
+        Returns:
+            Whether no other server is using the log, in which case this one
+            holds the users lock exclusively until it has compacted the log
+        """
+        if fcntl is None:
+            return True
+        try:
+            os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+            self._users = open(f"{self.log_path}.lock", "a")
+        except OSError as e:
+            logger.warning(f"Could not open job log lock {self.log_path}.lock: {e}")
+            return False
+        try:
+            fcntl.flock(self._users, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            # Waits for a server that is compacting the log to finish
+            fcntl.flock(self._users, fcntl.LOCK_SH)
+            return False
+
+    def _rewrite(self):
+        """Compact the log down to one line per remembered job; only done while no other server uses it."""
+        try:
+            os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+            temporary = f"{self.log_path}.tmp"
+            with open(temporary, "w", encoding="utf-8") as f:
+                for job in self._jobs.values():
+                    if job.registered:
+                        f.write(json.dumps(job._record(), default=str) + "\n")
+            os.replace(temporary, self.log_path)
+        except OSError as e:
+            logger.warning(f"Could not write job log {self.log_path}: {e}")
+
+    def _write(self, job: Job):
+        """Append the current state of a registered job to the log."""
+        if not job.registered:
+            return
+        try:
+            line = json.dumps(job._record(), default=str) + "\n"
+            if self._log is None:
+                os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+                self._log = open(self.log_path, "a", encoding="utf-8")
+            if fcntl is not None:
+                # Other servers append to the same log
+                fcntl.flock(self._log, fcntl.LOCK_EX)
+            try:
+                if not self._at_line_start():
+                    # Not on the end of a line cut short by a crash
+                    line = "\n" + line
+                self._log.write(line)
+                self._log.flush()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._log, fcntl.LOCK_UN)
+        except OSError as e:
+            logger.warning(f"Could not append to job log {self.log_path}: {e}")
+
+    def _at_line_start(self) -> bool:
+        """Whether the log ends with a whole line."""
+        with open(self.log_path, "rb") as f:
+            if f.seek(0, os.SEEK_END) == 0:
+                return True
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond ``keep_finished``."""
+        finished = [job for job in self._jobs.values() if job.done]
+        for job in sorted(finished, key=lambda j: j.finished or 0)[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job.id]
+
+    # Running
+
+    def start(self, kind: str, work: Work, args: Optional[Dict[str, Any]] = None) -> Job:
+        """
+        Start a job. It is not listed or logged until :meth:`register` is called.
+
+        Args:
+            kind: The operation, usually the tool name
+            work: Coroutine function doing the work; it is passed a callback
+                  taking ``(progress, total, message)``
+            args: The operation's arguments, for the record
+
+        Returns:
+            The job, queued or running
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+        job = Job(kind, args)
+        job.task = asyncio.ensure_future(self._run(job, work))
+        self._jobs[job.id] = job
+        return job
+
+    async def _run(self, job: Job, work: Work):
+        try:
+            async with self._slots:
+                job.status = RUNNING
+                job.started = time.time()
+                self._write(job)
+                job._notify()
+                job.result = await work(job.report)
+            job.status = SUCCEEDED
+        except asyncio.CancelledError as e:
+            job.status = CANCELLED
+            job.exception = e
+        except Exception as e:
+            job.status = FAILED
+            job.error = str(e) or type(e).__name__
+            job.exception = e
+            if job.registered:
+                logger.warning(f"Job {job.id} ({job.kind}) failed: {job.error}")
+        finally:
+            job.finished = time.time()
+            job.task = None
+            self._write(job)
+            job._notify()
+            if not job.registered:
+                # Nobody was told about it, so nobody will ask
+                self._jobs.pop(job.id, None)
+            self._prune()
+
+    def register(self, job: Job) -> Job:
+        """Make a job visible to clients and record it in the log."""
+        self._load()
+        if not job.registered:
+            job.registered = True
+            self._jobs[job.id] = job
+            self._write(job)
+        return job
+
+    async def wait(self, job: Job, timeout: float, on_progress: Optional[ProgressCallback] = None) -> bool:
+        """
+        Wait for a job to finish, without cancelling it on timeout.
+
+        Args:
+            job: The job to wait for
+            timeout: Most seconds to wait
+            on_progress: Coroutine function called with ``(progress, total, message)``
+                         whenever the job reports progress
+
+        Returns:
+            Whether the job has finished
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        updates: asyncio.Queue = asyncio.Queue()
+        job._watchers.append(updates)
+        sent = None
+        try:
+            while not job.done:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return False
+                try:
+                    await asyncio.wait_for(updates.get(), remaining)
+                except asyncio.TimeoutError:
+                    return False
+                update = (job.progress, job.total, job.message)
+                if on_progress is not None and not job.done and update != sent:
+                    sent = update
+                    await on_progress(*update)
+            return True
+        finally:
+            job._watchers.remove(updates)
+
+    # Queries
+
+    def get(self, job_id: str) -> Job:
+        """
+        Look up a registered job.
+
+        Raises:
+            ValueError: If there is no such job
+        """
+        self._load()
+        job = self._jobs.get(job_id)
+        if job is None or not job.registered:
+            raise ValueError(f"Unknown job '{job_id}'")
+        return job
+
+    def cancel(self, job_id: str) -> Job:
+        """Cancel a queued or running job; finished jobs are left as they are."""
+        job = self.get(job_id)
+        if job.task is not None:
+            job.task.cancel()
+        return job
+
+    def jobs(self, status: Optional[str] = None) -> List[Job]:
+        """Registered jobs, newest first, optionally only those in one state."""
+        self._load()
+        jobs = [job for job in self._jobs.values() if job.registered and (status is None or job.status == status)]
+        return sorted(jobs, key=lambda j: j.created, reverse=True)
+
+    def stats(self) -> Dict[str, int]:
+        """Number of jobs in each state, including those not handed to a client."""
+        counts: Dict[str, int] = {}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return counts
+
+    async def close(self):
+        """Cancel every unfinished job, close the log and stop using it."""
+        tasks = [job.task for job in self._jobs.values() if job.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+        if self._users is not None:
+            self._users.close()
+            self._users = None
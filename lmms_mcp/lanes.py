@@ -0,0 +1,153 @@
+"""
+Priority lanes for requests to LMMS.
+
+Every request needs one of ``max_in_flight`` slots before it is sent. The
+slots are handed out by lane, highest first:
+
+* ``realtime``: transport and tempo (``play``, ``stop``, ``set_tempo``)
+* ``interactive``: small edits and queries, the default
+* ``bulk``: note uploads and instrument loads
+
+Within a lane requests go first come, first served. Bulk requests may only
+hold ``max_bulk_in_flight`` slots at a time, so some slots are always left
+for the other lanes, and large uploads are split into one request per note
+bundle, so a ``stop`` issued in the middle of a huge upload waits for at most
+the bundles already on the wire instead of the whole upload.
+"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+
+REALTIME = "realtime"
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+# Highest priority first
+LANES = (REALTIME, INTERACTIVE, BULK)
+
+COMMAND_LANES = {
+    "play": REALTIME,
+    "stop": REALTIME,
+    "set_tempo": REALTIME,
+    "ping": REALTIME,
+    "add_notes": BULK,
+    "remove_notes": BULK,
+    "load_instrument": BULK,
+}
+
+# Recent latencies kept per lane for percentile estimates
+DEFAULT_RECENT = 1024
+
+
+def lane_for(command: str) -> str:
+    """The lane a command is scheduled in."""
+    return COMMAND_LANES.get(command, INTERACTIVE)
+
+
+def _percentile(ordered, q: int) -> float:
+    return ordered[min(len(ordered) - 1, len(ordered) * q // 100)]
+
+
+class LaneStats:
+    """Request count and queueing and total latencies for one lane."""
+
+    __slots__ = ("requests", "waits", "latencies")
+
+    def __init__(self, recent: int = DEFAULT_RECENT):
+        self.requests = 0
+        self.waits: Deque[float] = deque(maxlen=recent)
+        self.latencies: Deque[float] = deque(maxlen=recent)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Describe the lane's statistics, latencies in milliseconds."""
+        result: Dict[str, Any] = {"requests": self.requests}
+        for name, samples in (("wait", self.waits), ("latency", self.latencies)):
+            if not samples:
+                continue
+            ordered = sorted(samples)
+            result[f"{name}_mean_ms"] = round(sum(ordered) / len(ordered) * 1000, 3)
+            for q in (50, 99):
+                result[f"{name}_p{q}_ms"] = round(_percentile(ordered, q) * 1000, 3)
+            result[f"{name}_max_ms"] = round(ordered[-1] * 1000, 3)
+        return result
+
+
+class LaneScheduler:
+    """Hands out in-flight slots to requests by lane priority."""
+
+    def __init__(self, max_in_flight: int, max_bulk_in_flight: Optional[int] = None):
+        """
+        Initialize the scheduler.
+
+        Args:
+            max_in_flight: Slots shared by all lanes
+            max_bulk_in_flight: Slots the bulk lane may hold at once, at most
+                                ``max_in_flight``; defaults to all of them
+        """
+        self.max_in_flight = max_in_flight
+        self.max_bulk_in_flight = min(max_in_flight, max_bulk_in_flight or max_in_flight)
+        self._active = {lane: 0 for lane in LANES}
+        self._waiters: Dict[str, Deque[asyncio.Future]] = {lane: deque() for lane in LANES}
+        self.stats = {lane: LaneStats() for lane in LANES}
+
+    @property
+    def active(self) -> int:
+        """Slots currently held."""
+        return sum(self._active.values())
+
+    def _can_start(self, lane: str) -> bool:
+        if self.active >= self.max_in_flight:
+            return False
+        return lane != BULK or self._active[BULK] < self.max_bulk_in_flight
+
+    def _release(self, lane: str):
+        self._active[lane] -= 1
+        for waiting_lane in LANES:
+            waiters = self._waiters[waiting_lane]
+            while waiters and self._can_start(waiting_lane):
+                waiter = waiters.popleft()
+                if waiter.done():
+                    continue
+                # The slot is taken on the waiter's behalf, so nobody can jump in before it runs
+                self._active[waiting_lane] += 1
+                waiter.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, lane: str) -> AsyncIterator[None]:
+        """Hold one in-flight slot of ``lane`` for the enclosed request."""
+        stats = self.stats[lane]
+        stats.requests += 1
+        started = time.perf_counter()
+        if not self._waiters[lane] and self._can_start(lane):
+            self._active[lane] += 1
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters[lane].append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # Granted just before the cancellation arrived
+                    self._release(lane)
+                else:
+                    waiter.cancel()
+                raise
+        stats.waits.append(time.perf_counter() - started)
+        try:
+            yield
+        finally:
+            self._release(lane)
+            stats.latencies.append(time.perf_counter() - started)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Per-lane statistics with the current number of active and queued requests."""
+        result = {}
+        for lane in LANES:
+            stats = self.stats[lane].snapshot()
+            stats["active"] = self._active[lane]
+            stats["queued"] = sum(1 for waiter in self._waiters[lane] if not waiter.done())
+            result[lane] = stats
+        return result
@@ -1,80 +1,412 @@
 """
 LMMS Interface for OSC communication with LMMS.
-This is a stub implementation for testing purposes.
+
+All traffic goes over a single persistent UDP datagram endpoint. Every request
+is sent as an OSC message addressed ``/lmms/<command>`` whose first argument is
+an integer correlation id, followed by the command's positional arguments.
+LMMS (or the remote bridge) answers each request with a ``/lmms/reply``
+message carrying the same correlation id and a JSON encoded result object.
+A result containing an ``"error"`` key is raised as :class:`LMMSError`.
+
+Because replies are matched by id rather than by arrival order, many requests
+can be in flight at once; the in-flight slots are handed out by priority lane
+(see :mod:`lmms_mcp.lanes`) so that transport commands are not stuck behind
+bulk note uploads. Any other message received on the endpoint (for
+example ``/lmms/notify/tempo``) is treated as a notification and handed to the
+registered listeners.
 """
 
 import asyncio
-from typing import Dict, Any, List, Optional
+import itertools
+import json
+import logging
+import struct
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Callable, Tuple, Union
+
+from pythonosc.osc_message_builder import OscMessageBuilder
+from pythonosc.osc_packet import OscPacket, ParseError
+
+from .lanes import LaneScheduler, lane_for
+from .metrics import lmms_time
+from .notes import NoteColumns, NOTE_RECORD
+
+if TYPE_CHECKING:
+    from .wire_log import WireRecorder
+
+logger = logging.getLogger(__name__)
+
+# Default settings
+DEFAULT_TIMEOUT = 5.0
+DEFAULT_MAX_IN_FLIGHT = 64
+# Bulk bundles LMMS may be working through when a transport command arrives
+DEFAULT_MAX_BULK_IN_FLIGHT = 16
+# Largest UDP payload that fits an Ethernet frame without IP fragmentation
+DEFAULT_MAX_DATAGRAM_SIZE = 1472
+
+ADDRESS_PREFIX = "/lmms/"
+REPLY_ADDRESS = "/lmms/reply"
+
+NotificationListener = Callable[[str, Tuple[Any, ...]], None]
+
+# Bulk note bundles are encoded by hand: the layout is fixed, and building them
+# through python-osc would re-parse every datagram it produces.
+_BUNDLE_HEADER = b"#bundle\x00" + struct.pack(">Q", 1)  # timetag 1 = immediately
+_NOTE_ARGS = struct.Struct(">iiiii")
+_NOTE_TYPETAG = b",iiiib\x00\x00"
+
+
+def _osc_string(value: str) -> bytes:
+    data = value.encode() + b"\x00"
+    return data + b"\x00" * (-len(data) % 4)
+
+
+def _note_bundle_overhead(command: str) -> int:
+    return (len(_BUNDLE_HEADER) + 4 + len(_osc_string(ADDRESS_PREFIX + command)) + len(_NOTE_TYPETAG)
+            + _NOTE_ARGS.size + 3)
+
+
+def encode_note_bundle(command: str, request_id: int, track_index: int, pattern_index: int,
+                       offset: int, records: Union[bytes, memoryview]) -> bytes:
+    """
+    Encode one chunk of packed note records as an OSC bundle.
+
+    The bundle holds a single ``/lmms/<command>`` message with the arguments
+    ``request_id, track_index, pattern_index, offset, records``, where
+    ``offset`` is the index of the first note of the chunk within the batch.
+    """
+    padding = b"\x00" * (-len(records) % 4)
+    message = b"".join((
+        _osc_string(ADDRESS_PREFIX + command),
+        _NOTE_TYPETAG,
+        _NOTE_ARGS.pack(request_id, track_index, pattern_index, offset, len(records)),
+        records,
+        padding,
+    ))
+    return b"".join((_BUNDLE_HEADER, struct.pack(">i", len(message)), message))
+
+
+class LMMSError(Exception):
+    """Raised when LMMS reports an error or cannot be reached."""
+
+
+class LMMSTimeoutError(LMMSError):
+    """Raised when LMMS does not answer a request in time."""
+
+
+class _OSCProtocol(asyncio.DatagramProtocol):
+    """Datagram protocol that forwards everything to the owning interface."""
+
+    def __init__(self, interface: "LMMSInterface"):
+        self._interface = interface
+
+    def pause_writing(self):
+        self._interface._writable.clear()
+
+    def resume_writing(self):
+        self._interface._writable.set()
+
+    def datagram_received(self, data: bytes, addr: Tuple[str, int]):
+        self._interface._handle_datagram(data)
+
+    def error_received(self, exc: Exception):
+        logger.warning(f"OSC transport error: {exc}")
+
+    def connection_lost(self, exc: Optional[Exception]):
+        self._interface._handle_connection_lost(exc)
 
 
 class LMMSInterface:
     """Interface for communicating with LMMS via OSC."""
-    
-    def __init__(self, host: str = "127.0.0.1", port: int = 9000):
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 9000,
+                 timeout: float = DEFAULT_TIMEOUT, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+                 max_datagram_size: int = DEFAULT_MAX_DATAGRAM_SIZE,
+                 max_bulk_in_flight: int = DEFAULT_MAX_BULK_IN_FLIGHT, recorder: Optional["WireRecorder"] = None):
         """
         Initialize the LMMS interface.
-        
+
         Args:
             host: The hostname where LMMS is running
             port: The OSC port that LMMS listens on
+            timeout: Default number of seconds to wait for a reply
+            max_in_flight: Maximum number of requests awaiting a reply at once
+            max_datagram_size: Upper bound in bytes for bulk note datagrams
+            max_bulk_in_flight: Maximum number of bulk requests (note bundles,
+                                instrument loads) awaiting a reply at once
+            recorder: Appends every datagram sent and received to a wire log
         """
         self.host = host
         self.port = port
-    
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight
+        self.max_datagram_size = max_datagram_size
+        self._transport: Optional[asyncio.DatagramTransport] = None
+        self._start_lock: Optional[asyncio.Lock] = None
+        self._lanes = LaneScheduler(max_in_flight, max_bulk_in_flight)
+        self._writable: Optional[asyncio.Event] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+        self._listeners: List[NotificationListener] = []
+        self.recorder = recorder
+
+    @property
+    def connected(self) -> bool:
+        """Whether the datagram endpoint is open."""
+        return self._transport is not None and not self._transport.is_closing()
+
+    @property
+    def in_flight(self) -> int:
+        """Number of requests currently awaiting a reply."""
+        return len(self._pending)
+
     async def start_server(self):
         """Start the OSC server for receiving messages from LMMS."""
-        # Stub implementation
-        return None
-    
+        if self.connected:
+            return self._transport
+        if self._start_lock is None:
+            self._start_lock = asyncio.Lock()
+        async with self._start_lock:
+            if not self.connected:
+                loop = asyncio.get_running_loop()
+                self._writable = asyncio.Event()
+                self._writable.set()
+                self._transport, _ = await loop.create_datagram_endpoint(
+                    lambda: _OSCProtocol(self),
+                    remote_addr=(self.host, self.port)
+                )
+                logger.info(f"OSC endpoint open to LMMS at {self.host}:{self.port}")
+        return self._transport
+
+    async def close(self):
+        """Close the OSC endpoint and fail any outstanding requests."""
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+        self._fail_pending(LMMSError("Connection to LMMS closed"))
+
+    def add_listener(self, listener: NotificationListener):
+        """
+        Register a callback for notifications pushed by LMMS.
+
+        Args:
+            listener: Called with the OSC address and arguments of every
+                      message that is not a reply to a request
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: NotificationListener):
+        """Unregister a notification callback."""
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def lane_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Request counts, queueing and round-trip latencies per priority lane."""
+        return self._lanes.snapshot()
+
+    async def request(self, command: str, *args: Any, timeout: Optional[float] = None,
+                      lane: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Send a command to LMMS and wait for its reply.
+
+        Args:
+            command: The command name, sent as ``/lmms/<command>``
+            *args: Positional OSC arguments for the command
+            timeout: Seconds to wait for the reply, defaults to ``self.timeout``
+            lane: Priority lane, defaults to the command's lane
+
+        Returns:
+            The decoded result object from LMMS
+        """
+        return await self._roundtrip(command, lambda request_id: self.build_message(command, request_id, *args),
+                                     timeout, lane)
+
+    async def _roundtrip(self, command: str, encode: Callable[[int], bytes],
+                         timeout: Optional[float] = None, lane: Optional[str] = None) -> Dict[str, Any]:
+        """Send the datagram produced by ``encode(request_id)`` and wait for the matching reply."""
+        await self.start_server()
+        if timeout is None:
+            timeout = self.timeout
+        # Waiting for an in-flight slot counts as LMMS time: it is backpressure from LMMS
+        with lmms_time(command):
+            async with self._lanes.slot(lane or lane_for(command)):
+                request_id = next(self._ids) & 0x7FFFFFFF
+                future = asyncio.get_running_loop().create_future()
+                self._pending[request_id] = future
+                try:
+                    await self._writable.wait()
+                    self._send(encode(request_id))
+                    return await asyncio.wait_for(future, timeout)
+                except asyncio.TimeoutError:
+                    raise LMMSTimeoutError(f"LMMS did not answer '{command}' within {timeout}s") from None
+                finally:
+                    self._pending.pop(request_id, None)
+
+    def notes_per_bundle(self, command: str = "add_notes") -> int:
+        """Number of packed notes that fit into one bulk datagram."""
+        return max(1, (self.max_datagram_size - _note_bundle_overhead(command)) // NOTE_RECORD.size)
+
+    async def send_note_columns(self, track_index: int, pattern_index: int, columns: NoteColumns,
+                                command: str = "add_notes") -> Dict[str, Any]:
+        """
+        Stream a batch of notes to LMMS as size-bounded OSC bundles.
+
+        Every bundle is acknowledged separately. The bulk in-flight cap and the
+        transport's write flow control keep the sender from running ahead of
+        LMMS, so even very large batches only hold ``max_bulk_in_flight``
+        bundles on the wire at a time, and each bundle is scheduled on its own
+        so that higher-priority requests can go between them.
+
+        Args:
+            track_index: The track that owns the pattern
+            pattern_index: The pattern the notes belong to
+            columns: The validated notes
+            command: ``add_notes`` or ``remove_notes``
+
+        Returns:
+            The number of notes sent and bundles used
+        """
+        records = memoryview(columns.to_records())
+        step = self.notes_per_bundle(command) * NOTE_RECORD.size
+
+        def chunk(offset: int) -> Callable[[int], bytes]:
+            data = records[offset:offset + step]
+            return lambda request_id: encode_note_bundle(
+                command, request_id, track_index, pattern_index, offset // NOTE_RECORD.size, data)
+
+        offsets = range(0, len(records), step)
+        await asyncio.gather(*(self._roundtrip(command, chunk(offset)) for offset in offsets))
+        return {"success": True, "notes": len(columns), "bundles": len(offsets)}
+
+    @staticmethod
+    def build_message(command: str, *args: Any) -> bytes:
+        """Encode a command and its arguments as an OSC message datagram."""
+        builder = OscMessageBuilder(ADDRESS_PREFIX + command)
+        for arg in args:
+            builder.add_arg(arg)
+        return builder.build().dgram
+
+    def _send(self, datagram: bytes):
+        if not self.connected:
+            raise LMMSError("Not connected to LMMS")
+        self._transport.sendto(datagram)
+        if self.recorder is not None:
+            self.recorder.sent(datagram)
+
+    def _handle_datagram(self, data: bytes):
+        if self.recorder is not None:
+            self.recorder.received(data)
+        try:
+            packet = OscPacket(data)
+        except ParseError as e:
+            logger.warning(f"Dropping malformed OSC packet from LMMS: {e}")
+            return
+        for timed in packet.messages:
+            message = timed.message
+            if message.address == REPLY_ADDRESS:
+                self._handle_reply(message.params)
+            else:
+                self._notify(message.address, tuple(message.params))
+
+    def _handle_reply(self, params: List[Any]):
+        if len(params) < 2 or not isinstance(params[0], int):
+            logger.warning(f"Dropping malformed reply from LMMS: {params}")
+            return
+        future = self._pending.get(params[0])
+        if future is None or future.done():
+            # Late reply for a request that already timed out
+            return
+        try:
+            result = json.loads(params[1])
+        except (TypeError, ValueError) as e:
+            future.set_exception(LMMSError(f"Invalid reply from LMMS: {e}"))
+            return
+        if isinstance(result, dict) and "error" in result:
+            future.set_exception(LMMSError(result["error"]))
+        else:
+            future.set_result(result)
+
+    def _notify(self, address: str, args: Tuple[Any, ...]):
+        for listener in list(self._listeners):
+            try:
+                listener(address, args)
+            except Exception:
+                logger.exception(f"Notification listener failed for {address}")
+
+    def _handle_connection_lost(self, exc: Optional[Exception]):
+        self._transport = None
+        self._fail_pending(LMMSError(f"Connection to LMMS lost: {exc}"))
+
+    def _fail_pending(self, exc: Exception):
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(exc)
+
     async def get_session_info(self) -> Dict[str, Any]:
         """Get information about the current LMMS session."""
-        return {"tracks": 0, "tempo": 120}
-    
+        return await self.request("get_session_info")
+
     async def get_track_info(self, track_index: int) -> Dict[str, Any]:
         """Get information about a specific track."""
-        return {"name": f"Track {track_index}", "index": track_index}
-    
+        return await self.request("get_track_info", track_index)
+
     async def create_track(self, track_type: str = "instrument", name: str = None) -> Dict[str, Any]:
         """Create a new track."""
-        return {"success": True, "track_index": 0}
-    
+        return await self.request("create_track", track_type, name)
+
     async def set_track_name(self, track_index: int, name: str) -> Dict[str, Any]:
         """Set the name of a track."""
-        return {"success": True}
-    
+        return await self.request("set_track_name", track_index, name)
+
+    async def delete_track(self, track_index: int) -> Dict[str, Any]:
+        """Delete a track."""
+        return await self.request("delete_track", track_index)
+
     async def create_pattern(self, track_index: int, steps: int = 16) -> Dict[str, Any]:
         """Create a new pattern for a track."""
-        return {"success": True, "pattern_index": 0}
-    
-    async def add_notes_to_pattern(self, track_index: int, pattern_index: int, notes: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return await self.request("create_pattern", track_index, steps)
+
+    async def add_notes_to_pattern(self, track_index: int, pattern_index: int,
+                                   notes: Union[List[Dict[str, Any]], NoteColumns]) -> Dict[str, Any]:
         """Add notes to a pattern."""
-        return {"success": True}
-    
+        if not isinstance(notes, NoteColumns):
+            notes = NoteColumns.from_dicts(notes)
+        return await self.send_note_columns(track_index, pattern_index, notes, "add_notes")
+
+    async def remove_notes_from_pattern(self, track_index: int, pattern_index: int,
+                                        notes: Union[List[Dict[str, Any]], NoteColumns]) -> Dict[str, Any]:
+        """Remove notes matching pitch, start and length from a pattern."""
+        if not isinstance(notes, NoteColumns):
+            notes = NoteColumns.from_dicts(notes)
+        return await self.send_note_columns(track_index, pattern_index, notes, "remove_notes")
+
+    async def delete_pattern(self, track_index: int, pattern_index: int) -> Dict[str, Any]:
+        """Delete a pattern from a track."""
+        return await self.request("delete_pattern", track_index, pattern_index)
+
     async def load_instrument(self, track_index: int, instrument_path: str) -> Dict[str, Any]:
         """Load an instrument for a track."""
-        return {"success": True}
-    
+        return await self.request("load_instrument", track_index, instrument_path)
+
     async def set_tempo(self, tempo: float) -> Dict[str, Any]:
         """Set the project tempo in BPM."""
-        return {"success": True}
-    
+        return await self.request("set_tempo", float(tempo))
+
     async def play(self) -> Dict[str, Any]:
         """Start playback."""
-        return {"success": True}
-    
+        return await self.request("play")
+
     async def stop(self) -> Dict[str, Any]:
         """Stop playback."""
-        return {"success": True}
-    
+        return await self.request("stop")
+
     async def new_project(self) -> Dict[str, Any]:
         """Create a new project."""
-        return {"success": True}
-    
+        return await self.request("new_project")
+
     async def save_project(self, path: str = None) -> Dict[str, Any]:
         """Save the current project."""
-        return {"success": True}
-    
+        return await self.request("save_project", path)
+
     async def get_instruments_list(self) -> Dict[str, Any]:
         """Get a list of available instruments."""
-        return {"instruments": []}
-
+        return await self.request("get_instruments_list")
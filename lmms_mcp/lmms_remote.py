@@ -0,0 +1,377 @@
+"""
+Relay between one LMMS instance and any number of MCP servers.
+
+The bridge listens for MCP servers on the client port (9001 by default) and
+talks to LMMS on the port LMMS listens on (9000 by default), so several MCP
+sessions can share one LMMS. Point each server at the bridge with
+``--lmms-port 9001``.
+
+Traffic is shaped on the way through:
+
+* Requests are given fresh correlation ids so ids from different servers
+  cannot collide, and every reply is routed back to the server (and id)
+  that asked.
+* Requests are forwarded in batches, packed into as few OSC bundles as fit in
+  a datagram. The event loop hands over one datagram per iteration, so a
+  batch stays open while every iteration brings a new request, and is
+  forwarded after the first idle iteration (or after a couple of
+  milliseconds under sustained load).
+* Repeated setters within one batch (``set_tempo``, and
+  ``set_track_name`` or ``load_instrument`` for the same track) are merged
+  into a single request carrying the latest value, unless another request in
+  between touches the same resource. Everyone who sent one of the merged
+  requests gets the reply.
+* Notifications from LMMS (anything that is not a reply) are sent to every
+  server that has talked to the bridge recently.
+"""
+
+import argparse
+import asyncio
+import itertools
+import logging
+import struct
+from typing import Dict, Any, List, Optional, Tuple
+
+from pythonosc.osc_message import OscMessage, ParseError
+
+from .batch import BARRIER_TOOLS, resource_access
+from .lmms_interface import ADDRESS_PREFIX, REPLY_ADDRESS, DEFAULT_MAX_DATAGRAM_SIZE, _BUNDLE_HEADER
+
+logger = logging.getLogger(__name__)
+
+# Default settings
+DEFAULT_LISTENING_HOST = "127.0.0.1"
+DEFAULT_LISTENING_PORT = 9000
+DEFAULT_CLIENT_HOST = "127.0.0.1"
+DEFAULT_CLIENT_PORT = 9001
+# Seconds after which an unanswered request is forgotten
+DEFAULT_REPLY_TIMEOUT = 30.0
+# Seconds of silence after which a server stops receiving notifications
+DEFAULT_CLIENT_TIMEOUT = 3600.0
+# Longest a request is held back waiting for more requests to batch with it
+DEFAULT_BATCH_WINDOW = 0.002
+
+_BUNDLE_TAG = b"#bundle\x00"
+
+# LMMS commands whose first argument after the id is a track index
+_TRACK_COMMANDS = {"get_track_info", "set_track_name", "delete_track", "create_pattern", "delete_pattern",
+                   "add_notes", "remove_notes", "load_instrument"}
+
+_KNOWN_COMMANDS = _TRACK_COMMANDS | {"get_session_info", "create_track", "set_tempo", "play", "stop",
+                                     "new_project", "save_project", "get_instruments_list"}
+
+# LMMS command names that differ from the MCP tool names used by batch.resource_access
+_TOOL_NAMES = {"add_notes": "add_notes_to_pattern", "remove_notes": "remove_notes_from_pattern"}
+
+Address = Tuple[str, int]
+
+
+def split_packet(data: bytes) -> List[bytes]:
+    """
+    Split a datagram into its raw OSC messages, flattening nested bundles.
+
+    Raises:
+        ParseError: If a bundle element has a negative or unaligned size or
+                    runs past the end of the datagram
+    """
+    if not data.startswith(_BUNDLE_TAG):
+        return [data]
+    messages = []
+    position = len(_BUNDLE_HEADER)
+    while position < len(data):
+        if position + 4 > len(data):
+            raise ParseError(f"Bundle truncated at byte {position}")
+        size = struct.unpack_from(">i", data, position)[0]
+        if size < 0 or size % 4 or position + 4 + size > len(data):
+            raise ParseError(f"Bundle element at byte {position} has invalid size {size}")
+        messages.extend(split_packet(data[position + 4:position + 4 + size]))
+        position += 4 + size
+    return messages
+
+
+def _split_or_drop(data: bytes, source: str) -> List[bytes]:
+    try:
+        return split_packet(data)
+    except ParseError as e:
+        logger.warning(f"Dropping malformed OSC bundle from {source}: {e}")
+        return []
+
+
+def _id_offset(message: bytes) -> Optional[int]:
+    """Byte offset of the leading int32 argument of a raw OSC message, or None if it has none."""
+    try:
+        typetag = (message.index(b"\x00") + 4) & ~3
+        arguments = (message.index(b"\x00", typetag) + 4) & ~3
+    except ValueError:
+        return None
+    if message[typetag:typetag + 2] != b",i" or arguments + 4 > len(message):
+        return None
+    return arguments
+
+
+def _with_id(message: bytes, offset: int, request_id: int) -> bytes:
+    return message[:offset] + struct.pack(">i", request_id) + message[offset + 4:]
+
+
+def _conflicts(a: List[Tuple[str, bool]], b: List[Tuple[str, bool]]) -> bool:
+    return any(ra == rb and (wa or wb) for ra, wa in a for rb, wb in b)
+
+
+class _Request:
+    """A request waiting to be forwarded, possibly merged from several senders."""
+
+    __slots__ = ("message", "id_offset", "waiters", "accesses")
+
+    def __init__(self, message: bytes, id_offset: Optional[int], accesses: List[Tuple[str, bool]]):
+        self.message = message
+        self.id_offset = id_offset
+        self.waiters: List[Tuple[Address, int]] = []
+        self.accesses = accesses
+
+
+class _Endpoint(asyncio.DatagramProtocol):
+    def __init__(self, handler):
+        self._handler = handler
+
+    def datagram_received(self, data: bytes, addr: Address):
+        self._handler(data, addr)
+
+    def error_received(self, exc: Exception):
+        logger.warning(f"Bridge transport error: {exc}")
+
+
+class LMMSRemoteScript:
+    """Coalescing OSC relay between MCP servers and LMMS."""
+
+    def __init__(self, listening_host: str = DEFAULT_LISTENING_HOST, listening_port: int = DEFAULT_LISTENING_PORT,
+                 client_host: str = DEFAULT_CLIENT_HOST, client_port: int = DEFAULT_CLIENT_PORT,
+                 max_datagram_size: int = DEFAULT_MAX_DATAGRAM_SIZE,
+                 reply_timeout: float = DEFAULT_REPLY_TIMEOUT, client_timeout: float = DEFAULT_CLIENT_TIMEOUT,
+                 batch_window: float = DEFAULT_BATCH_WINDOW):
+        """
+        Initialize the bridge.
+
+        Args:
+            listening_host: Host LMMS listens on
+            listening_port: Port LMMS listens on
+            client_host: Host to accept MCP servers on
+            client_port: Port to accept MCP servers on
+            max_datagram_size: Upper bound in bytes for datagrams packed by the bridge
+            reply_timeout: Seconds to remember a forwarded request awaiting its reply
+            client_timeout: Seconds after a server's last request that it stops getting notifications
+            batch_window: Longest time in seconds a request waits for others to batch with
+        """
+        self.listening_host = listening_host
+        self.listening_port = listening_port
+        self.client_host = client_host
+        self.client_port = client_port
+        self.max_datagram_size = max_datagram_size
+        self.reply_timeout = reply_timeout
+        self.client_timeout = client_timeout
+        self.batch_window = batch_window
+        self.stats = {"requests": 0, "coalesced": 0, "forwarded": 0, "datagrams": 0, "replies": 0,
+                      "notifications": 0}
+        self._lmms: Optional[asyncio.DatagramTransport] = None
+        self._clients_transport: Optional[asyncio.DatagramTransport] = None
+        self._clients: Dict[Address, float] = {}
+        self._ids = itertools.count(1)
+        self._waiting: Dict[int, List[Tuple[Address, int]]] = {}
+        self._outbound: List[_Request] = []
+        self._mergeable: Dict[Tuple[Any, ...], _Request] = {}
+        self._flush_scheduled = False
+        self._batch_opened = 0.0
+        self._arrived = 0
+        self._arrived_at_check = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def client_address(self) -> Optional[Address]:
+        """Address the bridge accepts MCP servers on, once started."""
+        if self._clients_transport is None:
+            return None
+        return self._clients_transport.get_extra_info("sockname")[:2]
+
+    async def start(self):
+        """Open the endpoints towards LMMS and towards the MCP servers."""
+        self._loop = asyncio.get_running_loop()
+        self._lmms, _ = await self._loop.create_datagram_endpoint(
+            lambda: _Endpoint(self._from_lmms), remote_addr=(self.listening_host, self.listening_port))
+        self._clients_transport, _ = await self._loop.create_datagram_endpoint(
+            lambda: _Endpoint(self._from_client), local_addr=(self.client_host, self.client_port))
+        logger.info(f"Relaying {self.client_host}:{self.client_port} to LMMS at "
+                    f"{self.listening_host}:{self.listening_port}")
+
+    async def run(self):
+        """Start the bridge and relay until cancelled."""
+        await self.start()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            self.close()
+
+    def close(self):
+        """Close both endpoints."""
+        for transport in (self._lmms, self._clients_transport):
+            if transport is not None:
+                transport.close()
+        self._lmms = self._clients_transport = None
+
+    # From MCP servers to LMMS
+
+    def _from_client(self, data: bytes, addr: Address):
+        self._clients[addr] = self._loop.time()
+        for raw in _split_or_drop(data, str(addr)):
+            try:
+                message = OscMessage(raw)
+            except ParseError as e:
+                logger.warning(f"Dropping malformed OSC message from {addr}: {e}")
+                continue
+            if not message.address.startswith(ADDRESS_PREFIX):
+                continue
+            self._enqueue(message.address[len(ADDRESS_PREFIX):], raw, message.params, addr)
+
+    def _enqueue(self, command: str, raw: bytes, params: List[Any], addr: Address):
+        self.stats["requests"] += 1
+        self._arrived += 1
+        id_offset = _id_offset(raw)
+        key = self._merge_key(command, params) if id_offset is not None else None
+        pending = self._mergeable.get(key) if key is not None else None
+        if pending is not None:
+            # A later value for the same setter replaces the queued one
+            pending.message = raw
+            pending.id_offset = id_offset
+            pending.waiters.append((addr, params[0]))
+            self.stats["coalesced"] += 1
+            return
+
+        if command not in _KNOWN_COMMANDS or _TOOL_NAMES.get(command, command) in BARRIER_TOOLS:
+            accesses = None
+            self._mergeable.clear()
+        else:
+            args = {"track_index": params[1]} if command in _TRACK_COMMANDS and len(params) > 1 else {}
+            accesses = resource_access(_TOOL_NAMES.get(command, command), args)
+            # A setter cannot absorb a later one across a request touching the same resource
+            for merge_key, queued in list(self._mergeable.items()):
+                if _conflicts(queued.accesses, accesses):
+                    del self._mergeable[merge_key]
+
+        request = _Request(raw, id_offset, accesses or [])
+        if id_offset is not None:
+            request.waiters.append((addr, params[0]))
+        self._outbound.append(request)
+        if key is not None:
+            self._mergeable[key] = request
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            self._batch_opened = self._loop.time()
+            # Datagrams are read after ready callbacks within an iteration, so the first
+            # check always waits one more iteration
+            self._arrived_at_check = -1
+            self._loop.call_soon(self._flush)
+
+    @staticmethod
+    def _merge_key(command: str, params: List[Any]) -> Optional[Tuple[Any, ...]]:
+        if command == "set_tempo" and len(params) == 2:
+            return (command,)
+        if command in ("set_track_name", "load_instrument") and len(params) == 3:
+            return (command, params[1])
+        return None
+
+    def _flush(self):
+        """Forward the open batch once an iteration passes without new requests."""
+        if self._arrived != self._arrived_at_check and self._loop.time() - self._batch_opened < self.batch_window:
+            self._arrived_at_check = self._arrived
+            self._loop.call_soon(self._flush)
+            return
+        self._flush_scheduled = False
+        outbound, self._outbound = self._outbound, []
+        self._mergeable.clear()
+        if self._lmms is None:
+            return
+        messages = []
+        for request in outbound:
+            message = request.message
+            if request.waiters:
+                request_id = next(self._ids) & 0x7FFFFFFF
+                self._waiting[request_id] = request.waiters
+                self._loop.call_later(self.reply_timeout, self._waiting.pop, request_id, None)
+                message = _with_id(message, request.id_offset, request_id)
+            messages.append(message)
+        self.stats["forwarded"] += len(messages)
+
+        batch: List[bytes] = []
+        size = len(_BUNDLE_HEADER)
+        for message in messages:
+            if batch and size + 4 + len(message) > self.max_datagram_size:
+                self._send_batch(batch)
+                batch, size = [], len(_BUNDLE_HEADER)
+            batch.append(message)
+            size += 4 + len(message)
+        if batch:
+            self._send_batch(batch)
+
+    def _send_batch(self, messages: List[bytes]):
+        if len(messages) == 1:
+            datagram = messages[0]
+        else:
+            datagram = _BUNDLE_HEADER + b"".join(struct.pack(">i", len(m)) + m for m in messages)
+        self._lmms.sendto(datagram)
+        self.stats["datagrams"] += 1
+
+    # From LMMS to MCP servers
+
+    def _from_lmms(self, data: bytes, addr: Address):
+        if self._clients_transport is None:
+            return
+        for raw in _split_or_drop(data, "LMMS"):
+            end = raw.find(b"\x00")
+            if raw[:end] == REPLY_ADDRESS.encode():
+                self._route_reply(raw)
+            else:
+                self._broadcast(raw)
+
+    def _route_reply(self, raw: bytes):
+        offset = _id_offset(raw)
+        if offset is None:
+            logger.warning("Dropping LMMS reply without a correlation id")
+            return
+        waiters = self._waiting.pop(struct.unpack_from(">i", raw, offset)[0], None)
+        if waiters is None:
+            # Late reply for a request that has been forgotten
+            return
+        for addr, request_id in waiters:
+            self._clients_transport.sendto(_with_id(raw, offset, request_id), addr)
+            self.stats["replies"] += 1
+
+    def _broadcast(self, raw: bytes):
+        cutoff = self._loop.time() - self.client_timeout
+        for addr, last_seen in list(self._clients.items()):
+            if last_seen < cutoff:
+                del self._clients[addr]
+                continue
+            self._clients_transport.sendto(raw, addr)
+            self.stats["notifications"] += 1
+
+
+def main():
+    """Run the bridge from the command line."""
+    parser = argparse.ArgumentParser(description="Relay between MCP servers and one LMMS instance")
+    parser.add_argument("--listening-host", default=DEFAULT_LISTENING_HOST, help="Host LMMS listens on")
+    parser.add_argument("--listening-port", type=int, default=DEFAULT_LISTENING_PORT, help="Port LMMS listens on")
+    parser.add_argument("--client-host", default=DEFAULT_CLIENT_HOST, help="Host to accept MCP servers on")
+    parser.add_argument("--client-port", type=int, default=DEFAULT_CLIENT_PORT, help="Port to accept MCP servers on")
+    parser.add_argument("--max-datagram-size", type=int, default=DEFAULT_MAX_DATAGRAM_SIZE,
+                        help="Largest datagram the bridge packs")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    bridge = LMMSRemoteScript(args.listening_host, args.listening_port, args.client_host, args.client_port,
+                              args.max_datagram_size)
+    try:
+        asyncio.run(bridge.run())
+    except KeyboardInterrupt:
+        logger.info("Bridge stopped by user")
+
+
+if __name__ == "__main__":
+    main()
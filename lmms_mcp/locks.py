@@ -0,0 +1,179 @@
+"""
+Project, track and pattern locks for concurrent tool calls.
+
+Several MCP clients (or one client's concurrent requests) may edit the same
+LMMS project at once. :class:`ProjectLocks` gives every project a hierarchy of
+reader/writer locks:
+
+* the project: held exclusively by structural operations that renumber
+  tracks or replace the project (``delete_track``, ``new_project``,
+  ``save_project``, ``restore_snapshot``) and shared by everything else
+* one lock per track: held exclusively by changes to the track itself or to
+  its list of patterns (renames, instruments, creating and deleting
+  patterns) and shared by note edits
+* one lock per pattern: held exclusively by note edits, which read the
+  pattern's last-known notes and write them back
+
+Locks are always taken from the project down, so two operations cannot wait
+for each other, and edits of different tracks or patterns run in parallel.
+Waiters are served first come, first served, so a structural operation is
+not starved by a stream of note edits.
+
+Holding a lock covers everything beneath it, and locks already held by the
+current task are not taken again: a tool that calls other tools while it
+holds the project lock, such as ``restore_snapshot``, runs them under its
+own lock. Tasks started while a lock is held count as holding it too, since
+they inherit the context; they must be awaited before the lock is released.
+"""
+
+import asyncio
+import contextvars
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, FrozenSet, List, Tuple
+
+PROJECT = ("project",)
+
+Key = Tuple[Any, ...]
+
+# Locks held by the current task, with whether each is held exclusively
+_held: "contextvars.ContextVar[FrozenSet[Tuple[Key, bool]]]" = contextvars.ContextVar("held_locks",
+                                                                                     default=frozenset())
+
+
+class _RWLock:
+    """A first come, first served reader/writer lock."""
+
+    __slots__ = ("readers", "writer", "_waiters")
+
+    def __init__(self):
+        self.readers = 0
+        self.writer = False
+        self._waiters: Deque[Tuple[bool, asyncio.Future]] = deque()
+
+    @property
+    def idle(self) -> bool:
+        """Whether the lock is neither held nor awaited."""
+        return not self.writer and not self.readers and not self._waiters
+
+    def _can_take(self, exclusive: bool) -> bool:
+        return not self.writer and (not exclusive or not self.readers)
+
+    def _take(self, exclusive: bool):
+        if exclusive:
+            self.writer = True
+        else:
+            self.readers += 1
+
+    def _wake(self):
+        while self._waiters:
+            exclusive, waiter = self._waiters[0]
+            if waiter.done():
+                self._waiters.popleft()
+                continue
+            if not self._can_take(exclusive):
+                return
+            self._waiters.popleft()
+            # Taken on the waiter's behalf, so nobody can jump in before it runs
+            self._take(exclusive)
+            waiter.set_result(None)
+
+    async def acquire(self, exclusive: bool) -> bool:
+        """Take the lock; returns whether the caller had to wait."""
+        if not self._waiters and self._can_take(exclusive):
+            self._take(exclusive)
+            return False
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append((exclusive, waiter))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted just before the cancellation arrived
+                self.release(exclusive)
+            else:
+                waiter.cancel()
+                self._wake()
+            raise
+        return True
+
+    def release(self, exclusive: bool):
+        """Give the lock up and let the next waiters in."""
+        if exclusive:
+            self.writer = False
+        else:
+            self.readers -= 1
+        self._wake()
+
+
+class ProjectLocks:
+    """Project, track and pattern locks of one LMMS project."""
+
+    def __init__(self):
+        """Initialize with no locks held."""
+        self._locks: Dict[Key, _RWLock] = {}
+        self.acquired = 0
+        self.contended = 0
+
+    def _covered(self, held: FrozenSet[Tuple[Key, bool]], path: List[Key], exclusive: bool) -> bool:
+        """Whether the current task already holds ``path[-1]`` strongly enough."""
+        key = path[-1]
+        if any((ancestor, True) in held for ancestor in path[:-1]):
+            return True
+        if (key, True) in held:
+            return True
+        if (key, False) in held:
+            if exclusive:
+                raise RuntimeError(f"Cannot take an exclusive {key[0]} lock while holding it shared")
+            return True
+        return False
+
+    @asynccontextmanager
+    async def _hold(self, path: List[Key], exclusive: bool) -> AsyncIterator[None]:
+        """Hold every lock along ``path`` shared and the last one as requested."""
+        held = _held.get()
+        taken: List[Tuple[Key, bool]] = []
+        try:
+            for depth, key in enumerate(path):
+                mode = exclusive if depth == len(path) - 1 else False
+                if self._covered(held, path[:depth + 1], mode):
+                    continue
+                lock = self._locks.get(key)
+                if lock is None:
+                    lock = self._locks[key] = _RWLock()
+                self.acquired += 1
+                try:
+                    if await lock.acquire(mode):
+                        self.contended += 1
+                except asyncio.CancelledError:
+                    if lock.idle:
+                        del self._locks[key]
+                    raise
+                taken.append((key, mode))
+            token = _held.set(held.union(taken))
+            try:
+                yield
+            finally:
+                _held.reset(token)
+        finally:
+            for key, mode in reversed(taken):
+                lock = self._locks[key]
+                lock.release(mode)
+                if lock.idle:
+                    del self._locks[key]
+
+    def project(self, exclusive: bool = True):
+        """Hold the whole project, exclusively for structural changes."""
+        return self._hold([PROJECT], exclusive)
+
+    def track(self, track_index: int, exclusive: bool = True):
+        """Hold one track, sharing the project."""
+        return self._hold([PROJECT, ("track", track_index)], exclusive)
+
+    def pattern(self, track_index: int, pattern_index: int):
+        """Hold one pattern exclusively, sharing its track and the project."""
+        return self._hold([PROJECT, ("track", track_index), ("pattern", track_index, pattern_index)], True)
+
+    def stats(self) -> Dict[str, int]:
+        """Locks taken, how many of them had to wait, and locks currently held or awaited."""
+        return {"acquired": self.acquired, "contended": self.contended, "active": len(self._locks)}
@@ -0,0 +1,259 @@
+"""
+Per-tool metrics and tracing hooks for the MCP server.
+
+Every registered tool is wrapped so that each call records a call count, an
+error count, an in-flight gauge and three latency histograms:
+
+* ``handler``: time spent in the tool function
+* ``lmms``: the part of ``handler`` spent waiting for LMMS replies
+* ``framing``: time spent by the MCP framework around the tool function
+  (argument validation and result conversion)
+
+Time waiting for LMMS is measured by :func:`lmms_time`, which
+:class:`~lmms_mcp.lmms_interface.LMMSInterface` enters around every round
+trip. Concurrent round trips made by one tool call (for example the bundles
+of a large note upload) are counted once, so ``lmms`` never exceeds
+``handler``.
+
+If OpenTelemetry is installed every tool call becomes a span and every LMMS
+round trip a span event; otherwise tracing costs nothing.
+"""
+
+import contextvars
+import functools
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Any, Callable, Iterator, List, Optional, Tuple
+
+try:
+    from opentelemetry import trace
+except ImportError:
+    trace = None
+
+# Upper bounds of the latency histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Recent handler latencies kept per tool for percentile estimates
+DEFAULT_RECENT = 1024
+
+PHASES = ("handler", "lmms", "framing")
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _CallClock:
+    """Time accounting for one tool call, shared with the tasks it spawns."""
+
+    __slots__ = ("active", "since", "lmms", "handler")
+
+    def __init__(self):
+        self.active = 0
+        self.since = 0.0
+        self.lmms = 0.0
+        self.handler: Optional[float] = None
+
+
+_current_call: "contextvars.ContextVar[Optional[_CallClock]]" = contextvars.ContextVar("lmms_mcp_call", default=None)
+
+
+@contextmanager
+def lmms_time(command: str) -> Iterator[None]:
+    """
+    Attribute the enclosed wait to LMMS for the current tool call.
+
+    Args:
+        command: The LMMS command, recorded on the tracing span event
+    """
+    clock = _current_call.get()
+    if trace is not None:
+        trace.get_current_span().add_event("lmms.request", {"lmms.command": command})
+    if clock is None:
+        yield
+        return
+    if clock.active == 0:
+        clock.since = time.perf_counter()
+    clock.active += 1
+    try:
+        yield
+    finally:
+        clock.active -= 1
+        if clock.active == 0:
+            clock.lmms += time.perf_counter() - clock.since
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus style."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        """Record one sample in seconds."""
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """``(le, count)`` pairs including the ``+Inf`` bucket."""
+        pairs = []
+        running = 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            pairs.append((repr(bound), running))
+        pairs.append(("+Inf", self.count))
+        return pairs
+
+
+class ToolStats:
+    """Counters and histograms for one tool."""
+
+    __slots__ = ("calls", "errors", "in_flight", "histograms", "recent")
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, recent: int = DEFAULT_RECENT):
+        self.calls = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.histograms = {phase: Histogram(buckets) for phase in PHASES}
+        self.recent: deque = deque(maxlen=recent)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Describe the tool's statistics, latencies in milliseconds."""
+        result: Dict[str, Any] = {"calls": self.calls, "errors": self.errors, "in_flight": self.in_flight}
+        for phase, histogram in self.histograms.items():
+            result[f"{phase}_mean_ms"] = round(histogram.sum / histogram.count * 1000, 3) if histogram.count else None
+        if self.recent:
+            ordered = sorted(self.recent)
+            for q in (50, 95, 99):
+                result[f"handler_p{q}_ms"] = round(ordered[min(len(ordered) - 1, len(ordered) * q // 100)] * 1000, 3)
+        return result
+
+
+class ServerMetrics:
+    """Metrics for every tool of one MCP server."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        Initialize empty metrics.
+
+        Args:
+            buckets: Upper bounds of the latency histogram buckets in seconds
+        """
+        self.buckets = buckets
+        self.started = time.time()
+        self.tools: Dict[str, ToolStats] = {}
+        self._tracer = trace.get_tracer("lmms_mcp") if trace is not None else None
+
+    def _stats(self, name: str) -> ToolStats:
+        stats = self.tools.get(name)
+        if stats is None:
+            stats = self.tools[name] = ToolStats(self.buckets)
+        return stats
+
+    def instrument(self, name: str, fn: Callable) -> Callable:
+        """
+        Wrap a tool coroutine function so that its calls are measured.
+
+        The wrapper keeps the signature and docstring of ``fn``, so the MCP
+        framework derives the same schema from it.
+        """
+        stats = self._stats(name)
+        tracer = self._tracer
+
+        @functools.wraps(fn)
+        async def measured(*args, **kwargs):
+            # Reuse the clock set up by framing() if the framework called us
+            clock = _current_call.get()
+            token = None
+            if clock is None or clock.handler is not None:
+                clock = _CallClock()
+                token = _current_call.set(clock)
+            stats.calls += 1
+            stats.in_flight += 1
+            started = time.perf_counter()
+            with (tracer.start_as_current_span(f"tool/{name}") if tracer is not None else nullcontext()) as span:
+                try:
+                    return await fn(*args, **kwargs)
+                except BaseException:
+                    stats.errors += 1
+                    raise
+                finally:
+                    elapsed = time.perf_counter() - started
+                    stats.in_flight -= 1
+                    stats.histograms["handler"].observe(elapsed)
+                    stats.histograms["lmms"].observe(clock.lmms)
+                    stats.recent.append(elapsed)
+                    clock.handler = elapsed
+                    if span is not None:
+                        span.set_attribute("lmms.seconds", clock.lmms)
+                    if token is not None:
+                        _current_call.reset(token)
+
+        return measured
+
+    @contextmanager
+    def framing(self, name: str) -> Iterator[None]:
+        """
+        Measure one complete tool call as made by the MCP framework.
+
+        The time not spent inside the instrumented tool function is recorded
+        as the ``framing`` phase of that tool.
+        """
+        clock = _CallClock()
+        token = _current_call.set(clock)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            _current_call.reset(token)
+            stats = self.tools.get(name)
+            if stats is not None and clock.handler is not None:
+                stats.histograms["framing"].observe(max(0.0, time.perf_counter() - started - clock.handler))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Describe all tool statistics."""
+        return {
+            "uptime_seconds": round(time.time() - self.started, 3),
+            "tracing": self._tracer is not None,
+            "tools": {name: stats.snapshot() for name, stats in sorted(self.tools.items())},
+        }
+
+    def render_prometheus(self, gauges: Optional[Dict[str, Tuple[str, float]]] = None) -> str:
+        """
+        Render the metrics in the Prometheus text exposition format.
+
+        Args:
+            gauges: Extra gauges as ``{name: (help, value)}``
+        """
+        lines = [
+            "# HELP lmms_mcp_tool_calls_total Tool calls started.",
+            "# TYPE lmms_mcp_tool_calls_total counter",
+        ]
+        tools = sorted(self.tools.items())
+        lines += [f'lmms_mcp_tool_calls_total{{tool="{name}"}} {s.calls}' for name, s in tools]
+        lines += ["# HELP lmms_mcp_tool_errors_total Tool calls that raised.",
+                  "# TYPE lmms_mcp_tool_errors_total counter"]
+        lines += [f'lmms_mcp_tool_errors_total{{tool="{name}"}} {s.errors}' for name, s in tools]
+        lines += ["# HELP lmms_mcp_tool_in_flight Tool calls currently running.",
+                  "# TYPE lmms_mcp_tool_in_flight gauge"]
+        lines += [f'lmms_mcp_tool_in_flight{{tool="{name}"}} {s.in_flight}' for name, s in tools]
+        lines += ["# HELP lmms_mcp_tool_duration_seconds Tool call latency by phase (handler, lmms, framing).",
+                  "# TYPE lmms_mcp_tool_duration_seconds histogram"]
+        for name, stats in tools:
+            for phase, histogram in stats.histograms.items():
+                labels = f'tool="{name}",phase="{phase}"'
+                lines += [f'lmms_mcp_tool_duration_seconds_bucket{{{labels},le="{le}"}} {count}'
+                          for le, count in histogram.cumulative()]
+                lines.append(f"lmms_mcp_tool_duration_seconds_sum{{{labels}}} {histogram.sum!r}")
+                lines.append(f"lmms_mcp_tool_duration_seconds_count{{{labels}}} {histogram.count}")
+        for name, (help_text, value) in sorted((gauges or {}).items()):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
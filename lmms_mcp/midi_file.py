@@ -0,0 +1,473 @@
+"""
+Streaming Standard MIDI File (SMF) reading and writing.
+
+Reading never loads a whole file. The header is read first, then one track
+chunk at a time; the events of a chunk are decoded one by one by
+:func:`iter_track_events`, note-ons are paired with their note-offs, and the
+track's notes are handed over as one :class:`~lmms_mcp.pattern.Pattern` per
+MIDI channel before the next chunk is read. Memory use is bounded by the
+largest single track rather than by the size of the file.
+
+Writing is streamed the same way: :class:`MidiWriter` writes the header up
+front, encodes each track's events into the file as it goes, and fills in
+the chunk length and the track count afterwards, so only the track being
+written is held in memory.
+
+Formats 0 and 1 with a ticks-per-quarter-note division are supported. Times
+are converted to LMMS ticks (:data:`~lmms_mcp.notes.TICKS_PER_BEAT` per
+quarter note); files written here use that resolution as their division, so
+exporting and importing again is lossless.
+"""
+
+import struct
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .notes import NoteColumns, TICKS_PER_BEAT, np
+from .pattern import Pattern
+from .project_file import open_project
+
+# Bytes of encoded events buffered before a write while exporting
+DEFAULT_WRITE_CHUNK = 64 * 1024
+
+DEFAULT_TEMPO = 120.0
+
+# LMMS pattern steps are sixteenth notes, created in whole bars
+STEP_TICKS = TICKS_PER_BEAT // 4
+STEPS_PER_BAR = 16
+
+# MIDI channel 10, numbered from 0, is reserved for drums in General MIDI
+DRUM_CHANNEL = 9
+
+_HEADER = struct.Struct(">4sI")
+_FILE_HEADER = struct.Struct(">HHH")
+
+META_TRACK_NAME = 0x03
+META_END_OF_TRACK = 0x2F
+META_TEMPO = 0x51
+
+# Data bytes following each channel message status, by high nibble
+_DATA_BYTES = {0x80: 2, 0x90: 2, 0xA0: 2, 0xB0: 2, 0xC0: 1, 0xD0: 1, 0xE0: 2}
+
+
+class MidiFileError(Exception):
+    """Raised when a file is not a readable Standard MIDI File."""
+
+
+def _read_varlen(data: bytes, offset: int) -> Tuple[int, int]:
+    """Decode a variable-length quantity, returning it and the offset after it."""
+    value = 0
+    for _ in range(4):
+        byte = data[offset]
+        offset += 1
+        value = (value << 7) | (byte & 0x7F)
+        if byte < 0x80:
+            return value, offset
+    raise MidiFileError("Variable-length quantity longer than 4 bytes")
+
+
+def _varlen(value: int) -> bytes:
+    """Encode a variable-length quantity."""
+    out = bytearray([value & 0x7F])
+    value >>= 7
+    while value:
+        out.append(0x80 | (value & 0x7F))
+        value >>= 7
+    out.reverse()
+    return bytes(out)
+
+
+def iter_track_events(data: bytes) -> Iterator[Tuple[int, int, Any, Any]]:
+    """
+    Decode the events of one track chunk, one at a time.
+
+    Yields ``(tick, status, a, b)`` with the absolute tick of the event. For
+    channel messages ``status`` is the status byte (running status already
+    resolved) and ``a``/``b`` its data bytes (``b`` is None for one-byte
+    messages); for meta events ``status`` is 0xFF, ``a`` the meta type and
+    ``b`` the payload; for system exclusive messages ``status`` is 0xF0 or
+    0xF7 and ``b`` the payload.
+
+    Raises:
+        MidiFileError: If the chunk is truncated or malformed
+    """
+    offset = 0
+    end = len(data)
+    tick = 0
+    running = 0
+    try:
+        while offset < end:
+            delta, offset = _read_varlen(data, offset)
+            tick += delta
+            status = data[offset]
+            if status < 0x80:
+                # Running status: the previous status byte is reused
+                if not running:
+                    raise MidiFileError(f"Data byte without a status at offset {offset}")
+                status = running
+            else:
+                offset += 1
+            if status < 0xF0:
+                running = status
+                if _DATA_BYTES[status & 0xF0] == 2:
+                    yield tick, status, data[offset], data[offset + 1]
+                    offset += 2
+                else:
+                    yield tick, status, data[offset], None
+                    offset += 1
+            elif status == 0xFF:
+                # Meta and system exclusive events cancel running status
+                running = 0
+                kind = data[offset]
+                size, offset = _read_varlen(data, offset + 1)
+                yield tick, status, kind, data[offset:offset + size]
+                offset += size
+                if kind == META_END_OF_TRACK:
+                    return
+            elif status in (0xF0, 0xF7):
+                running = 0
+                size, offset = _read_varlen(data, offset)
+                yield tick, status, None, data[offset:offset + size]
+                offset += size
+            else:
+                raise MidiFileError(f"Unexpected status byte 0x{status:02X} at offset {offset - 1}")
+    except IndexError:
+        raise MidiFileError("Track chunk ends in the middle of an event") from None
+
+
+class MidiPart:
+    """The notes of one channel of one MIDI track, in LMMS ticks."""
+
+    __slots__ = ("track", "channel", "name", "program", "notes")
+
+    def __init__(self, track: int, channel: int, name: str, program: Optional[int], notes: Pattern):
+        self.track = track
+        self.channel = channel
+        self.name = name
+        self.program = program
+        self.notes = notes
+
+    @property
+    def end(self) -> int:
+        """Tick at which the last note ends."""
+        if not len(self.notes):
+            return 0
+        if np is not None:
+            return int((self.notes.start.astype(np.int64) + self.notes.length).max())
+        return max(s + l for s, l in zip(self.notes.start, self.notes.length))
+
+    @property
+    def steps(self) -> int:
+        """Pattern steps covering every note, in whole bars."""
+        bars = -(-self.end // (STEP_TICKS * STEPS_PER_BAR))
+        return max(1, bars) * STEPS_PER_BAR
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Describe the part without its notes."""
+        return {"track": self.track, "channel": self.channel, "name": self.name, "program": self.program,
+                "drums": self.channel == DRUM_CHANNEL, "notes": len(self.notes)}
+
+
+class MidiTrack:
+    """One decoded track chunk: its name, tempo changes and per-channel parts."""
+
+    __slots__ = ("index", "name", "events", "tempo", "parts")
+
+    def __init__(self, index: int):
+        self.index = index
+        self.name = ""
+        self.events = 0
+        self.tempo: Optional[float] = None
+        self.parts: List[MidiPart] = []
+
+
+class MidiReader:
+    """Reads a Standard MIDI File one track at a time."""
+
+    def __init__(self, path: str):
+        """
+        Open a MIDI file and read its header.
+
+        Args:
+            path: Path to a ``.mid`` file
+
+        Raises:
+            MidiFileError: If the file is not a supported Standard MIDI File
+        """
+        self.path = path
+        self._file: BinaryIO = open(path, "rb")
+        try:
+            kind, size = self._chunk_header()
+            if kind != b"MThd" or size < _FILE_HEADER.size:
+                raise MidiFileError(f"{path} is not a Standard MIDI File")
+            header = self._file.read(size)
+            self.format, self.track_count, division = _FILE_HEADER.unpack_from(header)
+        except BaseException:
+            self._file.close()
+            raise
+        if division & 0x8000:
+            self._file.close()
+            raise MidiFileError(f"{path} uses SMPTE time, which is not supported")
+        if self.format not in (0, 1):
+            self._file.close()
+            raise MidiFileError(f"{path} is a format {self.format} file; only formats 0 and 1 are supported")
+        self.division = division or TICKS_PER_BEAT
+
+    def _chunk_header(self) -> Tuple[bytes, int]:
+        header = self._file.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            return b"", 0
+        return _HEADER.unpack(header)
+
+    def close(self):
+        """Close the file."""
+        self._file.close()
+
+    def __enter__(self) -> "MidiReader":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _ticks(self, ticks: int) -> int:
+        return (ticks * TICKS_PER_BEAT + self.division // 2) // self.division
+
+    def _decode(self, index: int, data: bytes) -> MidiTrack:
+        """Pair note-ons with note-offs per channel and build the track's parts."""
+        track = MidiTrack(index)
+        # Per channel: pitch, velocity, start and end columns, and open notes by pitch
+        columns: Dict[int, Tuple[List[int], List[int], List[int], List[int]]] = {}
+        sounding: Dict[Tuple[int, int], List[int]] = {}
+        programs: Dict[int, int] = {}
+        last_tick = 0
+        events = 0
+        for tick, status, a, b in iter_track_events(data):
+            events += 1
+            last_tick = tick
+            kind = status & 0xF0
+            if kind == 0x90 and b:
+                channel = status & 0x0F
+                notes = columns.get(channel)
+                if notes is None:
+                    notes = columns[channel] = ([], [], [], [])
+                sounding.setdefault((channel, a), []).append(len(notes[0]))
+                notes[0].append(a)
+                notes[1].append(b)
+                notes[2].append(tick)
+                notes[3].append(-1)
+            elif kind == 0x80 or kind == 0x90:
+                channel = status & 0x0F
+                # Note-offs end the earliest sounding note of the same pitch
+                opened = sounding.get((channel, a))
+                if opened:
+                    columns[channel][3][opened.pop(0)] = tick
+            elif kind == 0xC0:
+                programs.setdefault(status & 0x0F, a)
+            elif status == 0xFF:
+                if a == META_TRACK_NAME and not track.name:
+                    track.name = b.decode("latin-1").strip()
+                elif a == META_TEMPO and len(b) == 3 and track.tempo is None:
+                    microseconds = int.from_bytes(b, "big")
+                    if microseconds:
+                        track.tempo = round(60_000_000 / microseconds, 3)
+        track.events = events
+        for channel in sorted(columns):
+            pitch, velocity, start, end = columns[channel]
+            # Notes never switched off last until the end of the track
+            end = [last_tick if e < 0 else e for e in end]
+            if np is not None:
+                first = (np.asarray(start, dtype=np.int64) * TICKS_PER_BEAT + self.division // 2) // self.division
+                last = (np.asarray(end, dtype=np.int64) * TICKS_PER_BEAT + self.division // 2) // self.division
+                length = np.maximum(last - first, 1)
+            else:
+                first = [self._ticks(s) for s in start]
+                length = [max(self._ticks(e) - s, 1) for s, e in zip(first, end)]
+            name = track.name or f"Track {index + 1}"
+            if len(columns) > 1 or self.format == 0:
+                name = f"{name} ch{channel + 1}"
+            track.parts.append(MidiPart(index, channel, name, programs.get(channel),
+                                        Pattern.from_ticks(pitch, velocity, first, length)))
+        return track
+
+    def tracks(self) -> Iterator[MidiTrack]:
+        """
+        Read and decode the track chunks in order, one at a time.
+
+        Chunks of unknown type are skipped.
+
+        Raises:
+            MidiFileError: If a chunk is truncated or malformed
+        """
+        index = 0
+        while True:
+            kind, size = self._chunk_header()
+            if not kind:
+                return
+            data = self._file.read(size)
+            if len(data) < size:
+                raise MidiFileError(f"{self.path}: track chunk {index} is truncated")
+            if kind != b"MTrk":
+                continue
+            yield self._decode(index, data)
+            index += 1
+
+
+class MidiWriter:
+    """Writes a format 1 Standard MIDI File one track at a time."""
+
+    def __init__(self, path: str, tempo: Optional[float] = None, chunk_size: int = DEFAULT_WRITE_CHUNK):
+        """
+        Create the file and write its header and a tempo track.
+
+        Args:
+            path: Path of the ``.mid`` file to write
+            tempo: Tempo in BPM for the tempo track
+            chunk_size: Bytes of encoded events to buffer before each write
+        """
+        self.path = path
+        self.chunk_size = chunk_size
+        self.track_count = 0
+        self._file: BinaryIO = open(path, "wb")
+        self._file.write(_HEADER.pack(b"MThd", _FILE_HEADER.size) + _FILE_HEADER.pack(1, 0, TICKS_PER_BEAT))
+        microseconds = round(60_000_000 / (tempo or DEFAULT_TEMPO))
+        self._write_chunk([b"\x00\xff\x51\x03" + microseconds.to_bytes(3, "big")])
+
+    def _write_chunk(self, parts) -> int:
+        """Write one MTrk chunk from an iterable of encoded event bytes; return its size."""
+        f = self._file
+        header = f.tell()
+        f.write(_HEADER.pack(b"MTrk", 0))
+        size = 0
+        for part in parts:
+            f.write(part)
+            size += len(part)
+        f.write(b"\x00\xff\x2f\x00")
+        size += 4
+        end = f.tell()
+        f.seek(header)
+        f.write(_HEADER.pack(b"MTrk", size))
+        f.seek(end)
+        self.track_count += 1
+        return size
+
+    def _encode(self, name: str, notes: Pattern, channel: int) -> Iterator[bytes]:
+        """Encode a track's name and notes in time order, ``chunk_size`` bytes at a time."""
+        encoded = name.encode("latin-1", "replace")
+        out = bytearray(b"\x00\xff\x03" + _varlen(len(encoded)) + encoded)
+        count = len(notes)
+        # Every note becomes a note-on and a note-off; at equal times note-offs go first
+        if np is not None:
+            times = np.concatenate([notes.start.astype(np.int64) + notes.length, notes.start.astype(np.int64)])
+            ons = np.concatenate([np.zeros(count, dtype=np.int8), np.ones(count, dtype=np.int8)])
+            pitch = np.concatenate([notes.pitch, notes.pitch])
+            velocity = np.concatenate([np.zeros(count, dtype=np.uint8), notes.velocity])
+            order = np.lexsort((pitch, ons, times))
+            times, ons, pitch, velocity = times[order], ons[order], pitch[order], velocity[order]
+            deltas = np.diff(times, prepend=0).tolist()
+            events = zip(deltas, ons.tolist(), pitch.tolist(), velocity.tolist())
+        else:
+            starts, lengths = list(notes.start), list(notes.length)
+            merged = sorted([(s + l, 0, p, 0) for s, l, p in zip(starts, lengths, notes.pitch)]
+                            + [(s, 1, p, v) for s, p, v in zip(starts, notes.pitch, notes.velocity)])
+            previous = 0
+            events = []
+            for time, on, p, v in merged:
+                events.append((time - previous, on, p, v))
+                previous = time
+        on_status = 0x90 | channel
+        off_status = 0x80 | channel
+        for delta, on, p, v in events:
+            if delta < 0x80:
+                out.append(delta)
+            else:
+                out += _varlen(delta)
+            out += bytes((on_status, p, v)) if on else bytes((off_status, p, 0x40))
+            if len(out) >= self.chunk_size:
+                yield bytes(out)
+                out.clear()
+        if out:
+            yield bytes(out)
+
+    def write_track(self, name: str, notes: Pattern, channel: int = 0) -> int:
+        """
+        Append one track holding ``notes`` (start and length in LMMS ticks).
+
+        Returns:
+            The number of bytes of events written
+        """
+        return self._write_chunk(self._encode(name, notes, channel & 0x0F))
+
+    def close(self):
+        """Fill in the track count and close the file."""
+        if self._file.closed:
+            return
+        self._file.seek(_HEADER.size)
+        self._file.write(_FILE_HEADER.pack(1, self.track_count, TICKS_PER_BEAT))
+        self._file.close()
+
+    def __enter__(self) -> "MidiWriter":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _channel(track_number: int) -> int:
+    """A channel per exported track, cycling through every channel but the drum channel."""
+    channel = track_number % 15
+    return channel + 1 if channel >= DRUM_CHANNEL else channel
+
+
+def _shifted(notes: NoteColumns, offset: int) -> Pattern:
+    """The notes as a pattern, ``offset`` ticks later."""
+    if np is not None:
+        start = notes.start.astype(np.int64) + offset
+    else:
+        start = [s + offset for s in notes.start]
+    return Pattern.from_ticks(notes.pitch, notes.velocity, start, notes.length)
+
+
+def export_patterns(path: str, parts: Sequence[Tuple[str, Pattern]], tempo: Optional[float] = None
+                    ) -> List[Dict[str, Any]]:
+    """
+    Write named patterns to a MIDI file, one track each, all starting at beat 0.
+
+    Returns:
+        The name and note count of every written track
+    """
+    written = []
+    with MidiWriter(path, tempo) as writer:
+        for name, notes in parts:
+            writer.write_track(name, notes, _channel(len(written)))
+            written.append({"name": name, "notes": len(notes)})
+    return written
+
+
+def export_project_file(project_path: str, path: str, tracks: Optional[Sequence[int]] = None
+                        ) -> Dict[str, Any]:
+    """
+    Write the notes of an LMMS project file to a MIDI file, one track at a time.
+
+    Each project track becomes one MIDI track with its patterns at their song
+    positions; tracks without notes are left out. Only one track's notes are
+    decoded at a time.
+
+    Args:
+        project_path: Path to a ``.mmp`` or ``.mmpz`` file
+        path: Path of the ``.mid`` file to write
+        tracks: Indices of the project tracks to export, or None for all
+
+    Returns:
+        The project tempo and the name and note count of every written track
+    """
+    project = open_project(project_path)
+    selected = range(len(project.tracks)) if tracks is None else tracks
+    written = []
+    with MidiWriter(path, project.tempo) as writer:
+        for index in selected:
+            track = project.track(index)
+            if not track.note_count:
+                continue
+            notes = Pattern.empty().concat([_shifted(p.notes, p.position) for p in track.patterns])
+            writer.write_track(track.name or f"Track {index + 1}", notes, _channel(len(written)))
+            written.append({"track": index, "name": track.name, "notes": len(notes)})
+    return {"tempo": project.tempo, "tracks": written}
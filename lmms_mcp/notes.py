@@ -0,0 +1,243 @@
+"""
+Column-wise note storage used for bulk note transfers.
+
+Notes arrive at the MCP boundary as a list of dicts such as
+``{"note": 60, "velocity": 100, "start": 0, "length": 1}`` where ``start`` and
+``length`` are measured in beats. :class:`NoteColumns` converts them once into
+four parallel columns (pitch, velocity, start ticks, length ticks), validates
+them column by column and packs them into fixed-width little-endian records
+that are sent to LMMS as OSC blobs.
+
+Clients sending many notes can skip the dicts and send the same records,
+base64-encoded (:meth:`NoteColumns.from_base64`). The decoded bytes are
+viewed in place as columns and only range-checked column by column, so no
+per-note object is ever built.
+
+NumPy is used when it is installed; otherwise the columns are plain
+``array.array`` objects and the same operations fall back to pure Python.
+"""
+
+import base64
+import binascii
+import math
+import struct
+from array import array
+from typing import Dict, Any, List, Sequence, Union
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+# LMMS resolution: 48 ticks per beat (192 per 4/4 bar)
+TICKS_PER_BEAT = 48
+
+DEFAULT_VELOCITY = 100
+DEFAULT_LENGTH = 1.0
+
+# One packed note: pitch (u8), velocity (u8), start ticks (u32), length ticks (u32)
+NOTE_RECORD = struct.Struct("<BBII")
+
+if np is not None:
+    NOTE_DTYPE = np.dtype([("pitch", "u1"), ("velocity", "u1"), ("start", "<u4"), ("length", "<u4")])
+else:
+    NOTE_DTYPE = None
+
+_MAX_TICKS = 0xFFFFFFFF
+
+
+class NoteValidationError(ValueError):
+    """Raised when a batch of notes contains out-of-range values."""
+
+
+def _column(values: Sequence[Any], typecode: str, dtype: str):
+    if np is not None:
+        return np.asarray(values, dtype=dtype)
+    # Whole floats such as 60.0 have passed _check_whole
+    return array(typecode, map(int, values))
+
+
+def _beats_to_ticks(values: Sequence[float]):
+    if np is not None:
+        beats = np.asarray(values)
+        # np.asarray would otherwise read strings such as "2" as numbers and None as NaN
+        if beats.dtype.kind not in "biuf":
+            raise TypeError(f"cannot convert {beats.dtype} values to ticks")
+        return np.rint(beats.astype(np.float64) * TICKS_PER_BEAT)
+    # Non-finite values are kept for _check_whole to reject
+    return [round(v * TICKS_PER_BEAT) if not isinstance(v, float) or math.isfinite(v) else v for v in values]
+
+
+def _not_a_number(name: str, values: Sequence[Any]) -> NoteValidationError:
+    for index, v in enumerate(values):
+        if not isinstance(v, (int, float)):
+            return NoteValidationError(f"Note {index}: {name} {v!r} is not a number")
+    return NoteValidationError(f"Notes must have numeric {name} values")
+
+
+def _check_whole(name: str, values):
+    if len(values) == 0:
+        return
+    if np is not None:
+        if values.dtype.kind != "f":
+            return
+        bad = np.flatnonzero(~np.isfinite(values) | (values != np.trunc(values)))
+        if bad.size:
+            index = int(bad[0])
+            raise NoteValidationError(f"Note {index}: {name} {values[index]} is not a finite whole number")
+    else:
+        for index, v in enumerate(values):
+            if isinstance(v, float) and not v.is_integer():
+                raise NoteValidationError(f"Note {index}: {name} {v} is not a finite whole number")
+
+
+def _check_range(name: str, values, low: int, high: int):
+    if len(values) == 0:
+        return
+    if np is not None:
+        bad = np.flatnonzero((values < low) | (values > high))
+        if bad.size:
+            index = int(bad[0])
+            raise NoteValidationError(f"Note {index}: {name} {values[index]} out of range [{low}, {high}]")
+    elif min(values) < low or max(values) > high:
+        index = next(i for i, v in enumerate(values) if v < low or v > high)
+        raise NoteValidationError(f"Note {index}: {name} {values[index]} out of range [{low}, {high}]")
+
+
+class NoteColumns:
+    """A batch of notes stored as parallel pitch/velocity/start/length columns."""
+
+    __slots__ = ("pitch", "velocity", "start", "length")
+
+    def __init__(self, pitch, velocity, start, length):
+        """
+        Initialize from existing columns.
+
+        Args:
+            pitch: MIDI note numbers (0-127)
+            velocity: Note velocities (0-127)
+            start: Note start positions in ticks
+            length: Note lengths in ticks
+        """
+        if not len(pitch) == len(velocity) == len(start) == len(length):
+            raise NoteValidationError("Note columns must all have the same length")
+        self.pitch = pitch
+        self.velocity = velocity
+        self.start = start
+        self.length = length
+
+    @classmethod
+    def from_dicts(cls, notes: List[Dict[str, Any]]) -> "NoteColumns":
+        """
+        Convert and validate a list of note dicts.
+
+        Args:
+            notes: Dicts with ``note`` (or ``pitch``), and optionally ``velocity``,
+                   ``start`` and ``length`` in beats
+
+        Returns:
+            The validated notes as columns
+        """
+        try:
+            pitch = [n["note"] if "note" in n else n["pitch"] for n in notes]
+        except KeyError:
+            index = next(i for i, n in enumerate(notes) if "note" not in n and "pitch" not in n)
+            raise NoteValidationError(f"Note {index}: missing 'note'") from None
+        velocity = [n.get("velocity", DEFAULT_VELOCITY) for n in notes]
+        beats = {"start": [n.get("start", 0) for n in notes],
+                 "length": [n.get("length", DEFAULT_LENGTH) for n in notes]}
+        ticks = {}
+        for name, values in beats.items():
+            try:
+                ticks[name] = _beats_to_ticks(values)
+            except (TypeError, ValueError):
+                raise _not_a_number(name, values) from None
+        return cls.from_ticks(pitch, velocity, ticks["start"], ticks["length"])
+
+    @classmethod
+    def from_ticks(cls, pitch, velocity, start, length) -> "NoteColumns":
+        """
+        Validate raw columns (start and length already in ticks) and build a batch.
+
+        Raises:
+            NoteValidationError: If a value is out of range, not numeric or
+                                 not a finite whole number
+        """
+        if np is not None:
+            pitch, velocity = np.asarray(pitch), np.asarray(velocity)
+            start, length = np.asarray(start), np.asarray(length)
+        try:
+            _check_whole("pitch", pitch)
+            _check_whole("velocity", velocity)
+            _check_whole("start", start)
+            _check_whole("length", length)
+            _check_range("pitch", pitch, 0, 127)
+            _check_range("velocity", velocity, 0, 127)
+            _check_range("start", start, 0, _MAX_TICKS)
+            _check_range("length", length, 1, _MAX_TICKS)
+        except TypeError as e:
+            raise NoteValidationError(f"Notes must have numeric fields: {e}") from None
+        return cls(_column(pitch, "B", "u1"), _column(velocity, "B", "u1"),
+                   _column(start, "I", "u4"), _column(length, "I", "u4"))
+
+    @classmethod
+    def from_records(cls, data: bytes) -> "NoteColumns":
+        """
+        Unpack consecutive :data:`NOTE_RECORD` records, the inverse of :meth:`to_records`.
+
+        Raises:
+            NoteValidationError: If the data is not a whole number of records
+                                 or holds out-of-range values
+        """
+        if len(data) % NOTE_RECORD.size:
+            raise NoteValidationError(f"Note records must be a multiple of {NOTE_RECORD.size} bytes long")
+        if np is not None:
+            records = np.frombuffer(data, dtype=NOTE_DTYPE)
+            return cls.from_ticks(records["pitch"], records["velocity"], records["start"], records["length"])
+        fields = struct.unpack("<" + "BBII" * (len(data) // NOTE_RECORD.size), data)
+        return cls.from_ticks(fields[0::4], fields[1::4], fields[2::4], fields[3::4])
+
+    @classmethod
+    def from_base64(cls, text: str) -> "NoteColumns":
+        """
+        Decode base64 of consecutive :data:`NOTE_RECORD` records, the inverse of :meth:`to_base64`.
+
+        Raises:
+            NoteValidationError: If the text is not base64 of whole records or
+                                 the records hold out-of-range values
+        """
+        try:
+            data = base64.b64decode(text, validate=True)
+        except (binascii.Error, ValueError) as e:
+            raise NoteValidationError(f"Note records are not valid base64: {e}") from None
+        return cls.from_records(data)
+
+    def __len__(self) -> int:
+        return len(self.pitch)
+
+    def to_records(self) -> bytes:
+        """Pack the notes into consecutive :data:`NOTE_RECORD` records."""
+        if np is not None:
+            records = np.empty(len(self), dtype=NOTE_DTYPE)
+            records["pitch"] = self.pitch
+            records["velocity"] = self.velocity
+            records["start"] = self.start
+            records["length"] = self.length
+            return records.tobytes()
+        fields = [None] * (4 * len(self))
+        fields[0::4] = self.pitch
+        fields[1::4] = self.velocity
+        fields[2::4] = self.start
+        fields[3::4] = self.length
+        return struct.pack("<" + "BBII" * len(self), *fields)
+
+    def to_base64(self) -> str:
+        """The notes as base64 of consecutive :data:`NOTE_RECORD` records."""
+        return base64.b64encode(self.to_records()).decode("ascii")
+
+    def to_dicts(self) -> List[Dict[str, Union[int, float]]]:
+        """Convert back to the note dict format used at the MCP boundary."""
+        return [
+            {"note": int(p), "velocity": int(v), "start": s / TICKS_PER_BEAT, "length": l / TICKS_PER_BEAT}
+            for p, v, s, l in zip(self.pitch, self.velocity, self.start, self.length)
+        ]
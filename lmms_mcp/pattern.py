@@ -0,0 +1,325 @@
+"""
+Column-wise patterns with vectorised note transforms.
+
+A :class:`Pattern` is a :class:`~lmms_mcp.notes.NoteColumns` batch with an
+extra pan column, so it can be handed straight to
+``LMMSInterface.send_note_columns``. It holds one typed array per field
+instead of one dict per note, which keeps cached and mirrored patterns about
+an order of magnitude smaller, and its transforms (transpose, quantize,
+humanize, slice) work on whole columns at once. Transforms return a new
+pattern and leave the original untouched.
+
+Like :mod:`lmms_mcp.notes`, NumPy is used when it is installed and
+``array.array`` columns with pure-Python loops otherwise.
+"""
+
+import random
+from array import array
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from .notes import NoteColumns, NoteValidationError, TICKS_PER_BEAT, _MAX_TICKS, _check_range, _check_whole, _column, np
+
+# LMMS panning range, centre is 0
+MIN_PAN = -100
+MAX_PAN = 100
+
+
+def _nbytes(column) -> int:
+    if np is not None:
+        return column.nbytes
+    return len(column) * column.itemsize
+
+
+def _ticks(beats: float) -> int:
+    return int(round(beats * TICKS_PER_BEAT))
+
+
+def _matched(keys, others):
+    """
+    Mask of the ``keys`` that have a partner among ``others``.
+
+    Both are multisets: each item of ``others`` pairs with at most one equal
+    key, so two copies of a note only both match if the other side has two
+    copies too. With NumPy the keys are pairs of int64 columns and are matched
+    with one sort, in O(n log n); otherwise they are tuples matched with a hash
+    count, in O(n).
+    """
+    if np is None:
+        remaining = Counter(others)
+        mask = []
+        for key in keys:
+            found = remaining[key] > 0
+            if found:
+                remaining[key] -= 1
+            mask.append(found)
+        return mask
+    count = len(keys[0])
+    if count == 0 or len(others[0]) == 0:
+        return np.zeros(count, dtype=bool)
+    high = np.concatenate([keys[0], others[0]])
+    low = np.concatenate([keys[1], others[1]])
+    side = np.zeros(len(high), dtype=np.int8)
+    side[count:] = 1
+    # Sort by key, then side, so every key's copies on each side are adjacent
+    order = np.lexsort((side, low, high))
+    high, low, side = high[order], low[order], side[order]
+    new_key = np.ones(len(high), dtype=bool)
+    new_key[1:] = (high[1:] != high[:-1]) | (low[1:] != low[:-1])
+    key_id = np.cumsum(new_key) - 1
+    new_run = new_key.copy()
+    new_run[1:] |= side[1:] != side[:-1]
+    # Number the copies of a key on one side 0, 1, 2, ... and match those below the other side's count
+    positions = np.arange(len(high))
+    occurrence = positions - np.maximum.accumulate(np.where(new_run, positions, 0))
+    others_per_key = np.bincount(key_id[side == 1], minlength=int(key_id[-1]) + 1)
+    mask = np.empty(len(high), dtype=bool)
+    mask[order] = (side == 0) & (occurrence < others_per_key[key_id])
+    return mask[:count]
+
+
+class Pattern(NoteColumns):
+    """Notes of one pattern stored as pitch/velocity/start/length/pan columns."""
+
+    __slots__ = ("pan",)
+
+    def __init__(self, pitch, velocity, start, length, pan=None):
+        """
+        Initialize from existing columns.
+
+        Args:
+            pitch: MIDI note numbers (0-127)
+            velocity: Note velocities (0-127)
+            start: Note start positions in ticks
+            length: Note lengths in ticks
+            pan: Note panning (-100 to 100), centred when omitted
+        """
+        super().__init__(pitch, velocity, start, length)
+        if pan is None:
+            pan = np.zeros(len(pitch), dtype="i1") if np is not None else array("b", bytes(len(pitch)))
+        elif len(pan) != len(pitch):
+            raise NoteValidationError("Note columns must all have the same length")
+        self.pan = pan
+
+    @classmethod
+    def empty(cls) -> "Pattern":
+        """A pattern without notes."""
+        return cls.from_ticks([], [], [], [])
+
+    @classmethod
+    def from_dicts(cls, notes: List[Dict[str, Any]]) -> "Pattern":
+        """
+        Convert and validate a list of note dicts.
+
+        Args:
+            notes: Dicts as accepted by :meth:`NoteColumns.from_dicts`, optionally
+                   with ``pan``
+
+        Returns:
+            The validated notes as a pattern
+        """
+        pattern = super().from_dicts(notes)
+        if any("pan" in n for n in notes):
+            pan = [n.get("pan", 0) for n in notes]
+            if np is not None:
+                pan = np.asarray(pan)
+            try:
+                _check_whole("pan", pan)
+                _check_range("pan", pan, MIN_PAN, MAX_PAN)
+            except TypeError as e:
+                raise NoteValidationError(f"Notes must have numeric fields: {e}") from None
+            pattern.pan = _column(pan, "b", "i1")
+        return pattern
+
+    def to_dicts(self) -> List[Dict[str, Union[int, float]]]:
+        """Convert back to the note dict format used at the MCP boundary, including ``pan``."""
+        tick = float(TICKS_PER_BEAT)
+        return [
+            {"note": p, "velocity": v, "start": s / tick, "length": l / tick, "pan": n}
+            for p, v, s, l, n in zip(self.pitch.tolist(), self.velocity.tolist(), self.start.tolist(),
+                                     self.length.tolist(), self.pan.tolist())
+        ]
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the note columns."""
+        return sum(_nbytes(c) for c in (self.pitch, self.velocity, self.start, self.length, self.pan))
+
+    def _replace(self, **columns) -> "Pattern":
+        fields = {"pitch": self.pitch, "velocity": self.velocity, "start": self.start,
+                  "length": self.length, "pan": self.pan}
+        fields.update(columns)
+        return type(self)(**fields)
+
+    def _take(self, indices) -> "Pattern":
+        """The notes at ``indices``, in that order."""
+        if np is not None:
+            return type(self)(self.pitch[indices], self.velocity[indices], self.start[indices],
+                              self.length[indices], self.pan[indices])
+        return type(self)(*(array(c.typecode, [c[i] for i in indices])
+                            for c in (self.pitch, self.velocity, self.start, self.length, self.pan)))
+
+    def transpose(self, semitones: int) -> "Pattern":
+        """
+        Shift every note by a number of semitones.
+
+        Raises:
+            NoteValidationError: If a note would leave the MIDI range
+        """
+        if np is not None:
+            pitch = self.pitch.astype(np.int16) + int(semitones)
+        else:
+            pitch = [p + semitones for p in self.pitch]
+        _check_range("pitch", pitch, 0, 127)
+        return self._replace(pitch=_column(pitch, "B", "u1"))
+
+    def quantize(self, grid: float = 0.25, strength: float = 1.0, lengths: bool = False) -> "Pattern":
+        """
+        Move note starts towards a grid.
+
+        Args:
+            grid: Grid spacing in beats (0.25 is a sixteenth note)
+            strength: Fraction of the distance to the nearest grid line to move, 0 to 1
+            lengths: Also round note lengths to whole grid steps, at least one
+
+        Returns:
+            The quantized pattern
+        """
+        step = max(1, _ticks(grid))
+        if np is not None:
+            start = self.start.astype(np.float64)
+            start = np.rint(start + (np.rint(start / step) * step - start) * strength)
+            length = np.maximum(np.rint(self.length / step), 1) * step if lengths else self.length
+        else:
+            start = [round(s + (round(s / step) * step - s) * strength) for s in self.start]
+            length = [max(round(l / step), 1) * step for l in self.length] if lengths else self.length
+        return self._replace(start=_column(start, "I", "u4"), length=_column(length, "I", "u4"))
+
+    def humanize(self, timing: float = 0.0, velocity: int = 0, seed: Optional[int] = None) -> "Pattern":
+        """
+        Randomly offset note starts and velocities.
+
+        The same seed gives the same result for a given backend (NumPy or
+        pure Python), not across backends.
+
+        Args:
+            timing: Largest start offset in beats, either direction
+            velocity: Largest velocity offset, either direction
+            seed: Seed for a reproducible result
+
+        Returns:
+            The humanized pattern; starts stay at or after 0, velocities within 1-127
+        """
+        spread = abs(_ticks(timing))
+        velocity = abs(int(velocity))
+        count = len(self)
+        start, levels = self.start, self.velocity
+        if np is not None:
+            rng = np.random.default_rng(seed)
+            if spread:
+                start = np.clip(start.astype(np.int64) + rng.integers(-spread, spread + 1, count), 0, _MAX_TICKS)
+            if velocity:
+                levels = np.clip(levels.astype(np.int16) + rng.integers(-velocity, velocity + 1, count), 1, 127)
+        else:
+            rng = random.Random(seed)
+            if spread:
+                start = [min(max(s + rng.randint(-spread, spread), 0), _MAX_TICKS) for s in start]
+            if velocity:
+                levels = [min(max(v + rng.randint(-velocity, velocity), 1), 127) for v in levels]
+        return self._replace(start=_column(start, "I", "u4"), velocity=_column(levels, "B", "u1"))
+
+    def slice(self, start: float, end: Optional[float] = None, rebase: bool = False) -> "Pattern":
+        """
+        The notes starting in ``[start, end)``.
+
+        Args:
+            start: Window start in beats, not before beat 0
+            end: Window end in beats, or None for the end of the pattern
+            rebase: Make the window start the new beat 0
+
+        Returns:
+            The notes in the window, in their original order
+
+        Raises:
+            NoteValidationError: If ``start`` is negative
+        """
+        low = _ticks(start)
+        if low < 0:
+            raise NoteValidationError(f"Slice start {start} is before beat 0")
+        high = _MAX_TICKS + 1 if end is None else _ticks(end)
+        if np is not None:
+            part = self._take(np.flatnonzero((self.start >= low) & (self.start < high)))
+        else:
+            part = self._take([i for i, s in enumerate(self.start) if low <= s < high])
+        if rebase and low:
+            if np is not None:
+                part.start = part.start - np.uint32(low)
+            else:
+                part.start = array("I", [s - low for s in part.start])
+        return part
+
+    def _keys(self, velocity: bool):
+        """One comparable key per note: start, pitch, length and optionally velocity."""
+        if np is None:
+            if velocity:
+                return list(zip(self.start, self.pitch, self.length, self.velocity))
+            return list(zip(self.start, self.pitch, self.length))
+        # Pack into two int64 columns: start and pitch, length and velocity
+        high = (self.start.astype(np.int64) << 7) | self.pitch
+        low = self.length.astype(np.int64) << 7
+        if velocity:
+            low |= self.velocity
+        return high, low
+
+    def difference(self, other: "Pattern", match_velocity: bool = True) -> "Pattern":
+        """
+        The notes of this pattern that are not in ``other``.
+
+        Each note of ``other`` cancels at most one equal note. Pan is not
+        compared, as it is not sent to LMMS.
+
+        Args:
+            other: The notes to take away
+            match_velocity: Compare velocity as well as pitch, start and length;
+                            LMMS itself matches notes to remove without it
+
+        Returns:
+            The remaining notes, in their original order
+        """
+        mask = _matched(self._keys(match_velocity), other._keys(match_velocity))
+        if np is not None:
+            return self._take(np.flatnonzero(~mask))
+        return self._take([i for i, found in enumerate(mask) if not found])
+
+    def sorted(self) -> "Pattern":
+        """The notes ordered by start, then pitch."""
+        if np is not None:
+            return self._take(np.lexsort((self.pitch, self.start)))
+        return self._take(sorted(range(len(self)), key=lambda i: (self.start[i], self.pitch[i])))
+
+    def concat(self, others: Sequence["Pattern"]) -> "Pattern":
+        """This pattern's notes followed by the notes of ``others``."""
+        parts = [self, *others]
+        names = ("pitch", "velocity", "start", "length", "pan")
+        if np is not None:
+            return type(self)(*(np.concatenate([getattr(p, name) for p in parts]) for name in names))
+        columns = []
+        for name in names:
+            column = array(getattr(self, name).typecode)
+            for part in parts:
+                column.extend(getattr(part, name))
+            columns.append(column)
+        return type(self)(*columns)
+
+
+def diff_patterns(old: Pattern, new: Pattern) -> Tuple[Pattern, Pattern]:
+    """
+    The smallest change that turns ``old`` into ``new`` on the LMMS side.
+
+    A note whose velocity changed is removed and added again; notes that only
+    differ in pan are left alone.
+
+    Returns:
+        The notes to remove and the notes to add
+    """
+    return old.difference(new), new.difference(old)
@@ -0,0 +1,331 @@
+"""
+Playhead, tempo and meter subscriptions fed by LMMS push notifications.
+
+While a project plays, LMMS pushes its state without being asked:
+
+* ``/lmms/notify/position <ticks> [playing]``: the playhead, in ticks
+* ``/lmms/notify/tempo <bpm>`` and ``/lmms/notify/playing <0|1>``
+* ``/lmms/notify/meters <track> <left> <right> ...``: peak levels (0.0 to
+  1.0) of any number of tracks, three arguments per track
+
+:class:`PlaybackHub` keeps the latest of each for one LMMS instance and fans
+it out to subscribers, one per MCP session. Each subscriber chooses its
+topics and a maximum rate; updates arriving faster are coalesced, keeping the
+latest position and tempo and the highest peak of every track since the last
+update sent. A subscriber therefore holds at most one pending update per
+topic, however slowly it reads. A subscriber whose update has not gone out
+within ``send_timeout`` seconds is dropped rather than allowed to fall
+further behind.
+
+Updates are sent by the server as MCP ``notifications/resources/updated``
+for ``lmms://playback/<topic>``, carrying the new value in a ``value`` field
+so clients need not read the resource back.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .notes import TICKS_PER_BEAT
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_PREFIX = "/lmms/notify/"
+RESOURCE_PREFIX = "lmms://playback/"
+
+POSITION = "position"
+TEMPO = "tempo"
+METERS = "meters"
+TOPICS = (POSITION, TEMPO, METERS)
+
+BAR_TICKS = 4 * TICKS_PER_BEAT
+
+# Updates per second sent to a subscriber, unless it asks for another rate
+DEFAULT_MAX_RATE = 10.0
+MAX_RATE = 60.0
+MIN_RATE = 0.1
+
+# Seconds an update may take to send before its subscriber is dropped
+DEFAULT_SEND_TIMEOUT = 2.0
+
+# Sends the value of a topic to a subscriber: (uri, value)
+Sender = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+# Track index -> (left, right) peak level
+Levels = Dict[int, Tuple[float, float]]
+
+
+class SubscriptionError(ValueError):
+    """Raised for subscriptions to unknown topics or at unusable rates."""
+
+
+def topic_uri(topic: str) -> str:
+    """The resource URI of a topic."""
+    return RESOURCE_PREFIX + topic
+
+
+def uri_topic(uri: str) -> str:
+    """
+    The topic of a resource URI.
+
+    Raises:
+        SubscriptionError: If the URI is not a playback resource
+    """
+    uri = str(uri)
+    topic = uri[len(RESOURCE_PREFIX):] if uri.startswith(RESOURCE_PREFIX) else None
+    if topic not in TOPICS:
+        raise SubscriptionError(f"Unknown playback resource '{uri}'")
+    return topic
+
+
+def _merge_peaks(held: Levels, levels: Levels) -> Levels:
+    """The highest levels of both, as a new mapping."""
+    merged = dict(held)
+    for track, (left, right) in levels.items():
+        old = merged.get(track)
+        merged[track] = (left, right) if old is None else (max(old[0], left), max(old[1], right))
+    return merged
+
+
+def meters_value(levels: Levels) -> Dict[str, Any]:
+    """The value of the meters topic for peak levels by track."""
+    return {"tracks": [{"track_index": track, "left": round(left, 4), "right": round(right, 4)}
+                       for track, (left, right) in sorted(levels.items())]}
+
+
+class Subscriber:
+    """The topics, rate and pending updates of one MCP session."""
+
+    __slots__ = ("key", "send", "topics", "interval", "pending", "peaks", "sent", "coalesced", "last_sent",
+                 "_wake", "_task")
+
+    def __init__(self, key: str, send: Sender, topics: Iterable[str], max_rate: float):
+        self.key = key
+        self.send = send
+        self.topics = set(topics)
+        self.interval = 1.0 / max_rate
+        # Topic -> latest value not yet sent; meters are held in peaks
+        self.pending: Dict[str, Optional[Dict[str, Any]]] = {}
+        self.peaks: Levels = {}
+        self.sent = 0
+        self.coalesced = 0
+        self.last_sent = float("-inf")
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def max_rate(self) -> float:
+        return 1.0 / self.interval
+
+    def offer(self, topic: str, value: Dict[str, Any]):
+        """Hold a new value of a topic until the next update, replacing any value not yet sent."""
+        if topic not in self.topics:
+            return
+        if topic in self.pending:
+            self.coalesced += 1
+        self.pending[topic] = value
+        self._wake.set()
+
+    def offer_levels(self, levels: Levels):
+        """Hold new peak levels until the next update, keeping the highest of each track."""
+        if METERS not in self.topics:
+            return
+        if METERS in self.pending:
+            self.coalesced += 1
+            self.peaks = _merge_peaks(self.peaks, levels)
+        else:
+            # Shared with the hub and other subscribers until merged, which copies
+            self.peaks = levels
+        self.pending[METERS] = None
+        self._wake.set()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"session": self.key, "topics": sorted(self.topics), "max_rate": self.max_rate,
+                "sent": self.sent, "coalesced": self.coalesced, "pending": len(self.pending)}
+
+
+class PlaybackHub:
+    """The transport, tempo and meters of one LMMS instance and their subscribers."""
+
+    def __init__(self, send_timeout: float = DEFAULT_SEND_TIMEOUT):
+        """
+        Initialize the hub.
+
+        Args:
+            send_timeout: Seconds an update may take to send before its
+                          subscriber is dropped
+        """
+        self.send_timeout = send_timeout
+        self.ticks: Optional[int] = None
+        self.playing = False
+        self.tempo: Optional[float] = None
+        self.levels: Levels = {}
+        self.updates = 0
+        self.dropped = 0
+        self._subscribers: Dict[str, Subscriber] = {}
+
+    # Updates pushed by LMMS
+
+    def handle_notification(self, address: str, args: Tuple[Any, ...]):
+        """
+        Take a playback notification from LMMS and pass it on to subscribers.
+
+        Understood notifications are ``/lmms/notify/<topic>`` messages where
+        topic is ``position``, ``tempo``, ``playing`` or ``meters``; anything
+        else is ignored.
+        """
+        if not address.startswith(NOTIFY_PREFIX):
+            return
+        topic = address[len(NOTIFY_PREFIX):]
+        try:
+            if topic == "position":
+                self.ticks = int(args[0])
+                if len(args) > 1:
+                    self.playing = bool(args[1])
+                self._publish(POSITION)
+            elif topic == "playing":
+                self.playing = bool(args[0])
+                self._publish(POSITION)
+            elif topic == "tempo":
+                self.tempo = float(args[0])
+                self._publish(TEMPO)
+                # The position in seconds depends on the tempo
+                self._publish(POSITION)
+            elif topic == "meters":
+                if len(args) % 3:
+                    raise ValueError("meters take three arguments per track")
+                levels = {int(args[i]): (float(args[i + 1]), float(args[i + 2])) for i in range(0, len(args), 3)}
+                self.levels.update(levels)
+                self.updates += 1
+                for subscriber in self._subscribers.values():
+                    subscriber.offer_levels(levels)
+        except (IndexError, TypeError, ValueError):
+            logger.warning(f"Ignoring malformed LMMS notification {address} {args}")
+
+    def _publish(self, topic: str):
+        value = self.current(topic)
+        if value is None:
+            return
+        self.updates += 1
+        for subscriber in self._subscribers.values():
+            subscriber.offer(topic, value)
+
+    def current(self, topic: str) -> Optional[Dict[str, Any]]:
+        """The latest value of a topic, or None before LMMS has reported it."""
+        if topic == POSITION:
+            if self.ticks is None:
+                return None
+            beats = self.ticks / TICKS_PER_BEAT
+            return {"ticks": self.ticks, "beats": beats, "bar": self.ticks // BAR_TICKS,
+                    "seconds": round(beats * 60.0 / self.tempo, 4) if self.tempo else None,
+                    "playing": self.playing}
+        if topic == TEMPO:
+            return None if self.tempo is None else {"tempo": self.tempo}
+        if topic == METERS:
+            return meters_value(self.levels) if self.levels else None
+        raise SubscriptionError(f"Unknown playback topic '{topic}'; expected one of {', '.join(TOPICS)}")
+
+    # Subscriptions
+
+    def subscribe(self, key: str, send: Sender, topics: Optional[Iterable[str]] = None,
+                  max_rate: float = DEFAULT_MAX_RATE) -> Subscriber:
+        """
+        Subscribe a session to topics, adding to any it already follows.
+
+        Args:
+            key: The session
+            send: Sends one update to the session
+            topics: Topics to follow, defaults to all of them
+            max_rate: Most updates per second the session receives; replaces
+                      the session's previous rate
+
+        Raises:
+            SubscriptionError: For unknown topics or a rate out of range
+        """
+        topics = list(TOPICS if topics is None else topics)
+        unknown = [topic for topic in topics if topic not in TOPICS]
+        if unknown:
+            raise SubscriptionError(f"Unknown playback topics {unknown}; expected some of {', '.join(TOPICS)}")
+        if not MIN_RATE <= max_rate <= MAX_RATE:
+            raise SubscriptionError(f"max_rate must be between {MIN_RATE} and {MAX_RATE} updates per second")
+        subscriber = self._subscribers.get(key)
+        if subscriber is None:
+            subscriber = Subscriber(key, send, topics, max_rate)
+            self._subscribers[key] = subscriber
+            subscriber._task = asyncio.get_running_loop().create_task(self._run(subscriber))
+        else:
+            subscriber.send = send
+            subscriber.topics.update(topics)
+            subscriber.interval = 1.0 / max_rate
+        return subscriber
+
+    def unsubscribe(self, key: str, topics: Optional[Iterable[str]] = None) -> List[str]:
+        """
+        Stop sending a session some or all of its topics.
+
+        Returns:
+            The topics the session no longer follows
+        """
+        subscriber = self._subscribers.get(key)
+        if subscriber is None:
+            return []
+        removed = sorted(subscriber.topics if topics is None else subscriber.topics.intersection(topics))
+        subscriber.topics.difference_update(removed)
+        for topic in removed:
+            subscriber.pending.pop(topic, None)
+        if not subscriber.topics:
+            self._remove(subscriber)
+        return removed
+
+    def subscription(self, key: str) -> Optional[Subscriber]:
+        """The subscription of a session, if it has one."""
+        return self._subscribers.get(key)
+
+    def _remove(self, subscriber: Subscriber):
+        if self._subscribers.get(subscriber.key) is subscriber:
+            del self._subscribers[subscriber.key]
+        if subscriber._task is not None and subscriber._task is not asyncio.current_task():
+            subscriber._task.cancel()
+
+    async def _run(self, subscriber: Subscriber):
+        """Send a subscriber its pending updates, at most once per interval."""
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                await subscriber._wake.wait()
+                subscriber._wake.clear()
+                delay = subscriber.last_sent + subscriber.interval - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                pending, subscriber.pending = subscriber.pending, {}
+                if METERS in pending:
+                    pending[METERS] = meters_value(subscriber.peaks)
+                    subscriber.peaks = {}
+                subscriber.last_sent = loop.time()
+                for topic, value in pending.items():
+                    await asyncio.wait_for(subscriber.send(topic_uri(topic), value), self.send_timeout)
+                    subscriber.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            logger.warning(f"Dropping playback subscriber {subscriber.key}: an update took more than "
+                           f"{self.send_timeout} seconds to send")
+            self.dropped += 1
+            self._remove(subscriber)
+        except Exception as e:
+            logger.info(f"Dropping playback subscriber {subscriber.key}: {e!r}")
+            self.dropped += 1
+            self._remove(subscriber)
+
+    async def close(self):
+        """Stop sending updates to every subscriber."""
+        subscribers = list(self._subscribers.values())
+        for subscriber in subscribers:
+            self._remove(subscriber)
+        await asyncio.gather(*(s._task for s in subscribers if s._task is not None), return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Subscribers, updates taken from LMMS and subscribers dropped for falling behind."""
+        subscribers = list(self._subscribers.values())
+        return {"subscribers": len(subscribers), "updates": self.updates, "dropped": self.dropped,
+                "sent": sum(s.sent for s in subscribers), "coalesced": sum(s.coalesced for s in subscribers)}
@@ -0,0 +1,218 @@
+"""
+Offline audio previews of patterns, without LMMS.
+
+Notes are synthesized with simple oscillators (sine, triangle, saw, square or
+noise) shaped by an attack/decay/sustain/release envelope and panned with
+equal-power gains. Synthesis runs one block of frames at a time: for every
+block the notes sounding in it are selected with a binary search over their
+start times and rendered together as a ``notes x frames`` array, so there is
+no loop over samples and memory stays bounded by the block size.
+
+Several patterns are rendered in parallel, one per worker process, and mixed;
+the mix is written as a 16-bit stereo WAV file or returned as WAV bytes.
+
+NumPy is required; it is an optional dependency of the package
+(``pip install lmms-mcp[numpy]``).
+"""
+
+import io
+import multiprocessing
+import os
+import threading
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, Optional, Sequence
+
+from .notes import TICKS_PER_BEAT
+from .pattern import Pattern
+from .snapshots import unpack_pattern
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+DEFAULT_SAMPLE_RATE = 44100
+DEFAULT_BLOCK_FRAMES = 4096
+DEFAULT_WAVEFORM = "triangle"
+# Per-note level before mixing; several loud notes at once still clip
+DEFAULT_GAIN = 0.25
+
+WAVEFORMS = ("sine", "triangle", "saw", "square", "noise")
+
+# Attack, decay and release in seconds, and the sustain level
+ENVELOPES = {
+    "noise": (0.001, 0.08, 0.0, 0.05),
+}
+DEFAULT_ENVELOPE = (0.005, 0.2, 0.6, 0.08)
+
+# Longest preview returned as WAV bytes rather than written to a file
+MAX_INLINE_SECONDS = 30.0
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+class PreviewError(ValueError):
+    """Raised when a preview cannot be rendered."""
+
+
+def _require_numpy():
+    if np is None:
+        raise PreviewError("Rendering previews needs NumPy (pip install lmms-mcp[numpy])")
+
+
+def _oscillator(waveform: str, cycles, rng):
+    """Evaluate a waveform at positions given in cycles since the note started."""
+    if waveform == "sine":
+        return np.sin(2 * np.pi * cycles)
+    if waveform == "noise":
+        return rng.uniform(-1.0, 1.0, cycles.shape)
+    fraction = cycles - np.floor(cycles)
+    if waveform == "saw":
+        return 2.0 * fraction - 1.0
+    if waveform == "square":
+        return np.where(fraction < 0.5, 1.0, -1.0)
+    return 4.0 * np.abs(fraction - 0.5) - 1.0
+
+
+def _envelope(frames, held, attack: float, decay: float, sustain: float, release: float):
+    """Envelope level ``frames`` after each note started, for notes held for ``held`` frames."""
+    def shape(t):
+        rising = t / attack
+        falling = sustain + (1.0 - sustain) * np.exp(-(t - attack) / decay)
+        return np.where(t < attack, rising, falling)
+
+    level = shape(np.minimum(frames, held))
+    released = frames - held
+    level = np.where(released > 0, level * np.maximum(0.0, 1.0 - released / release), level)
+    return np.where(frames >= 0, level, 0.0)
+
+
+def iter_blocks(notes: Pattern, tempo: float, sample_rate: int = DEFAULT_SAMPLE_RATE,
+                waveform: str = DEFAULT_WAVEFORM, length_ticks: int = 0, gain: float = DEFAULT_GAIN,
+                block_frames: int = DEFAULT_BLOCK_FRAMES, seed: int = 0) -> Iterator["np.ndarray"]:
+    """
+    Synthesize a pattern one block at a time.
+
+    Args:
+        notes: The notes to play, starting at tick 0 of the preview
+        tempo: Tempo in BPM
+        sample_rate: Frames per second
+        waveform: One of :data:`WAVEFORMS`
+        length_ticks: Least length of the preview, e.g. the pattern's length;
+                      the last note's release is always included
+        gain: Level of a note at full velocity
+        block_frames: Frames per block
+        seed: Seed of the noise generator
+
+    Yields:
+        ``(frames, 2)`` float32 arrays of stereo samples
+    """
+    _require_numpy()
+    if waveform not in WAVEFORMS:
+        raise PreviewError(f"Unknown waveform '{waveform}', expected one of {', '.join(WAVEFORMS)}")
+    if tempo <= 0 or sample_rate <= 0:
+        raise PreviewError("Tempo and sample rate must be positive")
+    attack, decay, sustain, release = ENVELOPES.get(waveform, DEFAULT_ENVELOPE)
+    attack, decay, release = (max(1.0, seconds * sample_rate) for seconds in (attack, decay, release))
+    frames_per_tick = 60.0 * sample_rate / (tempo * TICKS_PER_BEAT)
+
+    order = np.argsort(np.asarray(notes.start), kind="stable")
+    start = np.asarray(notes.start, dtype=np.float64)[order] * frames_per_tick
+    held = np.asarray(notes.length, dtype=np.float64)[order] * frames_per_tick
+    frequency = 440.0 * 2.0 ** ((np.asarray(notes.pitch, dtype=np.float64)[order] - 69.0) / 12.0) / sample_rate
+    level = gain * np.asarray(notes.velocity, dtype=np.float64)[order] / 127.0
+    # Equal-power panning
+    angle = (np.asarray(notes.pan, dtype=np.float64)[order] + 100.0) / 200.0 * (np.pi / 2)
+    left, right = level * np.cos(angle), level * np.sin(angle)
+    end = start + held + release
+
+    total = int(np.ceil(max(length_ticks * frames_per_tick, end.max() if len(end) else 0.0)))
+    rng = np.random.default_rng(seed)
+    for first in range(0, total, block_frames):
+        count = min(block_frames, total - first)
+        block = np.zeros((count, 2), dtype=np.float32)
+        # Notes that started before the block ends and still sound when it begins
+        candidates = np.arange(np.searchsorted(start, first + count))
+        active = candidates[end[candidates] > first]
+        if active.size:
+            since = np.arange(first, first + count, dtype=np.float64)[None, :] - start[active, None]
+            voices = (_oscillator(waveform, since * frequency[active, None], rng)
+                      * _envelope(since, held[active, None], attack, decay, sustain, release))
+            block[:, 0] = left[active] @ voices
+            block[:, 1] = right[active] @ voices
+        yield block
+
+
+def render_pattern(data: bytes, tempo: float, sample_rate: int = DEFAULT_SAMPLE_RATE,
+                   waveform: str = DEFAULT_WAVEFORM, length_ticks: int = 0,
+                   gain: float = DEFAULT_GAIN) -> "np.ndarray":
+    """
+    Render packed notes to one stereo array; the unit of work of a render worker process.
+
+    Args:
+        data: The notes, packed by :func:`~lmms_mcp.snapshots.pack_pattern`
+        tempo, sample_rate, waveform, length_ticks, gain: As for :func:`iter_blocks`
+
+    Returns:
+        A ``(frames, 2)`` float32 array
+    """
+    _require_numpy()
+    notes = unpack_pattern(data)
+    blocks = list(iter_blocks(notes, tempo, sample_rate, waveform, length_ticks, gain))
+    return np.concatenate(blocks) if blocks else np.zeros((0, 2), dtype=np.float32)
+
+
+def render_pool() -> ProcessPoolExecutor:
+    """The process pool shared by all renders, started on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned rather than forked: the server process runs an event loop and threads
+            _pool = ProcessPoolExecutor(max_workers=min(8, os.cpu_count() or 1),
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def mix(tracks: Sequence["np.ndarray"]) -> "np.ndarray":
+    """Sum stereo arrays of different lengths, starting together."""
+    _require_numpy()
+    frames = max((len(t) for t in tracks), default=0)
+    result = np.zeros((frames, 2), dtype=np.float32)
+    for track in tracks:
+        result[:len(track)] += track
+    return result
+
+
+def wav_bytes(audio: "np.ndarray", sample_rate: int) -> bytes:
+    """Encode stereo samples as a 16-bit WAV file in memory."""
+    buffer = io.BytesIO()
+    write_wav(buffer, audio, sample_rate)
+    return buffer.getvalue()
+
+
+def write_wav(target, audio: "np.ndarray", sample_rate: int, block_frames: int = DEFAULT_BLOCK_FRAMES * 16):
+    """
+    Write stereo samples, clipped to [-1, 1], as a 16-bit WAV file.
+
+    Args:
+        target: A path or a writable binary file object
+        audio: ``(frames, 2)`` samples
+        sample_rate: Frames per second
+        block_frames: Frames converted and written at a time
+    """
+    with wave.open(target, "wb") as out:
+        out.setnchannels(2)
+        out.setsampwidth(2)
+        out.setframerate(sample_rate)
+        for first in range(0, len(audio), block_frames):
+            block = np.clip(audio[first:first + block_frames], -1.0, 1.0)
+            out.writeframes((block * 32767.0).astype("<i2").tobytes())
+
+
+def describe(audio: "np.ndarray", sample_rate: int) -> Dict[str, float]:
+    """Length, peak level and number of clipped samples of a render."""
+    peak = float(np.abs(audio).max()) if audio.size else 0.0
+    return {"seconds": round(len(audio) / sample_rate, 3), "frames": len(audio), "peak": round(peak, 4),
+            "clipped": int(np.count_nonzero(np.abs(audio) > 1.0))}
@@ -0,0 +1,331 @@
+"""
+Read-only access to LMMS project files without a running LMMS.
+
+Both plain XML ``.mmp`` files and compressed ``.mmpz`` files are supported.
+``.mmpz`` is what LMMS writes through Qt's ``qCompress``: a 4-byte big-endian
+length header followed by a zlib stream.
+
+Files are never loaded whole. The XML is decompressed and parsed
+incrementally, and every pattern element is discarded as soon as it has been
+summarised, so memory use is bounded by the largest single pattern rather
+than by the size of the project. Opening a project only builds a per-track
+summary; the notes of a track are decoded when its patterns are first
+accessed, by streaming the file again up to that track.
+"""
+
+import os
+import threading
+import xml.etree.ElementTree as ET
+import zlib
+from collections import OrderedDict
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from .notes import NoteColumns, TICKS_PER_BEAT
+
+# Bytes read from disk per parser feed
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# LMMS numbers keys from C0 = 0; MIDI numbers them from C-1 = 0
+LMMS_KEY_OFFSET = 12
+
+# Note volume 100 (LMMS default) corresponds to full MIDI velocity
+LMMS_DEFAULT_VOLUME = 100
+
+TRACK_TYPES = {
+    0: "instrument",
+    1: "pattern",
+    2: "sample",
+    3: "event",
+    4: "video",
+    5: "automation",
+    6: "hidden_automation",
+}
+
+_TRACK_PATH = ["lmms-project", "song", "trackcontainer", "track"]
+_TRACK_DEPTH = len(_TRACK_PATH)
+
+# Projects kept open by open_project()
+_CACHE_SIZE = 8
+
+
+class ProjectFileError(Exception):
+    """Raised when a file is not a readable LMMS project."""
+
+
+def iter_project_bytes(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Yield the XML text of a project file in chunks, decompressing on the fly.
+
+    Args:
+        path: Path to a ``.mmp`` or ``.mmpz`` file
+        chunk_size: Number of bytes to read from disk at a time
+    """
+    with open(path, "rb") as f:
+        head = f.read(6)
+        if head.lstrip()[:1] == b"<":
+            # Plain XML, whatever the extension says
+            yield head
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                yield chunk
+            return
+        if len(head) >= 2 and head[0] == 0x78:
+            # Bare zlib stream without the qCompress length header
+            compressed = head
+        elif len(head) >= 6 and head[4] == 0x78:
+            compressed = head[4:]
+        else:
+            raise ProjectFileError(f"{path} is neither an XML nor a compressed LMMS project")
+        decompressor = zlib.decompressobj()
+        try:
+            while compressed:
+                data = decompressor.decompress(compressed, chunk_size)
+                while data:
+                    yield data
+                    data = decompressor.decompress(decompressor.unconsumed_tail, chunk_size)
+                compressed = f.read(chunk_size)
+            tail = decompressor.flush()
+            if tail:
+                yield tail
+        except zlib.error as e:
+            raise ProjectFileError(f"{path}: corrupt compressed project: {e}") from None
+
+
+def _iter_events(path: str, chunk_size: int) -> Iterator[Tuple[str, ET.Element, List[str]]]:
+    """
+    Yield ``(event, element, tag_path)`` for every start and end tag in the file.
+
+    ``tag_path`` is the list of open tags including the current one. It is
+    the same list object for every event, so callers must not keep it.
+    """
+    parser = ET.XMLPullParser(events=("start", "end"))
+    stack: List[str] = []
+    try:
+        for chunk in iter_project_bytes(path, chunk_size):
+            parser.feed(chunk)
+            for event, elem in parser.read_events():
+                if event == "start":
+                    stack.append(elem.tag)
+                    yield event, elem, stack
+                else:
+                    yield event, elem, stack
+                    stack.pop()
+        parser.close()
+    except ET.ParseError as e:
+        raise ProjectFileError(f"{path}: invalid project XML: {e}") from None
+
+
+def _int(value: Optional[str], default: int = 0) -> int:
+    try:
+        return int(float(value)) if value is not None else default
+    except ValueError:
+        return default
+
+
+def _float(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def _decode_notes(pattern: ET.Element) -> NoteColumns:
+    pitch, velocity, start, length = [], [], [], []
+    for note in pattern.iter("note"):
+        pitch.append(min(127, max(0, _int(note.get("key"), 57) + LMMS_KEY_OFFSET)))
+        velocity.append(min(127, max(0, round(_int(note.get("vol"), LMMS_DEFAULT_VOLUME) * 127 / LMMS_DEFAULT_VOLUME))))
+        start.append(max(0, _int(note.get("pos"))))
+        # Step notes in beat/bassline patterns carry a non-positive length
+        note_length = _int(note.get("len"), TICKS_PER_BEAT)
+        length.append(note_length if note_length > 0 else TICKS_PER_BEAT // 4)
+    return NoteColumns.from_ticks(pitch, velocity, start, length)
+
+
+class ProjectPattern:
+    """A decoded pattern from a project file."""
+
+    __slots__ = ("index", "name", "position", "steps", "muted", "notes")
+
+    def __init__(self, index: int, element: ET.Element):
+        self.index = index
+        self.name = element.get("name", "")
+        self.position = _int(element.get("pos"))
+        self.steps = _int(element.get("steps"), 16)
+        self.muted = element.get("muted") == "1"
+        self.notes = _decode_notes(element)
+
+    def to_dict(self, include_notes: bool = False) -> Dict[str, Any]:
+        """Describe the pattern, optionally with its notes in the MCP note format."""
+        result = {"index": self.index, "name": self.name, "position": self.position,
+                  "steps": self.steps, "muted": self.muted, "note_count": len(self.notes)}
+        if include_notes:
+            result["notes"] = self.notes.to_dicts()
+        return result
+
+
+class LazyTrack:
+    """Summary of a project track whose patterns are decoded on first access."""
+
+    __slots__ = ("_project", "index", "name", "type", "muted", "instrument", "pattern_count", "note_count",
+                 "_patterns")
+
+    def __init__(self, project: "ProjectFile", index: int, element: ET.Element):
+        self._project = project
+        self.index = index
+        self.name = element.get("name", "")
+        self.type = TRACK_TYPES.get(_int(element.get("type")), "unknown")
+        self.muted = element.get("muted") == "1"
+        self.instrument: Optional[str] = None
+        self.pattern_count = 0
+        self.note_count = 0
+        self._patterns: Optional[List[ProjectPattern]] = None
+
+    @property
+    def patterns(self) -> List[ProjectPattern]:
+        """The track's patterns with their notes, decoded on first access."""
+        if self._patterns is None:
+            self._patterns = self._project._decode_track(self.index)
+        return self._patterns
+
+    def to_dict(self, include_patterns: bool = False, include_notes: bool = False) -> Dict[str, Any]:
+        """Describe the track; patterns are only decoded when requested."""
+        result = {"index": self.index, "name": self.name, "type": self.type, "muted": self.muted,
+                  "instrument": self.instrument, "pattern_count": self.pattern_count,
+                  "note_count": self.note_count}
+        if include_patterns:
+            result["patterns"] = [p.to_dict(include_notes) for p in self.patterns]
+        return result
+
+
+class ProjectFile:
+    """A lazily loaded LMMS project file."""
+
+    def __init__(self, path: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        """
+        Open a project file and index its tracks.
+
+        Args:
+            path: Path to a ``.mmp`` or ``.mmpz`` file
+            chunk_size: Number of bytes to read from disk at a time
+        """
+        self.path = os.path.abspath(path)
+        self.chunk_size = chunk_size
+        self.version: Optional[str] = None
+        self.creator: Optional[str] = None
+        self.tempo: Optional[float] = None
+        self.time_signature: Optional[Tuple[int, int]] = None
+        self.master_volume: Optional[float] = None
+        self.tracks: List[LazyTrack] = []
+        self._lock = threading.Lock()
+        self._scan()
+
+    def _scan(self):
+        """Stream the whole file once, keeping only per-track summaries."""
+        track: Optional[LazyTrack] = None
+        for event, elem, path in _iter_events(self.path, self.chunk_size):
+            depth = len(path)
+            if depth > _TRACK_DEPTH:
+                # Inside a track: only the instrument and pattern ends matter
+                if track is None or event == "start":
+                    continue
+                if depth == _TRACK_DEPTH + 1 and elem.tag == "pattern":
+                    track.pattern_count += 1
+                    track.note_count += sum(1 for _ in elem.iter("note"))
+                    elem.clear()
+                elif depth == _TRACK_DEPTH + 2 and elem.tag == "instrument" and path[-2] == "instrumenttrack":
+                    track.instrument = elem.get("name")
+                    elem.clear()
+            elif event == "start":
+                if depth == 1:
+                    if elem.tag != "lmms-project":
+                        raise ProjectFileError(f"{self.path} is not an LMMS project (root <{elem.tag}>)")
+                    self.version = elem.get("version")
+                    self.creator = elem.get("creator")
+                elif depth == _TRACK_DEPTH and path == _TRACK_PATH:
+                    track = LazyTrack(self, len(self.tracks), elem)
+                    self.tracks.append(track)
+            elif depth == _TRACK_DEPTH:
+                elem.clear()
+                track = None
+            elif depth == 2 and elem.tag == "head":
+                self.tempo = _float(elem.get("bpm")) or self.tempo
+                numerator, denominator = elem.get("timesig_numerator"), elem.get("timesig_denominator")
+                if numerator and denominator:
+                    self.time_signature = (_int(numerator), _int(denominator))
+                self.master_volume = _float(elem.get("mastervol"))
+                elem.clear()
+            elif depth == 3 and elem.tag == "bpm" and path[1] == "head" and self.tempo is None:
+                # Automated tempo is stored as a child element
+                self.tempo = _float(elem.get("value"))
+            elif depth in (2, 3) and elem.tag != "trackcontainer":
+                # Mixer, controllers, editors and the like are not summarised
+                elem.clear()
+
+    def _decode_track(self, track_index: int) -> List[ProjectPattern]:
+        """Stream the file up to one track and decode only that track's patterns."""
+        with self._lock:
+            patterns: List[ProjectPattern] = []
+            current = -1
+            for event, elem, path in _iter_events(self.path, self.chunk_size):
+                depth = len(path)
+                if depth == _TRACK_DEPTH + 1:
+                    if event == "end" and elem.tag == "pattern" and path[:_TRACK_DEPTH] == _TRACK_PATH:
+                        if current == track_index:
+                            patterns.append(ProjectPattern(len(patterns), elem))
+                        elem.clear()
+                elif depth == _TRACK_DEPTH and path == _TRACK_PATH:
+                    if event == "start":
+                        current += 1
+                    else:
+                        elem.clear()
+                        if current == track_index:
+                            break
+            return patterns
+
+    def track(self, track_index: int) -> LazyTrack:
+        """Get one track by index."""
+        if not 0 <= track_index < len(self.tracks):
+            raise IndexError(f"Track {track_index} out of range (project has {len(self.tracks)} tracks)")
+        return self.tracks[track_index]
+
+    def info(self) -> Dict[str, Any]:
+        """Summarise the project without decoding any notes."""
+        return {
+            "path": self.path,
+            "version": self.version,
+            "creator": self.creator,
+            "tempo": self.tempo,
+            "time_signature": list(self.time_signature) if self.time_signature else None,
+            "master_volume": self.master_volume,
+            "track_count": len(self.tracks),
+            "tracks": [t.to_dict() for t in self.tracks],
+        }
+
+
+_open_projects: "OrderedDict[Tuple[str, float, int], ProjectFile]" = OrderedDict()
+_open_projects_lock = threading.Lock()
+
+
+def open_project(path: str) -> ProjectFile:
+    """
+    Open a project file, reusing a recently opened one if the file is unchanged.
+
+    Args:
+        path: Path to a ``.mmp`` or ``.mmpz`` file
+    """
+    path = os.path.abspath(os.path.expanduser(path))
+    try:
+        stat = os.stat(path)
+    except OSError as e:
+        raise ProjectFileError(f"Cannot open project {path}: {e.strerror}") from None
+    key = (path, stat.st_mtime, stat.st_size)
+    with _open_projects_lock:
+        project = _open_projects.get(key)
+        if project is not None:
+            _open_projects.move_to_end(key)
+            return project
+    project = ProjectFile(path)
+    with _open_projects_lock:
+        _open_projects[key] = project
+        while len(_open_projects) > _CACHE_SIZE:
+            _open_projects.popitem(last=False)
+    return project
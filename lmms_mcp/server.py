@@ -6,9 +6,37 @@ import logging
 import json
 import asyncio
 import argparse
-from typing import Dict, Any, List, Optional, Union, Tuple
+import base64
+import functools
+import itertools
+import os
+import weakref
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Union, Tuple, Set
+from mcp import types
 from mcp.server.fastmcp import FastMCP
-from .lmms_interface import LMMSInterface
+from . import __version__
+from .analysis import DEFAULT_TOP, Part, analyze
+from .backend_pool import BackendPool, DEFAULT_SESSION, parse_endpoints, session_scope
+from .batch import BatchRunner, BATCH_TOOLS
+from .encoding import encoded
+from .generators import generate
+from .instrument_index import InstrumentIndex
+from .jobs import DEFAULT_MAX_CONCURRENT, FINISHED, SUCCEEDED, JobManager, ProgressCallback, Work
+from .lmms_interface import LMMSError, LMMSInterface, LMMSTimeoutError
+from .locks import ProjectLocks
+from .metrics import ServerMetrics, PROMETHEUS_CONTENT_TYPE
+from .midi_file import DEFAULT_TEMPO, STEP_TICKS, MidiPart, MidiReader, export_patterns, export_project_file
+from .notes import TICKS_PER_BEAT, NoteValidationError
+from .pattern import Pattern, diff_patterns
+from .playback import DEFAULT_MAX_RATE, TOPICS, Sender, SubscriptionError, topic_uri, uri_topic
+from .preview import (DEFAULT_GAIN, DEFAULT_SAMPLE_RATE, DEFAULT_WAVEFORM, MAX_INLINE_SECONDS, PreviewError,
+                      describe, mix, render_pattern, render_pool, wav_bytes, write_wav)
+from .project_file import open_project
+from .session_state import SessionState
+from .snapshots import (DEFAULT_SNAPSHOT_DELAY, DEFAULT_SNAPSHOT_MAX_DELAY, SnapshotScheduler, SnapshotStore,
+                        capture, pack_pattern)
+from .wire_log import WireRecorder
 
 logging.basicConfig(
     level=logging.INFO,
@@ -22,11 +50,141 @@ DEFAULT_SERVER_PORT = 8000
 DEFAULT_LMMS_HOST = "127.0.0.1"
 DEFAULT_LMMS_PORT = 9000
 
+METRICS_PATH = "/metrics"
+
+# Seconds a long-running tool waits for its job before answering with the job id
+DEFAULT_INLINE_TIMEOUT = 2.0
+
+# Longest wait get_job_status accepts, in seconds
+MAX_JOB_WAIT = 60.0
+
+# Analyses kept, one per LMMS instance or project file
+ANALYSIS_CACHE_SIZE = 16
+
+# Tools that run as jobs and take a ``background`` argument
+JOB_TOOLS = ("save_project", "load_instrument", "import_midi")
+
+
+# Tools after which the session is snapshotted (unchanged states are not recorded twice)
+SNAPSHOT_TOOLS = ("create_track", "delete_track", "set_track_name", "create_pattern", "delete_pattern",
+                  "add_notes_to_pattern", "remove_notes_from_pattern", "set_pattern_notes", "generate_pattern",
+                  "import_midi", "load_instrument", "set_tempo", "new_project", "batch", "restore_snapshot")
+
+_RECORDS_NOTE = ("Instead of notes, many notes can be sent as records: base64 of consecutive 10-byte "
+                 "little-endian records of pitch (u8), velocity (u8), start and length in ticks (u32 each, "
+                 "48 ticks per beat)")
+
+_JOB_NOTE = ("Runs as a background job if it takes more than a moment: the answer is then the job's "
+             "status with a job_id to follow with get_job_status; background=true answers with the job id at "
+             "once, background=false always waits for the result")
+
+
+class _InstrumentedFastMCP(FastMCP):
+    """FastMCP that measures the framework's share of every tool call and tags it with its session."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics: Optional[ServerMetrics] = None
+        self.backends: Optional[BackendPool] = None
+        self._session_keys: "weakref.WeakKeyDictionary[Any, str]" = weakref.WeakKeyDictionary()
+        self._session_ids = itertools.count(1)
+        # Announce resource subscriptions once a handler for them is registered
+        capabilities = self._mcp_server.get_capabilities
+
+        def get_capabilities(*args, **kwargs) -> types.ServerCapabilities:
+            result = capabilities(*args, **kwargs)
+            if result.resources is not None and types.SubscribeRequest in self._mcp_server.request_handlers:
+                result.resources.subscribe = True
+            return result
+
+        self._mcp_server.get_capabilities = get_capabilities
+
+    def _session_key(self) -> str:
+        """A stable key for the MCP session of the current request."""
+        try:
+            session = self._mcp_server.request_context.session
+        except LookupError:
+            return DEFAULT_SESSION
+        key = self._session_keys.get(session)
+        if key is None:
+            key = f"session-{next(self._session_ids)}"
+            self._session_keys[session] = key
+            if self.backends is not None:
+                # Free the session's backend slot once the session is gone
+                weakref.finalize(session, self.backends.release, key)
+        return key
+
+    def progress_sender(self) -> Optional[ProgressCallback]:
+        """
+        A coroutine function sending MCP progress notifications for the current request.
+
+        Returns None outside a request or if the client did not ask for progress.
+        """
+        try:
+            context = self._mcp_server.request_context
+        except LookupError:
+            return None
+        token = context.meta.progressToken if context.meta is not None else None
+        if token is None:
+            return None
+
+        async def send(progress: float, total: Optional[float] = None, message: Optional[str] = None):
+            await context.session.send_progress_notification(token, progress, total, message)
+
+        return send
+
+    def update_sender(self) -> Optional[Sender]:
+        """
+        A coroutine function sending resource updates to the session of the current request.
+
+        Each update is a ``notifications/resources/updated`` carrying the new
+        value. The sender does not keep the session alive; once the session
+        is gone it raises ``ConnectionError``. Returns None outside a request.
+        """
+        try:
+            session = weakref.ref(self._mcp_server.request_context.session)
+        except LookupError:
+            return None
+
+        async def send(uri: str, value: Dict[str, Any]):
+            target = session()
+            if target is None:
+                raise ConnectionError("The MCP session has ended")
+            params = types.ResourceUpdatedNotificationParams(uri=uri, value=value)
+            await target.send_notification(types.ServerNotification(types.ResourceUpdatedNotification(
+                params=params)))
+
+        return send
+
+    def session_key(self) -> Optional[str]:
+        """The key of the current request's MCP session, or None outside a request."""
+        try:
+            self._mcp_server.request_context
+        except LookupError:
+            return None
+        return self._session_key()
+
+    async def call_tool(self, name: str, arguments: Dict[str, Any]):
+        with session_scope(self._session_key()):
+            if self.metrics is None:
+                return await super().call_tool(name, arguments)
+            with self.metrics.framing(name):
+                return await super().call_tool(name, arguments)
+
+    async def read_resource(self, uri):
+        with session_scope(self._session_key()):
+            return await super().read_resource(uri)
+
+
 class MCPServer:
     """Model Context Protocol server for LMMS integration."""
 
     def __init__(self, server_host: str = DEFAULT_SERVER_HOST, server_port: int = DEFAULT_SERVER_PORT,
-                 lmms_host: str = DEFAULT_LMMS_HOST, lmms_port: int = DEFAULT_LMMS_PORT):
+                 lmms_host: str = DEFAULT_LMMS_HOST, lmms_port: int = DEFAULT_LMMS_PORT,
+                 lmms_endpoints: Optional[List[Tuple[str, int]]] = None, job_log: Optional[str] = None,
+                 max_jobs: int = DEFAULT_MAX_CONCURRENT, inline_timeout: float = DEFAULT_INLINE_TIMEOUT,
+                 snapshot_dir: Optional[str] = None, snapshots: bool = True, record_wire: Optional[str] = None,
+                 snapshot_delay: float = DEFAULT_SNAPSHOT_DELAY):
         """
         Initialize the MCP server.
 
@@ -35,45 +193,258 @@ class MCPServer:
             server_port: The port to run the MCP server on
             lmms_host: The hostname where LMMS is running
             lmms_port: The OSC port that LMMS listens on
+            lmms_endpoints: ``(host, port)`` of several LMMS instances to spread
+                            sessions over; replaces ``lmms_host`` and ``lmms_port``
+            job_log: File recording background jobs across restarts, defaults to
+                     the user's cache directory
+            max_jobs: Most long-running operations running at once
+            inline_timeout: Seconds a long-running tool waits before answering
+                            with a job id instead of its result
+            snapshot_dir: Where session snapshots are stored, defaults to the
+                          user's cache directory
+            snapshots: Snapshot the session after every mutating tool
+            record_wire: Append all traffic with LMMS to this wire log, to be
+                         replayed with ``python -m benchmarks.replay``
+            snapshot_delay: Seconds without changes before the session is
+                            snapshotted, so a burst of changes is recorded once
         """
         self.server_host = server_host
         self.server_port = server_port
-        self.lmms_interface = LMMSInterface(lmms_host, lmms_port)
-        self.server = FastMCP(
+        self.recorder = WireRecorder(record_wire) if record_wire else None
+        interface = LMMSInterface if self.recorder is None else functools.partial(LMMSInterface,
+                                                                                   recorder=self.recorder)
+        self.backends = BackendPool(lmms_endpoints or [(lmms_host, lmms_port)], interface)
+        self.instrument_index = InstrumentIndex()
+        self.jobs = JobManager(job_log, max_jobs)
+        self.inline_timeout = inline_timeout
+        self.snapshot_dir = snapshot_dir
+        self.snapshots = snapshots
+        self.snapshot_delay = snapshot_delay
+        self._snapshot_stores: Dict[str, SnapshotStore] = {}
+        self._snapshot_locks: Dict[str, asyncio.Lock] = {}
+        self._snapshot_schedulers: Dict[str, SnapshotScheduler] = {}
+        # Tasks waiting for background jobs to finish before scheduling a snapshot
+        self._snapshot_waits: Set[asyncio.Task] = set()
+        # Source (LMMS address or project file) -> (state version or file stamp and options, analysis)
+        self._analyses: "OrderedDict[str, Tuple[Tuple, Dict[str, Any]]]" = OrderedDict()
+        self.metrics = ServerMetrics()
+        self.server = _InstrumentedFastMCP(
             name="LMMS-MCP",
             host=server_host,
             port=server_port
         )
+        self.server.metrics = self.metrics
+        self.server.backends = self.backends
+        # Report this package's version rather than the MCP library's as serverInfo
+        self.server._mcp_server.version = __version__
         self._register_tools()
+        self._register_resources()
+        # Served next to the streamable HTTP endpoint
+        self.server.custom_route(METRICS_PATH, methods=["GET"])(self._metrics_endpoint)
+
+    @property
+    def lmms_interface(self) -> LMMSInterface:
+        """The LMMS instance of the current MCP session."""
+        return self.backends.current().interface
+
+    @property
+    def session_state(self) -> SessionState:
+        """The mirror of the LMMS instance of the current MCP session."""
+        return self.backends.current().session_state
+
+    @property
+    def locks(self) -> ProjectLocks:
+        """The project, track and pattern locks of the LMMS instance of the current MCP session."""
+        return self.backends.current().locks
+
+    def _add_tool(self, fn, name: str, description: str, compact: bool = False):
+        """
+        Register a tool, wrapped so that its calls are measured.
+
+        With ``compact`` the result is sent as compact JSON text only, encoded
+        once by the fast encoder, instead of as indented text plus structured
+        output. Tools in :data:`SNAPSHOT_TOOLS` have the session snapshotted
+        in the background after they succeed.
+        """
+        if self.snapshots and name in SNAPSHOT_TOOLS:
+            fn = self._snapshotting(name, fn)
+        if compact:
+            self.server.add_tool(self.metrics.instrument(name, encoded(fn)), name=name, description=description,
+                                 structured_output=False)
+        else:
+            self.server.add_tool(self.metrics.instrument(name, fn), name=name, description=description)
 
     def _register_tools(self):
         """Register all available tools for the MCP protocol."""
-        self.server.add_tool(self.get_session_info, name="get_session_info",
-                            description="Get detailed information about the current LMMS session")
-        self.server.add_tool(self.get_track_info, name="get_track_info",
-                            description="Get detailed information about a specific track in LMMS")
-        self.server.add_tool(self.create_track, name="create_track",
+        self._add_tool(self.get_session_info, name="get_session_info", compact=True,
+                       description="Get information about the current LMMS session and its tracks. For large "
+                                   "projects page through tracks with offset/limit (next_offset is null on the "
+                                   "last page), keep only some track fields with fields (e.g. [\"name\", "
+                                   "\"instrument\", \"pattern_count\", \"note_count\"]), and pass the "
+                                   "version of an earlier answer as since_version to get only the tracks that "
+                                   "changed since")
+        self._add_tool(self.get_track_info, name="get_track_info", compact=True,
+                       description="Get detailed information about a specific track in LMMS, optionally only "
+                                   "some fields")
+        self._add_tool(self.read_project_file, name="read_project_file",
+                            description="Summarise an LMMS project file (.mmp or .mmpz) on disk without "
+                                        "opening it in LMMS")
+        self._add_tool(self.read_project_track, name="read_project_track",
+                            description="Get the patterns of one track of an LMMS project file on disk, "
+                                        "optionally including every note")
+        self._add_tool(self.analyze_project, name="analyze_project",
+                       description="Analyse all patterns in one pass on the server: estimated key and "
+                                   "best-fitting scales (usable in generate_pattern), notes per bar for the "
+                                   "project and each track, each track's pitch range and the track pairs "
+                                   "whose ranges overlap most, and notes of a pattern overlapping another at "
+                                   "the same pitch (duplicates). Covers the session patterns whose notes the "
+                                   "server knows, counting bars from each pattern's start, or with "
+                                   "project_path the patterns of a project file at their song positions. "
+                                   "Optionally only some tracks; top limits each ranked list. Repeated calls "
+                                   "are answered from a cache until the session or file changes",
+                       compact=True)
+        self._add_tool(self.create_track, name="create_track",
                             description="Create a new track in the LMMS session")
-        self.server.add_tool(self.set_track_name, name="set_track_name",
+        self._add_tool(self.delete_track, name="delete_track",
+                            description="Delete a track; later tracks move down by one index")
+        self._add_tool(self.set_track_name, name="set_track_name",
                             description="Set the name of a track")
-        self.server.add_tool(self.create_pattern, name="create_pattern",
+        self._add_tool(self.create_pattern, name="create_pattern",
                             description="Create a new pattern in a track")
-        self.server.add_tool(self.add_notes_to_pattern, name="add_notes_to_pattern",
-                            description="Add notes to a pattern")
-        self.server.add_tool(self.load_instrument, name="load_instrument",
-                            description="Load an instrument into a track")
-        self.server.add_tool(self.set_tempo, name="set_tempo",
+        self._add_tool(self.delete_pattern, name="delete_pattern",
+                            description="Delete a pattern from a track")
+        self._add_tool(self.add_notes_to_pattern, name="add_notes_to_pattern",
+                            description="Add notes to a pattern. " + _RECORDS_NOTE)
+        self._add_tool(self.remove_notes_from_pattern, name="remove_notes_from_pattern",
+                            description="Remove notes matching pitch, start and length from a pattern. "
+                                        + _RECORDS_NOTE)
+        self._add_tool(self.set_pattern_notes, name="set_pattern_notes",
+                       description="Replace all notes of a pattern; only the notes that changed since the "
+                                   "server last knew the pattern are sent to LMMS, so repeated edits of a "
+                                   "large pattern stay cheap. " + _RECORDS_NOTE)
+        self._add_tool(self.get_pattern_notes, name="get_pattern_notes", compact=True,
+                       description="Get the notes of a pattern as note dicts (with pan), or with "
+                                   "as_records=true as base64 note records in the format add_notes_to_pattern "
+                                   "accepts. Only patterns whose notes were set through this server, or that "
+                                   "are empty, can be read")
+        self._add_tool(self.generate_pattern, name="generate_pattern",
+                       description="Generate notes on the server from a compact spec and add them to a "
+                                   "pattern (or replace its notes). The spec is a dict or one line such as "
+                                   "\"euclid pulses=5 steps=16 note=36 repeat=64\", "
+                                   "\"steps 36=x...x... 42=x-x-X-x- repeat=32\" (x hit, X accent, - hold), "
+                                   "\"arp chords=Am,F,C,G mode=updown octaves=2 repeat=8\" or "
+                                   "\"walk root=A scale=minor count=256 low=45 high=72 seed=1\". Common keys: "
+                                   "step and length (beats, default 0.25), velocity, start (beat offset), "
+                                   "repeat, seed")
+        self._add_tool(self.import_midi, name="import_midi",
+                       description="Import a Standard MIDI File from disk: every channel of every MIDI track "
+                                   "with notes becomes a new instrument track with one pattern holding its "
+                                   "notes. Optionally only some MIDI tracks (by index) and without taking "
+                                   "the file's tempo. " + _JOB_NOTE)
+        self._add_tool(self.export_midi, name="export_midi",
+                       description="Export notes to a Standard MIDI File on disk: the patterns of the "
+                                   "current session whose notes the server knows (one MIDI track each), or "
+                                   "with project_path the tracks of an LMMS project file with their "
+                                   "patterns at their song positions")
+        self._add_tool(self.render_preview, name="render_preview",
+                       description="Render patterns to an audio preview offline, without LMMS: each pattern "
+                                   "({\"track_index\": t, \"pattern_index\": p, \"waveform\": optional}) is "
+                                   "synthesized with a simple oscillator (sine, triangle, saw, square or noise) "
+                                   "and they are mixed, starting together. Notes come from the session "
+                                   "(patterns whose notes the server knows) or from project_path. Writes a "
+                                   "16-bit WAV file to path, or returns it base64-encoded when path is "
+                                   f"omitted (up to {MAX_INLINE_SECONDS:.0f} seconds)")
+        self._add_tool(self.load_instrument, name="load_instrument",
+                            description="Load an instrument into a track, by path or by a short name "
+                                        "from get_instruments_list: an exact name or the start of exactly one "
+                                        "name. The result gives the instrument loaded. " + _JOB_NOTE)
+        self._add_tool(self.set_tempo, name="set_tempo",
                             description="Set the tempo of the LMMS session")
-        self.server.add_tool(self.play, name="play",
+        self._add_tool(self.play, name="play",
                             description="Start playback of the LMMS session")
-        self.server.add_tool(self.stop, name="stop",
+        self._add_tool(self.stop, name="stop",
                             description="Stop playback of the LMMS session")
-        self.server.add_tool(self.new_project, name="new_project",
+        self._add_tool(self.new_project, name="new_project",
                             description="Create a new LMMS project")
-        self.server.add_tool(self.save_project, name="save_project",
-                            description="Save the current LMMS project")
-        self.server.add_tool(self.get_instruments_list, name="get_instruments_list",
-                            description="Get a list of available instruments")
+        self._add_tool(self.save_project, name="save_project",
+                            description="Save the current LMMS project. " + _JOB_NOTE)
+        self._add_tool(self.get_job_status, name="get_job_status",
+                       description="Get the status, progress and, once finished, the result of a background "
+                                   "job, or list recent jobs when no job_id is given. With wait > 0 (seconds, "
+                                   "at most 60) the call waits for the job to finish, sending progress "
+                                   "notifications meanwhile")
+        self._add_tool(self.cancel_job, name="cancel_job",
+                       description="Cancel a queued or running background job. The server stops waiting for "
+                                   "it; an LMMS operation already sent may still complete")
+        self._add_tool(self.list_snapshots, name="list_snapshots",
+                       description="List snapshots of the session, newest first, one page at a time. A "
+                                   "snapshot is taken once changes made through this server pause; each "
+                                   "names the tools whose changes it records and the snapshot it followed")
+        self._add_tool(self.diff_snapshots, name="diff_snapshots",
+                       description="Compare two snapshots, or a snapshot with the current session when "
+                                   "to_snapshot is omitted: tempo, tracks added and removed, and per changed "
+                                   "track its name, instrument, patterns and notes added and removed")
+        self._add_tool(self.restore_snapshot, name="restore_snapshot",
+                       description="Bring the session back to a snapshot (undo), sending LMMS only the "
+                                   "tracks, patterns and notes that differ. Editing after a restore starts a "
+                                   "new branch of the history; later snapshots stay available")
+        self._add_tool(self.get_instruments_list, name="get_instruments_list",
+                            description="Search available instrument plugins, presets and samples by name "
+                                        "(prefix and fuzzy matching), one page at a time")
+        self._add_tool(self.batch, name="batch",
+                            description="Run an ordered list of operations in one call. Each operation is "
+                                        "{\"tool\": name, \"args\": {...}, \"id\": optional name}; a string "
+                                        "argument \"$<id or position>.<field>\" is replaced by a field of an "
+                                        "earlier result (e.g. \"$bass.track_index\"). Independent operations "
+                                        "run concurrently. With atomic=true all completed operations are "
+                                        "rolled back if any operation fails.")
+        self._add_tool(self.subscribe_playback, name="subscribe_playback",
+                       description="Stream playback updates to this session as they come from LMMS: the "
+                                   "playhead (position), tempo changes (tempo) and per-track peak levels "
+                                   "(meters). Updates arrive as notifications/resources/updated for "
+                                   "lmms://playback/<topic> with the new value in params.value, at most "
+                                   "max_rate per second (0.1 to 60); faster changes are merged, keeping the "
+                                   "latest position and tempo and the highest peaks. A session that does not "
+                                   "keep up with its updates is unsubscribed. Calling again adds topics and "
+                                   "changes the rate")
+        self._add_tool(self.unsubscribe_playback, name="unsubscribe_playback",
+                       description="Stop streaming some or, by default, all playback topics to this session")
+        self._add_tool(self.get_server_stats, name="get_server_stats",
+                       description="Get per-tool call counts, error counts, in-flight calls and latencies, "
+                                   "split into time waiting for LMMS and time spent in the server, and "
+                                   "LMMS request latencies per priority lane")
+
+    def _register_resources(self):
+        """Register the playback resources and subscriptions to them."""
+        for topic in TOPICS:
+            self.server.resource(topic_uri(topic), name=f"playback-{topic}", mime_type="application/json",
+                                 description=f"Latest {topic} reported by LMMS (null until reported); "
+                                             f"subscribe to be sent updates at {DEFAULT_MAX_RATE:g} per second "
+                                             f"or the rate chosen with subscribe_playback")(
+                self._playback_resource(topic))
+        self.server._mcp_server.subscribe_resource()(self._subscribe_resource)
+        self.server._mcp_server.unsubscribe_resource()(self._unsubscribe_resource)
+
+    def _playback_resource(self, topic: str):
+        def read() -> str:
+            return json.dumps(self.backends.current().playback.current(topic))
+
+        read.__name__ = f"playback_{topic}"
+        return read
+
+    async def _subscribe_resource(self, uri):
+        topic = uri_topic(uri)
+        key = self.server.session_key()
+        with session_scope(key):
+            hub = self.backends.current().playback
+            subscriber = hub.subscription(key)
+            hub.subscribe(key, self.server.update_sender(), [topic],
+                          DEFAULT_MAX_RATE if subscriber is None else subscriber.max_rate)
+
+    async def _unsubscribe_resource(self, uri):
+        key = self.server.session_key()
+        with session_scope(key):
+            self.backends.current().playback.unsubscribe(key, [uri_topic(uri)])
 
     async def start(self, use_stdio: bool = False):
         """
@@ -83,10 +454,7 @@ class MCPServer:
             use_stdio: If True, use stdio transport (for Claude Desktop).
                       If False, use HTTP transport (for testing).
         """
-        # First start the LMMS interface's OSC server
-        transport = await self.lmms_interface.start_server()
-        
-        # Then start the MCP server
+        # The LMMS endpoint is opened by the first tool call that needs it
         if use_stdio:
             logger.info("Starting MCP server with stdio transport")
             await self.server.run_stdio_async()
@@ -94,76 +462,839 @@ class MCPServer:
             logger.info(f"Starting MCP server on {self.server_host}:{self.server_port}")
             await self.server.run_streamable_http_async()
 
+    async def _mutate(self, call, track_index: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Await a mutating LMMS call, keeping the session mirror honest.
+
+        If LMMS does not answer in time, or the call is cancelled, the change
+        may or may not have been applied, so the affected part of the mirror
+        is dropped.
+        """
+        try:
+            return await call
+        except (LMMSTimeoutError, asyncio.CancelledError):
+            self.session_state.invalidate(track_index)
+            raise
+
+    def _snapshot_store(self) -> SnapshotStore:
+        """The snapshot store of the current session's LMMS instance."""
+        address = self.backends.current().address
+        store = self._snapshot_stores.get(address)
+        if store is None:
+            store = self._snapshot_stores[address] = SnapshotStore(self.snapshot_dir, address)
+            self._snapshot_locks[address] = asyncio.Lock()
+            self._snapshot_schedulers[address] = SnapshotScheduler(self._auto_snapshot, self.snapshot_delay,
+                                                                   max(self.snapshot_delay,
+                                                                       DEFAULT_SNAPSHOT_MAX_DELAY))
+        return store
+
+    async def flush_snapshots(self):
+        """Take the snapshot of any change still waiting for a burst of changes to pause."""
+        store = self._snapshot_store()
+        await self._snapshot_schedulers[store.name].flush()
+
+    async def _sync_mirror(self):
+        """Fill the session mirror with every track, asking LMMS for the missing ones at once."""
+        if not self.session_state.synced:
+            await self.get_session_info()
+
+        async def fetch(track_index: int):
+            # Not while the track changes, or an older description could replace the new one
+            async with self.locks.track(track_index, exclusive=False):
+                await self.get_track_info(track_index)
+
+        await asyncio.gather(*(fetch(track_index) for track_index in range(self.session_state.track_count)
+                               if self.session_state.track_info(track_index, ["index"]) is None))
+
+    async def _take_snapshot(self, tool: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Snapshot the session; returns the new record, or None if nothing changed since the last one."""
+        store = self._snapshot_store()
+        async with self._snapshot_locks[store.name]:
+            await self._sync_mirror()
+            state = capture(self.session_state)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, store.take, state, tool)
+
+    async def _auto_snapshot(self, tool: str):
+        """Snapshot after a tool, logging rather than failing the tool if that goes wrong."""
+        try:
+            await self._take_snapshot(tool)
+        except Exception as e:
+            logger.warning(f"Could not snapshot the session after {tool}: {e}")
+
+    def _schedule_snapshot(self, tool: str):
+        """Have the session snapshotted in the background once changes pause."""
+        store = self._snapshot_store()
+        self._snapshot_schedulers[store.name].changed(tool)
+
+    async def _snapshot_after_job(self, job_id: str, tool: str):
+        """Snapshot once a tool that went on as a background job has succeeded."""
+        try:
+            job = self.jobs.get(job_id)
+            while not job.done:
+                await self.jobs.wait(job, MAX_JOB_WAIT)
+            if job.status == SUCCEEDED:
+                self._schedule_snapshot(tool)
+        except Exception as e:
+            logger.warning(f"Could not snapshot the session after {tool} job {job_id}: {e}")
+
+    def _snapshotting(self, name: str, fn):
+        """Wrap a mutating tool so the session is snapshotted after it succeeds, without waiting for that."""
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            result = await fn(*args, **kwargs)
+            if isinstance(result, dict) and "job_id" in result and result.get("status") not in FINISHED:
+                task = asyncio.ensure_future(self._snapshot_after_job(result["job_id"], name))
+                self._snapshot_waits.add(task)
+                task.add_done_callback(self._snapshot_waits.discard)
+            else:
+                self._schedule_snapshot(name)
+            return result
+
+        return wrapper
+
+    async def _run_job(self, kind: str, args: Dict[str, Any], work: Work,
+                       background: Optional[bool]) -> Dict[str, Any]:
+        """
+        Run a long operation as a job.
+
+        Args:
+            kind: The tool name
+            args: The tool arguments, for the job record
+            work: Coroutine function doing the work, passed a progress callback
+            background: True to answer with the job id at once, False to run
+                        inline without a job, None to wait up to ``inline_timeout``
+                        for the result and answer with the job id after that
+
+        Returns:
+            The operation's result, or the job's status including ``job_id``
+        """
+        if background is False:
+            return await work(lambda *progress: None)
+        job = self.jobs.start(kind, work, args)
+        if background:
+            return self.jobs.register(job).to_dict()
+        try:
+            finished = await self.jobs.wait(job, self.inline_timeout, self.server.progress_sender())
+        except asyncio.CancelledError:
+            # The caller gave up; keep the job reachable
+            self.jobs.register(job)
+            raise
+        if not finished:
+            logger.info(f"{kind} is taking longer than {self.inline_timeout}s, continuing as job {job.id}")
+            return self.jobs.register(job).to_dict()
+        if job.exception is not None:
+            raise job.exception
+        return job.result
+
     # Function implementations
-    async def get_session_info(self) -> Dict[str, Any]:
-        """Get information about the current LMMS session."""
-        return await self.lmms_interface.get_session_info()
+    async def get_session_info(self, fields: Optional[List[str]] = None, offset: int = 0,
+                               limit: Optional[int] = None, since_version: Optional[int] = None) -> Dict[str, Any]:
+        """Get information about the current LMMS session, one page of tracks at a time."""
+        if not self.session_state.synced:
+            self.session_state.load_session(await self.lmms_interface.get_session_info())
+        return self.session_state.session_info(fields, offset, limit, since_version)
 
-    async def get_track_info(self, track_index: int) -> Dict[str, Any]:
+    async def get_track_info(self, track_index: int, fields: Optional[List[str]] = None) -> Dict[str, Any]:
         """Get information about a specific track."""
-        return await self.lmms_interface.get_track_info(track_index)
+        track = self.session_state.track_info(track_index, fields)
+        if track is None:
+            self.session_state.load_track(track_index, await self.lmms_interface.get_track_info(track_index))
+            track = self.session_state.track_info(track_index, fields)
+        return track
+
+    async def read_project_file(self, path: str) -> Dict[str, Any]:
+        """Summarise a project file on disk."""
+        loop = asyncio.get_running_loop()
+        project = await loop.run_in_executor(None, open_project, path)
+        return project.info()
+
+    async def read_project_track(self, path: str, track_index: int, include_notes: bool = False) -> Dict[str, Any]:
+        """Get one track of a project file on disk with its patterns."""
+        def read():
+            return open_project(path).track(track_index).to_dict(include_patterns=True, include_notes=include_notes)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, read)
+
+    def _cached_analysis(self, source: str, stamp: Tuple) -> Optional[Dict[str, Any]]:
+        """A cached analysis of ``source`` if it was made at ``stamp``."""
+        cached = self._analyses.get(source)
+        if cached is None or cached[0] != stamp:
+            return None
+        self._analyses.move_to_end(source)
+        return cached[1]
+
+    def _cache_analysis(self, source: str, stamp: Tuple, result: Dict[str, Any]):
+        self._analyses[source] = (stamp, result)
+        self._analyses.move_to_end(source)
+        while len(self._analyses) > ANALYSIS_CACHE_SIZE:
+            self._analyses.popitem(last=False)
+
+    @staticmethod
+    def _analyze_project_file(path: str, tracks: Optional[List[int]], top: int) -> Dict[str, Any]:
+        """Analyse the patterns of a project file at their song positions."""
+        project = open_project(path)
+        parts = [Part(track.index, track.name, pattern.index, pattern.position, pattern.notes)
+                 for track in project.tracks if tracks is None or track.index in tracks
+                 for pattern in track.patterns]
+        return analyze(parts, project.tempo, top)
+
+    async def analyze_project(self, project_path: Optional[str] = None, tracks: Optional[List[int]] = None,
+                              top: int = DEFAULT_TOP) -> Dict[str, Any]:
+        """Analyse key, density, ranges and collisions of the known session patterns or a project file."""
+        loop = asyncio.get_running_loop()
+        options = (tuple(sorted(tracks)) if tracks is not None else None, top)
+        if project_path is not None:
+            source = os.path.realpath(project_path)
+            stat = await loop.run_in_executor(None, os.stat, source)
+            stamp = (stat.st_mtime_ns, stat.st_size) + options
+            result = self._cached_analysis(source, stamp)
+            if result is not None:
+                return {**result, "cached": True}
+            result = await loop.run_in_executor(None, self._analyze_project_file, source, tracks, top)
+            result["path"] = project_path
+            self._cache_analysis(source, stamp, result)
+            return {**result, "cached": False}
+
+        state = self.session_state
+        source = self.backends.current().address
+        stamp = (state.version,) + options
+        result = self._cached_analysis(source, stamp)
+        if result is not None:
+            return {**result, "cached": True}
+        # Patterns are immutable, so the notes can be analysed off the event loop while edits go on
+        parts = []
+        for track_index, pattern_index in state.known_patterns():
+            if tracks is not None and track_index not in tracks:
+                continue
+            info = state.track_info(track_index) or {}
+            parts.append(Part(track_index, info.get("name") or f"Track {track_index + 1}", pattern_index, 0,
+                              state.pattern_notes(track_index, pattern_index)))
+        unknown = sum(1 for track_index in range(state.track_count)
+                      if tracks is None or track_index in tracks
+                      for pattern in (state.track_info(track_index) or {}).get("patterns", [])
+                      if state.pattern_notes(track_index, pattern.get("index")) is None)
+        result = await loop.run_in_executor(None, analyze, parts, state.tempo, top)
+        result.update(version=stamp[0], patterns_without_notes=unknown)
+        self._cache_analysis(source, stamp, result)
+        return {**result, "cached": False}
 
     async def create_track(self, track_type: str = "instrument", name: str = None) -> Dict[str, Any]:
         """Create a new track."""
-        return await self.lmms_interface.create_track(track_type, name)
+        # Appending a track renumbers nothing, so other edits may go on meanwhile
+        async with self.locks.project(exclusive=False):
+            result = await self._mutate(self.lmms_interface.create_track(track_type, name))
+            self.session_state.track_created(result.get("track_index"), track_type, name)
+        return result
+
+    async def delete_track(self, track_index: int) -> Dict[str, Any]:
+        """Delete a track."""
+        # Later tracks are renumbered, so nothing else may run meanwhile
+        async with self.locks.project():
+            result = await self._mutate(self.lmms_interface.delete_track(track_index))
+            self.session_state.track_deleted(track_index)
+        return result
 
     async def set_track_name(self, track_index: int, name: str) -> Dict[str, Any]:
         """Set the name of a track."""
-        return await self.lmms_interface.set_track_name(track_index, name)
+        async with self.locks.track(track_index):
+            result = await self._mutate(self.lmms_interface.set_track_name(track_index, name), track_index)
+            self.session_state.track_renamed(track_index, name)
+        return result
 
     async def create_pattern(self, track_index: int, steps: int = 16) -> Dict[str, Any]:
         """Create a new pattern for a track."""
-        return await self.lmms_interface.create_pattern(track_index, steps)
+        async with self.locks.track(track_index):
+            result = await self._mutate(self.lmms_interface.create_pattern(track_index, steps), track_index)
+            self.session_state.pattern_created(track_index, result.get("pattern_index"), steps)
+        return result
 
-    async def add_notes_to_pattern(self, track_index: int, pattern_index: int, notes: List[Dict[str, Any]]) -> Dict[str, Any]:
+    async def delete_pattern(self, track_index: int, pattern_index: int) -> Dict[str, Any]:
+        """Delete a pattern from a track."""
+        async with self.locks.track(track_index):
+            result = await self._mutate(self.lmms_interface.delete_pattern(track_index, pattern_index), track_index)
+            self.session_state.pattern_deleted(track_index, pattern_index)
+        return result
+
+    @staticmethod
+    def _notes_argument(notes: Optional[List[Dict[str, Any]]],
+                        records: Optional[str]) -> Union[List[Dict[str, Any]], Pattern]:
+        """The notes of a tool call, given either as note dicts or as base64 note records."""
+        if (notes is None) == (records is None):
+            raise NoteValidationError("Pass the notes either as note dicts (notes) or as base64 note records "
+                                      "(records)")
+        return notes if records is None else Pattern.from_base64(records)
+
+    async def add_notes_to_pattern(self, track_index: int, pattern_index: int,
+                                   notes: Optional[List[Dict[str, Any]]] = None,
+                                   records: Optional[str] = None) -> Dict[str, Any]:
         """Add notes to a pattern."""
-        return await self.lmms_interface.add_notes_to_pattern(track_index, pattern_index, notes)
+        return await self._add_notes(track_index, pattern_index, self._notes_argument(notes, records))
+
+    async def _add_notes(self, track_index: int, pattern_index: int,
+                         notes: Union[List[Dict[str, Any]], Pattern]) -> Dict[str, Any]:
+        """Add note dicts or a pattern's notes to a pattern, keeping the last-known notes current."""
+        async with self.locks.pattern(track_index, pattern_index):
+            known = self.session_state.pattern_notes(track_index, pattern_index)
+            result = await self._mutate(
+                self.lmms_interface.add_notes_to_pattern(track_index, pattern_index, notes), track_index)
+            self.session_state.notes_added(track_index, pattern_index, len(notes))
+            if known is not None:
+                added = notes if isinstance(notes, Pattern) else Pattern.from_dicts(notes)
+                self.session_state.notes_set(track_index, pattern_index, known.concat([added]))
+        return result
+
+    async def remove_notes_from_pattern(self, track_index: int, pattern_index: int,
+                                        notes: Optional[List[Dict[str, Any]]] = None,
+                                        records: Optional[str] = None) -> Dict[str, Any]:
+        """Remove notes from a pattern."""
+        notes = self._notes_argument(notes, records)
+        async with self.locks.pattern(track_index, pattern_index):
+            known = self.session_state.pattern_notes(track_index, pattern_index)
+            result = await self._mutate(
+                self.lmms_interface.remove_notes_from_pattern(track_index, pattern_index, notes), track_index)
+            self.session_state.notes_added(track_index, pattern_index, -len(notes))
+            if known is not None:
+                # LMMS removes notes by pitch, start and length
+                removed = notes if isinstance(notes, Pattern) else Pattern.from_dicts(notes)
+                remaining = known.difference(removed, match_velocity=False)
+                self.session_state.notes_set(track_index, pattern_index, remaining)
+        return result
+
+    async def _known_notes(self, track_index: int, pattern_index: int) -> Pattern:
+        """The current notes of a pattern, which must be known to the server or empty."""
+        known = self.session_state.pattern_notes(track_index, pattern_index)
+        if known is not None:
+            return known
+        if self.session_state.pattern_note_count(track_index, pattern_index) is None:
+            self.session_state.load_track(track_index, await self.lmms_interface.get_track_info(track_index))
+        if self.session_state.pattern_note_count(track_index, pattern_index) == 0:
+            return Pattern.empty()
+        raise ValueError(f"The notes of pattern {pattern_index} on track {track_index} were not set through "
+                         f"this server, so they cannot be replaced; create a new pattern instead")
+
+    async def set_pattern_notes(self, track_index: int, pattern_index: int,
+                                notes: Optional[List[Dict[str, Any]]] = None,
+                                records: Optional[str] = None) -> Dict[str, Any]:
+        """Replace the notes of a pattern, sending LMMS only the difference."""
+        notes = self._notes_argument(notes, records)
+        new = notes if isinstance(notes, Pattern) else Pattern.from_dicts(notes)
+        return await self._replace_notes(track_index, pattern_index, new)
+
+    async def get_pattern_notes(self, track_index: int, pattern_index: int,
+                                as_records: bool = False) -> Dict[str, Any]:
+        """Get the last-known notes of a pattern as note dicts or base64 note records."""
+        notes = await self._known_notes(track_index, pattern_index)
+        result = {"track_index": track_index, "pattern_index": pattern_index, "count": len(notes)}
+        if as_records:
+            result["records"] = notes.to_base64()
+        else:
+            result["notes"] = notes.to_dicts()
+        return result
+
+    async def _replace_notes(self, track_index: int, pattern_index: int, new: Pattern) -> Dict[str, Any]:
+        """Make ``new`` the notes of a pattern by sending the difference from the last-known notes."""
+        async with self.locks.pattern(track_index, pattern_index):
+            return await self._send_difference(track_index, pattern_index, new)
+
+    async def _send_difference(self, track_index: int, pattern_index: int, new: Pattern) -> Dict[str, Any]:
+        """Send the difference between a pattern's last-known notes and ``new``; the pattern must be locked."""
+        old = await self._known_notes(track_index, pattern_index)
+        removed, added = diff_patterns(old, new)
+        try:
+            if len(removed):
+                await self._mutate(
+                    self.lmms_interface.remove_notes_from_pattern(track_index, pattern_index, removed), track_index)
+            if len(added):
+                await self._mutate(
+                    self.lmms_interface.add_notes_to_pattern(track_index, pattern_index, added), track_index)
+        except Exception:
+            # Part of the change may have been applied
+            self.session_state.notes_set(track_index, pattern_index, None)
+            raise
+        self.session_state.notes_set(track_index, pattern_index, new)
+        modified = len(removed) - len(removed.difference(added, match_velocity=False))
+        return {
+            "success": True,
+            "notes": len(new),
+            "added": len(added) - modified,
+            "removed": len(removed) - modified,
+            "modified": modified,
+            "unchanged": len(new) - len(added),
+        }
+
+    async def generate_pattern(self, track_index: int, pattern_index: int, spec: Union[str, Dict[str, Any]],
+                               replace: bool = False) -> Dict[str, Any]:
+        """Expand a generator spec on the server and add or set the resulting notes."""
+        loop = asyncio.get_running_loop()
+        notes = await loop.run_in_executor(None, generate, spec)
+        if replace:
+            result = await self._replace_notes(track_index, pattern_index, notes)
+        else:
+            result = await self._add_notes(track_index, pattern_index, notes)
+        result = dict(result)
+        result["generated"] = len(notes)
+        result["end_beat"] = (max((s + l for s, l in zip(notes.start.tolist(), notes.length.tolist())), default=0)
+                              / TICKS_PER_BEAT)
+        return result
+
+    async def import_midi(self, path: str, tracks: Optional[List[int]] = None, set_tempo: bool = True,
+                          background: Optional[bool] = None) -> Dict[str, Any]:
+        """Import a MIDI file."""
+        return await self._run_job(
+            "import_midi", {"path": path, "tracks": tracks, "set_tempo": set_tempo},
+            functools.partial(self._import_midi, path, tracks, set_tempo), background)
+
+    async def _import_midi(self, path: str, tracks: Optional[List[int]], set_tempo: bool,
+                           report: ProgressCallback) -> Dict[str, Any]:
+        """Import a MIDI file, ingesting each track into LMMS while the next one is parsed."""
+        # Held shared throughout, so no track is renumbered between creating it and filling it
+        async with self.locks.project(exclusive=False):
+            return await self._import_midi_tracks(path, tracks, set_tempo, report)
+
+    async def _import_midi_tracks(self, path: str, tracks: Optional[List[int]], set_tempo: bool,
+                                  report: ProgressCallback) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        reader = await loop.run_in_executor(None, MidiReader, path)
+        chunks = reader.tracks()
+        ingests = []
+        events = 0
+        tempo = None
+        parsed = 0
 
-    async def load_instrument(self, track_index: int, instrument_path: str) -> Dict[str, Any]:
+        def ingested(_):
+            done = sum(task.done() for task in ingests)
+            report(parsed, reader.track_count, f"Parsed {parsed} of {reader.track_count} tracks, "
+                                               f"{done} of {len(ingests)} parts sent to LMMS")
+
+        reading = None
+        try:
+            while True:
+                # Shielded, so a cancelled import can still wait for the thread reading the file
+                reading = loop.run_in_executor(None, next, chunks, None)
+                track = await asyncio.shield(reading)
+                if track is None:
+                    break
+                parsed += 1
+                events += track.events
+                tempo = tempo or track.tempo
+                if tracks is None or track.index in tracks:
+                    for part in track.parts:
+                        task = asyncio.ensure_future(self._import_midi_part(part))
+                        task.add_done_callback(ingested)
+                        ingests.append(task)
+                ingested(None)
+            imported = await asyncio.gather(*ingests)
+        except BaseException:
+            for task in ingests:
+                task.cancel()
+            # They run under this call's project lock, so they must stop before it is released
+            await asyncio.gather(*ingests, return_exceptions=True)
+            raise
+        finally:
+            if reading is not None and not reading.done():
+                # The file cannot be closed while a thread is still reading it
+                await asyncio.wait([reading])
+            reader.close()
+        if tempo and set_tempo:
+            await self.set_tempo(tempo)
+        return {"success": True, "path": path, "format": reader.format, "events": events, "tempo": tempo,
+                "tracks": imported}
+
+    async def _import_midi_part(self, part: MidiPart) -> Dict[str, Any]:
+        """Create a track and a pattern for one channel of a MIDI track and add its notes."""
+        created = await self.create_track("instrument", part.name)
+        track_index = created.get("track_index")
+        if track_index is None:
+            raise LMMSError(f"LMMS did not report the index of the track created for '{part.name}'")
+        pattern = await self.create_pattern(track_index, part.steps)
+        pattern_index = pattern.get("pattern_index")
+        if pattern_index is None:
+            raise LMMSError(f"LMMS did not report the index of the pattern created for '{part.name}'")
+        await self._add_notes(track_index, pattern_index, part.notes)
+        result = part.to_dict()
+        result.update(track_index=track_index, pattern_index=pattern_index)
+        return result
+
+    async def export_midi(self, path: str, project_path: Optional[str] = None,
+                          tracks: Optional[List[int]] = None) -> Dict[str, Any]:
+        """Write session patterns or the tracks of a project file to a MIDI file."""
+        loop = asyncio.get_running_loop()
+        if project_path is not None:
+            result = await loop.run_in_executor(None, export_project_file, project_path, path, tracks)
+            return {"success": True, "path": path, **result}
+        parts = []
+        for track_index, pattern_index in self.session_state.known_patterns():
+            if tracks is not None and track_index not in tracks:
+                continue
+            notes = self.session_state.pattern_notes(track_index, pattern_index)
+            if not len(notes):
+                continue
+            info = self.session_state.track_info(track_index) or {}
+            name = info.get("name") or f"Track {track_index + 1}"
+            parts.append((f"{name} pattern {pattern_index + 1}", notes))
+        tempo = self.session_state.tempo
+        written = await loop.run_in_executor(None, export_patterns, path, parts, tempo)
+        return {"success": True, "path": path, "tempo": tempo, "tracks": written}
+
+    def _session_previews(self, patterns: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], Pattern, int]]:
+        """The known notes and steps of session patterns to preview."""
+        sources = []
+        for item in patterns:
+            track_index, pattern_index = item["track_index"], item.get("pattern_index", 0)
+            notes = self.session_state.pattern_notes(track_index, pattern_index)
+            if notes is None:
+                raise PreviewError(f"The notes of pattern {pattern_index} of track {track_index} are not known "
+                                   f"to the server; set them through it or render from project_path")
+            info = self.session_state.track_info(track_index) or {}
+            steps = next((p.get("steps") or 0 for p in info.get("patterns", []) if p.get("index") == pattern_index), 0)
+            sources.append((item, notes, steps))
+        return sources
+
+    @staticmethod
+    def _project_previews(project_path: str, patterns: List[Dict[str, Any]]):
+        """The tempo of a project file and the notes and steps of its patterns to preview."""
+        project = open_project(project_path)
+        sources = []
+        for item in patterns:
+            track_index, pattern_index = item["track_index"], item.get("pattern_index", 0)
+            found = project.track(track_index).patterns
+            if not 0 <= pattern_index < len(found):
+                raise PreviewError(f"Pattern {pattern_index} out of range (track {track_index} has "
+                                   f"{len(found)} patterns)")
+            notes = found[pattern_index].notes
+            sources.append((item, Pattern(notes.pitch, notes.velocity, notes.start, notes.length),
+                            found[pattern_index].steps))
+        return project.tempo, sources
+
+    async def render_preview(self, patterns: List[Dict[str, Any]], project_path: Optional[str] = None,
+                             path: Optional[str] = None, waveform: str = DEFAULT_WAVEFORM,
+                             sample_rate: int = DEFAULT_SAMPLE_RATE, gain: float = DEFAULT_GAIN) -> Dict[str, Any]:
+        """Render patterns offline and mix them into a WAV preview."""
+        if not patterns:
+            raise PreviewError("No patterns to render")
+        loop = asyncio.get_running_loop()
+        if project_path is not None:
+            tempo, sources = await loop.run_in_executor(None, self._project_previews, project_path, patterns)
+        else:
+            tempo, sources = self.session_state.tempo, self._session_previews(patterns)
+        tempo = tempo or DEFAULT_TEMPO
+
+        started = loop.time()
+        renders = [functools.partial(render_pattern, pack_pattern(notes), tempo, sample_rate,
+                                     item.get("waveform", waveform), steps * STEP_TICKS, gain)
+                   for item, notes, steps in sources]
+        # One pattern renders on a thread; several render at once in worker processes
+        executor = render_pool() if len(renders) > 1 else None
+        rendered = await asyncio.gather(*(loop.run_in_executor(executor, render) for render in renders))
+
+        def finish() -> Dict[str, Any]:
+            audio = mix(rendered)
+            result = describe(audio, sample_rate)
+            if path is not None:
+                write_wav(path, audio, sample_rate)
+                result["path"] = path
+            elif result["seconds"] > MAX_INLINE_SECONDS:
+                raise PreviewError(f"The preview is {result['seconds']} seconds long; pass a path to write "
+                                   f"previews longer than {MAX_INLINE_SECONDS:.0f} seconds")
+            else:
+                result["wav_base64"] = base64.b64encode(wav_bytes(audio, sample_rate)).decode("ascii")
+            return result
+
+        result = await loop.run_in_executor(None, finish)
+        elapsed = loop.time() - started
+        return {"success": True, "tempo": tempo, "sample_rate": sample_rate,
+                "patterns": [{"track_index": item["track_index"], "pattern_index": item.get("pattern_index", 0),
+                              "notes": len(notes)} for item, notes, _ in sources],
+                "render_seconds": round(elapsed, 3),
+                "realtime": round(result["seconds"] / elapsed, 1) if elapsed > 0 else None, **result}
+
+    async def _resolve_instrument(self, instrument: str) -> str:
+        """Turn a short instrument name into a plugin name or path using the instrument index."""
+        if os.sep in instrument or (os.altsep and os.altsep in instrument) or os.path.exists(instrument):
+            return instrument
+        loop = asyncio.get_running_loop()
+        resolved = await loop.run_in_executor(None, self.instrument_index.resolve, instrument)
+        return resolved or instrument
+
+    async def load_instrument(self, track_index: int, instrument_path: str,
+                              background: Optional[bool] = None) -> Dict[str, Any]:
         """Load an instrument for a track."""
-        return await self.lmms_interface.load_instrument(track_index, instrument_path)
+        async def work(report: ProgressCallback) -> Dict[str, Any]:
+            report(0, 2, "Resolving instrument")
+            resolved = await self._resolve_instrument(instrument_path)
+            report(1, 2, f"Loading {resolved}")
+            async with self.locks.track(track_index):
+                result = await self._mutate(self.lmms_interface.load_instrument(track_index, resolved),
+                                            track_index)
+                self.session_state.instrument_loaded(track_index, resolved)
+            report(2, 2, "Loaded")
+            return {**result, "instrument": resolved}
+
+        return await self._run_job("load_instrument", {"track_index": track_index,
+                                                       "instrument_path": instrument_path}, work, background)
 
     async def set_tempo(self, tempo: float) -> Dict[str, Any]:
         """Set the project tempo in BPM."""
-        return await self.lmms_interface.set_tempo(tempo)
+        result = await self._mutate(self.lmms_interface.set_tempo(tempo))
+        self.session_state.tempo_changed(tempo)
+        return result
 
     async def play(self) -> Dict[str, Any]:
         """Start playback."""
-        return await self.lmms_interface.play()
+        result = await self.lmms_interface.play()
+        self.session_state.playing_changed(True)
+        return result
 
     async def stop(self) -> Dict[str, Any]:
         """Stop playback."""
-        return await self.lmms_interface.stop()
+        result = await self.lmms_interface.stop()
+        self.session_state.playing_changed(False)
+        return result
 
     async def new_project(self) -> Dict[str, Any]:
         """Create a new project."""
-        return await self.lmms_interface.new_project()
+        # A new project may go to a different, less busy LMMS instance
+        self.backends.place_new_project()
+        async with self.locks.project():
+            try:
+                return await self.lmms_interface.new_project()
+            finally:
+                # Force a full resync from LMMS on the next read
+                self.session_state.invalidate()
 
-    async def save_project(self, path: str = None) -> Dict[str, Any]:
+    async def save_project(self, path: str = None, background: Optional[bool] = None) -> Dict[str, Any]:
         """Save the current project."""
-        return await self.lmms_interface.save_project(path)
+        async def work(report: ProgressCallback) -> Dict[str, Any]:
+            report(0, 1, "Saving")
+            # Saved between edits, never in the middle of one
+            async with self.locks.project():
+                try:
+                    result = await self.lmms_interface.save_project(path)
+                finally:
+                    # Saving does not change any notes
+                    self.session_state.invalidate(keep_notes=True)
+            report(1, 1, "Saved")
+            return result
+
+        return await self._run_job("save_project", {"path": path}, work, background)
+
+    async def get_job_status(self, job_id: Optional[str] = None, wait: float = 0) -> Dict[str, Any]:
+        """Describe a background job, waiting for it if asked, or list recent jobs."""
+        if job_id is None:
+            return {"jobs": [job.to_dict() for job in self.jobs.jobs()]}
+        job = self.jobs.get(job_id)
+        if wait > 0 and not job.done:
+            await self.jobs.wait(job, min(wait, MAX_JOB_WAIT), self.server.progress_sender())
+        return job.to_dict()
 
-    async def get_instruments_list(self) -> Dict[str, Any]:
-        """Get a list of available instruments."""
-        return await self.lmms_interface.get_instruments_list()
+    async def cancel_job(self, job_id: str) -> Dict[str, Any]:
+        """Cancel a background job."""
+        job = self.jobs.cancel(job_id)
+        if job.task is not None:
+            await self.jobs.wait(job, self.inline_timeout)
+        return job.to_dict()
+
+    async def list_snapshots(self, offset: int = 0, limit: int = 50) -> Dict[str, Any]:
+        """List the session's snapshots, newest first."""
+        await self.flush_snapshots()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._snapshot_store().snapshots, offset, limit)
+
+    async def diff_snapshots(self, from_snapshot: int, to_snapshot: Optional[int] = None) -> Dict[str, Any]:
+        """Compare a snapshot with another one or with the current session."""
+        store = self._snapshot_store()
+        await self.flush_snapshots()
+        loop = asyncio.get_running_loop()
+        old = await loop.run_in_executor(None, store.load, from_snapshot)
+        if to_snapshot is None:
+            await self._sync_mirror()
+            new = await loop.run_in_executor(None, store.tree, capture(self.session_state))
+        else:
+            new = await loop.run_in_executor(None, store.load, to_snapshot)
+        result = await loop.run_in_executor(None, store.diff, old, new)
+        result["from"] = from_snapshot
+        result["to"] = to_snapshot
+        return result
+
+    async def restore_snapshot(self, snapshot_id: int) -> Dict[str, Any]:
+        """Bring the session back to a snapshot, sending LMMS only what differs."""
+        # Earlier changes are recorded before the history moves to the snapshot
+        await self.flush_snapshots()
+        async with self.locks.project():
+            return await self._restore_snapshot(snapshot_id)
+
+    async def _restore_snapshot(self, snapshot_id: int) -> Dict[str, Any]:
+        store = self._snapshot_store()
+        loop = asyncio.get_running_loop()
+        target = await loop.run_in_executor(None, store.load, snapshot_id)
+        await self._sync_mirror()
+        current = await loop.run_in_executor(
+            None, functools.partial(store.tree, capture(self.session_state), write=False))
+        summary = {"success": True, "restored": snapshot_id, "tracks_created": 0, "tracks_deleted": 0,
+                   "tracks_changed": 0, "patterns_changed": 0, "notes_added": 0, "notes_removed": 0,
+                   "skipped": []}
+        if target["tempo"] is not None and target["tempo"] != current["tempo"]:
+            await self.set_tempo(target["tempo"])
+        for track_index in range(len(current["tracks"]) - 1, len(target["tracks"]) - 1, -1):
+            await self.delete_track(track_index)
+            summary["tracks_deleted"] += 1
+        for track_index, track in enumerate(target["tracks"]):
+            if track_index < len(current["tracks"]):
+                before = current["tracks"][track_index]
+                if before["hash"] == track["hash"]:
+                    continue
+                summary["tracks_changed"] += 1
+            else:
+                created = await self.create_track(track["type"] or "instrument", track["name"])
+                track_index = created.get("track_index", track_index)
+                before = {"name": track["name"], "type": track["type"], "instrument": None, "patterns": []}
+                summary["tracks_created"] += 1
+            await self._restore_track(store, track_index, before, track, summary)
+        # Later snapshots branch from the restored one
+        store.checkout(snapshot_id)
+        return summary
+
+    async def _restore_track(self, store: SnapshotStore, track_index: int, before: Dict[str, Any],
+                             after: Dict[str, Any], summary: Dict[str, Any]):
+        """Turn one track from its current snapshot description into another, counting changes in ``summary``."""
+        skipped = summary["skipped"]
+        if after["name"] is not None and after["name"] != before["name"]:
+            await self.set_track_name(track_index, after["name"])
+        if after["instrument"] and after["instrument"] != before["instrument"]:
+            await self.load_instrument(track_index, after["instrument"], background=False)
+        if before["type"] != after["type"]:
+            skipped.append(f"track {track_index}: a {before['type']} track cannot become a {after['type']} track")
+        old_patterns, new_patterns = before["patterns"], after["patterns"]
+        for pattern in reversed(old_patterns[len(new_patterns):]):
+            await self.delete_pattern(track_index, pattern["index"])
+        for pattern in new_patterns[len(old_patterns):]:
+            await self.create_pattern(track_index, pattern["steps"] or 16)
+        loop = asyncio.get_running_loop()
+        for position, pattern in enumerate(new_patterns):
+            old = old_patterns[position] if position < len(old_patterns) else None
+            where = f"track {track_index} pattern {pattern['index']}"
+            if old is not None and old["steps"] != pattern["steps"]:
+                skipped.append(f"{where}: the length cannot be changed from {old['steps']} to {pattern['steps']} steps")
+            if pattern["notes"] is None:
+                if old is not None and old["notes"] is not None:
+                    skipped.append(f"{where}: the notes were not known to the server when the snapshot was taken")
+                continue
+            if old is not None and old["notes"] == pattern["notes"]:
+                continue
+            notes = await loop.run_in_executor(None, store.pattern, pattern["notes"])
+            try:
+                result = await self._replace_notes(track_index, pattern["index"], notes)
+            except ValueError as e:
+                skipped.append(f"{where}: {e}")
+                continue
+            summary["patterns_changed"] += 1
+            summary["notes_added"] += result["added"] + result["modified"]
+            summary["notes_removed"] += result["removed"] + result["modified"]
+
+    async def get_instruments_list(self, query: str = None, kind: str = None,
+                                   offset: int = 0, limit: int = 50) -> Dict[str, Any]:
+        """Search the instrument index."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, functools.partial(self.instrument_index.search, query, kind, offset, limit))
+
+    async def batch(self, operations: List[Dict[str, Any]], atomic: bool = False) -> Dict[str, Any]:
+        """Run many operations in one call."""
+        # Operations inside a batch always run inline
+        runner = BatchRunner({name: functools.partial(getattr(self, name), background=False)
+                              if name in JOB_TOOLS else getattr(self, name) for name in BATCH_TOOLS})
+        return await runner.run(operations, atomic)
+
+    async def subscribe_playback(self, topics: Optional[List[str]] = None,
+                                 max_rate: float = DEFAULT_MAX_RATE) -> Dict[str, Any]:
+        """Stream playhead, tempo and meter updates to the current MCP session."""
+        send = self.server.update_sender()
+        if send is None:
+            raise SubscriptionError("Playback updates can only be sent to an MCP session")
+        key = self.server.session_key()
+        hub = self.backends.current().playback
+        subscriber = hub.subscribe(key, send, topics, max_rate)
+        return {"topics": sorted(subscriber.topics), "max_rate": subscriber.max_rate,
+                "resources": {topic: topic_uri(topic) for topic in sorted(subscriber.topics)},
+                "current": {topic: hub.current(topic) for topic in sorted(subscriber.topics)}}
+
+    async def unsubscribe_playback(self, topics: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Stop streaming playback topics to the current MCP session."""
+        key = self.server.session_key()
+        hub = self.backends.current().playback
+        removed = hub.unsubscribe(key, topics) if key is not None else []
+        subscriber = hub.subscription(key) if key is not None else None
+        return {"unsubscribed": removed, "topics": sorted(subscriber.topics) if subscriber else []}
+
+    async def get_server_stats(self) -> Dict[str, Any]:
+        """Report the server's own metrics."""
+        stats = self.metrics.snapshot()
+        stats["lmms_in_flight"] = self.lmms_interface.in_flight
+        stats["lmms_lanes"] = self.lmms_interface.lane_stats()
+        stats["session_version"] = self.session_state.version
+        stats["backends"] = self.backends.status()
+        stats["jobs"] = self.jobs.stats()
+        stats["locks"] = self.locks.stats()
+        stats["snapshots"] = self._snapshot_store().stats()
+        stats["playback"] = self.backends.current().playback.stats()
+        if self.recorder is not None:
+            stats["wire_log"] = self.recorder.stats()
+        return stats
+
+    async def _metrics_endpoint(self, request):
+        """Serve the metrics in the Prometheus text format."""
+        from starlette.responses import Response
+
+        backends = self.backends.backends
+        text = self.metrics.render_prometheus({
+            "lmms_mcp_lmms_requests_in_flight": ("LMMS requests awaiting a reply.",
+                                                 sum(b.interface.in_flight for b in backends)),
+            "lmms_mcp_session_version": ("Sum of the versions of the session state mirrors.",
+                                         sum(b.session_state.version for b in backends)),
+            "lmms_mcp_lmms_backends_healthy": ("LMMS instances in rotation.", sum(b.healthy for b in backends)),
+        })
+        return Response(text, media_type=PROMETHEUS_CONTENT_TYPE)
 
 def main():
     """Main entry point for the MCP server."""
     parser = argparse.ArgumentParser(description="LMMS MCP Server")
     parser.add_argument("--host", default=DEFAULT_SERVER_HOST, help="Server host")
     parser.add_argument("--port", type=int, default=DEFAULT_SERVER_PORT, help="Server port")
-    parser.add_argument("--lmms-host", default=DEFAULT_LMMS_HOST, help="LMMS host")
-    parser.add_argument("--lmms-port", type=int, default=DEFAULT_LMMS_PORT, help="LMMS port")
+    parser.add_argument("--lmms-host", action="append",
+                        help=f"LMMS host (default {DEFAULT_LMMS_HOST}); repeat for several instances")
+    parser.add_argument("--lmms-port", type=int, action="append",
+                        help=f"LMMS port (default {DEFAULT_LMMS_PORT}); repeat for several instances")
+    parser.add_argument("--lmms-config", help="JSON file listing LMMS instances as "
+                                              "{\"backends\": [{\"host\": ..., \"port\": ...}]}")
+    parser.add_argument("--job-log", help="File recording background jobs across restarts "
+                                          "(default: jobs.jsonl in the user's cache directory)")
+    parser.add_argument("--max-jobs", type=int, default=DEFAULT_MAX_CONCURRENT,
+                        help="Most background jobs running at once")
+    parser.add_argument("--snapshot-dir", help="Where session snapshots are stored "
+                                               "(default: snapshots in the user's cache directory)")
+    parser.add_argument("--no-snapshots", action="store_true",
+                        help="Do not snapshot the session after every change")
+    parser.add_argument("--snapshot-delay", type=float, default=DEFAULT_SNAPSHOT_DELAY,
+                        help="Seconds without changes before the session is snapshotted")
+    parser.add_argument("--record-wire", metavar="PATH",
+                        help="Append all traffic with LMMS to a wire log for replaying")
     args = parser.parse_args()
 
     # Setup logging
     logging.basicConfig(level=logging.INFO)
 
+    endpoints = parse_endpoints(args.lmms_host, args.lmms_port, args.lmms_config,
+                                DEFAULT_LMMS_HOST, DEFAULT_LMMS_PORT)
+
     # Create and start the server
-    server = MCPServer(args.host, args.port, args.lmms_host, args.lmms_port)
+    server = MCPServer(args.host, args.port, lmms_endpoints=endpoints, job_log=args.job_log, max_jobs=args.max_jobs,
+                       snapshot_dir=args.snapshot_dir, snapshots=not args.no_snapshots,
+                       record_wire=args.record_wire, snapshot_delay=args.snapshot_delay)
 
     logger.info(f"Starting LMMS MCP server on {args.host}:{args.port}")
-    logger.info(f"Connecting to LMMS on {args.lmms_host}:{args.lmms_port}")
+    logger.info(f"Using LMMS on {', '.join(f'{host}:{port}' for host, port in endpoints)}")
 
     try:
         asyncio.run(server.start())
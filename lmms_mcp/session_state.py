@@ -0,0 +1,334 @@
+"""
+In-process mirror of the LMMS project state.
+
+The MCP server answers ``get_session_info`` and ``get_track_info`` from this
+mirror instead of asking LMMS every time. The mirror is filled from LMMS on
+first use, kept current by the server's mutating tools and by change
+notifications pushed by LMMS, and thrown away whenever its contents can no
+longer be trusted (a new project, a save, or a request that timed out).
+
+Every change bumps :attr:`SessionState.version`, and every track records the
+version at which it last changed.
+
+The mirror also remembers the last-known notes of patterns whose content the
+server knows exactly (patterns it created, or whose notes it set), so that
+``set_pattern_notes`` can send LMMS only what changed.
+"""
+
+import logging
+from typing import Dict, Any, Optional, Sequence, Tuple
+
+from .pattern import Pattern
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_PREFIX = "/lmms/notify/"
+
+# Track fields computed from the patterns for projections
+DERIVED_FIELDS = ("pattern_count", "note_count")
+
+
+def _copy(value: Any) -> Any:
+    """Copy JSON-like data (dicts, lists and scalars), several times faster than ``copy.deepcopy``."""
+    if isinstance(value, dict):
+        return {key: _copy(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy(item) for item in value]
+    return value
+
+
+def _project(track: Dict[str, Any], fields: Optional[Sequence[str]]) -> Dict[str, Any]:
+    """Copy a cached track, keeping only ``fields`` (and its index) if given."""
+    if fields is None:
+        return _copy(track)
+    result = {"index": track["index"]}
+    for field in fields:
+        if field == "pattern_count":
+            result[field] = len(track.get("patterns") or [])
+        elif field == "note_count":
+            result[field] = sum(p.get("notes", 0) for p in track.get("patterns") or []
+                                if isinstance(p.get("notes"), int))
+        elif field in track:
+            result[field] = _copy(track[field])
+    return result
+
+
+class SessionState:
+    """Versioned mirror of tracks, patterns, tempo and instruments."""
+
+    def __init__(self):
+        """Initialize an empty, unsynced mirror."""
+        self.version = 0
+        self.synced = False
+        self.tempo: Optional[float] = None
+        self.playing = False
+        self.track_count = 0
+        self._tracks: Dict[int, Dict[str, Any]] = {}
+        self._notes: Dict[Tuple[int, int], Pattern] = {}
+
+    def _bump(self) -> int:
+        self.version += 1
+        return self.version
+
+    def _touch(self, track_index: int) -> Optional[Dict[str, Any]]:
+        """Mark a track changed and return it, or None if it is not cached."""
+        version = self._bump()
+        track = self._tracks.get(track_index)
+        if track is not None:
+            track["version"] = version
+        return track
+
+    # Invalidation
+
+    def invalidate(self, track_index: Optional[int] = None, keep_notes: bool = False):
+        """
+        Drop cached state so the next read goes to LMMS.
+
+        Args:
+            track_index: Only drop this track; drop everything if None
+            keep_notes: Keep the last-known pattern notes, for changes that
+                        cannot have touched them
+        """
+        self._bump()
+        if track_index is None:
+            self.synced = False
+            self._tracks.clear()
+            if not keep_notes:
+                self._notes.clear()
+        else:
+            self._tracks.pop(track_index, None)
+            if not keep_notes:
+                self._forget_track_notes(track_index)
+
+    # Loading from LMMS
+
+    def load_session(self, info: Dict[str, Any]):
+        """Replace the mirror with a full session description from LMMS."""
+        self._tracks.clear()
+        self._bump()
+        self.tempo = info.get("tempo", self.tempo)
+        self.playing = bool(info.get("playing", False))
+        tracks = info.get("tracks", [])
+        if isinstance(tracks, list):
+            self.track_count = len(tracks)
+            for track in tracks:
+                self.load_track(track.get("index", len(self._tracks)), track)
+        else:
+            # Only a track count is known; track details are fetched on demand
+            self.track_count = int(tracks)
+        self.synced = True
+
+    def load_track(self, track_index: int, info: Dict[str, Any]) -> Dict[str, Any]:
+        """Cache the description of one track from LMMS and return the cached copy."""
+        track = {"index": track_index, "name": None, "type": None, "instrument": None, "patterns": []}
+        track.update(_copy(info))
+        track["index"] = track_index
+        track["version"] = self._bump()
+        self._tracks[track_index] = track
+        self.track_count = max(self.track_count, track_index + 1)
+        return track
+
+    # Reads
+
+    def session_info(self, fields: Optional[Sequence[str]] = None, offset: int = 0, limit: Optional[int] = None,
+                     since_version: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Describe the session from the mirror, one page of tracks at a time.
+
+        Only the tracks on the page are copied, so asking for a small page or a
+        few fields of a large project stays cheap.
+
+        Args:
+            fields: Track fields to include besides ``index``; all fields if None.
+                    ``pattern_count`` and ``note_count`` are computed from the patterns
+            offset: Number of matching tracks to skip
+            limit: Most tracks to return; all remaining tracks if None
+            since_version: Only tracks changed after this state version
+
+        Returns:
+            The session with the page of tracks, the number of matching tracks
+            (``total``) and the offset of the next page (None on the last page)
+        """
+        offset = max(0, offset)
+        indices = sorted(self._tracks)
+        if since_version is not None:
+            indices = [i for i in indices if self._tracks[i]["version"] > since_version]
+        end = len(indices) if limit is None else min(len(indices), offset + max(0, limit))
+        return {
+            "tempo": self.tempo,
+            "playing": self.playing,
+            "track_count": self.track_count,
+            "tracks": [_project(self._tracks[i], fields) for i in indices[offset:end]],
+            "version": self.version,
+            "total": len(indices),
+            "next_offset": end if end < len(indices) else None,
+        }
+
+    def track_info(self, track_index: int, fields: Optional[Sequence[str]] = None) -> Optional[Dict[str, Any]]:
+        """Describe one track from the mirror, optionally only some fields, or None if it is not cached."""
+        track = self._tracks.get(track_index)
+        return _project(track, fields) if track is not None else None
+
+    def pattern_notes(self, track_index: int, pattern_index: int) -> Optional[Pattern]:
+        """The last-known notes of a pattern, or None if they are not known."""
+        return self._notes.get((track_index, pattern_index))
+
+    def known_patterns(self):
+        """The ``(track_index, pattern_index)`` of every pattern whose notes are known, in order."""
+        return sorted(self._notes)
+
+    def pattern_note_count(self, track_index: int, pattern_index: int) -> Optional[int]:
+        """The number of notes in a pattern as last reported, or None if not known."""
+        track = self._tracks.get(track_index)
+        for pattern in track["patterns"] if track is not None else []:
+            if pattern.get("index") == pattern_index and isinstance(pattern.get("notes"), int):
+                return pattern["notes"]
+        return None
+
+    # Updates from mutating tools
+
+    def track_created(self, track_index: Optional[int], track_type: str, name: Optional[str]):
+        """Record a track created through the server."""
+        if track_index is None:
+            self.invalidate()
+            return
+        self.load_track(track_index, {"name": name, "type": track_type})
+
+    def track_deleted(self, track_index: int):
+        """Record a deleted track; later tracks move down by one index."""
+        self._bump()
+        self._tracks.pop(track_index, None)
+        shifted = {}
+        for index, track in self._tracks.items():
+            if index > track_index:
+                track["index"] = index - 1
+                track["version"] = self.version
+                index -= 1
+            shifted[index] = track
+        self._tracks = shifted
+        self.track_count = max(0, self.track_count - 1)
+        self._forget_track_notes(track_index)
+        self._notes = {(t - 1 if t > track_index else t, p): notes for (t, p), notes in self._notes.items()}
+
+    def track_renamed(self, track_index: int, name: str):
+        """Record a track rename."""
+        track = self._touch(track_index)
+        if track is not None:
+            track["name"] = name
+
+    def pattern_created(self, track_index: int, pattern_index: Optional[int], steps: int):
+        """Record a new pattern on a track."""
+        track = self._touch(track_index)
+        if pattern_index is not None:
+            self._notes[(track_index, pattern_index)] = Pattern.empty()
+        if track is None:
+            return
+        if pattern_index is None:
+            self.invalidate(track_index)
+            return
+        track["patterns"] = [p for p in track["patterns"] if p.get("index") != pattern_index]
+        track["patterns"].append({"index": pattern_index, "steps": steps, "notes": 0})
+        track["patterns"].sort(key=lambda p: p["index"])
+
+    def pattern_deleted(self, track_index: int, pattern_index: int):
+        """Record a deleted pattern; later patterns move down by one index."""
+        self._notes.pop((track_index, pattern_index), None)
+        self._notes = {(t, p - 1 if t == track_index and p > pattern_index else p): notes
+                       for (t, p), notes in self._notes.items()}
+        track = self._touch(track_index)
+        if track is None:
+            return
+        patterns = []
+        for pattern in track["patterns"]:
+            if pattern.get("index") == pattern_index:
+                continue
+            if pattern.get("index", 0) > pattern_index:
+                pattern["index"] -= 1
+            patterns.append(pattern)
+        track["patterns"] = patterns
+
+    def notes_added(self, track_index: int, pattern_index: int, count: int):
+        """Record notes added to a pattern (a negative count records removals)."""
+        track = self._touch(track_index)
+        if track is None:
+            return
+        for pattern in track["patterns"]:
+            if pattern.get("index") == pattern_index:
+                pattern["notes"] = max(0, pattern.get("notes", 0) + count)
+                return
+        # Pattern not known to the mirror: refetch the track on next read
+        self.invalidate(track_index)
+
+    def notes_set(self, track_index: int, pattern_index: int, notes: Optional[Pattern]):
+        """
+        Record the full note content of a pattern.
+
+        Args:
+            track_index: The track that owns the pattern
+            pattern_index: The pattern
+            notes: The notes now in the pattern, or None if they are no longer known
+        """
+        if notes is None:
+            if self._notes.pop((track_index, pattern_index), None) is not None:
+                self._bump()
+            return
+        self._notes[(track_index, pattern_index)] = notes
+        track = self._touch(track_index)
+        for pattern in track["patterns"] if track is not None else []:
+            if pattern.get("index") == pattern_index:
+                pattern["notes"] = len(notes)
+
+    def _forget_track_notes(self, track_index: int):
+        self._notes = {key: notes for key, notes in self._notes.items() if key[0] != track_index}
+
+    def instrument_loaded(self, track_index: int, instrument: str):
+        """Record an instrument loaded into a track."""
+        track = self._touch(track_index)
+        if track is not None:
+            track["instrument"] = instrument
+
+    def tempo_changed(self, tempo: float):
+        """Record a tempo change."""
+        self._bump()
+        self.tempo = tempo
+
+    def playing_changed(self, playing: bool):
+        """Record a transport state change."""
+        self._bump()
+        self.playing = playing
+
+    # Updates pushed by LMMS
+
+    def handle_notification(self, address: str, args: Tuple[Any, ...]):
+        """
+        Apply a change notification from LMMS.
+
+        Understood notifications are ``/lmms/notify/<topic>`` messages where
+        topic is one of ``tempo``, ``playing``, ``track_added``,
+        ``track_removed``, ``track_name``, ``instrument``, ``pattern_added``
+        or ``invalidate``.
+        Anything else is ignored.
+        """
+        if not address.startswith(NOTIFY_PREFIX):
+            return
+        topic = address[len(NOTIFY_PREFIX):]
+        try:
+            if topic == "tempo":
+                self.tempo_changed(float(args[0]))
+            elif topic == "playing":
+                self.playing_changed(bool(args[0]))
+            elif topic == "track_added":
+                self.track_created(int(args[0]), args[1], args[2] if len(args) > 2 else None)
+            elif topic == "track_removed":
+                self.track_deleted(int(args[0]))
+            elif topic == "track_name":
+                self.track_renamed(int(args[0]), args[1])
+            elif topic == "instrument":
+                self.instrument_loaded(int(args[0]), args[1])
+            elif topic == "pattern_added":
+                self.pattern_created(int(args[0]), int(args[1]), int(args[2]))
+            elif topic == "invalidate":
+                self.invalidate(int(args[0]) if args else None)
+        except (IndexError, TypeError, ValueError):
+            logger.warning(f"Ignoring malformed LMMS notification {address} {args}")
+            self.invalidate()
@@ -0,0 +1,510 @@
+"""
+Content-addressed snapshots of the session state, for undo and branching.
+
+A snapshot records what the server knows about an LMMS project: the tempo,
+every track's name, type and instrument, its patterns and, where the server
+knows them, their notes. The state is split into chunks stored under the hash
+of their content:
+
+* one chunk per pattern's notes (packed note records followed by the pan column)
+* one chunk per track, listing its patterns and their note chunks
+* one chunk per block of :data:`TRACKS_PER_BLOCK` tracks
+* one root chunk with the tempo and the blocks
+
+A chunk that already exists is never written again, so a snapshot taken after
+an edit stores only the chunks on the path from the changed pattern to the
+root, and a snapshot of an unchanged state stores nothing at all. Snapshots of
+one LMMS instance are listed in an append-only JSON-lines index, each naming
+its root chunk and the snapshot it was taken after, which makes the history a
+tree: restoring an old snapshot and editing from there starts a new branch.
+Several servers may take snapshots of the same instance: the index is locked
+while a snapshot's id is allocated and its record appended, and records the
+other servers appended are read before every lookup.
+
+Snapshots are taken in the background by :class:`SnapshotScheduler` once a
+burst of changes has paused, so tool results never wait for them, and only
+tracks whose mirror version changed since the last snapshot are encoded again.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+import zlib
+from array import array
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .notes import NOTE_RECORD
+from .pattern import Pattern, diff_patterns
+from .session_state import SessionState
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: the index is assumed to have a single writer
+    fcntl = None
+
+# Tracks per block chunk: an edit rewrites one block, not the whole track list
+TRACKS_PER_BLOCK = 64
+
+# Seconds without changes before a snapshot is taken, and the most a stream
+# of changes can put it off
+DEFAULT_SNAPSHOT_DELAY = 0.5
+DEFAULT_SNAPSHOT_MAX_DELAY = 5.0
+
+_NAME_CHARS = re.compile(r"[^A-Za-z0-9._-]+")
+
+
+class SnapshotError(ValueError):
+    """Raised for unknown snapshots or missing chunks."""
+
+
+def default_snapshot_dir() -> str:
+    """Location of the snapshot store in the user's cache directory."""
+    cache = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache, "lmms-mcp", "snapshots")
+
+
+def pack_pattern(notes: Pattern) -> bytes:
+    """Serialize a pattern's notes: their note records followed by one pan byte per note."""
+    return notes.to_records() + notes.pan.tobytes()
+
+
+def unpack_pattern(data: bytes) -> Pattern:
+    """Rebuild a pattern serialized by :func:`pack_pattern`."""
+    count = len(data) // (NOTE_RECORD.size + 1)
+    split = count * NOTE_RECORD.size
+    if len(data) != split + count:
+        raise SnapshotError("Pattern chunk has a partial note")
+    notes = Pattern.from_records(data[:split])
+    notes.pan = np.frombuffer(data[split:], dtype="i1") if np is not None else array("b", data[split:])
+    return notes
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _encode(value: Any) -> bytes:
+    """Canonical JSON, so equal values always hash the same."""
+    return json.dumps(value, sort_keys=True, separators=(",", ":")).encode()
+
+
+def capture(state: SessionState) -> Dict[str, Any]:
+    """
+    Take what a snapshot needs from a synced session mirror.
+
+    The result refers to the mirror's pattern objects, which are never
+    modified in place, so it can be hashed and stored off the event loop while
+    the mirror moves on. Each track carries the mirror version at which it
+    last changed (None if the mirror does not hold it).
+    """
+    tracks = []
+    for index in range(state.track_count):
+        track = state._tracks.get(index) or {}
+        patterns = []
+        for pattern in sorted(track.get("patterns") or [], key=lambda p: p.get("index", 0)):
+            pattern_index = pattern.get("index", len(patterns))
+            patterns.append({"index": pattern_index, "steps": pattern.get("steps"),
+                             "notes": state.pattern_notes(index, pattern_index)})
+        tracks.append({"name": track.get("name"), "type": track.get("type"),
+                       "instrument": track.get("instrument"), "patterns": patterns,
+                       "version": track.get("version")})
+    return {"tempo": state.tempo, "tracks": tracks}
+
+
+class SnapshotStore:
+    """Chunk store and snapshot history of one LMMS instance."""
+
+    def __init__(self, directory: Optional[str] = None, name: str = "default"):
+        """
+        Initialize the store. Nothing is read or written until a snapshot is taken or looked up.
+
+        Args:
+            directory: Where chunks and histories are kept, defaults to
+                       :func:`default_snapshot_dir`; may be shared by several stores
+            name: Name of the history, usually the LMMS instance's address
+        """
+        self.directory = directory or default_snapshot_dir()
+        self.name = name
+        self.index_path = os.path.join(self.directory, _NAME_CHARS.sub("_", name) + ".jsonl")
+        self.head: Optional[int] = None
+        self._records: Optional[List[Dict[str, Any]]] = None
+        # Bytes of the index read into _records
+        self._read_to = 0
+        # Chunks known to exist on disk
+        self._chunks: set = set()
+        # Last hash of each (track, pattern), kept with the notes it was computed from
+        self._pattern_hashes: Dict[Tuple[int, int], Tuple[Pattern, str]] = {}
+        # Last chunk of each track: (mirror version, pattern notes, whether stored, chunk)
+        self._track_chunks: Dict[int, Tuple[int, List[Optional[Pattern]], bool, Dict[str, Any]]] = {}
+        self.bytes_written = 0
+
+    # Chunks
+
+    def _chunk_path(self, digest: str) -> str:
+        return os.path.join(self.directory, "objects", digest[:2], digest[2:])
+
+    def _put(self, data: bytes) -> Tuple[str, int]:
+        """Store a chunk unless it exists; return its hash and the bytes written."""
+        digest = _digest(data)
+        if digest in self._chunks:
+            return digest, 0
+        path = self._chunk_path(digest)
+        written = 0
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            compressed = zlib.compress(data, 1)
+            temporary = f"{path}.tmp"
+            with open(temporary, "wb") as f:
+                f.write(compressed)
+            os.replace(temporary, path)
+            written = len(compressed)
+        self._chunks.add(digest)
+        return digest, written
+
+    def _get(self, digest: str) -> bytes:
+        try:
+            with open(self._chunk_path(digest), "rb") as f:
+                return zlib.decompress(f.read())
+        except (OSError, zlib.error) as e:
+            raise SnapshotError(f"Snapshot chunk {digest} is missing or damaged: {e}") from None
+
+    def _get_json(self, digest: str) -> Any:
+        return json.loads(self._get(digest))
+
+    def pattern(self, digest: str) -> Pattern:
+        """Load the notes stored in a pattern chunk."""
+        return unpack_pattern(self._get(digest))
+
+    # History
+
+    def _load(self) -> List[Dict[str, Any]]:
+        """The snapshot records, including any other servers appended since the last call."""
+        first = self._records is None
+        if first:
+            self._records = []
+        try:
+            with open(self.index_path, "rb") as f:
+                self._read(f)
+        except FileNotFoundError:
+            pass
+        if first and self._records:
+            self.head = self._records[-1]["id"]
+        return self._records
+
+    def _read(self, f) -> bytes:
+        """Read the whole records appended to the index since it was last read; return any partial line."""
+        f.seek(self._read_to)
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            try:
+                self._records.append(json.loads(line))
+            except ValueError:
+                # A line cut short by a crash
+                continue
+        self._read_to += end
+        return data[end:]
+
+    def get(self, snapshot_id: int) -> Dict[str, Any]:
+        """
+        Look up a snapshot record.
+
+        Raises:
+            SnapshotError: If there is no such snapshot
+        """
+        for record in self._load():
+            if record["id"] == snapshot_id:
+                return record
+        raise SnapshotError(f"Unknown snapshot {snapshot_id}")
+
+    def snapshots(self, offset: int = 0, limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        List snapshots, newest first, one page at a time.
+
+        Returns:
+            ``snapshots``, ``total``, ``next_offset`` (None on the last page) and ``head``
+        """
+        records = self._load()[::-1]
+        offset = max(0, offset)
+        end = len(records) if limit is None else min(len(records), offset + max(0, limit))
+        return {"snapshots": records[offset:end], "total": len(records),
+                "next_offset": end if end < len(records) else None, "head": self.head}
+
+    def checkout(self, snapshot_id: int):
+        """Make a snapshot the head, so the next snapshot branches from it."""
+        self.get(snapshot_id)
+        self.head = snapshot_id
+
+    # Snapshots
+
+    def _hash_pattern(self, key: Tuple[int, int], notes: Optional[Pattern],
+                      write: bool) -> Tuple[Optional[str], int]:
+        if notes is None:
+            return None, 0
+        cached = self._pattern_hashes.get(key)
+        if cached is not None and cached[0] is notes and (not write or cached[1] in self._chunks):
+            return cached[1], 0
+        data = pack_pattern(notes)
+        digest, written = self._put(data) if write else (_digest(data), 0)
+        self._pattern_hashes[key] = (notes, digest)
+        return digest, written
+
+    def tree(self, state: Dict[str, Any], write: bool = True) -> Dict[str, Any]:
+        """
+        Hash a captured state into chunks, storing the missing ones.
+
+        Args:
+            state: As returned by :func:`capture`
+            write: Store the chunks; with False only the hashes are computed
+
+        Returns:
+            ``root``, the per-track ``tracks`` (with their ``hash`` and pattern
+            ``notes`` hashes) and ``written``, the bytes stored
+        """
+        written = 0
+        tracks = []
+        live = set()
+        track_chunks = {}
+        for track_index, track in enumerate(state["tracks"]):
+            notes = [pattern["notes"] for pattern in track["patterns"]]
+            cached = self._track_chunks.get(track_index)
+            if (cached is not None and track.get("version") is not None and cached[0] == track["version"]
+                    and (cached[2] or not write) and len(cached[1]) == len(notes)
+                    and all(a is b for a, b in zip(cached[1], notes))):
+                # Unchanged since the last snapshot: nothing to encode or store
+                live.update((track_index, pattern["index"]) for pattern in track["patterns"])
+                track_chunks[track_index] = cached
+                tracks.append(cached[3])
+                continue
+            patterns = []
+            for pattern in track["patterns"]:
+                key = (track_index, pattern["index"])
+                live.add(key)
+                digest, size = self._hash_pattern(key, pattern["notes"], write)
+                written += size
+                count = None if pattern["notes"] is None else len(pattern["notes"])
+                patterns.append({"index": pattern["index"], "steps": pattern["steps"], "notes": digest,
+                                 "count": count})
+            chunk = {"name": track["name"], "type": track["type"], "instrument": track["instrument"],
+                     "patterns": patterns}
+            data = _encode(chunk)
+            digest, size = self._put(data) if write else (_digest(data), 0)
+            written += size
+            chunk["hash"] = digest
+            tracks.append(chunk)
+            if track.get("version") is not None:
+                track_chunks[track_index] = (track["version"], notes, write, chunk)
+        self._pattern_hashes = {key: value for key, value in self._pattern_hashes.items() if key in live}
+        self._track_chunks = track_chunks
+        blocks = []
+        for start in range(0, len(tracks), TRACKS_PER_BLOCK):
+            data = _encode([t["hash"] for t in tracks[start:start + TRACKS_PER_BLOCK]])
+            digest, size = self._put(data) if write else (_digest(data), 0)
+            written += size
+            blocks.append(digest)
+        data = _encode({"tempo": state["tempo"], "blocks": blocks})
+        root, size = self._put(data) if write else (_digest(data), 0)
+        return {"root": root, "tempo": state["tempo"], "tracks": tracks, "written": written + size}
+
+    def take(self, state: Dict[str, Any], tool: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Store a captured state as a new snapshot after the head.
+
+        Args:
+            state: As returned by :func:`capture`
+            tool: The tool whose change the snapshot records
+
+        Returns:
+            The new snapshot's record, or None if the state is the head's
+        """
+        self._load()
+        tree = self.tree(state)
+        head = self.get(self.head) if self.head is not None else None
+        if head is not None and head["root"] == tree["root"]:
+            return None
+        record = {"parent": self.head, "root": tree["root"], "created": time.time(), "tool": tool,
+                  "tempo": tree["tempo"], "tracks": len(tree["tracks"]), "bytes": tree["written"]}
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.index_path, "a+b") as f:
+            if fcntl is not None:
+                # Held until closed, so no other server takes the same id
+                fcntl.flock(f, fcntl.LOCK_EX)
+            partial = self._read(f)
+            record = {"id": self._records[-1]["id"] + 1 if self._records else 1, **record}
+            line = json.dumps(record).encode() + b"\n"
+            # Not on the end of a line cut short by a crash
+            f.write(b"\n" + line if partial else line)
+            f.flush()
+            self._read_to = f.tell()
+        self._records.append(record)
+        self.head = record["id"]
+        self.bytes_written += tree["written"]
+        return record
+
+    def load(self, snapshot_id: int) -> Dict[str, Any]:
+        """
+        Read a snapshot's state back from its chunks.
+
+        Returns:
+            ``root``, ``tempo`` and ``tracks`` as in :meth:`tree`
+        """
+        record = self.get(snapshot_id)
+        root = self._get_json(record["root"])
+        tracks = []
+        for block in root["blocks"]:
+            for digest in self._get_json(block):
+                track = self._get_json(digest)
+                track["hash"] = digest
+                tracks.append(track)
+        return {"root": record["root"], "tempo": root["tempo"], "tracks": tracks}
+
+    def diff(self, old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Compare two loaded states track by track and pattern by pattern.
+
+        Only tracks whose chunks differ are opened, and only patterns whose
+        note chunks differ are read to count the notes added and removed.
+        """
+        result: Dict[str, Any] = {"changed": []}
+        if old["tempo"] != new["tempo"]:
+            result["tempo"] = [old["tempo"], new["tempo"]]
+        old_tracks, new_tracks = old["tracks"], new["tracks"]
+        result["added"] = [{"index": i, "name": t["name"]} for i, t in enumerate(new_tracks)
+                           if i >= len(old_tracks)]
+        result["removed"] = [{"index": i, "name": t["name"]} for i, t in enumerate(old_tracks)
+                             if i >= len(new_tracks)]
+        for index, (before, after) in enumerate(zip(old_tracks, new_tracks)):
+            if before["hash"] == after["hash"]:
+                continue
+            change: Dict[str, Any] = {"index": index}
+            for field in ("name", "type", "instrument"):
+                if before[field] != after[field]:
+                    change[field] = [before[field], after[field]]
+            old_patterns = {p["index"]: p for p in before["patterns"]}
+            new_patterns = {p["index"]: p for p in after["patterns"]}
+            added = sorted(set(new_patterns) - set(old_patterns))
+            removed = sorted(set(old_patterns) - set(new_patterns))
+            if added:
+                change["patterns_added"] = added
+            if removed:
+                change["patterns_removed"] = removed
+            patterns = []
+            for pattern_index in sorted(set(old_patterns) & set(new_patterns)):
+                a, b = old_patterns[pattern_index], new_patterns[pattern_index]
+                if a["notes"] == b["notes"] and a["steps"] == b["steps"]:
+                    continue
+                pattern: Dict[str, Any] = {"index": pattern_index}
+                if a["steps"] != b["steps"]:
+                    pattern["steps"] = [a["steps"], b["steps"]]
+                if a["notes"] is None or b["notes"] is None:
+                    pattern["notes"] = "unknown"
+                elif a["notes"] != b["notes"]:
+                    removed_notes, added_notes = diff_patterns(self.pattern(a["notes"]), self.pattern(b["notes"]))
+                    pattern["notes_added"] = len(added_notes)
+                    pattern["notes_removed"] = len(removed_notes)
+                patterns.append(pattern)
+            if patterns:
+                change["patterns_changed"] = patterns
+            result["changed"].append(change)
+        result["unchanged"] = min(len(old_tracks), len(new_tracks)) - len(result["changed"])
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot count and the bytes stored by this process."""
+        return {"snapshots": len(self._load()), "head": self.head, "bytes_written": self.bytes_written}
+
+
+class SnapshotScheduler:
+    """Takes a snapshot in the background once a burst of changes has paused."""
+
+    def __init__(self, take: Callable[[str], Awaitable[Any]], delay: float = DEFAULT_SNAPSHOT_DELAY,
+                 max_delay: float = DEFAULT_SNAPSHOT_MAX_DELAY):
+        """
+        Initialize the scheduler.
+
+        Args:
+            take: Coroutine function taking the snapshot, passed the tools
+                  whose changes it records, comma-separated
+            delay: Seconds without changes before the snapshot is taken
+            max_delay: Most seconds a stream of changes can put it off
+        """
+        self.take = take
+        self.delay = delay
+        self.max_delay = max_delay
+        self.changes = 0
+        self.taken = 0
+        self._tools: List[str] = []
+        self._due = 0.0
+        self._hurry = asyncio.Event()
+        self._waiters: List[Tuple[int, asyncio.Future]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> bool:
+        """Whether changes are waiting to be snapshotted."""
+        return self.taken < self.changes
+
+    def changed(self, tool: str):
+        """Record a change made by a tool; it is snapshotted once changes pause."""
+        loop = asyncio.get_running_loop()
+        self.changes += 1
+        self._tools.append(tool)
+        self._due = loop.time() + self.delay
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+
+    async def flush(self):
+        """Snapshot the changes made so far now, and wait until that is done."""
+        if not self.pending or self._task is None or self._task.done():
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append((self.changes, waiter))
+        self._hurry.set()
+        await waiter
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while self._tools:
+                first = loop.time()
+                while not self._hurry.is_set():
+                    delay = min(self._due, first + self.max_delay) - loop.time()
+                    if delay <= 0:
+                        break
+                    try:
+                        await asyncio.wait_for(self._hurry.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+                self._hurry.clear()
+                tools, self._tools = self._tools, []
+                covered = self.changes
+                await self.take(", ".join(dict.fromkeys(tools)))
+                self.taken = covered
+                self._wake(covered)
+        finally:
+            # Nobody waits for a snapshot that will not come
+            self._wake(None)
+
+    def _wake(self, covered: Optional[int]):
+        waiting = []
+        for target, waiter in self._waiters:
+            if covered is None or target <= covered:
+                if not waiter.done():
+                    waiter.set_result(None)
+            else:
+                waiting.append((target, waiter))
+        self._waiters = waiting
+
+    async def close(self):
+        """Stop without taking the pending snapshot."""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
@@ -0,0 +1,568 @@
+"""
+Precomputed MCP initialize result and tool list for the fast stdio start.
+
+Generated by ``python -m lmms_mcp.fast_stdio --write-manifest``; do not edit.
+"""
+
+INITIALIZE_RESULT = {'protocolVersion': '2025-11-25',
+ 'capabilities': {'experimental': {},
+                  'prompts': {'listChanged': False},
+                  'resources': {'subscribe': True, 'listChanged': False},
+                  'tools': {'listChanged': False}},
+ 'serverInfo': {'name': 'LMMS-MCP', 'version': '0.1.0'}}
+
+PROTOCOL_VERSIONS = ['2024-11-05', '2025-03-26', '2025-06-18', '2025-11-25']
+
+LATEST_PROTOCOL_VERSION = '2025-11-25'
+
+TOOLS = [{'name': 'get_session_info',
+  'description': 'Get information about the current LMMS session and its tracks. For large projects page '
+                 'through tracks with offset/limit (next_offset is null on the last page), keep only some '
+                 'track fields with fields (e.g. ["name", "instrument", "pattern_count", "note_count"]), and '
+                 'pass the version of an earlier answer as since_version to get only the tracks that changed '
+                 'since',
+  'inputSchema': {'properties': {'fields': {'anyOf': [{'items': {'type': 'string'}, 'type': 'array'},
+                                                      {'type': 'null'}],
+                                            'default': None,
+                                            'title': 'Fields'},
+                                 'offset': {'default': 0, 'title': 'Offset', 'type': 'integer'},
+                                 'limit': {'anyOf': [{'type': 'integer'}, {'type': 'null'}],
+                                           'default': None,
+                                           'title': 'Limit'},
+                                 'since_version': {'anyOf': [{'type': 'integer'}, {'type': 'null'}],
+                                                   'default': None,
+                                                   'title': 'Since Version'}},
+                  'title': 'get_session_infoArguments',
+                  'type': 'object'}},
+ {'name': 'get_track_info',
+  'description': 'Get detailed information about a specific track in LMMS, optionally only some fields',
+  'inputSchema': {'properties': {'track_index': {'title': 'Track Index', 'type': 'integer'},
+                                 'fields': {'anyOf': [{'items': {'type': 'string'}, 'type': 'array'},
+                                                      {'type': 'null'}],
+                                            'default': None,
+                                            'title': 'Fields'}},
+                  'required': ['track_index'],
+                  'title': 'get_track_infoArguments',
+                  'type': 'object'}},
+ {'name': 'read_project_file',
+  'description': 'Summarise an LMMS project file (.mmp or .mmpz) on disk without opening it in LMMS',
+  'inputSchema': {'properties': {'path': {'title': 'Path', 'type': 'string'}},
+                  'required': ['path'],
+                  'title': 'read_project_fileArguments',
+                  'type': 'object'},
+  'outputSchema': {'properties': {'result': {'additionalProperties': True,
+                                             'title': 'Result',
+                                             'type': 'object'}},
+                   'required': ['result'],
+                   'title': 'read_project_fileOutput',
+                   'type': 'object'}},
+ {'name': 'read_project_track',
+  'description': 'Get the patterns of one track of an LMMS project file on disk, optionally including every '
+                 'note',
+  'inputSchema': {'properties': {'path': {'title': 'Path', 'type': 'string'},
+                                 'track_index': {'title': 'Track Index', 'type': 'integer'},
+                                 'include_notes': {'default': False,
+                                                   'title': 'Include Notes',
+                                                   'type': 'boolean'}},
+                  'required': ['path', 'track_index'],
+                  'title': 'read_project_trackArguments',
+                  'type': 'object'},
+  'outputSchema': {'properties': {'result': {'additionalProperties': True,
+                                             'title': 'Result',
+                                             'type': 'object'}},
+                   'required': ['result'],
+                   'title': 'read_project_trackOutput',
+                   'type': 'object'}},
+ {'name': 'analyze_project',
+  'description': 'Analyse all patterns in one pass on the server: estimated key and best-fitting scales '
+                 "(usable in generate_pattern), notes per bar for the project and each track, each track's "
+                 'pitch range and the track pairs whose ranges overlap most, and notes of a pattern '
+                 'overlapping another at the same pitch (duplicates). Covers the session patterns whose '
+                 "notes the server knows, counting bars from each pattern's start, or with project_path the "
+                 'patterns of a project file at their song positions. Optionally only some tracks; top '
+                 'limits each ranked list. Repeated calls are answered from a cache until the session or '
+                 'file changes',
+  'inputSchema': {'properties': {'project_path': {'anyOf': [{'type': 'string'}, {'type': 'null'}],
+                                                  'default': None,
+                                                  'title': 'Project Path'},
+                                 'tracks': {'anyOf': [{'items': {'type': 'integer'}, 'type': 'array'},
+                                                      {'type': 'null'}],
+                                            'default': None,
+                                            'title': 'Tracks'},
+                                 'top': {'default': 10, 'title': 'Top', 'type': 'integer'}},
+                  'title': 'analyze_projectArguments',
+                  'type': 'object'}},
+ {'name': 'create_track',
+  'description': 'Create a new track in the LMMS session',
+  'inputSchema': {'properties': {'track_type': {'default': 'instrument',
+                                                'title': 'Track Type',
+                                                'type': 'string'},
+                                 'name': {'default': None, 'title': 'Name', 'type': 'string'}},
+                  'title': 'create_trackArguments',
+                  'type': 'object'},
+  'outputSchema': {'properties': {'result': {'additionalProperties': True,
+                                             'title': 'Result',
+                                             'type': 'object'}},
+                   'required': ['result'],
+                   'title': 'create_trackOutput',
+                   'type': 'object'}},
+ {'name': 'delete_track',
+  'description': 'Delete a track; later tracks move down by one index',
+  'inputSchema': {'properties': {'track_index': {'title': 'Track Index', 'type': 'integer'}},
+                  'required': ['track_index'],
+                  'title': 'delete_trackArguments',
+                  'type': 'object'},
+  'outputSchema': {'properties': {'result': {'additionalProperties': True,
+                                             'title': 'Result',
+                                             'type': 'object'}},
+                   'required': ['result'],
+                   'title': 'delete_trackOutput',
+                   'type': 'object'}},
+ {'name': 'set_track_name',
+  'description': 'Set the name of a track',
+  'inputSchema': {'properties': {'track_index': {'title': 'Track Index', 'type': 'integer'},
+                                 'name': {'title': 'Name', 'type': 'string'}},
+                  'required': ['track_index', 'name'],
+                  'title': 'set_track_nameArguments',
+                  'type': 'object'},
+  'outputSchema': {'properties': {'result': {'additionalProperties': True,
+                                             'title': 'Result',
+                                             'type': 'object'}},
+                   'required': ['result'],
+                   'title': 'set_track_nameOutput',
+                   'type': 'object'}},
+ {'name': 'create_pattern',
+  'description': 'Create a new pattern in a track',
+  'inputSchema': {'properties': {'track_index': {'title': 'Track Index', 'type': 'integer'},
+                                 'steps': {'default': 16, 'title': 'Steps', 'type': 'integer'}},
+                  'required': ['track_index'],
+                  'title': 'create_patternArguments',
+                  'type': 'object'},
+  'outputSchema': {'properties': {'result': {'additionalProperties': True,
+                                             'title': 'Result',
+                                             'type': 'object'}},
+                   'required': ['result'],
+                   'title': 'create_patternOutput',
+                   'type': 'object'}},
+ {'name': 'delete_pattern',
+  'description': 'Delete a pattern from a track',
+  'inputSchema': {'properties': {'track_index': {'title': 'Track Index', 'type': 'integer'},
+                                 'pattern_index': {'title': 'Pattern Index', 'type': 'integer'}},
+                  'required': ['track_index', 'pattern_index'],
+                  'title': 'delete_patternArguments',
+                  'type': 'object'},
+  'outputSchema': {'properties': {'result': {'additionalProperties': True,
+                                             'title': 'Result',
+                                             'type': 'object'}},
+                   'required': ['result'],
+                   'title': 'delete_patternOutput',
+                   'type': 'object'}},
+ {'name': 'add_notes_to_pattern',
+  'description': 'Add notes to a pattern. Instead of notes, many notes can be sent as records: base64 of '
+                 'consecutive 10-byte little-endian records of pitch (u8), velocity (u8), start and length '
+                 'in ticks (u32 each, 48 ticks per beat)',
+  'inputSchema': {'properties': {'track_index': {'title': 'Track Index', 'type': 'integer'},
+                                 'pattern_index': {'title': 'Pattern Index', 'type': 'integer'},
+                                 'notes': {'anyOf': [{'items': {'additionalProperties': True,
+                                                                'type': 'object'},
+                                                      'type': 'array'},
+                                                     {'type': 'null'}],
+                                           'default': None,
+                                           'title': 'Notes'},
+                                 'records': {'anyOf': [{'type': 'string'}, {'type': 'null'}],
+                                             'default': None,
+                                             'title': 'Records'}},
+                  'required': ['track_index', 'pattern_index'],
+                  'title': 'add_notes_to_patternArguments',
+                  'type': 'object'},
+  'outputSchema': {'properties': {'result': {'additionalProperties': True,
+                                             'title': 'Result',
+                                             'type': 'object'}},
+                   'required': ['result'],
+                   'title': 'add_notes_to_patternOutput',
+                   'type': 'object'}},
+ {'name': 'remove_notes_from_pattern',
+  'description': 'Remove notes matching pitch, start and length from a pattern. Instead of notes, many notes '
+                 'can be sent as records: base64 of consecutive 10-byte little-endian records of pitch (u8), '
+                 'velocity (u8), start and length in ticks (u32 each, 48 ticks per beat)',
+  'inputSchema': {'properties': {'track_index': {'title': 'Track Index', 'type': 'integer'},
+                                 'pattern_index': {'title': 'Pattern Index', 'type': 'integer'},
+                                 'notes': {'anyOf': [{'items': {'additionalProperties': True,
+                                                                'type': 'object'},
+                                                      'type': 'array'},
+                                                     {'type': 'null'}],
+                                           'default': None,
+                                           'title': 'Notes'},
+                                 'records': {'anyOf': [{'type': 'string'}, {'type': 'null'}],
+                                             'default': None,
+                                             'title': 'Records'}},
+                  'required': ['track_index', 'pattern_index'],
+                  'title': 'remove_notes_from_patternArguments',
+                  'type': 'object'},
+  'outputSchema': {'properties': {'result': {'additionalProperties': True,
+                                             'title': 'Result',
+                                             'type': 'object'}},
+                   'required': ['result'],
+                   'title': 'remove_notes_from_patternOutput',
+                   'type': 'object'}},
+ {'name': 'set_pattern_notes',
+  'description': 'Replace all notes of a pattern; only the notes that changed since the server last knew the '
+                 'pattern are sent to LMMS, so repeated edits of a large pattern stay cheap. Instead of '
+                 'notes, many notes can be sent as records: base64 of consecutive 10-byte little-endian '
+                 'records of pitch (u8), velocity (u8), start and length in ticks (u32 each, 48 ticks per '
+                 'beat)',
+  'inputSchema': {'properties': {'track_index': {'title': 'Track Index', 'type': 'integer'},
+                                 'pattern_index': {'title': 'Pattern Index', 'type': 'integer'},
+                                 'notes': {'anyOf': [{'items': {'additionalProperties': True,
+                                                                'type': 'object'},
+                                                      'type': 'array'},
+                                                     {'type': 'null'}],
+                                           'default': None,
+                                           'title': 'Notes'},
+                                 'records': {'anyOf': [{'type': 'string'}, {'type': 'null'}],
+                                             'default': None,
+                                             'title': 'Records'}},
+                  'required': ['track_index', 'pattern_index'],
+                  'title': 'set_pattern_notesArguments',
+                  'type': 'object'},
+  'outputSchema': {'properties': {'result': {'additionalProperties': True,
+                                             'title': 'Result',
+                                             'type': 'object'}},
+                   'required': ['result'],
+                   'title': 'set_pattern_notesOutput',
+                   'type': 'object'}},
+ {'name': 'get_pattern_notes',
+  'description': 'Get the notes of a pattern as note dicts (with pan), or with as_records=true as base64 '
+                 'note records in the format add_notes_to_pattern accepts. Only patterns whose notes were '
+                 'set through this server, or that are empty, can be read',
+  'inputSchema': {'properties': {'track_index': {'title': 'Track Index', 'type': 'integer'},
+                                 'pattern_index': {'title': 'Pattern Index', 'type': 'integer'},
+                                 'as_records': {'default': False, 'title': 'As Records', 'type': 'boolean'}},
+                  'required': ['track_index', 'pattern_index'],
+                  'title': 'get_pattern_notesArguments',
+                  'type': 'object'}},
+ {'name': 'generate_pattern',
+  'description': 'Generate notes on the server from a compact spec and add them to a pattern (or replace its '
+                 'notes). The spec is a dict or one line such as "euclid pulses=5 steps=16 note=36 '
+                 'repeat=64", "steps 36=x...x... 42=x-x-X-x- repeat=32" (x hit, X accent, - hold), "arp '
+                 'chords=Am,F,C,G mode=updown octaves=2 repeat=8" or "walk root=A scale=minor count=256 '
+                 'low=45 high=72 seed=1". Common keys: step and length (beats, default 0.25), velocity, '
+                 'start (beat offset), repeat, seed',
+  'inputSchema': {'properties': {'track_index': {'title': 'Track Index', 'type': 'integer'},
+                                 'pattern_index': {'title': 'Pattern Index', 'type': 'integer'},
+                                 'spec': {'anyOf': [{'type': 'string'},
+                                                    {'additionalProperties': True, 'type': 'object'}],
+                                          'title': 'Spec'},
+                                 'replace': {'default': False, 'title': 'Replace', 'type': 'boolean'}},
+                  'required': ['track_index', 'pattern_index', 'spec'],
+                  'title': 'generate_patternArguments',
+                  'type': 'object'},
+  'outputSchema': {'properties': {'result': {'additionalProperties': True,
+                                             'title': 'Result',
+                                             'type': 'object'}},
+                   'required': ['result'],
+                   'title': 'generate_patternOutput',
+                   'type': 'object'}},
+ {'name': 'import_midi',
+  'description': 'Import a Standard MIDI File from disk: every channel of every MIDI track with notes '
+                 'becomes a new instrument track with one pattern holding its notes. Optionally only some '
+                 "MIDI tracks (by index) and without taking the file's tempo. Runs as a background job if it "
+                 "takes more than a moment: the answer is then the job's status with a job_id to follow with "
+                 'get_job_status; background=true answers with the job id at once, background=false always '
+                 'waits for the result',
+  'inputSchema': {'properties': {'path': {'title': 'Path', 'type': 'string'},
+                                 'tracks': {'anyOf': [{'items': {'type': 'integer'}, 'type': 'array'},
+                                                      {'type': 'null'}],
+                                            'default': None,
+                                            'title': 'Tracks'},
+                                 'set_tempo': {'default': True, 'title': 'Set Tempo', 'type': 'boolean'},
+                                 'background': {'anyOf': [{'type': 'boolean'}, {'type': 'null'}],
+                                                'default': None,
+                                                'title': 'Background'}},
+                  'required': ['path'],
+                  'title': 'import_midiArguments',
+                  'type': 'object'},
+  'outputSchema': {'properties': {'result': {'additionalProperties': True,
+                                             'title': 'Result',
+                                             'type': 'object'}},
+                   'required': ['result'],
+                   'title': 'import_midiOutput',
+                   'type': 'object'}},
+ {'name': 'export_midi',
+  'description': 'Export notes to a Standard MIDI File on disk: the patterns of the current session whose '
+                 'notes the server knows (one MIDI track each), or with project_path the tracks of an LMMS '
+                 'project file with their patterns at their song positions',
+  'inputSchema': {'properties': {'path': {'title': 'Path', 'type': 'string'},
+                                 'project_path': {'anyOf': [{'type': 'string'}, {'type': 'null'}],
+                                                  'default': None,
+                                                  'title': 'Project Path'},
+                                 'tracks': {'anyOf': [{'items': {'type': 'integer'}, 'type': 'array'},
+                                                      {'type': 'null'}],
+                                            'default': None,
+                                            'title': 'Tracks'}},
+                  'required': ['path'],
+                  'title': 'export_midiArguments',
+                  'type': 'object'},
+  'outputSchema': {'properties': {'result': {'additionalProperties': True,
+                                             'title': 'Result',
+                                             'type': 'object'}},
+                   'required': ['result'],
+                   'title': 'export_midiOutput',
+                   'type': 'object'}},
+ {'name': 'render_preview',
+  'description': 'Render patterns to an audio preview offline, without LMMS: each pattern ({"track_index": '
+                 't, "pattern_index": p, "waveform": optional}) is synthesized with a simple oscillator '
+                 '(sine, triangle, saw, square or noise) and they are mixed, starting together. Notes come '
+                 'from the session (patterns whose notes the server knows) or from project_path. Writes a '
+                 '16-bit WAV file to path, or returns it base64-encoded when path is omitted (up to 30 '
+                 'seconds)',
+  'inputSchema': {'properties': {'patterns': {'items': {'additionalProperties': True, 'type': 'object'},
+                                              'title': 'Patterns',
+                                              'type': 'array'},
+                                 'project_path': {'anyOf': [{'type': 'string'}, {'type': 'null'}],
+                                                  'default': None,
+                                                  'title': 'Project Path'},
+                                 'path': {'anyOf': [{'type': 'string'}, {'type': 'null'}],
+                                          'default': None,
+                                          'title': 'Path'},
+                                 'waveform': {'default': 'triangle', 'title': 'Waveform', 'type': 'string'},
+                                 'sample_rate': {'default': 44100, 'title': 'Sample Rate', 'type': 'integer'},
+                                 'gain': {'default': 0.25, 'title': 'Gain', 'type': 'number'}},
+                  'required': ['patterns'],
+                  'title': 'render_previewArguments',
+                  'type': 'object'},
+  'outputSchema': {'properties': {'result': {'additionalProperties': True,
+                                             'title': 'Result',
+                                             'type': 'object'}},
+                   'required': ['result'],
+                   'title': 'render_previewOutput',
+                   'type': 'object'}},
+ {'name': 'load_instrument',
+  'description': 'Load an instrument into a track, by path or by a short name from get_instruments_list: an '
+                 'exact name or the start of exactly one name. The result gives the instrument loaded. Runs '
+                 "as a background job if it takes more than a moment: the answer is then the job's status "
+                 'with a job_id to follow with get_job_status; background=true answers with the job id at '
+                 'once, background=false always waits for the result',
+  'inputSchema': {'properties': {'track_index': {'title': 'Track Index', 'type': 'integer'},
+                                 'instrument_path': {'title': 'Instrument Path', 'type': 'string'},
+                                 'background': {'anyOf': [{'type': 'boolean'}, {'type': 'null'}],
+                                                'default': None,
+                                                'title': 'Background'}},
+                  'required': ['track_index', 'instrument_path'],
+                  'title': 'load_instrumentArguments',
+                  'type': 'object'},
+  'outputSchema': {'properties': {'result': {'additionalProperties': True,
+                                             'title': 'Result',
+                                             'type': 'object'}},
+                   'required': ['result'],
+                   'title': 'load_instrumentOutput',
+                   'type': 'object'}},
+ {'name': 'set_tempo',
+  'description': 'Set the tempo of the LMMS session',
+  'inputSchema': {'properties': {'tempo': {'title': 'Tempo', 'type': 'number'}},
+                  'required': ['tempo'],
+                  'title': 'set_tempoArguments',
+                  'type': 'object'},
+  'outputSchema': {'properties': {'result': {'additionalProperties': True,
+                                             'title': 'Result',
+                                             'type': 'object'}},
+                   'required': ['result'],
+                   'title': 'set_tempoOutput',
+                   'type': 'object'}},
+ {'name': 'play',
+  'description': 'Start playback of the LMMS session',
+  'inputSchema': {'properties': {}, 'title': 'playArguments', 'type': 'object'},
+  'outputSchema': {'properties': {'result': {'additionalProperties': True,
+                                             'title': 'Result',
+                                             'type': 'object'}},
+                   'required': ['result'],
+                   'title': 'playOutput',
+                   'type': 'object'}},
+ {'name': 'stop',
+  'description': 'Stop playback of the LMMS session',
+  'inputSchema': {'properties': {}, 'title': 'stopArguments', 'type': 'object'},
+  'outputSchema': {'properties': {'result': {'additionalProperties': True,
+                                             'title': 'Result',
+                                             'type': 'object'}},
+                   'required': ['result'],
+                   'title': 'stopOutput',
+                   'type': 'object'}},
+ {'name': 'new_project',
+  'description': 'Create a new LMMS project',
+  'inputSchema': {'properties': {}, 'title': 'new_projectArguments', 'type': 'object'},
+  'outputSchema': {'properties': {'result': {'additionalProperties': True,
+                                             'title': 'Result',
+                                             'type': 'object'}},
+                   'required': ['result'],
+                   'title': 'new_projectOutput',
+                   'type': 'object'}},
+ {'name': 'save_project',
+  'description': 'Save the current LMMS project. Runs as a background job if it takes more than a moment: '
+                 "the answer is then the job's status with a job_id to follow with get_job_status; "
+                 'background=true answers with the job id at once, background=false always waits for the '
+                 'result',
+  'inputSchema': {'properties': {'path': {'default': None, 'title': 'Path', 'type': 'string'},
+                                 'background': {'anyOf': [{'type': 'boolean'}, {'type': 'null'}],
+                                                'default': None,
+                                                'title': 'Background'}},
+                  'title': 'save_projectArguments',
+                  'type': 'object'},
+  'outputSchema': {'properties': {'result': {'additionalProperties': True,
+                                             'title': 'Result',
+                                             'type': 'object'}},
+                   'required': ['result'],
+                   'title': 'save_projectOutput',
+                   'type': 'object'}},
+ {'name': 'get_job_status',
+  'description': 'Get the status, progress and, once finished, the result of a background job, or list '
+                 'recent jobs when no job_id is given. With wait > 0 (seconds, at most 60) the call waits '
+                 'for the job to finish, sending progress notifications meanwhile',
+  'inputSchema': {'properties': {'job_id': {'anyOf': [{'type': 'string'}, {'type': 'null'}],
+                                            'default': None,
+                                            'title': 'Job Id'},
+                                 'wait': {'default': 0, 'title': 'Wait', 'type': 'number'}},
+                  'title': 'get_job_statusArguments',
+                  'type': 'object'},
+  'outputSchema': {'properties': {'result': {'additionalProperties': True,
+                                             'title': 'Result',
+                                             'type': 'object'}},
+                   'required': ['result'],
+                   'title': 'get_job_statusOutput',
+                   'type': 'object'}},
+ {'name': 'cancel_job',
+  'description': 'Cancel a queued or running background job. The server stops waiting for it; an LMMS '
+                 'operation already sent may still complete',
+  'inputSchema': {'properties': {'job_id': {'title': 'Job Id', 'type': 'string'}},
+                  'required': ['job_id'],
+                  'title': 'cancel_jobArguments',
+                  'type': 'object'},
+  'outputSchema': {'properties': {'result': {'additionalProperties': True,
+                                             'title': 'Result',
+                                             'type': 'object'}},
+                   'required': ['result'],
+                   'title': 'cancel_jobOutput',
+                   'type': 'object'}},
+ {'name': 'list_snapshots',
+  'description': 'List snapshots of the session, newest first, one page at a time. A snapshot is taken once '
+                 'changes made through this server pause; each names the tools whose changes it records and '
+                 'the snapshot it followed',
+  'inputSchema': {'properties': {'offset': {'default': 0, 'title': 'Offset', 'type': 'integer'},
+                                 'limit': {'default': 50, 'title': 'Limit', 'type': 'integer'}},
+                  'title': 'list_snapshotsArguments',
+                  'type': 'object'},
+  'outputSchema': {'properties': {'result': {'additionalProperties': True,
+                                             'title': 'Result',
+                                             'type': 'object'}},
+                   'required': ['result'],
+                   'title': 'list_snapshotsOutput',
+                   'type': 'object'}},
+ {'name': 'diff_snapshots',
+  'description': 'Compare two snapshots, or a snapshot with the current session when to_snapshot is omitted: '
+                 'tempo, tracks added and removed, and per changed track its name, instrument, patterns and '
+                 'notes added and removed',
+  'inputSchema': {'properties': {'from_snapshot': {'title': 'From Snapshot', 'type': 'integer'},
+                                 'to_snapshot': {'anyOf': [{'type': 'integer'}, {'type': 'null'}],
+                                                 'default': None,
+                                                 'title': 'To Snapshot'}},
+                  'required': ['from_snapshot'],
+                  'title': 'diff_snapshotsArguments',
+                  'type': 'object'},
+  'outputSchema': {'properties': {'result': {'additionalProperties': True,
+                                             'title': 'Result',
+                                             'type': 'object'}},
+                   'required': ['result'],
+                   'title': 'diff_snapshotsOutput',
+                   'type': 'object'}},
+ {'name': 'restore_snapshot',
+  'description': 'Bring the session back to a snapshot (undo), sending LMMS only the tracks, patterns and '
+                 'notes that differ. Editing after a restore starts a new branch of the history; later '
+                 'snapshots stay available',
+  'inputSchema': {'properties': {'snapshot_id': {'title': 'Snapshot Id', 'type': 'integer'}},
+                  'required': ['snapshot_id'],
+                  'title': 'restore_snapshotArguments',
+                  'type': 'object'},
+  'outputSchema': {'properties': {'result': {'additionalProperties': True,
+                                             'title': 'Result',
+                                             'type': 'object'}},
+                   'required': ['result'],
+                   'title': 'restore_snapshotOutput',
+                   'type': 'object'}},
+ {'name': 'get_instruments_list',
+  'description': 'Search available instrument plugins, presets and samples by name (prefix and fuzzy '
+                 'matching), one page at a time',
+  'inputSchema': {'properties': {'query': {'default': None, 'title': 'Query', 'type': 'string'},
+                                 'kind': {'default': None, 'title': 'Kind', 'type': 'string'},
+                                 'offset': {'default': 0, 'title': 'Offset', 'type': 'integer'},
+                                 'limit': {'default': 50, 'title': 'Limit', 'type': 'integer'}},
+                  'title': 'get_instruments_listArguments',
+                  'type': 'object'},
+  'outputSchema': {'properties': {'result': {'additionalProperties': True,
+                                             'title': 'Result',
+                                             'type': 'object'}},
+                   'required': ['result'],
+                   'title': 'get_instruments_listOutput',
+                   'type': 'object'}},
+ {'name': 'batch',
+  'description': 'Run an ordered list of operations in one call. Each operation is {"tool": name, "args": '
+                 '{...}, "id": optional name}; a string argument "$<id or position>.<field>" is replaced by '
+                 'a field of an earlier result (e.g. "$bass.track_index"). Independent operations run '
+                 'concurrently. With atomic=true all completed operations are rolled back if any operation '
+                 'fails.',
+  'inputSchema': {'properties': {'operations': {'items': {'additionalProperties': True, 'type': 'object'},
+                                                'title': 'Operations',
+                                                'type': 'array'},
+                                 'atomic': {'default': False, 'title': 'Atomic', 'type': 'boolean'}},
+                  'required': ['operations'],
+                  'title': 'batchArguments',
+                  'type': 'object'},
+  'outputSchema': {'properties': {'result': {'additionalProperties': True,
+                                             'title': 'Result',
+                                             'type': 'object'}},
+                   'required': ['result'],
+                   'title': 'batchOutput',
+                   'type': 'object'}},
+ {'name': 'subscribe_playback',
+  'description': 'Stream playback updates to this session as they come from LMMS: the playhead (position), '
+                 'tempo changes (tempo) and per-track peak levels (meters). Updates arrive as '
+                 'notifications/resources/updated for lmms://playback/<topic> with the new value in '
+                 'params.value, at most max_rate per second (0.1 to 60); faster changes are merged, keeping '
+                 'the latest position and tempo and the highest peaks. A session that does not keep up with '
+                 'its updates is unsubscribed. Calling again adds topics and changes the rate',
+  'inputSchema': {'properties': {'topics': {'anyOf': [{'items': {'type': 'string'}, 'type': 'array'},
+                                                      {'type': 'null'}],
+                                            'default': None,
+                                            'title': 'Topics'},
+                                 'max_rate': {'default': 10.0, 'title': 'Max Rate', 'type': 'number'}},
+                  'title': 'subscribe_playbackArguments',
+                  'type': 'object'},
+  'outputSchema': {'properties': {'result': {'additionalProperties': True,
+                                             'title': 'Result',
+                                             'type': 'object'}},
+                   'required': ['result'],
+                   'title': 'subscribe_playbackOutput',
+                   'type': 'object'}},
+ {'name': 'unsubscribe_playback',
+  'description': 'Stop streaming some or, by default, all playback topics to this session',
+  'inputSchema': {'properties': {'topics': {'anyOf': [{'items': {'type': 'string'}, 'type': 'array'},
+                                                      {'type': 'null'}],
+                                            'default': None,
+                                            'title': 'Topics'}},
+                  'title': 'unsubscribe_playbackArguments',
+                  'type': 'object'},
+  'outputSchema': {'properties': {'result': {'additionalProperties': True,
+                                             'title': 'Result',
+                                             'type': 'object'}},
+                   'required': ['result'],
+                   'title': 'unsubscribe_playbackOutput',
+                   'type': 'object'}},
+ {'name': 'get_server_stats',
+  'description': 'Get per-tool call counts, error counts, in-flight calls and latencies, split into time '
+                 'waiting for LMMS and time spent in the server, and LMMS request latencies per priority '
+                 'lane',
+  'inputSchema': {'properties': {}, 'title': 'get_server_statsArguments', 'type': 'object'},
+  'outputSchema': {'properties': {'result': {'additionalProperties': True,
+                                             'title': 'Result',
+                                             'type': 'object'}},
+                   'required': ['result'],
+                   'title': 'get_server_statsOutput',
+                   'type': 'object'}}]
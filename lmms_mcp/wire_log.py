@@ -0,0 +1,310 @@
+"""
+Recording and reading of the OSC traffic between the server and LMMS.
+
+:class:`WireRecorder` appends every datagram sent to or received from LMMS to
+a binary log. The log starts with :data:`MAGIC` and is followed by one record
+per datagram: a :data:`RECORD` header (wall-clock time in nanoseconds, payload
+length and :data:`OUTGOING` or :data:`INCOMING`) and the datagram itself.
+Records are only ever appended, so a log can grow over several server runs,
+and a record cut short by a crash is ignored when reading.
+
+:class:`WireLog` memory-maps a log and walks it without copying payloads.
+:func:`tool_calls` turns the requests of a log back into the MCP tool calls
+that issued them, which ``python -m benchmarks.replay`` plays back through an
+:class:`~lmms_mcp.server.MCPServer` against the fake LMMS::
+
+    lmms-mcp server --record-wire session.wire
+    python -m lmms_mcp.wire_log session.wire
+    python -m benchmarks.replay session.wire --speed 0
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+import weakref
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from pythonosc.osc_packet import OscPacket, ParseError
+
+from .lmms_interface import ADDRESS_PREFIX, REPLY_ADDRESS
+from .notes import NoteColumns
+
+MAGIC = b"LMMSWIR1"
+RECORD = struct.Struct("<qIB")
+
+OUTGOING = 0
+INCOMING = 1
+
+DEFAULT_BUFFER_SIZE = 64 * 1024
+# Seconds between flushes of buffered records to the file
+FLUSH_INTERVAL = 1.0
+
+# LMMS commands and the tools that send them; note bundles are handled separately
+_TOOLS = {
+    "get_session_info": ("get_session_info", ()),
+    "get_track_info": ("get_track_info", ("track_index",)),
+    "create_track": ("create_track", ("track_type", "name")),
+    "set_track_name": ("set_track_name", ("track_index", "name")),
+    "delete_track": ("delete_track", ("track_index",)),
+    "create_pattern": ("create_pattern", ("track_index", "steps")),
+    "delete_pattern": ("delete_pattern", ("track_index", "pattern_index")),
+    "load_instrument": ("load_instrument", ("track_index", "instrument_path")),
+    "set_tempo": ("set_tempo", ("tempo",)),
+    "play": ("play", ()),
+    "stop": ("stop", ()),
+    "new_project": ("new_project", ()),
+    "save_project": ("save_project", ("path",)),
+    "get_instruments_list": ("get_instruments_list", ()),
+}
+_NOTE_TOOLS = {"add_notes": "add_notes_to_pattern", "remove_notes": "remove_notes_from_pattern"}
+# Tools run as jobs; replays wait for them inline
+_JOB_TOOLS = ("load_instrument", "save_project")
+
+
+class WireLogError(ValueError):
+    """Raised when a file is not a wire log."""
+
+
+class WireMessage(NamedTuple):
+    """One recorded datagram."""
+
+    time_ns: int
+    direction: int
+    data: memoryview
+
+
+class ToolCall(NamedTuple):
+    """A tool call reconstructed from the LMMS requests it sent."""
+
+    time: float
+    tool: str
+    arguments: Dict[str, Any]
+
+
+class WireRecorder:
+    """Appends datagrams to a wire log."""
+
+    def __init__(self, path: str, buffer_size: int = DEFAULT_BUFFER_SIZE):
+        """
+        Open a log for appending, creating it if needed.
+
+        Args:
+            path: The log file
+            buffer_size: Bytes of records buffered before they are written
+
+        Raises:
+            WireLogError: If the file exists and is not a wire log
+        """
+        self.path = path
+        if os.path.exists(path) and os.path.getsize(path):
+            with open(path, "rb") as existing:
+                if existing.read(len(MAGIC)) != MAGIC:
+                    raise WireLogError(f"{path} is not a wire log")
+        self._file = open(path, "ab", buffering=buffer_size)
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+        # Buffered records are written when the server exits without closing the log
+        weakref.finalize(self, self._file.close)
+        self._flushed = time.monotonic()
+        self.messages = 0
+        self.bytes = 0
+
+    def record(self, direction: int, data: bytes):
+        """Append one datagram, stamped with the current time."""
+        if self._file.closed:
+            return
+        self._file.write(RECORD.pack(time.time_ns(), len(data), direction))
+        self._file.write(data)
+        self.messages += 1
+        self.bytes += RECORD.size + len(data)
+        now = time.monotonic()
+        if now - self._flushed >= FLUSH_INTERVAL:
+            self._file.flush()
+            self._flushed = now
+
+    def sent(self, data: bytes):
+        """Append a datagram sent to LMMS."""
+        self.record(OUTGOING, data)
+
+    def received(self, data: bytes):
+        """Append a datagram received from LMMS."""
+        self.record(INCOMING, data)
+
+    def flush(self):
+        """Write buffered records to the file."""
+        if not self._file.closed:
+            self._file.flush()
+
+    def close(self):
+        """Flush and close the log."""
+        self._file.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """The log's path and what this recorder appended to it."""
+        return {"path": self.path, "messages": self.messages, "bytes": self.bytes}
+
+
+class WireLog:
+    """A memory-mapped wire log."""
+
+    def __init__(self, path: str):
+        """
+        Map a log for reading.
+
+        Raises:
+            WireLogError: If the file is not a wire log
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise WireLogError(f"{path} is not a wire log")
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.truncated = False
+
+    def __enter__(self) -> "WireLog":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Unmap the log, or leave that to the last payload view still in use."""
+        try:
+            self._map.close()
+        except BufferError:
+            pass
+
+    def __iter__(self) -> Iterator[WireMessage]:
+        """The recorded datagrams in order; payloads are views into the mapped file."""
+        view = memoryview(self._map)
+        try:
+            offset, end = len(MAGIC), len(view)
+            while offset + RECORD.size <= end:
+                time_ns, length, direction = RECORD.unpack_from(view, offset)
+                offset += RECORD.size
+                if offset + length > end:
+                    break
+                yield WireMessage(time_ns, direction, view[offset:offset + length])
+                offset += length
+            # Cut short by a crash while recording
+            self.truncated = offset != end
+        finally:
+            view.release()
+
+
+def decode(data) -> List[Tuple[str, List[Any]]]:
+    """The OSC messages of a datagram as ``(address, params)``; malformed datagrams give none."""
+    try:
+        packet = OscPacket(bytes(data))
+    except ParseError:
+        return []
+    return [(timed.message.address, list(timed.message.params)) for timed in packet.messages]
+
+
+def tool_calls(log: WireLog) -> List[ToolCall]:
+    """
+    Reconstruct the tool calls behind the LMMS requests of a log.
+
+    Each request becomes the tool that sends it, with times in seconds from
+    the first request. The note bundles of one batch (consecutive offsets to
+    one pattern) become a single ``add_notes_to_pattern`` or
+    ``remove_notes_from_pattern`` call. Requests only the server sends, such
+    as health-check pings, are left out.
+    """
+    calls: List[ToolCall] = []
+    first: Optional[int] = None
+    # (command, track, pattern) -> the call collecting that pattern's current batch
+    batches: Dict[Tuple[str, int, int], int] = {}
+    # Call index -> (offset, note records) of each bundle of its batch
+    bundles: Dict[int, List[Tuple[int, bytes]]] = {}
+    for message in log:
+        if message.direction != OUTGOING:
+            continue
+        for address, params in decode(message.data):
+            command = address[len(ADDRESS_PREFIX):]
+            args = params[1:]
+            if first is None:
+                first = message.time_ns
+            at = (message.time_ns - first) / 1e9
+            if command in _NOTE_TOOLS:
+                track_index, pattern_index, offset, records = args
+                key = (command, track_index, pattern_index)
+                if offset == 0 or key not in batches:
+                    calls.append(ToolCall(at, _NOTE_TOOLS[command], {"track_index": track_index,
+                                                                     "pattern_index": pattern_index}))
+                    batches[key] = len(calls) - 1
+                    bundles[batches[key]] = []
+                bundles[batches[key]].append((offset, records))
+            elif command in _TOOLS:
+                tool, names = _TOOLS[command]
+                arguments = {name: value for name, value in zip(names, args) if value is not None}
+                if tool in _JOB_TOOLS:
+                    arguments["background"] = False
+                calls.append(ToolCall(at, tool, arguments))
+    for index, chunks in bundles.items():
+        records = b"".join(data for _, data in sorted(chunks, key=lambda chunk: chunk[0]))
+        calls[index].arguments["notes"] = NoteColumns.from_records(records).to_dicts()
+    return calls
+
+
+def round_trips(log: WireLog) -> Dict[str, List[float]]:
+    """Seconds from each request to its reply, by command, matching replies by correlation id."""
+    pending: Dict[int, Tuple[str, int]] = {}
+    result: Dict[str, List[float]] = {}
+    for message in log:
+        for address, params in decode(message.data):
+            if not params or not isinstance(params[0], int):
+                continue
+            if message.direction == OUTGOING and address.startswith(ADDRESS_PREFIX):
+                pending[params[0]] = (address[len(ADDRESS_PREFIX):], message.time_ns)
+            elif message.direction == INCOMING and address == REPLY_ADDRESS and params[0] in pending:
+                command, sent = pending.pop(params[0])
+                result.setdefault(command, []).append((message.time_ns - sent) / 1e9)
+    return result
+
+
+def summary(path: str) -> Dict[str, Any]:
+    """Message counts, duration, round trips per command and the tool calls a replay would make."""
+    with WireLog(path) as log:
+        counts = {"outgoing": 0, "incoming": 0}
+        first = last = None
+        size = 0
+        for message in log:
+            counts["outgoing" if message.direction == OUTGOING else "incoming"] += 1
+            first = message.time_ns if first is None else first
+            last = message.time_ns
+            size += len(message.data)
+        trips = round_trips(log)
+        calls = tool_calls(log)
+        truncated = log.truncated
+    commands = {}
+    for command, seconds in sorted(trips.items()):
+        seconds.sort()
+        commands[command] = {"count": len(seconds), "p50_ms": round(seconds[len(seconds) // 2] * 1000, 3),
+                             "max_ms": round(seconds[-1] * 1000, 3)}
+    tools: Dict[str, int] = {}
+    for call in calls:
+        tools[call.tool] = tools.get(call.tool, 0) + 1
+    return {"path": path, **counts, "payload_bytes": size, "truncated": truncated,
+            "seconds": round((last - first) / 1e9, 3) if first is not None else 0.0,
+            "round_trips": commands, "tool_calls": tools}
+
+
+def main(argv: Optional[List[str]] = None):
+    """Print a summary of a wire log."""
+    parser = argparse.ArgumentParser(description="Summarise a recorded LMMS wire log")
+    parser.add_argument("path", help="Log written with --record-wire")
+    args = parser.parse_args(argv)
+    try:
+        print(json.dumps(summary(args.path), indent=2))
+    except (OSError, WireLogError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
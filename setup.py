@@ -12,7 +12,7 @@ setup(
     author="akidry",
     author_email="akidry@example.com",
     url="https://github.com/akidry/lmms-claude-mcp",
-    packages=find_packages(),
+    packages=find_packages(exclude=["benchmarks", "benchmarks.*"]),
     classifiers=[
         "Development Status :: 3 - Alpha",
         "Intended Audience :: Developers",
@@ -29,6 +29,11 @@ setup(
         "websockets>=10.0",
         "mcp>=0.1.0",
     ],
+    extras_require={
+        "numpy": ["numpy>=1.20"],
+        "tracing": ["opentelemetry-api>=1.0"],
+        "fastjson": ["orjson>=3.6"],
+    },
     entry_points={
         "console_scripts": [
             "lmms-mcp=lmms_mcp.cli:main",
@@ -0,0 +1,84 @@
+"""
+Unit tests for whole-project note analysis.
+"""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from lmms_mcp.analysis import BAR_TICKS, Part, analyze
+from lmms_mcp.pattern import Pattern
+
+# A minor, C major, G major and F major chords, one per beat
+CHORDS = [57, 60, 64, 60, 64, 67, 55, 59, 62, 53, 57, 60]
+
+
+def chords(repeat: int = 4) -> Pattern:
+    pitch = CHORDS * repeat
+    start = [48 * (i // 3) for i in range(len(pitch))]
+    return Pattern.from_ticks(pitch, [100] * len(pitch), start, [48] * len(pitch))
+
+
+class TestAnalyze:
+    """Test cases for analyze."""
+
+    def test_key_and_scales(self):
+        """Test that the key and the scales covering the notes are found."""
+        melody = Pattern.from_ticks([69, 72, 76, 74, 72, 71, 69], [100] * 7, range(0, 336, 48), [96] * 7)
+        result = analyze([Part(0, "Chords", 0, 0, chords()), Part(1, "Lead", 0, 0, melody)])
+        key = result["key"]
+        assert key["name"] in ("A minor", "C major")
+        assert key["in_key"] == 1.0 and key["out_of_key"] == []
+        # Seven-note scales of the same pitch classes cover everything; the estimated tonic comes first
+        assert key["scales"][0] == {"name": key["name"], "root": key["tonic"], "scale": key["mode"],
+                                    "in_scale": 1.0}
+        assert result["pitch_classes"]["C#"] == 0.0
+
+    def test_out_of_key_notes(self):
+        """Test that notes outside the key are reported by their share."""
+        sharp = Pattern.from_ticks([66], [100], [0], [48])
+        key = analyze([Part(0, "Chords", 0, 0, chords()), Part(1, "Odd", 0, 0, sharp)])["key"]
+        assert [entry["pitch_class"] for entry in key["out_of_key"]] == ["F#"]
+        assert key["in_key"] < 1.0
+
+    def test_density(self):
+        """Test notes per bar for the project and per track, with song positions."""
+        # Four chords fill one bar; the second part starts two bars later
+        parts = [Part(0, "Chords", 0, 0, chords(1)), Part(0, "Chords", 1, 2 * BAR_TICKS, chords(1)),
+                 Part(3, "Bass", 0, 0, Pattern.from_ticks([33, 36], [100, 100], [0, BAR_TICKS], [48, 48]))]
+        result = analyze(parts)
+        assert result["density"]["per_bar"] == [13, 1, 12]
+        assert result["density"]["empty_bars"] == 0
+        assert result["density"]["busiest"][0] == {"bar": 0, "notes": 13}
+        chords_track, bass = result["tracks"]
+        assert (chords_track["track_index"], chords_track["notes"], chords_track["bars_active"]) == (0, 24, 2)
+        assert (bass["track_index"], bass["notes_per_active_bar"]) == (3, 1.0)
+
+    def test_ranges(self):
+        """Test pitch ranges and the overlap between track pairs."""
+        low = Pattern.from_ticks([36, 48], [100, 100], [0, 48], [48, 48])
+        middle = Pattern.from_ticks([45, 60, 52], [100] * 3, [0, 48, 96], [48] * 3)
+        high = Pattern.from_ticks([72, 84], [100, 100], [0, 48], [48, 48])
+        result = analyze([Part(0, "Low", 0, 0, low), Part(1, "Mid", 0, 0, middle), Part(2, "High", 0, 0, high)])
+        assert [t["range"] for t in result["tracks"]] == [[36, 48], [45, 60], [72, 84]]
+        assert result["tracks"][1]["median_pitch"] == 52
+        # 45..48 is shared by the low and middle tracks; the high track overlaps neither
+        assert result["range_overlaps"] == [{"tracks": [0, 1], "semitones": 4, "share": round(4 / 13, 3)}]
+
+    def test_collisions(self):
+        """Test duplicate and overlapping notes of one pattern, but not of different patterns."""
+        notes = Pattern.from_ticks([60, 60, 60, 60, 62, 60], [100] * 6, [0, 0, 30, 48, 10, 200], [48] * 6)
+        # The same note in another pattern does not collide
+        other = Pattern.from_ticks([60], [100], [0], [48])
+        result = analyze([Part(0, "Lead", 0, 0, notes), Part(0, "Lead", 1, 0, other)])
+        collisions = result["collisions"]
+        # The repeated start, the note inside the first and the note starting before it ends
+        assert (collisions["overlapping"], collisions["duplicates"]) == (3, 1)
+        assert [(e["pattern_index"], e["start"], e["kind"]) for e in collisions["examples"]] == [
+            (0, 0.0, "duplicate"), (0, 0.625, "overlap"), (0, 1.0, "overlap")]
+        assert result["tracks"][0]["collisions"] == 3
+
+    def test_empty(self):
+        """Test that no notes give empty reports."""
+        result = analyze([Part(0, "Empty", 0, 0, Pattern.empty())], tempo=120)
+        assert (result["notes"], result["key"]["name"], result["tracks"]) == (0, None, [])
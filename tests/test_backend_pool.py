@@ -0,0 +1,131 @@
+"""
+Unit tests for the LMMS backend pool.
+"""
+
+import pytest
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+from lmms_mcp.backend_pool import BackendPool, current_session, parse_endpoints, session_scope
+from lmms_mcp.lmms_interface import LMMSError, LMMSTimeoutError
+
+
+class FakeInterface:
+    """Stand-in for LMMSInterface that answers health checks as told."""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.in_flight = 0
+        self.add_listener = MagicMock()
+        self.request = AsyncMock(return_value={"success": True})
+        self.close = AsyncMock()
+
+
+def make_pool(count: int = 2, **kwargs) -> BackendPool:
+    return BackendPool([("127.0.0.1", 9000 + i) for i in range(count)], FakeInterface, **kwargs)
+
+
+class TestBackendPool:
+    """Test cases for session placement and health checks."""
+
+    def test_sessions_are_pinned(self):
+        """Test that a session keeps its backend across calls."""
+        pool = make_pool()
+        with session_scope("a"):
+            first = pool.current()
+            assert pool.current() is first
+        assert current_session() == "default"
+
+    def test_sessions_are_spread(self):
+        """Test that new sessions go to the backend with the fewest sessions."""
+        pool = make_pool()
+        backends = [pool.backend_for(f"s{i}") for i in range(4)]
+        assert [b.interface.port for b in backends] == [9000, 9001, 9000, 9001]
+        pool.release("s1")
+        pool.release("s3")
+        assert pool.backend_for("s4").interface.port == 9001
+
+    def test_new_project_goes_to_least_loaded(self):
+        """Test that a new project moves its session to the least-loaded backend."""
+        pool = make_pool()
+        pool.backend_for("other")
+        with session_scope("a"):
+            assert pool.current().interface.port == 9001
+            pool.backends[1].interface.in_flight = 5
+            pool.release("other")
+            assert pool.place_new_project().interface.port == 9000
+        assert [b.sessions for b in pool.backends] == [1, 0]
+
+    @pytest.mark.asyncio
+    async def test_dead_backend_leaves_rotation(self):
+        """Test that a backend that stops answering is skipped and rejoins when it answers."""
+        pool = make_pool(failure_threshold=2)
+        dead = pool.backends[0]
+        assert pool.backend_for("a") is dead
+        dead.session_state.tempo_changed(140.0)
+        dead.interface.request.side_effect = LMMSTimeoutError("no reply")
+
+        await pool.check()
+        assert dead.healthy
+        await pool.check()
+        assert not dead.healthy
+        assert dead.session_state.version > 0 and not dead.session_state.synced
+
+        assert pool.backend_for("a") is pool.backends[1]
+        assert pool.backend_for("b") is pool.backends[1]
+        assert dead.sessions == 0
+
+        dead.interface.request.side_effect = None
+        await pool.check()
+        assert dead.healthy
+        assert pool.backend_for("c") is dead
+        await pool.close()
+
+    @pytest.mark.asyncio
+    async def test_error_reply_counts_as_alive(self):
+        """Test that a backend answering with an error stays in rotation."""
+        pool = make_pool(failure_threshold=1)
+        pool.backends[0].interface.request.side_effect = LMMSError("unknown command 'ping'")
+        await pool.check()
+        assert pool.backends[0].healthy
+        await pool.close()
+
+    def test_no_healthy_backend(self):
+        """Test that placing a session fails when every backend is down."""
+        pool = make_pool(1)
+        pool.backends[0].healthy = False
+        with pytest.raises(LMMSError):
+            pool.backend_for("a")
+
+    def test_status(self):
+        """Test the per-backend status report."""
+        pool = make_pool()
+        pool.backend_for("a")
+        assert pool.status() == [
+            {"address": "127.0.0.1:9000", "healthy": True, "sessions": 1, "in_flight": 0},
+            {"address": "127.0.0.1:9001", "healthy": True, "sessions": 0, "in_flight": 0},
+        ]
+
+
+class TestParseEndpoints:
+    """Test cases for reading LMMS endpoints from options."""
+
+    def test_defaults(self):
+        """Test that no options give the default endpoint."""
+        assert parse_endpoints(None, None) == [("127.0.0.1", 9000)]
+
+    def test_repeated_options(self):
+        """Test pairing of repeated hosts and ports."""
+        assert parse_endpoints(["a", "b"], [1, 2]) == [("a", 1), ("b", 2)]
+        assert parse_endpoints(["a"], [1, 2]) == [("a", 1), ("a", 2)]
+        assert parse_endpoints(None, [1, 2]) == [("127.0.0.1", 1), ("127.0.0.1", 2)]
+        with pytest.raises(ValueError):
+            parse_endpoints(["a", "b", "c"], [1, 2])
+
+    def test_config_file(self, tmp_path):
+        """Test reading endpoints from a JSON config file."""
+        path = tmp_path / "lmms.json"
+        path.write_text(json.dumps({"backends": [{"host": "x", "port": 9100}, {"port": 9101}]}))
+        assert parse_endpoints(None, None, str(path)) == [("x", 9100), ("127.0.0.1", 9101)]
+        assert parse_endpoints(None, [9000], str(path))[0] == ("127.0.0.1", 9000)
@@ -0,0 +1,211 @@
+"""
+Unit tests for batched tool execution.
+"""
+
+import pytest
+import asyncio
+
+from lmms_mcp.batch import BatchRunner, BatchError
+
+
+class FakeTools:
+    """Records calls to a minimal in-memory project."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self.tracks = []
+        # Like LMMS, the instrument of a track is only known once it has been loaded
+        self.instruments = {}
+        self.tempo = 120.0
+
+    def tools(self):
+        return {name: getattr(self, name) for name in (
+            "get_session_info", "get_track_info", "create_track", "delete_track", "set_track_name",
+            "load_instrument", "set_tempo", "play", "stop", "new_project")}
+
+    async def _call(self, tool, **kwargs):
+        self.calls.append((tool, kwargs))
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+
+    async def get_session_info(self):
+        return {"tempo": self.tempo, "playing": False, "track_count": len(self.tracks)}
+
+    async def get_track_info(self, track_index):
+        info = {"index": track_index, "name": self.tracks[track_index]}
+        if track_index in self.instruments:
+            info["instrument"] = self.instruments[track_index]
+        return info
+
+    async def create_track(self, track_type="instrument", name=None):
+        await self._call("create_track", name=name)
+        self.tracks.append(name)
+        return {"success": True, "track_index": len(self.tracks) - 1}
+
+    async def delete_track(self, track_index):
+        await self._call("delete_track", track_index=track_index)
+        del self.tracks[track_index]
+        return {"success": True}
+
+    async def set_track_name(self, track_index, name):
+        await self._call("set_track_name", track_index=track_index, name=name)
+        if name == "fail":
+            raise RuntimeError("rename failed")
+        self.tracks[track_index] = name
+        return {"success": True}
+
+    async def load_instrument(self, track_index, instrument_path):
+        await self._call("load_instrument", track_index=track_index, instrument_path=instrument_path)
+        if instrument_path == "missing":
+            raise RuntimeError("instrument not found")
+        self.instruments[track_index] = instrument_path
+        return {"success": True}
+
+    async def set_tempo(self, tempo):
+        await self._call("set_tempo", tempo=tempo)
+        self.tempo = tempo
+        return {"success": True}
+
+    async def play(self):
+        await self._call("play")
+        return {"success": True}
+
+    async def stop(self):
+        await self._call("stop")
+        return {"success": True}
+
+    async def new_project(self):
+        await self._call("new_project")
+        return {"success": True}
+
+
+class TestBatchRunner:
+    """Test cases for BatchRunner."""
+
+    @pytest.mark.asyncio
+    async def test_references(self):
+        """Test that later operations can use results of earlier ones."""
+        fake = FakeTools()
+        fake.tracks = ["Existing"]
+        result = await BatchRunner(fake.tools()).run([
+            {"id": "bass", "tool": "create_track", "args": {"name": "Bass"}},
+            {"tool": "set_track_name", "args": {"track_index": "$bass.track_index", "name": "Sub"}},
+            {"tool": "get_track_info", "args": {"track_index": "$0.track_index"}},
+        ])
+        assert result["success"]
+        assert result["results"][0] == {"id": "bass", "result": {"success": True, "track_index": 1}}
+        assert result["results"][2]["result"] == {"index": 1, "name": "Sub"}
+
+    @pytest.mark.asyncio
+    async def test_independent_operations_run_concurrently(self):
+        """Test that operations on different tracks overlap."""
+        fake = FakeTools(delay=0.05)
+        fake.tracks = [f"T{i}" for i in range(8)]
+        operations = [{"tool": "set_track_name", "args": {"track_index": i, "name": f"N{i}"}} for i in range(8)]
+        result = await asyncio.wait_for(BatchRunner(fake.tools()).run(operations), timeout=0.3)
+        assert result["success"]
+        assert fake.max_active == 8
+
+    @pytest.mark.asyncio
+    async def test_same_track_runs_in_order(self):
+        """Test that operations on one track keep list order."""
+        fake = FakeTools(delay=0.01)
+        fake.tracks = ["A"]
+        operations = [{"tool": "set_track_name", "args": {"track_index": 0, "name": f"N{i}"}} for i in range(5)]
+        await BatchRunner(fake.tools()).run(operations)
+        assert fake.max_active == 1
+        assert fake.tracks == ["N4"]
+
+    @pytest.mark.asyncio
+    async def test_barrier(self):
+        """Test that new_project waits for earlier operations and blocks later ones."""
+        fake = FakeTools(delay=0.01)
+        await BatchRunner(fake.tools()).run([
+            {"tool": "set_tempo", "args": {"tempo": 90}},
+            {"tool": "play"},
+            {"tool": "new_project"},
+            {"tool": "set_tempo", "args": {"tempo": 100}},
+        ])
+        names = [name for name, _ in fake.calls]
+        assert names.index("new_project") == 2
+        assert names[3] == "set_tempo"
+
+    @pytest.mark.asyncio
+    async def test_failure_skips_dependents(self):
+        """Test that a failed operation skips the operations that depend on it."""
+        fake = FakeTools()
+        fake.tracks = ["A"]
+        result = await BatchRunner(fake.tools()).run([
+            {"tool": "set_track_name", "args": {"track_index": 0, "name": "fail"}},
+            {"tool": "set_track_name", "args": {"track_index": 0, "name": "B"}},
+            {"tool": "set_tempo", "args": {"tempo": 99}},
+        ])
+        assert not result["success"]
+        assert result["results"][0] == {"error": "rename failed"}
+        assert "skipped" in result["results"][1]
+        assert result["results"][2] == {"result": {"success": True}}
+
+    @pytest.mark.asyncio
+    async def test_atomic_rollback(self):
+        """Test that an atomic batch undoes completed operations on failure."""
+        fake = FakeTools()
+        fake.tracks = ["Drums"]
+        result = await BatchRunner(fake.tools()).run([
+            {"tool": "set_tempo", "args": {"tempo": 140}},
+            {"id": "lead", "tool": "create_track", "args": {"name": "Lead"}},
+            {"tool": "set_track_name", "args": {"track_index": 0, "name": "Perc"}},
+            {"tool": "set_track_name", "args": {"track_index": "$lead.track_index", "name": "fail"}},
+        ], atomic=True)
+        assert not result["success"]
+        assert result["rolled_back"]
+        assert fake.tracks == ["Drums"]
+        assert fake.tempo == 120.0
+
+    @pytest.mark.asyncio
+    async def test_atomic_changes_to_created_tracks(self):
+        """Test that the module docstring's example runs atomically and rolls back by deleting the track."""
+        fake = FakeTools()
+        example = [
+            {"id": "bass", "tool": "create_track", "args": {"name": "Bass"}},
+            {"tool": "load_instrument",
+             "args": {"track_index": "$bass.track_index", "instrument_path": "tripleoscillator"}},
+        ]
+        result = await BatchRunner(fake.tools()).run(example, atomic=True)
+        assert result["success"]
+        assert fake.tracks == ["Bass"] and fake.instruments == {0: "tripleoscillator"}
+
+        result = await BatchRunner(fake.tools()).run(example + [
+            {"tool": "set_track_name", "args": {"track_index": "$bass.track_index", "name": "Sub"}},
+            {"tool": "load_instrument", "args": {"track_index": "$bass.track_index", "instrument_path": "missing"}},
+        ], atomic=True)
+        assert not result["success"] and result["rolled_back"]
+        assert fake.tracks == ["Bass"]
+        assert fake.calls[-1] == ("delete_track", {"track_index": 1})
+
+    @pytest.mark.asyncio
+    async def test_atomic_rejects_irreversible(self):
+        """Test that irreversible tools are refused in atomic mode before anything runs."""
+        fake = FakeTools()
+        with pytest.raises(BatchError, match="cannot be rolled back"):
+            await BatchRunner(fake.tools()).run([{"tool": "set_tempo", "args": {"tempo": 1}},
+                                                 {"tool": "new_project"}], atomic=True)
+        assert fake.calls == []
+
+    @pytest.mark.parametrize("operations, message", [
+        ([{"tool": "rm_rf"}], "unknown tool"),
+        ([{"tool": "set_tempo", "args": {"tempo": "$later.tempo"}}, {"id": "later", "tool": "play"}], "unknown or later"),
+        ([{"id": "a", "tool": "play"}, {"id": "a", "tool": "stop"}], "duplicate id"),
+        ([{"args": {}}], "'tool' field"),
+    ])
+    @pytest.mark.asyncio
+    async def test_malformed(self, operations, message):
+        """Test that malformed batches are rejected."""
+        with pytest.raises(BatchError, match=message):
+            await BatchRunner(FakeTools().tools()).run(operations)
@@ -0,0 +1,49 @@
+"""
+Unit tests for compact JSON encoding of tool results.
+"""
+
+import inspect
+import json
+
+import pytest
+
+from lmms_mcp import encoding
+from lmms_mcp.encoding import dumps, encoded
+
+
+@pytest.fixture(params=["orjson", "json"], autouse=True)
+def encoder(request, monkeypatch):
+    """Run every test with orjson and with the standard library encoder."""
+    if request.param == "orjson":
+        if encoding.orjson is None:
+            pytest.skip("orjson is not installed")
+    else:
+        monkeypatch.setattr(encoding, "orjson", None)
+    return request.param
+
+
+class TestEncoding:
+    """Test cases for the compact encoder."""
+
+    def test_compact(self):
+        """Test that output has no whitespace and round-trips."""
+        value = {"tracks": [{"index": 0, "name": "Bass", "patterns": []}], "tempo": 120.5, "next": None}
+        text = dumps(value)
+        assert text == '{"tracks":[{"index":0,"name":"Bass","patterns":[]}],"tempo":120.5,"next":null}'
+        assert json.loads(text) == value
+
+    def test_unknown_values(self):
+        """Test that values JSON does not know are encoded as strings."""
+        assert json.loads(dumps({"path": encoding})) == {"path": str(encoding)}
+
+    @pytest.mark.asyncio
+    async def test_encoded_keeps_signature(self):
+        """Test that wrapped tools keep their signature and return JSON text."""
+        async def tool(track_index: int, fields: list = None) -> dict:
+            """Describe a track."""
+            return {"index": track_index, "fields": fields}
+
+        wrapped = encoded(tool)
+        assert inspect.signature(wrapped).parameters == inspect.signature(tool).parameters
+        assert wrapped.__doc__ == "Describe a track."
+        assert await wrapped(3, fields=["name"]) == '{"index":3,"fields":["name"]}'
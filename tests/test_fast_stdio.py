@@ -0,0 +1,95 @@
+"""
+Unit tests for the fast-starting stdio transport.
+"""
+
+import io
+import json
+import os
+import threading
+import time
+
+from lmms_mcp import tool_manifest
+from lmms_mcp.fast_stdio import StdioFrontEnd, build_manifest, render_manifest, MANIFEST_PATH
+from lmms_mcp.server import MCPServer
+
+
+def encode(*messages):
+    return io.BytesIO(b"".join(json.dumps(m).encode() + b"\n" for m in messages))
+
+
+INITIALIZE = {"jsonrpc": "2.0", "id": 1, "method": "initialize",
+              "params": {"protocolVersion": "2025-06-18", "capabilities": {},
+                         "clientInfo": {"name": "test", "version": "0"}}}
+INITIALIZED = {"jsonrpc": "2.0", "method": "notifications/initialized"}
+
+
+class TestToolManifest:
+    """Test the precomputed manifest."""
+
+    def test_manifest_is_current(self):
+        """Test that the committed manifest matches what FastMCP reports for the server."""
+        with open(MANIFEST_PATH) as f:
+            assert f.read() == render_manifest(build_manifest()), \
+                "run: python -m lmms_mcp.fast_stdio --write-manifest"
+
+    def test_manifest_lists_every_tool(self):
+        """Test that every registered tool is in the manifest."""
+        names = {tool["name"] for tool in tool_manifest.TOOLS}
+        assert {"get_session_info", "batch", "get_server_stats"} <= names
+
+
+class TestStdioFrontEnd:
+    """Test the session handover to the real server."""
+
+    def run_session(self, *messages, expect=None, factory=MCPServer):
+        """Feed messages over a pipe, keeping it open until ``expect`` replies arrived."""
+        read_fd, write_fd = os.pipe()
+        stdout = io.BytesIO()
+        front_end = StdioFrontEnd(factory, stdin=os.fdopen(read_fd, "rb"), stdout=stdout)
+        thread = threading.Thread(target=front_end.serve)
+        thread.start()
+        with os.fdopen(write_fd, "wb") as stdin:
+            stdin.write(encode(*messages).getvalue())
+            stdin.flush()
+            deadline = time.monotonic() + 10
+            while len(stdout.getvalue().splitlines()) < (expect or 0) and time.monotonic() < deadline:
+                time.sleep(0.01)
+        thread.join(10)
+        return [json.loads(line) for line in stdout.getvalue().splitlines()]
+
+    def test_session_is_replayed(self):
+        """Test that the session is answered once per request, across the handover."""
+        replies = self.run_session(
+            INITIALIZE, INITIALIZED,
+            {"jsonrpc": "2.0", "id": 2, "method": "tools/list"},
+            {"jsonrpc": "2.0", "id": 3, "method": "tools/call",
+             "params": {"name": "get_server_stats", "arguments": {}}},
+            expect=3,
+        )
+        assert sorted(r["id"] for r in replies) == [1, 2, 3]
+        by_id = {r["id"]: r for r in replies}
+        assert by_id[1]["result"]["protocolVersion"] == "2025-06-18"
+        assert by_id[1]["result"]["serverInfo"]["name"] == "LMMS-MCP"
+        assert by_id[2]["result"]["tools"] == tool_manifest.TOOLS
+        assert not by_id[3]["result"].get("isError")
+        stats = json.loads(by_id[3]["result"]["content"][0]["text"])
+        assert stats["tools"]["get_server_stats"]["calls"] == 1
+
+    def test_unknown_protocol_version(self):
+        """Test that an unsupported protocol version is answered with the latest one."""
+        request = dict(INITIALIZE, params=dict(INITIALIZE["params"], protocolVersion="1999-01-01"))
+        replies = self.run_session(request, INITIALIZED, expect=1)
+        assert replies[0]["result"]["protocolVersion"] == tool_manifest.LATEST_PROTOCOL_VERSION
+
+    def test_server_failure_is_reported(self):
+        """Test that requests get errors if the server cannot be built."""
+        def broken():
+            raise RuntimeError("boom")
+
+        replies = self.run_session(
+            INITIALIZE, INITIALIZED,
+            {"jsonrpc": "2.0", "id": 2, "method": "tools/call", "params": {"name": "play", "arguments": {}}},
+            expect=2, factory=broken,
+        )
+        assert replies[0]["id"] == 1
+        assert replies[-1]["id"] == 2 and "boom" in replies[-1]["error"]["message"]
@@ -0,0 +1,116 @@
+"""
+Unit tests for server-side pattern generators.
+"""
+
+import pytest
+
+from lmms_mcp import generators, notes, pattern as pattern_module
+from lmms_mcp.generators import PatternSpecError, SCALES, generate, parse_chord, parse_spec
+from lmms_mcp.notes import NoteValidationError, TICKS_PER_BEAT
+
+
+@pytest.fixture(params=["numpy", "array"], autouse=True)
+def backend(request, monkeypatch):
+    """Run every test with NumPy columns and with the pure-Python fallback."""
+    if request.param == "numpy":
+        if notes.np is None:
+            pytest.skip("NumPy is not installed")
+    else:
+        for module in (notes, pattern_module, generators):
+            monkeypatch.setattr(module, "np", None)
+    return request.param
+
+
+def beats(pattern):
+    return [s / TICKS_PER_BEAT for s in pattern.start.tolist()]
+
+
+class TestParseSpec:
+    """Test cases for reading specs."""
+
+    def test_one_line(self):
+        """Test the one-line form, with value types and pitch rows."""
+        spec = parse_spec("steps 36=x... 42=x-x- step=0.5 seed=3 name=kick")
+        assert spec == {"type": "steps", "rows": {"36": "x...", "42": "x-x-"}, "step": 0.5, "seed": 3,
+                        "name": "kick"}
+
+    def test_dict(self):
+        """Test that dict specs need a generator type."""
+        assert parse_spec({"type": "euclid", "pulses": 3})["pulses"] == 3
+        with pytest.raises(PatternSpecError):
+            parse_spec({"pulses": 3})
+        with pytest.raises(PatternSpecError):
+            parse_spec("euclid pulses")
+
+    def test_chords(self):
+        """Test chord symbols."""
+        assert parse_chord("C") == [60, 64, 67]
+        assert parse_chord("Am", octave=3) == [57, 60, 64]
+        assert parse_chord("F#m7") == [66, 69, 73, 76]
+        assert parse_chord("Bbmaj7") == [70, 74, 77, 81]
+        with pytest.raises(PatternSpecError):
+            parse_chord("H7")
+
+
+class TestGenerate:
+    """Test cases for expanding specs into notes."""
+
+    def test_euclid(self):
+        """Test the tresillo, E(3,8), repeated and offset."""
+        tresillo = generate("euclid pulses=3 steps=8 note=38 step=0.25 repeat=2 start=4")
+        assert list(tresillo.pitch) == [38] * 6
+        assert beats(tresillo) == [4.0, 4.75, 5.5, 6.0, 6.75, 7.5]
+        assert set(tresillo.length.tolist()) == {TICKS_PER_BEAT // 4}
+        rotated = generate({"type": "euclid", "pulses": 3, "steps": 8, "rotate": 1})
+        assert beats(rotated) == [0.25, 1.0, 1.75]
+
+    def test_steps(self):
+        """Test hits, accents, held notes and several rows."""
+        drums = generate("steps 36=X...x--. 42=x.x.x.x. velocity=90")
+        kick = [(s, l, v) for p, s, l, v in zip(drums.pitch.tolist(), beats(drums), drums.length.tolist(),
+                                                 drums.velocity.tolist()) if p == 36]
+        assert kick == [(0.0, 12, 127), (1.0, 36, 90)]
+        assert drums.pitch.tolist().count(42) == 4
+
+    def test_arp_updown(self):
+        """Test an up-and-down arpeggio over two chords."""
+        arp = generate("arp chords=C,Am mode=updown beats=1.5")
+        assert list(arp.pitch) == [60, 64, 67, 64, 60, 64, 69, 72, 76, 72, 69, 72]
+        assert beats(arp)[-1] == 2.75
+
+    def test_walk(self):
+        """Test that a walk stays in its scale and range and is reproducible."""
+        spec = "walk root=D scale=dorian count=5000 low=50 high=74 max_step=3 seed=11"
+        walk = generate(spec)
+        pitches = walk.pitch.tolist()
+        assert len(pitches) == 5000
+        assert all(50 <= p <= 74 for p in pitches)
+        assert all((p - 2) % 12 in SCALES["dorian"] for p in pitches)
+        assert len(set(pitches)) > 5
+        assert walk.to_dicts() == generate(spec).to_dicts()
+        assert len(generate(spec + " density=0.5")) < 5000
+
+    def test_thousands_of_notes_from_one_line(self):
+        """Test that a short spec expands to a long part."""
+        hats = generate("euclid pulses=11 steps=16 note=42 repeat=1000")
+        assert len(hats) == 11000
+        assert beats(hats)[-1] < 4000
+
+    @pytest.mark.parametrize("spec", [
+        "noise count=3",
+        "euclid pulses=9 steps=8",
+        "euclid step=0",
+        "arp chords=C mode=sideways",
+        "walk scale=bebop",
+        "steps",
+        "walk count=2000000",
+    ])
+    def test_bad_specs(self, spec):
+        """Test that specs that cannot be expanded are rejected."""
+        with pytest.raises(PatternSpecError):
+            generate(spec)
+
+    def test_out_of_range_notes(self):
+        """Test that generated notes outside the MIDI range are rejected."""
+        with pytest.raises(NoteValidationError):
+            generate("arp chords=G octave=9 octaves=2")
@@ -0,0 +1,112 @@
+"""
+Unit tests for the instrument index.
+"""
+
+import pytest
+import os
+
+from lmms_mcp.instrument_index import AmbiguousInstrumentError, InstrumentIndex
+
+
+@pytest.fixture
+def library(tmp_path):
+    root = tmp_path / "lmms"
+    (root / "plugins").mkdir(parents=True)
+    (root / "presets" / "TripleOscillator").mkdir(parents=True)
+    (root / "samples" / "drums").mkdir(parents=True)
+    for name in ("libtripleoscillator.so", "libkicker.so", "libzynaddsubfx.so"):
+        (root / "plugins" / name).write_text("")
+    for name in ("Bass.xpf", "SuperBass.xpf", "Pluck.xpf", "readme.txt"):
+        (root / "presets" / "TripleOscillator" / name).write_text("")
+    for name in ("kick01.ogg", "snare01.ogg", "hihat_closed.wav"):
+        (root / "samples" / "drums" / name).write_text("")
+    return root
+
+
+@pytest.fixture
+def index(tmp_path, library):
+    index = InstrumentIndex(str(tmp_path / "cache" / "index.sqlite"), [str(library)], refresh_interval=0)
+    yield index
+    index.close()
+
+
+class TestInstrumentIndex:
+    """Test cases for InstrumentIndex."""
+
+    def test_build(self, index):
+        """Test that the first query builds the index."""
+        result = index.search()
+        assert result["total"] == 9
+        names = {r["name"]: r["kind"] for r in result["results"]}
+        assert names["tripleoscillator"] == "plugin"
+        assert names["Bass"] == "preset"
+        assert names["kick01"] == "sample"
+        assert "readme" not in names
+
+    def test_prefix_and_fuzzy(self, index):
+        """Test that prefix matches come before fuzzy matches."""
+        result = index.search("bass")
+        assert [r["name"] for r in result["results"]] == ["Bass", "SuperBass"]
+        assert [r["name"] for r in index.search("bass", fuzzy=False)["results"]] == ["Bass"]
+        assert index.search("hhcl")["results"][0]["name"] == "hihat_closed"
+        assert index.search("zzz")["total"] == 0
+
+    def test_kind_filter_and_pagination(self, index):
+        """Test kind filtering and offset/limit paging."""
+        first = index.search(kind="sample", limit=2)
+        second = index.search(kind="sample", offset=2, limit=2)
+        assert first["total"] == 3
+        assert len(first["results"]) == 2
+        assert len(second["results"]) == 1
+        assert {r["name"] for r in first["results"] + second["results"]} == {"kick01", "snare01", "hihat_closed"}
+
+    def test_incremental_refresh(self, index, library):
+        """Test that only changed directories are rescanned."""
+        index.refresh(force=True)
+        stats = index.refresh(force=True)
+        assert stats["rescanned"] == 0
+        assert stats["checked"] == 6
+
+        (library / "samples" / "drums" / "clap.wav").write_text("")
+        stats = index.refresh(force=True)
+        assert stats["rescanned"] == 1
+        assert index.search("clap")["total"] == 1
+
+        os.remove(library / "samples" / "drums" / "clap.wav")
+        (library / "presets" / "TripleOscillator" / "Pluck.xpf").unlink()
+        index.refresh(force=True)
+        assert index.search("clap")["total"] == 0
+        assert index.search("pluck")["total"] == 0
+
+    def test_removed_directory(self, index, library):
+        """Test that entries under a removed directory are forgotten."""
+        index.refresh(force=True)
+        for name in os.listdir(library / "samples" / "drums"):
+            os.remove(library / "samples" / "drums" / name)
+        os.rmdir(library / "samples" / "drums")
+        index.refresh(force=True)
+        assert index.search(kind="sample")["total"] == 0
+
+    def test_persistence(self, tmp_path, library, index):
+        """Test that a second index over the same database needs no rescan."""
+        index.refresh(force=True)
+        index.close()
+        again = InstrumentIndex(index.db_path, [str(library)])
+        assert again.refresh(force=True)["rescanned"] == 0
+        assert again.search("kick")["total"] == 2
+        again.close()
+
+    def test_resolve(self, index):
+        """Test resolving short names for load_instrument."""
+        assert index.resolve("TripleOscillator") == "tripleoscillator"
+        assert index.resolve("bass").endswith(os.path.join("TripleOscillator", "Bass.xpf"))
+        assert index.resolve("snare").endswith("snare01.ogg")
+        assert index.resolve("nothing-like-this") is None
+
+    def test_resolve_is_not_fuzzy(self, index):
+        """Test that resolving only takes unique prefixes, never fuzzy matches."""
+        assert index.resolve("zyn") == "zynaddsubfx"
+        assert index.resolve("hhcl") is None
+        assert index.resolve("") is None
+        with pytest.raises(AmbiguousInstrumentError, match="kick01 \\(sample\\), kicker \\(plugin\\)"):
+            index.resolve("kick")
@@ -0,0 +1,172 @@
+"""
+Unit tests for background jobs.
+"""
+
+import asyncio
+import json
+import os
+
+import pytest
+
+from lmms_mcp.jobs import CANCELLED, FAILED, INTERRUPTED, QUEUED, RUNNING, SUCCEEDED, JobManager
+
+
+def blocked(release: asyncio.Event, result=None):
+    """Work that reports progress and then waits for ``release``."""
+    async def work(report):
+        report(1, 2, "half way")
+        await release.wait()
+        report(2, 2, "done")
+        return result or {"success": True}
+    return work
+
+
+@pytest.fixture
+def log_path(tmp_path):
+    return str(tmp_path / "jobs.jsonl")
+
+
+class TestJobManager:
+    """Test cases for JobManager."""
+
+    @pytest.mark.asyncio
+    async def test_quick_job_is_not_recorded(self, log_path):
+        """Test that a job nobody was told about leaves no trace."""
+        jobs = JobManager(log_path)
+        release = asyncio.Event()
+        release.set()
+        job = jobs.start("save_project", blocked(release, {"saved": True}))
+        assert await jobs.wait(job, 1.0)
+        assert (job.status, job.result) == (SUCCEEDED, {"saved": True})
+        assert jobs.jobs() == []
+        with pytest.raises(ValueError):
+            jobs.get(job.id)
+        assert jobs.stats() == {}
+
+    @pytest.mark.asyncio
+    async def test_concurrency_is_bounded(self, log_path):
+        """Test that jobs beyond the limit wait their turn."""
+        jobs = JobManager(log_path, max_concurrent=2)
+        release = asyncio.Event()
+        started = [jobs.register(jobs.start("load_instrument", blocked(release))) for _ in range(4)]
+        await asyncio.sleep(0.01)
+        assert [job.status for job in started] == [RUNNING, RUNNING, QUEUED, QUEUED]
+        assert jobs.stats() == {RUNNING: 2, QUEUED: 2}
+        release.set()
+        for job in started:
+            assert await jobs.wait(job, 1.0)
+        assert jobs.stats() == {SUCCEEDED: 4}
+
+    @pytest.mark.asyncio
+    async def test_progress_and_timeout(self, log_path):
+        """Test that waiting forwards progress and gives up without cancelling."""
+        jobs = JobManager(log_path)
+        release = asyncio.Event()
+        job = jobs.start("import_midi", blocked(release))
+        seen = []
+
+        async def on_progress(progress, total, message):
+            seen.append((progress, total, message))
+
+        assert not await jobs.wait(job, 0.05, on_progress)
+        assert seen[-1] == (1, 2, "half way")
+        assert job.status == RUNNING
+        release.set()
+        assert await jobs.wait(job, 1.0)
+        assert job.to_dict()["progress"] == 2
+
+    @pytest.mark.asyncio
+    async def test_cancel_and_failure(self, log_path):
+        """Test cancelled and failed jobs."""
+        jobs = JobManager(log_path)
+        job = jobs.register(jobs.start("save_project", blocked(asyncio.Event())))
+        await asyncio.sleep(0)
+        jobs.cancel(job.id)
+        await jobs.wait(job, 1.0)
+        assert job.status == CANCELLED
+
+        async def broken(report):
+            raise OSError("disk full")
+
+        failed = jobs.register(jobs.start("save_project", broken))
+        await jobs.wait(failed, 1.0)
+        assert failed.to_dict()["error"] == "disk full"
+        assert failed.status == FAILED
+        assert isinstance(failed.exception, OSError)
+
+    @pytest.mark.asyncio
+    async def test_log_survives_restart(self, log_path):
+        """Test that registered jobs are known after a restart and unfinished ones are interrupted."""
+        jobs = JobManager(log_path)
+        release = asyncio.Event()
+        release.set()
+        finished = jobs.register(jobs.start("save_project", blocked(release, {"path": "a.mmp"})))
+        await jobs.wait(finished, 1.0)
+        running = jobs.register(jobs.start("import_midi", blocked(asyncio.Event()), {"path": "b.mid"}))
+        await asyncio.sleep(0)
+        with open(log_path, "a") as f:
+            f.write('{"job_id": "cut sho')
+
+        restarted = JobManager(log_path)
+        assert restarted.get(finished.id).to_dict()["result"] == {"path": "a.mmp"}
+        interrupted = restarted.get(running.id)
+        assert interrupted.status == INTERRUPTED
+        assert interrupted.args == {"path": "b.mid"}
+        await jobs.close()
+        await restarted.close()
+
+    @pytest.mark.asyncio
+    async def test_log_is_compacted_when_unused(self, log_path):
+        """Test that a server alone with the log compacts it to one line per job."""
+        jobs = JobManager(log_path)
+        release = asyncio.Event()
+        release.set()
+        finished = jobs.register(jobs.start("save_project", blocked(release)))
+        await jobs.wait(finished, 1.0)
+        await jobs.close()
+        with open(log_path, "a") as f:
+            f.write('{"job_id": "cut sho')
+
+        restarted = JobManager(log_path)
+        assert restarted.get(finished.id).status == SUCCEEDED
+        with open(log_path) as f:
+            assert [json.loads(line)["job_id"] for line in f] == [finished.id]
+        await restarted.close()
+
+    @pytest.mark.asyncio
+    async def test_shared_log(self, log_path):
+        """Test that jobs of another running server are not interrupted and its updates still reach the log."""
+        jobs = JobManager(log_path)
+        release = asyncio.Event()
+        running = jobs.register(jobs.start("import_midi", blocked(release)))
+        await asyncio.sleep(0)
+        with open(log_path, "a") as f:
+            # Owned by a live process, the parent of this one
+            f.write(json.dumps({"job_id": "elsewhere", "kind": "save_project", "status": RUNNING,
+                                "pid": os.getppid()}) + "\n")
+
+        other = JobManager(log_path)
+        assert other.get("elsewhere").status == RUNNING
+        # Same process, so a server that stopped
+        assert other.get(running.id).status == INTERRUPTED
+        # A line cut short by a crash, after which the first server appends
+        with open(log_path, "a") as f:
+            f.write('{"job_id": "cut sho')
+        release.set()
+        await jobs.wait(running, 1.0)
+        with open(log_path) as f:
+            last = json.loads(f.readlines()[-1])
+        assert (last["job_id"], last["status"]) == (running.id, SUCCEEDED)
+        await jobs.close()
+        await other.close()
+
+    @pytest.mark.asyncio
+    async def test_finished_jobs_are_pruned(self, log_path):
+        """Test that only the most recent finished jobs are kept."""
+        jobs = JobManager(log_path, keep_finished=3)
+        release = asyncio.Event()
+        release.set()
+        for _ in range(5):
+            await jobs.wait(jobs.register(jobs.start("save_project", blocked(release))), 1.0)
+        assert len(jobs.jobs()) == 3
+        assert len(JobManager(log_path, keep_finished=3).jobs()) == 3
@@ -0,0 +1,74 @@
+"""
+Unit tests for the priority lane scheduler.
+"""
+
+import pytest
+import asyncio
+
+from lmms_mcp.lanes import BULK, INTERACTIVE, REALTIME, LaneScheduler, lane_for
+
+
+async def hold(scheduler: LaneScheduler, lane: str, order: list, release: asyncio.Event):
+    async with scheduler.slot(lane):
+        order.append(lane)
+        await release.wait()
+
+
+class TestLaneScheduler:
+    """Test cases for LaneScheduler."""
+
+    def test_lane_for(self):
+        """Test the lane of transport, edit and bulk commands."""
+        assert lane_for("stop") == REALTIME
+        assert lane_for("set_track_name") == INTERACTIVE
+        assert lane_for("add_notes") == BULK
+
+    @pytest.mark.asyncio
+    async def test_higher_lanes_go_first(self):
+        """Test that freed slots go to the highest waiting lane, first come first served within it."""
+        scheduler = LaneScheduler(1)
+        order, release = [], asyncio.Event()
+        tasks = [asyncio.create_task(hold(scheduler, BULK, order, release))]
+        await asyncio.sleep(0)
+        for lane in (BULK, INTERACTIVE, REALTIME, INTERACTIVE):
+            tasks.append(asyncio.create_task(hold(scheduler, lane, order, release)))
+        await asyncio.sleep(0)
+        assert scheduler.snapshot()[INTERACTIVE]["queued"] == 2
+        release.set()
+        await asyncio.gather(*tasks)
+        assert order == [BULK, REALTIME, INTERACTIVE, INTERACTIVE, BULK]
+        assert scheduler.active == 0
+
+    @pytest.mark.asyncio
+    async def test_bulk_leaves_slots_free(self):
+        """Test that bulk requests cannot take every slot."""
+        scheduler = LaneScheduler(4, max_bulk_in_flight=2)
+        order, release = [], asyncio.Event()
+        tasks = [asyncio.create_task(hold(scheduler, BULK, order, release)) for _ in range(5)]
+        await asyncio.sleep(0)
+        assert scheduler.active == 2
+        tasks.append(asyncio.create_task(hold(scheduler, REALTIME, order, release)))
+        await asyncio.sleep(0)
+        assert order == [BULK, BULK, REALTIME]
+        release.set()
+        await asyncio.gather(*tasks)
+        stats = scheduler.snapshot()
+        assert stats[BULK]["requests"] == 5
+        assert stats[REALTIME]["wait_max_ms"] < stats[BULK]["wait_max_ms"]
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_gives_up_its_place(self):
+        """Test that a cancelled request neither keeps nor leaks a slot."""
+        scheduler = LaneScheduler(1)
+        order, release = [], asyncio.Event()
+        first = asyncio.create_task(hold(scheduler, BULK, order, release))
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(hold(scheduler, REALTIME, order, release))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        release.set()
+        await first
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert scheduler.active == 0
+        assert order == [BULK]
@@ -0,0 +1,213 @@
+"""
+Unit tests for the LMMS OSC interface.
+"""
+
+import pytest
+import asyncio
+import json
+from typing import Any, Dict, List, Tuple
+
+from pythonosc.osc_message_builder import OscMessageBuilder
+from pythonosc.osc_packet import OscPacket
+
+from lmms_mcp.lmms_interface import LMMSInterface, LMMSError, LMMSTimeoutError
+from lmms_mcp.notes import NOTE_RECORD
+
+
+def build_reply(request_id: int, result: Dict[str, Any]) -> bytes:
+    builder = OscMessageBuilder("/lmms/reply")
+    builder.add_arg(request_id)
+    builder.add_arg(json.dumps(result))
+    return builder.build().dgram
+
+
+class FakeLMMSProtocol(asyncio.DatagramProtocol):
+    """Minimal LMMS stand-in that answers every request after an optional delay."""
+
+    def __init__(self, delays: Dict[str, float] = None, silent: Tuple[str, ...] = ()):
+        self.delays = delays or {}
+        self.silent = silent
+        self.received: List[Tuple[str, List[Any]]] = []
+        self.datagram_sizes: List[int] = []
+        self.max_concurrent = 0
+        self._outstanding = 0
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.datagram_sizes.append(len(data))
+        for timed in OscPacket(data).messages:
+            message = timed.message
+            command = message.address[len("/lmms/"):]
+            self.received.append((command, list(message.params)))
+            if command in self.silent:
+                continue
+            self._outstanding += 1
+            self.max_concurrent = max(self.max_concurrent, self._outstanding)
+            asyncio.get_running_loop().call_later(
+                self.delays.get(command, 0.0), self._answer, command, message.params, addr)
+
+    def _answer(self, command, params, addr):
+        self._outstanding -= 1
+        if command == "fail":
+            result = {"error": "boom"}
+        else:
+            args = [len(p) if isinstance(p, bytes) else p for p in params[1:]]
+            result = {"success": True, "command": command, "args": args}
+        self.transport.sendto(build_reply(params[0], result), addr)
+
+
+class SerialLMMSProtocol(FakeLMMSProtocol):
+    """LMMS stand-in that works through requests one at a time, like LMMS's event loop."""
+
+    def __init__(self, per_message: float = 0.0005):
+        super().__init__()
+        self.per_message = per_message
+        self.queue = []
+        self.busy = False
+
+    def datagram_received(self, data, addr):
+        for timed in OscPacket(data).messages:
+            message = timed.message
+            self.queue.append((message.address[len("/lmms/"):], message.params, addr))
+        if not self.busy:
+            self._next()
+
+    def _next(self):
+        self.busy = bool(self.queue)
+        if self.busy:
+            command, params, addr = self.queue.pop(0)
+            self.received.append((command, list(params)))
+            self._outstanding += 1
+            asyncio.get_running_loop().call_later(self.per_message, self._done, command, params, addr)
+
+    def _done(self, command, params, addr):
+        self._answer(command, params, addr)
+        self._next()
+
+
+@pytest.fixture
+async def fake_lmms():
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.create_datagram_endpoint(
+        FakeLMMSProtocol, local_addr=("127.0.0.1", 0))
+    protocol.port = transport.get_extra_info("sockname")[1]
+    yield protocol
+    transport.close()
+
+
+class TestLMMSInterface:
+    """Test cases for the OSC transport."""
+
+    @pytest.mark.asyncio
+    async def test_request_reply(self, fake_lmms):
+        """Test that a request is answered through its correlation id."""
+        interface = LMMSInterface("127.0.0.1", fake_lmms.port)
+        result = await interface.set_track_name(2, "Bass")
+        assert result == {"success": True, "command": "set_track_name", "args": [2, "Bass"]}
+        assert interface.in_flight == 0
+        await interface.close()
+
+    @pytest.mark.asyncio
+    async def test_requests_are_pipelined(self, fake_lmms):
+        """Test that concurrent requests are in flight at the same time."""
+        fake_lmms.delays["set_tempo"] = 0.05
+        interface = LMMSInterface("127.0.0.1", fake_lmms.port)
+        results = await asyncio.wait_for(
+            asyncio.gather(*(interface.set_tempo(100 + i) for i in range(20))), timeout=0.5)
+        assert [r["args"][0] for r in results] == [float(100 + i) for i in range(20)]
+        assert fake_lmms.max_concurrent == 20
+        await interface.close()
+
+    @pytest.mark.asyncio
+    async def test_in_flight_cap(self, fake_lmms):
+        """Test that max_in_flight bounds the number of outstanding requests."""
+        fake_lmms.delays["play"] = 0.01
+        interface = LMMSInterface("127.0.0.1", fake_lmms.port, max_in_flight=4)
+        await asyncio.gather(*(interface.play() for _ in range(16)))
+        assert fake_lmms.max_concurrent == 4
+        await interface.close()
+
+    @pytest.mark.asyncio
+    async def test_timeout(self, fake_lmms):
+        """Test that an unanswered request times out and is cleaned up."""
+        fake_lmms.silent = ("stop",)
+        interface = LMMSInterface("127.0.0.1", fake_lmms.port, timeout=0.05)
+        with pytest.raises(LMMSTimeoutError):
+            await interface.stop()
+        assert interface.in_flight == 0
+        await interface.close()
+
+    @pytest.mark.asyncio
+    async def test_error_reply(self, fake_lmms):
+        """Test that an error reply is raised as LMMSError."""
+        interface = LMMSInterface("127.0.0.1", fake_lmms.port)
+        with pytest.raises(LMMSError, match="boom"):
+            await interface.request("fail")
+        await interface.close()
+
+    @pytest.mark.asyncio
+    async def test_notifications(self, fake_lmms):
+        """Test that non-reply messages are delivered to listeners."""
+        interface = LMMSInterface("127.0.0.1", fake_lmms.port)
+        received = []
+        interface.add_listener(lambda address, args: received.append((address, args)))
+        await interface.play()
+        builder = OscMessageBuilder("/lmms/notify/tempo")
+        builder.add_arg(128.0)
+        local = interface._transport.get_extra_info("sockname")
+        fake_lmms.transport.sendto(builder.build().dgram, local)
+        await asyncio.sleep(0.05)
+        assert received == [("/lmms/notify/tempo", (128.0,))]
+        await interface.close()
+
+    @pytest.mark.asyncio
+    async def test_add_notes_bulk(self, fake_lmms):
+        """Test that notes are streamed as MTU-bounded bundles covering every note."""
+        interface = LMMSInterface("127.0.0.1", fake_lmms.port, max_in_flight=8, max_datagram_size=512)
+        notes = [{"note": 36 + i % 48, "velocity": 100, "start": i / 4, "length": 0.25} for i in range(1000)]
+        result = await interface.add_notes_to_pattern(1, 2, notes)
+
+        assert result["notes"] == 1000
+        assert result["bundles"] == len(fake_lmms.received)
+        assert max(fake_lmms.datagram_sizes) <= 512
+        assert fake_lmms.max_concurrent <= 8
+        offsets = []
+        for command, params in sorted(fake_lmms.received, key=lambda r: r[1][3]):
+            assert command == "add_notes"
+            assert params[1:3] == [1, 2]
+            assert params[3] == sum(offsets)
+            offsets.append(len(params[4]) // NOTE_RECORD.size)
+        assert sum(offsets) == 1000
+        await interface.close()
+
+    @pytest.mark.asyncio
+    async def test_stop_is_not_stuck_behind_bulk_upload(self):
+        """Test that stop latency stays bounded while 100k notes are being uploaded."""
+        loop = asyncio.get_running_loop()
+        transport, lmms = await loop.create_datagram_endpoint(SerialLMMSProtocol, local_addr=("127.0.0.1", 0))
+        interface = LMMSInterface("127.0.0.1", transport.get_extra_info("sockname")[1])
+        notes = [{"note": 36 + i % 48, "start": i / 4, "length": 0.25} for i in range(100_000)]
+
+        started = loop.time()
+        upload = asyncio.create_task(interface.add_notes_to_pattern(0, 0, notes))
+        while len(lmms.received) < 50:
+            await asyncio.sleep(0.005)
+        stop_started = loop.time()
+        await interface.stop()
+        stop_latency = loop.time() - stop_started
+        result = await upload
+        upload_time = loop.time() - started
+
+        assert result["notes"] == 100_000
+        # Only the bulk bundles already handed to LMMS are ahead of the stop
+        bound = (interface._lanes.max_bulk_in_flight + 1) * lmms.per_message
+        assert stop_latency < max(4 * bound, 0.1)
+        assert stop_latency < upload_time / 4
+        stats = interface.lane_stats()
+        assert stats["realtime"]["requests"] == 1
+        assert stats["bulk"]["requests"] == result["bundles"]
+        await interface.close()
+        transport.close()
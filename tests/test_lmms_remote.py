@@ -0,0 +1,164 @@
+"""
+Unit tests for the LMMS bridge.
+"""
+
+import pytest
+import asyncio
+import json
+from typing import Any, List, Tuple
+
+from pythonosc.osc_message import ParseError
+from pythonosc.osc_message_builder import OscMessageBuilder
+from pythonosc.osc_packet import OscPacket
+
+from lmms_mcp.lmms_interface import LMMSInterface
+from lmms_mcp.lmms_remote import LMMSRemoteScript, split_packet
+from lmms_mcp.notes import NOTE_RECORD
+
+
+class RecordingLMMS(asyncio.DatagramProtocol):
+    """LMMS stand-in that records every message and echoes its arguments back."""
+
+    def __init__(self):
+        self.received: List[Tuple[str, List[Any]]] = []
+        self.datagrams = 0
+        self.transport = None
+        self.peer = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.datagrams += 1
+        self.peer = addr
+        for timed in OscPacket(data).messages:
+            message = timed.message
+            command = message.address[len("/lmms/"):]
+            self.received.append((command, list(message.params)))
+            args = [len(p) if isinstance(p, bytes) else p for p in message.params[1:]]
+            builder = OscMessageBuilder("/lmms/reply")
+            builder.add_arg(message.params[0])
+            builder.add_arg(json.dumps({"success": True, "command": command, "args": args}))
+            self.transport.sendto(builder.build().dgram, addr)
+
+    def notify(self, address: str, *args):
+        builder = OscMessageBuilder(address)
+        for arg in args:
+            builder.add_arg(arg)
+        self.transport.sendto(builder.build().dgram, self.peer)
+
+
+@pytest.fixture
+async def bridge():
+    loop = asyncio.get_running_loop()
+    transport, lmms = await loop.create_datagram_endpoint(RecordingLMMS, local_addr=("127.0.0.1", 0))
+    remote = LMMSRemoteScript("127.0.0.1", transport.get_extra_info("sockname")[1], "127.0.0.1", 0)
+    await remote.start()
+    remote.lmms = lmms
+    clients = []
+
+    def client():
+        interface = LMMSInterface("127.0.0.1", remote.client_address[1])
+        clients.append(interface)
+        return interface
+
+    remote.client = client
+    yield remote
+    for interface in clients:
+        await interface.close()
+    remote.close()
+    transport.close()
+
+
+class TestLMMSRemoteScript:
+    """Test cases for the bridge."""
+
+    @pytest.mark.asyncio
+    async def test_replies_are_routed_to_their_sender(self, bridge):
+        """Test that requests from several servers each get their own reply."""
+        first, second = bridge.client(), bridge.client()
+        results = await asyncio.gather(first.get_track_info(1), second.get_track_info(2),
+                                       first.play(), second.stop())
+        assert [r["command"] for r in results] == ["get_track_info", "get_track_info", "play", "stop"]
+        assert results[0]["args"] == [1] and results[1]["args"] == [2]
+
+    @pytest.mark.asyncio
+    async def test_requests_are_batched_per_tick(self, bridge):
+        """Test that requests sent together reach LMMS in one datagram."""
+        interface = bridge.client()
+        await interface.start_server()
+        await asyncio.gather(*(interface.get_track_info(i) for i in range(10)))
+        assert len(bridge.lmms.received) == 10
+        assert bridge.lmms.datagrams == 1
+
+    @pytest.mark.asyncio
+    async def test_repeated_setters_are_coalesced(self, bridge):
+        """Test that repeated tempo sets are merged and every caller is answered."""
+        first, second = bridge.client(), bridge.client()
+        await asyncio.gather(first.start_server(), second.start_server())
+        results = await asyncio.gather(*(c.set_tempo(100 + i) for i, c in enumerate([first, second] * 5)))
+        assert len(results) == 10
+        tempos = [params[1] for command, params in bridge.lmms.received if command == "set_tempo"]
+        assert tempos == [109.0]
+        assert bridge.stats["coalesced"] == 9
+
+    @pytest.mark.asyncio
+    async def test_setters_are_not_merged_across_conflicts(self, bridge):
+        """Test that a rename is not moved across a request on the same track."""
+        interface = bridge.client()
+        await interface.start_server()
+        await asyncio.gather(interface.set_track_name(0, "a"), interface.create_pattern(0, 16),
+                             interface.set_track_name(0, "b"), interface.set_track_name(1, "x"),
+                             interface.set_track_name(1, "y"))
+        commands = [(command, params[1:]) for command, params in bridge.lmms.received]
+        assert commands == [("set_track_name", [0, "a"]), ("create_pattern", [0, 16]),
+                            ("set_track_name", [0, "b"]), ("set_track_name", [1, "y"])]
+
+    @pytest.mark.asyncio
+    async def test_note_bundles_pass_through(self, bridge):
+        """Test that bulk note uploads are relayed intact."""
+        interface = bridge.client()
+        notes = [{"note": 60, "start": i * 0.25, "length": 0.25} for i in range(1000)]
+        result = await interface.add_notes_to_pattern(0, 0, notes)
+        assert result["notes"] == 1000
+        blobs = [params[4] for command, params in bridge.lmms.received if command == "add_notes"]
+        assert sum(len(b) for b in blobs) == 1000 * NOTE_RECORD.size
+
+    @pytest.mark.asyncio
+    async def test_notifications_fan_out(self, bridge):
+        """Test that LMMS notifications reach every connected server."""
+        first, second = bridge.client(), bridge.client()
+        seen = {id(first): [], id(second): []}
+        for interface in (first, second):
+            interface.add_listener(lambda address, args, i=interface: seen[id(i)].append((address, args)))
+        await first.play()
+        await second.play()
+        bridge.lmms.notify("/lmms/notify/tempo", 140.0)
+        await asyncio.sleep(0.05)
+        assert seen[id(first)] == [("/lmms/notify/tempo", (140.0,))]
+        assert seen[id(second)] == [("/lmms/notify/tempo", (140.0,))]
+
+    def test_split_packet(self):
+        """Test that nested bundles are flattened into messages."""
+        message = OscMessageBuilder("/lmms/play").build().dgram
+        header = b"#bundle\x00" + b"\x00" * 7 + b"\x01"
+        inner = header + len(message).to_bytes(4, "big") + message
+        outer = header + len(inner).to_bytes(4, "big") + inner + len(message).to_bytes(4, "big") + message
+        assert split_packet(outer) == [message, message]
+
+    @pytest.mark.parametrize("size", [-4, 3])
+    def test_split_packet_rejects_bad_sizes(self, size):
+        """Test that a bundle element with a negative or unaligned size is rejected."""
+        message = OscMessageBuilder("/lmms/play").build().dgram
+        bundle = b"#bundle\x00" + b"\x00" * 7 + b"\x01" + size.to_bytes(4, "big", signed=True) + message
+        with pytest.raises(ParseError):
+            split_packet(bundle)
+
+    def test_split_packet_rejects_truncated_bundles(self):
+        """Test that a bundle cut short inside an element or its size is rejected."""
+        message = OscMessageBuilder("/lmms/play").build().dgram
+        bundle = b"#bundle\x00" + b"\x00" * 7 + b"\x01" + len(message).to_bytes(4, "big") + message
+        with pytest.raises(ParseError):
+            split_packet(bundle[:-4])
+        with pytest.raises(ParseError):
+            split_packet(bundle + b"\x00\x00")
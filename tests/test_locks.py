@@ -0,0 +1,116 @@
+"""
+Unit tests for project, track and pattern locks.
+"""
+
+import asyncio
+import contextvars
+
+import pytest
+
+from lmms_mcp.locks import ProjectLocks
+
+
+async def started(coroutine) -> asyncio.Task:
+    """Start a coroutine as another client would, holding no locks, and let it run up to its first wait."""
+    task = contextvars.Context().run(asyncio.ensure_future, coroutine)
+    for _ in range(3):
+        await asyncio.sleep(0)
+    return task
+
+
+class TestProjectLocks:
+    """Test cases for ProjectLocks."""
+
+    @pytest.mark.asyncio
+    async def test_different_patterns_and_tracks_run_together(self):
+        """Test that edits of different patterns and tracks do not wait for each other."""
+        locks = ProjectLocks()
+        async with locks.pattern(0, 0):
+            async with locks.pattern(0, 1):
+                async with locks.track(1):
+                    assert locks.stats()["contended"] == 0
+        # Project and track 0 are taken once for both patterns
+        assert locks.stats() == {"acquired": 5, "contended": 0, "active": 0}
+
+    @pytest.mark.asyncio
+    async def test_same_pattern_waits(self):
+        """Test that a second edit of a pattern waits for the first."""
+        locks = ProjectLocks()
+        order = []
+
+        async def edit(name):
+            async with locks.pattern(2, 0):
+                order.append(f"{name} start")
+                await asyncio.sleep(0.01)
+                order.append(f"{name} end")
+
+        await asyncio.gather(edit("a"), edit("b"))
+        assert order == ["a start", "a end", "b start", "b end"]
+        assert locks.stats()["contended"] == 1
+
+    @pytest.mark.asyncio
+    async def test_track_change_waits_for_note_edits(self):
+        """Test that a track-wide change waits for note edits on the track, but not on others."""
+        locks = ProjectLocks()
+        async with locks.pattern(0, 0):
+            other = await started(self.hold(locks.track(1)))
+            same = await started(self.hold(locks.track(0)))
+            assert other.done() and not same.done()
+        await same
+
+    @pytest.mark.asyncio
+    async def test_structural_change_is_exclusive_and_fair(self):
+        """Test that a project-wide change waits for edits, and later edits wait behind it."""
+        locks = ProjectLocks()
+        order = []
+        async with locks.pattern(0, 0):
+            structural = await started(self.hold(locks.project(), order, "delete_track"))
+            edit = await started(self.hold(locks.pattern(5, 0), order, "edit"))
+            assert not structural.done() and not edit.done()
+        await asyncio.gather(structural, edit)
+        assert order == ["delete_track", "edit"]
+
+    @pytest.mark.asyncio
+    async def test_reentrant(self):
+        """Test that locks held by the task cover nested locks instead of deadlocking."""
+        locks = ProjectLocks()
+        async with locks.project():
+            async with locks.track(3):
+                async with locks.pattern(3, 1):
+                    pass
+            # Tasks started under the lock share it
+            await asyncio.wait_for(asyncio.ensure_future(self.hold(locks.pattern(0, 0))), 1)
+        async with locks.track(3):
+            async with locks.pattern(3, 0):
+                pass
+        assert locks.stats()["active"] == 0
+
+    @pytest.mark.asyncio
+    async def test_upgrade_is_refused(self):
+        """Test that asking for a lock exclusively while holding it shared fails instead of deadlocking."""
+        locks = ProjectLocks()
+        async with locks.track(0, exclusive=False):
+            with pytest.raises(RuntimeError):
+                async with locks.track(0):
+                    pass
+        assert locks.stats()["active"] == 0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter(self):
+        """Test that a waiter cancelled in the queue does not hold up those behind it."""
+        locks = ProjectLocks()
+        async with locks.pattern(0, 0):
+            structural = await started(self.hold(locks.project()))
+            edit = await started(self.hold(locks.pattern(1, 0)))
+            structural.cancel()
+            await asyncio.sleep(0)
+            await asyncio.wait_for(edit, 1)
+        with pytest.raises(asyncio.CancelledError):
+            await structural
+        assert locks.stats()["active"] == 0
+
+    @staticmethod
+    async def hold(lock, order=None, name=None):
+        async with lock:
+            if order is not None:
+                order.append(name)
@@ -0,0 +1,70 @@
+"""
+Unit tests for the tool metrics.
+"""
+
+import asyncio
+
+import pytest
+
+from lmms_mcp.metrics import Histogram, ServerMetrics, lmms_time
+
+
+class TestHistogram:
+    """Test the latency histogram."""
+
+    def test_cumulative_buckets(self):
+        """Test that buckets are cumulative and end with +Inf."""
+        histogram = Histogram((0.1, 1.0))
+        for value in (0.05, 0.5, 0.7, 3.0):
+            histogram.observe(value)
+        assert histogram.cumulative() == [("0.1", 1), ("1.0", 3), ("+Inf", 4)]
+        assert histogram.sum == pytest.approx(4.25)
+
+
+class TestServerMetrics:
+    """Test tool instrumentation."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_lmms_time_is_counted_once(self):
+        """Test that overlapping LMMS waits in one call are not double counted."""
+        metrics = ServerMetrics()
+
+        async def wait():
+            with lmms_time("play"):
+                await asyncio.sleep(0.05)
+
+        async def tool():
+            await asyncio.gather(*(wait() for _ in range(5)))
+
+        await metrics.instrument("tool", tool)()
+        stats = metrics.tools["tool"]
+        lmms = stats.histograms["lmms"].sum
+        assert 0.04 < lmms <= stats.histograms["handler"].sum
+        assert lmms < 0.2
+
+    @pytest.mark.asyncio
+    async def test_framing_excludes_handler(self):
+        """Test that framing time is what the framework spends around the tool."""
+        metrics = ServerMetrics()
+
+        async def tool():
+            await asyncio.sleep(0.05)
+
+        measured = metrics.instrument("tool", tool)
+        with metrics.framing("tool"):
+            await measured()
+            await asyncio.sleep(0.02)
+        framing = metrics.tools["tool"].histograms["framing"].sum
+        assert 0.015 < framing < 0.05
+
+    @pytest.mark.asyncio
+    async def test_wrapper_keeps_signature(self):
+        """Test that the wrapper exposes the wrapped function's signature and docstring."""
+        import inspect
+
+        async def tool(track_index: int, name: str = "x"):
+            """Rename a track."""
+
+        measured = ServerMetrics().instrument("tool", tool)
+        assert str(inspect.signature(measured)) == str(inspect.signature(tool))
+        assert measured.__doc__ == "Rename a track."
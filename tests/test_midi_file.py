@@ -0,0 +1,137 @@
+"""
+Unit tests for reading and writing Standard MIDI Files.
+"""
+
+import pytest
+import struct
+
+from lmms_mcp import notes, pattern as pattern_module, midi_file
+from lmms_mcp.midi_file import (MidiFileError, MidiReader, MidiWriter, export_project_file, iter_track_events)
+from lmms_mcp.notes import TICKS_PER_BEAT
+from lmms_mcp.pattern import Pattern
+from tests.test_project_file import PROJECT_XML
+
+
+@pytest.fixture(params=["numpy", "array"], autouse=True)
+def backend(request, monkeypatch):
+    """Run every test with NumPy columns and with the pure-Python fallback."""
+    if request.param == "numpy":
+        if notes.np is None:
+            pytest.skip("NumPy is not installed")
+    else:
+        for module in (notes, pattern_module, midi_file):
+            monkeypatch.setattr(module, "np", None)
+    return request.param
+
+
+def smf(division: int, *tracks: bytes, file_format: int = 1) -> bytes:
+    data = b"MThd" + struct.pack(">IHHH", 6, file_format, len(tracks), division)
+    for track in tracks:
+        data += b"MTrk" + struct.pack(">I", len(track)) + track
+    return data
+
+
+# Division 96: a quarter note is 96 ticks, 48 in LMMS
+CONDUCTOR = (b"\x00\xff\x51\x03\x07\xa1\x20"  # 120 BPM
+             b"\x00\xff\x2f\x00")
+PIANO = (b"\x00\xff\x03\x05Piano"
+         b"\x00\xc0\x05"                        # program 5 on channel 1
+         b"\x00\x90\x3c\x64"                    # C4 on
+         b"\x00\x40\x50"                        # E4 on, running status
+         b"\x60\x3c\x00"                        # C4 off after a quarter (velocity 0)
+         b"\x00\xf0\x03\x7e\x7f\xf7"            # sysex
+         b"\x81\x40\x80\x40\x40"                # E4 off after 2 more quarters
+         b"\x00\x99\x24\x7f"                    # kick on channel 10, never switched off
+         b"\x30\xff\x2f\x00")
+
+
+@pytest.fixture
+def song(tmp_path):
+    path = tmp_path / "song.mid"
+    path.write_bytes(smf(96, CONDUCTOR, PIANO))
+    return str(path)
+
+
+class TestMidiReader:
+    """Test cases for parsing MIDI files."""
+
+    def test_events(self):
+        """Test event decoding with running status, sysex and meta events."""
+        events = list(iter_track_events(PIANO))
+        assert events[0] == (0, 0xFF, 0x03, b"Piano")
+        assert events[3] == (0, 0x90, 0x40, 0x50)
+        assert events[4] == (96, 0x90, 0x3C, 0)
+        assert events[5] == (96, 0xF0, None, b"\x7e\x7f\xf7")
+        assert events[6] == (288, 0x80, 0x40, 0x40)
+        assert events[-1] == (336, 0xFF, 0x2F, b"")
+
+    def test_tracks(self, song):
+        """Test that notes are paired, converted to LMMS ticks and split by channel."""
+        with MidiReader(song) as reader:
+            assert (reader.format, reader.track_count, reader.division) == (1, 2, 96)
+            conductor, piano = list(reader.tracks())
+        assert conductor.tempo == 120.0 and conductor.parts == []
+        assert piano.name == "Piano" and piano.events == 9
+        keys, drums = piano.parts
+        assert keys.to_dict() == {"track": 1, "channel": 0, "name": "Piano ch1", "program": 5,
+                                  "drums": False, "notes": 2}
+        assert keys.notes.to_dicts() == [
+            {"note": 60, "velocity": 100, "start": 0.0, "length": 1.0, "pan": 0},
+            {"note": 64, "velocity": 80, "start": 0.0, "length": 3.0, "pan": 0},
+        ]
+        assert keys.steps == 16
+        assert drums.to_dict()["drums"]
+        # Held until the end of the track
+        assert drums.notes.to_dicts()[0]["length"] == 0.5
+
+    @pytest.mark.parametrize("data, message", [
+        (b"RIFF0000", "not a Standard MIDI File"),
+        (smf(0xE250, PIANO), "SMPTE"),
+        (smf(96, PIANO, file_format=2), "format 2"),
+        (smf(96, PIANO)[:-10], "truncated"),
+        (smf(96, b"\x00\x3c\x40"), "without a status"),
+        # Meta and sysex events cancel running status
+        (smf(96, b"\x00\x90\x3c\x64\x00\xff\x01\x00\x00\x3c\x00"), "without a status"),
+        (smf(96, b"\x00\x90\x3c\x64\x00\xf0\x01\xf7\x00\x3c\x00"), "without a status"),
+        (smf(96, b"\x00\x90\x3c"), "middle of an event"),
+    ])
+    def test_bad_files(self, tmp_path, data, message):
+        """Test that unreadable files are rejected."""
+        path = tmp_path / "bad.mid"
+        path.write_bytes(data)
+        with pytest.raises(MidiFileError, match=message):
+            with MidiReader(str(path)) as reader:
+                list(reader.tracks())
+
+
+class TestMidiWriter:
+    """Test cases for writing MIDI files."""
+
+    def test_round_trip(self, tmp_path):
+        """Test that written tracks read back to the same notes."""
+        path = str(tmp_path / "out.mid")
+        lead = Pattern.from_ticks([60, 67, 60], [100, 90, 127], [0, 0, 12], [24, 200, 12])
+        bass = Pattern.from_ticks(list(range(30, 90)), [80] * 60, [i * 300 for i in range(60)], [299] * 60)
+        with MidiWriter(path, tempo=90, chunk_size=16) as writer:
+            writer.write_track("Lead", lead)
+            writer.write_track("Bass", bass, channel=1)
+        with MidiReader(path) as reader:
+            assert (reader.track_count, reader.division) == (3, TICKS_PER_BEAT)
+            tempo, lead_back, bass_back = list(reader.tracks())
+        assert tempo.tempo == 90.0
+        assert lead_back.name == "Lead"
+        assert lead_back.parts[0].notes.sorted().to_dicts() == lead.sorted().to_dicts()
+        assert bass_back.parts[0].channel == 1
+        assert bass_back.parts[0].notes.to_dicts() == bass.to_dicts()
+
+    def test_export_project_file(self, tmp_path):
+        """Test exporting an LMMS project with patterns at their song positions."""
+        project = tmp_path / "song.mmp"
+        project.write_text(PROJECT_XML)
+        path = str(tmp_path / "song.mid")
+        result = export_project_file(str(project), path)
+        # The beat/bassline track has no notes of its own and the sample track none at all
+        assert result == {"tempo": 128.0, "tracks": [{"track": 0, "name": "Lead", "notes": 3}]}
+        with MidiReader(path) as reader:
+            lead = list(reader.tracks())[1].parts[0].notes
+        assert [(n["note"], n["start"]) for n in lead.to_dicts()] == [(69, 0.0), (72, 1.0), (57, 4.0)]
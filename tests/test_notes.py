@@ -0,0 +1,115 @@
+"""
+Unit tests for column-wise note batches.
+"""
+
+import base64
+
+import pytest
+
+from lmms_mcp import notes as notes_module
+from lmms_mcp.notes import NoteColumns, NoteValidationError, NOTE_RECORD, TICKS_PER_BEAT
+
+
+class TestNoteColumns:
+    """Test cases for NoteColumns."""
+
+    def test_from_dicts(self):
+        """Test conversion of note dicts into tick columns."""
+        columns = NoteColumns.from_dicts([
+            {"note": 60, "velocity": 90, "start": 0, "length": 1},
+            {"pitch": 64, "start": 0.5, "length": 0.25},
+        ])
+        assert len(columns) == 2
+        assert list(columns.pitch) == [60, 64]
+        assert list(columns.velocity) == [90, 100]
+        assert list(columns.start) == [0, TICKS_PER_BEAT // 2]
+        assert list(columns.length) == [TICKS_PER_BEAT, TICKS_PER_BEAT // 4]
+
+    def test_round_trip(self):
+        """Test that columns convert back to the MCP dict format."""
+        notes = [{"note": 60, "velocity": 100, "start": 1.0, "length": 0.5}]
+        assert NoteColumns.from_dicts(notes).to_dicts() == notes
+
+    def test_to_records(self):
+        """Test packing into fixed-width little-endian records."""
+        columns = NoteColumns.from_dicts([{"note": 60, "velocity": 100, "start": 2, "length": 1},
+                                          {"note": 62, "velocity": 80, "start": 3, "length": 1}])
+        records = columns.to_records()
+        assert len(records) == 2 * NOTE_RECORD.size
+        assert NOTE_RECORD.unpack_from(records, NOTE_RECORD.size) == (62, 80, 3 * TICKS_PER_BEAT, TICKS_PER_BEAT)
+
+    def test_from_records(self):
+        """Test unpacking records, rejecting partial and out-of-range ones."""
+        columns = NoteColumns.from_dicts([{"note": 60, "velocity": 100, "start": 2, "length": 1},
+                                          {"note": 62, "velocity": 80, "start": 3, "length": 0.5}])
+        assert NoteColumns.from_records(columns.to_records()).to_dicts() == columns.to_dicts()
+        with pytest.raises(NoteValidationError, match="multiple"):
+            NoteColumns.from_records(columns.to_records()[:-1])
+        with pytest.raises(NoteValidationError, match="pitch"):
+            NoteColumns.from_records(NOTE_RECORD.pack(200, 100, 0, 12))
+
+    def test_base64(self):
+        """Test the base64 record form, rejecting text that is not base64 of whole, valid records."""
+        columns = NoteColumns.from_dicts([{"note": 60, "velocity": 100, "start": 2, "length": 1},
+                                          {"note": 62, "velocity": 80, "start": 3, "length": 0.5}])
+        text = columns.to_base64()
+        assert base64.b64decode(text) == columns.to_records()
+        assert NoteColumns.from_base64(text).to_dicts() == columns.to_dicts()
+        with pytest.raises(NoteValidationError, match="base64"):
+            NoteColumns.from_base64(text[:-2] + "!!")
+        with pytest.raises(NoteValidationError, match="multiple"):
+            NoteColumns.from_base64(base64.b64encode(columns.to_records()[:-1]).decode())
+        with pytest.raises(NoteValidationError, match="Note 1: length 0"):
+            NoteColumns.from_base64(base64.b64encode(NOTE_RECORD.pack(60, 100, 0, 12)
+                                                     + NOTE_RECORD.pack(61, 100, 0, 0)).decode())
+
+    @pytest.mark.parametrize("note, message", [
+        ({"note": 128}, "pitch"),
+        ({"note": 60, "velocity": -1}, "velocity"),
+        ({"note": 60, "start": -1}, "start"),
+        ({"note": 60, "length": 0}, "length"),
+        ({"velocity": 100}, "missing"),
+        ({"note": "C4"}, "numeric"),
+    ])
+    def test_validation(self, note, message):
+        """Test that out-of-range notes are rejected with their index."""
+        with pytest.raises(NoteValidationError, match=message):
+            NoteColumns.from_dicts([{"note": 60}, note])
+
+    @pytest.mark.parametrize("backend", ["numpy", "array"])
+    @pytest.mark.parametrize("note, message", [
+        ({"note": 60.7}, "Note 1: pitch 60.7 is not a finite whole number"),
+        ({"note": 60, "velocity": 99.5}, "velocity 99.5"),
+        ({"note": 60, "start": float("nan")}, "start nan"),
+        ({"note": 60, "length": float("inf")}, "length inf"),
+    ])
+    def test_fractions_and_non_finite_values(self, monkeypatch, backend, note, message):
+        """Test that fractional pitches and velocities and non-finite times are rejected, not truncated."""
+        if backend == "numpy" and notes_module.np is None:
+            pytest.skip("NumPy is not installed")
+        if backend == "array":
+            monkeypatch.setattr(notes_module, "np", None)
+        with pytest.raises(NoteValidationError, match=message):
+            NoteColumns.from_dicts([{"note": 60}, note])
+        assert list(NoteColumns.from_dicts([{"note": 60.0, "velocity": 90.0}]).pitch) == [60]
+
+    @pytest.mark.parametrize("backend", ["numpy", "array"])
+    @pytest.mark.parametrize("note, message", [
+        ({"note": 60, "start": "1.0a"}, "Note 1: start '1.0a' is not a number"),
+        ({"note": 60, "start": "2"}, "Note 1: start '2' is not a number"),
+        ({"note": 60, "length": None}, "Note 1: length None is not a number"),
+    ])
+    def test_non_numeric_times(self, monkeypatch, backend, note, message):
+        """Test that non-numeric starts and lengths are rejected with their index."""
+        if backend == "numpy" and notes_module.np is None:
+            pytest.skip("NumPy is not installed")
+        if backend == "array":
+            monkeypatch.setattr(notes_module, "np", None)
+        with pytest.raises(NoteValidationError, match=message):
+            NoteColumns.from_dicts([{"note": 60}, note])
+
+    def test_empty(self):
+        """Test that an empty batch is valid."""
+        columns = NoteColumns.from_dicts([])
+        assert len(columns) == 0
+        assert columns.to_records() == b""
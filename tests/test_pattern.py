@@ -0,0 +1,137 @@
+"""
+Unit tests for column-wise patterns.
+"""
+
+import pytest
+
+from lmms_mcp import notes, pattern as pattern_module
+from lmms_mcp.notes import NoteValidationError, TICKS_PER_BEAT
+from lmms_mcp.pattern import Pattern, diff_patterns
+
+
+@pytest.fixture(params=["numpy", "array"], autouse=True)
+def backend(request, monkeypatch):
+    """Run every test with NumPy columns and with the pure-Python fallback."""
+    if request.param == "numpy":
+        if notes.np is None:
+            pytest.skip("NumPy is not installed")
+    else:
+        monkeypatch.setattr(notes, "np", None)
+        monkeypatch.setattr(pattern_module, "np", None)
+    return request.param
+
+
+def bar(*starts, note=60):
+    return Pattern.from_dicts([{"note": note + i, "start": s, "length": 0.25} for i, s in enumerate(starts)])
+
+
+class TestPattern:
+    """Test cases for Pattern."""
+
+    def test_round_trip(self):
+        """Test that note dicts survive conversion, with pan."""
+        dicts = [{"note": 60, "velocity": 90, "start": 0.5, "length": 0.25, "pan": -30},
+                 {"note": 64, "velocity": 100, "start": 1.0, "length": 1.0, "pan": 0}]
+        assert Pattern.from_dicts(dicts).to_dicts() == dicts
+
+    def test_pan_defaults_to_centre(self):
+        """Test that notes without pan are centred."""
+        assert Pattern.from_dicts([{"note": 60}]).to_dicts()[0]["pan"] == 0
+
+    @pytest.mark.parametrize("note", [{"note": 60, "pan": 101}, {"note": 60, "pan": "left"},
+                                      {"note": 60, "pan": 10.5}, {"note": 60, "pan": float("nan")}])
+    def test_pan_validation(self, note):
+        """Test that bad pan values are rejected."""
+        with pytest.raises(NoteValidationError):
+            Pattern.from_dicts([note])
+
+    def test_nbytes(self):
+        """Test the memory held by the columns."""
+        assert bar(0, 1, 2).nbytes == 3 * (1 + 1 + 4 + 4 + 1)
+
+    def test_transpose(self):
+        """Test that transposing shifts every pitch and leaves the original alone."""
+        original = bar(0, 1)
+        assert list(original.transpose(12).pitch) == [72, 73]
+        assert list(original.transpose(-60).pitch) == [0, 1]
+        assert list(original.pitch) == [60, 61]
+        with pytest.raises(NoteValidationError):
+            original.transpose(67)
+
+    def test_quantize(self):
+        """Test full and partial quantization to a grid."""
+        loose = Pattern.from_ticks([60, 61], [100, 100], [5, 20], [7, 30])
+        assert list(loose.quantize(0.25).start) == [0, 24]
+        assert list(loose.quantize(0.25, strength=0.5).start) == [2, 22]
+        assert list(loose.quantize(0.25, lengths=True).length) == [12, 24]
+
+    def test_humanize(self):
+        """Test that humanizing stays within bounds and is reproducible."""
+        straight = bar(*[i * 0.25 for i in range(64)])
+        loose = straight.humanize(timing=0.05, velocity=10, seed=1)
+        assert loose.to_dicts() == straight.humanize(timing=0.05, velocity=10, seed=1).to_dicts()
+        offsets = [a - b for a, b in zip(loose.start.tolist(), straight.start.tolist())]
+        assert max(abs(o) for o in offsets) <= round(0.05 * TICKS_PER_BEAT)
+        assert any(offsets)
+        assert all(90 <= v <= 110 for v in loose.velocity)
+        assert min(loose.start) >= 0
+
+    def test_humanize_nothing(self):
+        """Test that zero amounts leave the notes unchanged."""
+        quiet = Pattern.from_ticks([60], [0], [0], [12])
+        assert quiet.humanize(seed=3).to_dicts() == quiet.to_dicts()
+
+    def test_slice(self):
+        """Test selecting the notes that start inside a window."""
+        notes_ = bar(0, 3.5, 4, 7.75, 8)
+        bar_two = notes_.slice(4, 8)
+        assert list(bar_two.pitch) == [62, 63]
+        assert list(bar_two.start) == [4 * TICKS_PER_BEAT, int(7.75 * TICKS_PER_BEAT)]
+        assert list(notes_.slice(4, 8, rebase=True).start) == [0, int(3.75 * TICKS_PER_BEAT)]
+        assert list(notes_.slice(7).pitch) == [63, 64]
+        assert len(notes_.slice(9)) == 0
+        with pytest.raises(NoteValidationError, match="before beat 0"):
+            notes_.slice(-1, 4, rebase=True)
+
+    def test_sorted_and_concat(self):
+        """Test ordering by start then pitch, and joining patterns."""
+        joined = bar(2, 1).concat([bar(1, note=50)])
+        assert list(joined.pitch) == [60, 61, 50]
+        ordered = joined.sorted()
+        assert list(ordered.pitch) == [50, 61, 60]
+        assert list(ordered.start) == [48, 48, 96]
+
+    def test_empty(self):
+        """Test an empty pattern."""
+        empty = Pattern.empty()
+        assert len(empty) == 0
+        assert empty.to_dicts() == []
+        assert len(empty.transpose(3).quantize().humanize(0.1, 5).slice(0, 4)) == 0
+        assert empty.to_records() == b""
+
+    def test_difference_pairs_duplicates(self):
+        """Test that each note cancels at most one equal note."""
+        doubled = Pattern.from_ticks([60, 60, 62], [100, 100, 100], [0, 0, 48], [12, 12, 12])
+        single = Pattern.from_ticks([60], [100], [0], [12])
+        assert list(doubled.difference(single).pitch) == [60, 62]
+        assert list(doubled.difference(doubled).pitch) == []
+        assert list(single.difference(doubled).pitch) == []
+
+    def test_difference_without_velocity(self):
+        """Test matching on pitch, start and length only, as LMMS removes notes."""
+        loud = Pattern.from_ticks([60, 62], [127, 100], [0, 48], [12, 12])
+        quiet = Pattern.from_ticks([60], [20], [0], [12])
+        assert list(loud.difference(quiet).pitch) == [60, 62]
+        assert list(loud.difference(quiet, match_velocity=False).pitch) == [62]
+
+    def test_diff_patterns(self):
+        """Test the remove and add sets that turn one pattern into another."""
+        old = bar(0, 1, 2, 3)
+        new = Pattern.from_dicts([{"note": 60, "start": 0, "length": 0.25},
+                                  {"note": 61, "start": 1, "length": 0.25, "velocity": 50},
+                                  {"note": 63, "start": 3, "length": 0.25, "pan": 40},
+                                  {"note": 70, "start": 4, "length": 0.25}])
+        removed, added = diff_patterns(old, new)
+        assert sorted(removed.pitch) == [61, 62]
+        assert sorted(added.pitch) == [61, 70]
+        assert diff_patterns(new, new)[0].to_dicts() == diff_patterns(new, new)[1].to_dicts() == []
@@ -0,0 +1,113 @@
+"""
+Unit tests for playback subscriptions.
+"""
+
+import asyncio
+
+import pytest
+
+from lmms_mcp.playback import PlaybackHub, SubscriptionError, uri_topic
+
+
+class Recorder:
+    """A subscriber's sender that records what it is sent, optionally stalling."""
+
+    def __init__(self, stall: float = 0.0):
+        self.stall = stall
+        self.updates = []
+
+    async def __call__(self, uri, value):
+        if self.stall:
+            await asyncio.sleep(self.stall)
+        self.updates.append((uri, value))
+
+
+class TestPlaybackHub:
+    """Test cases for PlaybackHub."""
+
+    @pytest.mark.asyncio
+    async def test_updates_are_coalesced_to_the_rate(self):
+        """Test that a burst of positions reaches a subscriber as the first and the latest one."""
+        hub = PlaybackHub()
+        send = Recorder()
+        hub.subscribe("a", send, ["position"], max_rate=20)
+        for ticks in range(0, 480, 12):
+            hub.handle_notification("/lmms/notify/position", (ticks, 1))
+            await asyncio.sleep(0)
+        await asyncio.sleep(0.1)
+        assert [value["ticks"] for _, value in send.updates] == [0, 468]
+        assert send.updates[-1] == ("lmms://playback/position",
+                                    {"ticks": 468, "beats": 9.75, "bar": 2, "seconds": None, "playing": True})
+        assert hub.subscription("a").coalesced == 38
+        await hub.close()
+
+    @pytest.mark.asyncio
+    async def test_topics_and_tempo(self):
+        """Test that subscribers only get their topics and positions follow the tempo."""
+        hub = PlaybackHub()
+        positions, tempos = Recorder(), Recorder()
+        hub.subscribe("positions", positions, ["position"], max_rate=60)
+        hub.subscribe("tempos", tempos, ["tempo"], max_rate=60)
+        hub.handle_notification("/lmms/notify/position", (96,))
+        hub.handle_notification("/lmms/notify/tempo", (60.0,))
+        hub.handle_notification("/lmms/notify/unknown", (1,))
+        await asyncio.sleep(0.05)
+        assert [uri_topic(uri) for uri, _ in positions.updates] == ["position"]
+        assert positions.updates[0][1]["seconds"] == 2.0
+        assert tempos.updates == [("lmms://playback/tempo", {"tempo": 60.0})]
+        assert hub.current("position")["playing"] is False
+        await hub.close()
+
+    @pytest.mark.asyncio
+    async def test_meters_hold_peaks(self):
+        """Test that merged meter updates keep the highest level of every track."""
+        hub = PlaybackHub()
+        send = Recorder()
+        hub.subscribe("a", send, ["meters"], max_rate=10)
+        hub.handle_notification("/lmms/notify/meters", (0, 0.5, 0.5))
+        await asyncio.sleep(0.01)
+        hub.handle_notification("/lmms/notify/meters", (0, 0.9, 0.1, 1, 0.2, 0.3))
+        hub.handle_notification("/lmms/notify/meters", (0, 0.1, 0.4))
+        await asyncio.sleep(0.15)
+        assert [value for _, value in send.updates] == [
+            {"tracks": [{"track_index": 0, "left": 0.5, "right": 0.5}]},
+            {"tracks": [{"track_index": 0, "left": 0.9, "right": 0.4},
+                        {"track_index": 1, "left": 0.2, "right": 0.3}]}]
+        # The resource holds the latest levels, not the peaks
+        assert hub.current("meters")["tracks"][0] == {"track_index": 0, "left": 0.1, "right": 0.4}
+        hub.handle_notification("/lmms/notify/meters", (0, 0.5))
+        assert hub.current("meters")["tracks"][0]["left"] == 0.1
+        await hub.close()
+
+    @pytest.mark.asyncio
+    async def test_slow_subscriber_is_dropped(self):
+        """Test that a subscriber that cannot keep up is dropped without holding back others."""
+        hub = PlaybackHub(send_timeout=0.05)
+        slow, fast = Recorder(stall=1.0), Recorder()
+        hub.subscribe("slow", slow, max_rate=60)
+        hub.subscribe("fast", fast, max_rate=60)
+        for ticks in range(10):
+            hub.handle_notification("/lmms/notify/position", (ticks * 12,))
+            await asyncio.sleep(0.02)
+        assert hub.subscription("slow") is None
+        assert hub.stats()["dropped"] == 1 and hub.stats()["subscribers"] == 1
+        assert slow.updates == [] and len(fast.updates) >= 5
+        await hub.close()
+
+    @pytest.mark.asyncio
+    async def test_subscribe_and_unsubscribe(self):
+        """Test adding topics, changing the rate and unsubscribing."""
+        hub = PlaybackHub()
+        hub.subscribe("a", Recorder(), ["tempo"], max_rate=5)
+        subscriber = hub.subscribe("a", Recorder(), ["meters"], max_rate=30)
+        assert subscriber.topics == {"tempo", "meters"} and subscriber.max_rate == 30
+        with pytest.raises(SubscriptionError):
+            hub.subscribe("a", Recorder(), ["volume"])
+        with pytest.raises(SubscriptionError):
+            hub.subscribe("a", Recorder(), max_rate=1000)
+        assert hub.unsubscribe("a", ["tempo"]) == ["tempo"]
+        assert hub.unsubscribe("a") == ["meters"]
+        assert hub.subscription("a") is None and hub.unsubscribe("a") == []
+        with pytest.raises(SubscriptionError):
+            uri_topic("lmms://playback/volume")
+        await hub.close()
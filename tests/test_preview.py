@@ -0,0 +1,88 @@
+"""
+Unit tests for offline pattern previews.
+"""
+
+import io
+import wave
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from lmms_mcp.pattern import Pattern
+from lmms_mcp.preview import PreviewError, describe, iter_blocks, mix, render_pattern, wav_bytes
+from lmms_mcp.snapshots import pack_pattern
+
+RATE = 8000
+
+
+def render(notes: Pattern, **options) -> "np.ndarray":
+    options.setdefault("sample_rate", RATE)
+    return np.concatenate(list(iter_blocks(notes, 120.0, **options)))
+
+
+class TestIterBlocks:
+    """Test block-based synthesis."""
+
+    def test_length_and_timing(self):
+        """Test that notes sound at their start and the render covers the pattern and the last release."""
+        # At 120 BPM a beat is 0.5 s, 4000 frames at 8 kHz
+        notes = Pattern.from_ticks([69], [127], [48], [48])
+        audio = render(notes, waveform="sine")
+        assert not audio[:4000].any()
+        assert np.abs(audio[4000:8000]).max() > 0.1
+        # Release of 80 ms after the note ends
+        assert len(audio) == 8000 + 640
+        assert len(render(notes, length_ticks=16 * 12)) == 16000
+
+    def test_block_size_does_not_change_the_result(self):
+        """Test that rendering in small blocks joins up seamlessly."""
+        notes = Pattern.from_ticks([60, 64, 67, 72], [100, 90, 80, 70], [0, 6, 30, 31], [40, 10, 20, 5])
+        for waveform in ("sine", "triangle", "saw", "square"):
+            whole = render(notes, waveform=waveform, block_frames=1 << 16)
+            assert np.allclose(render(notes, waveform=waveform, block_frames=97), whole, atol=1e-6)
+
+    def test_pitch(self):
+        """Test that A4 is synthesized at 440 Hz."""
+        audio = render(Pattern.from_ticks([69], [127], [0], [96]), waveform="sine")[:8000, 0]
+        spectrum = np.abs(np.fft.rfft(audio))
+        assert np.fft.rfftfreq(len(audio), 1 / RATE)[spectrum.argmax()] == pytest.approx(440, abs=1)
+
+    def test_pan(self):
+        """Test equal-power panning of each note."""
+        base = Pattern.from_ticks([60, 60], [100, 100], [0, 96], [48, 48])
+        notes = Pattern(base.pitch, base.velocity, base.start, base.length, np.array([-100, 0], dtype="i1"))
+        audio = render(notes)
+        hard_left = audio[:4000]
+        assert np.abs(hard_left[:, 1]).max() < 1e-6 and np.abs(hard_left[:, 0]).max() > 0.1
+        centre = audio[8000:12000]
+        assert np.allclose(centre[:, 0], centre[:, 1])
+
+    def test_errors(self):
+        """Test that bad options are refused."""
+        notes = Pattern.from_ticks([60], [100], [0], [12])
+        with pytest.raises(PreviewError):
+            render(notes, waveform="organ")
+        with pytest.raises(PreviewError):
+            list(iter_blocks(notes, 0))
+
+
+class TestOutput:
+    """Test rendering packed patterns and writing WAV data."""
+
+    def test_render_pattern(self):
+        """Test rendering notes packed as in snapshots, and an empty pattern of a given length."""
+        notes = Pattern.from_ticks([48, 55], [100, 100], [0, 24], [24, 24])
+        audio = render_pattern(pack_pattern(notes), 120.0, RATE, "saw")
+        assert audio.dtype == np.float32 and np.allclose(audio, render(notes, waveform="saw"))
+        assert render_pattern(pack_pattern(Pattern.empty()), 120.0, RATE, length_ticks=48).shape == (4000, 2)
+
+    def test_mix_and_wav(self):
+        """Test mixing renders of different lengths and encoding them with clipping."""
+        audio = mix([np.full((10, 2), 0.5, dtype=np.float32), np.full((4, 2), 0.75, dtype=np.float32)])
+        assert audio.shape == (10, 2)
+        assert describe(audio, RATE) == {"seconds": 0.001, "frames": 10, "peak": 1.25, "clipped": 8}
+        with wave.open(io.BytesIO(wav_bytes(audio, RATE))) as decoded:
+            assert (decoded.getnchannels(), decoded.getsampwidth(), decoded.getframerate()) == (2, 2, RATE)
+            samples = np.frombuffer(decoded.readframes(10), dtype="<i2").reshape(-1, 2)
+        assert samples[0].tolist() == [32767, 32767] and samples[-1].tolist() == [16383, 16383]
@@ -0,0 +1,128 @@
+"""
+Unit tests for reading LMMS project files.
+"""
+
+import pytest
+import struct
+import zlib
+
+from lmms_mcp.project_file import ProjectFile, ProjectFileError, open_project, iter_project_bytes
+
+PROJECT_XML = """<?xml version="1.0"?>
+<!DOCTYPE lmms-project>
+<lmms-project version="1.0" creator="LMMS" creatorversion="1.2.2" type="song">
+  <head bpm="128" timesig_numerator="4" timesig_denominator="4" mastervol="100" masterpitch="0"/>
+  <song>
+    <trackcontainer type="song">
+      <track type="0" name="Lead" muted="0" solo="0">
+        <instrumenttrack vol="100" pan="0">
+          <instrument name="tripleoscillator"><tripleoscillator/></instrument>
+        </instrumenttrack>
+        <pattern type="1" name="Intro" pos="0" steps="16" muted="0">
+          <note pan="0" key="57" vol="100" pos="0" len="48"/>
+          <note pan="0" key="60" vol="50" pos="48" len="24"/>
+        </pattern>
+        <pattern type="1" name="Verse" pos="192" steps="16" muted="1">
+          <note pan="0" key="45" vol="100" pos="0" len="-192"/>
+        </pattern>
+      </track>
+      <track type="1" name="Beat/Bassline 0" muted="0">
+        <bbtrack>
+          <trackcontainer type="bbtrackcontainer">
+            <track type="0" name="Kicker" muted="0">
+              <instrumenttrack><instrument name="kicker"/></instrumenttrack>
+              <pattern type="0" name="" pos="0" steps="16"><note key="57" pos="0" len="-192"/></pattern>
+            </track>
+          </trackcontainer>
+        </bbtrack>
+      </track>
+      <track type="2" name="Vocals" muted="1"/>
+    </trackcontainer>
+    <fxmixer><fxchannel num="0" name="Master"/></fxmixer>
+  </song>
+</lmms-project>
+"""
+
+
+@pytest.fixture
+def mmp(tmp_path):
+    path = tmp_path / "song.mmp"
+    path.write_text(PROJECT_XML)
+    return str(path)
+
+
+@pytest.fixture
+def mmpz(tmp_path):
+    data = PROJECT_XML.encode()
+    path = tmp_path / "song.mmpz"
+    path.write_bytes(struct.pack(">I", len(data)) + zlib.compress(data))
+    return str(path)
+
+
+class TestProjectFile:
+    """Test cases for ProjectFile."""
+
+    @pytest.mark.parametrize("fixture", ["mmp", "mmpz"])
+    def test_summary(self, fixture, request):
+        """Test the project summary for plain and compressed files."""
+        project = ProjectFile(request.getfixturevalue(fixture))
+        info = project.info()
+        assert info["tempo"] == 128.0
+        assert info["time_signature"] == [4, 4]
+        assert info["creator"] == "LMMS"
+        assert info["track_count"] == 3
+        lead, beat, vocals = info["tracks"]
+        assert lead == {"index": 0, "name": "Lead", "type": "instrument", "muted": False,
+                        "instrument": "tripleoscillator", "pattern_count": 2, "note_count": 3}
+        assert beat["type"] == "pattern"
+        assert beat["instrument"] is None
+        assert beat["pattern_count"] == 0
+        assert vocals["type"] == "sample"
+        assert vocals["muted"]
+
+    def test_patterns_are_lazy(self, mmp):
+        """Test that patterns are only decoded on access."""
+        project = ProjectFile(mmp)
+        track = project.track(0)
+        assert track._patterns is None
+        intro, verse = track.patterns
+        assert intro.name == "Intro"
+        assert list(intro.notes.pitch) == [69, 72]
+        assert list(intro.notes.velocity) == [127, 64]
+        assert list(intro.notes.start) == [0, 48]
+        assert verse.muted
+        assert list(verse.notes.length) == [12]
+        assert project.track(2).patterns == []
+
+    def test_to_dict_with_notes(self, mmpz):
+        """Test track description with notes in the MCP note format."""
+        result = ProjectFile(mmpz).track(0).to_dict(include_patterns=True, include_notes=True)
+        assert result["patterns"][0]["notes"][0] == {"note": 69, "velocity": 127, "start": 0.0, "length": 1.0}
+
+    def test_streams_in_small_chunks(self, mmpz):
+        """Test that decompression yields bounded chunks."""
+        chunks = list(iter_project_bytes(mmpz, chunk_size=64))
+        assert max(len(c) for c in chunks) <= 64
+        assert b"".join(chunks).decode() == PROJECT_XML
+
+    def test_open_project_cache(self, mmp):
+        """Test that an unchanged file is opened once."""
+        assert open_project(mmp) is open_project(mmp)
+
+    def test_invalid_files(self, tmp_path):
+        """Test that unreadable files raise ProjectFileError."""
+        garbage = tmp_path / "garbage.mmpz"
+        garbage.write_bytes(b"\x00\x01\x02\x03\x04\x05\x06")
+        with pytest.raises(ProjectFileError):
+            ProjectFile(str(garbage))
+        other = tmp_path / "other.mmp"
+        other.write_text("<html><body/></html>")
+        with pytest.raises(ProjectFileError, match="not an LMMS project"):
+            ProjectFile(str(other))
+        with pytest.raises(ProjectFileError, match="Cannot open"):
+            open_project(str(tmp_path / "missing.mmp"))
+
+    def test_track_out_of_range(self, mmp):
+        """Test that a missing track index raises IndexError."""
+        with pytest.raises(IndexError):
+            ProjectFile(mmp).track(3)
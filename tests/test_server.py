@@ -2,11 +2,18 @@
 Unit tests for the MCP server.
 """
 
+import base64
+import itertools
+import json
 import pytest
 import asyncio
 from unittest.mock import AsyncMock, MagicMock, patch
 from typing import Dict, Any
 
+from lmms_mcp.instrument_index import InstrumentIndex
+from lmms_mcp.notes import NOTE_RECORD, NoteValidationError
+from lmms_mcp.pattern import Pattern
+
 # Mock LMMSInterface before importing server
 class MockLMMSInterface:
     """Mock LMMSInterface for testing."""
@@ -15,6 +22,9 @@ class MockLMMSInterface:
         self.host = host
         self.port = port
         self.start_server = AsyncMock(return_value=MagicMock())
+        self.add_listener = MagicMock()
+        self.in_flight = 0
+        self.lane_stats = MagicMock(return_value={})
         self.get_session_info = AsyncMock(return_value={"tracks": 0, "tempo": 120})
         self.get_track_info = AsyncMock(return_value={"name": "Track 1", "index": 0})
         self.create_track = AsyncMock(return_value={"success": True, "track_index": 0})
@@ -28,12 +38,28 @@ class MockLMMSInterface:
         self.new_project = AsyncMock(return_value={"success": True})
         self.save_project = AsyncMock(return_value={"success": True})
         self.get_instruments_list = AsyncMock(return_value={"instruments": []})
+        self.delete_track = AsyncMock(return_value={"success": True})
+        self.delete_pattern = AsyncMock(return_value={"success": True})
+        self.remove_notes_from_pattern = AsyncMock(return_value={"success": True})
 
 # Patch LMMSInterface before importing
 with patch('lmms_mcp.server.LMMSInterface', MockLMMSInterface):
     from lmms_mcp.server import MCPServer, DEFAULT_SERVER_HOST, DEFAULT_SERVER_PORT
 
 
+@pytest.fixture(autouse=True)
+def mock_lmms_interface():
+    """Keep LMMSInterface mocked while each test runs, not just at import time."""
+    with patch('lmms_mcp.server.LMMSInterface', MockLMMSInterface):
+        yield
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """Keep snapshots and job logs out of the user's cache directory."""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+
+
 class TestMCPServer:
     """Test cases for MCPServer class."""
 
@@ -74,18 +100,32 @@ class TestMCPServer:
             "set_track_name",
             "create_pattern",
             "add_notes_to_pattern",
+            "set_pattern_notes", "generate_pattern", "import_midi", "export_midi", "get_job_status", "cancel_job",
+            "list_snapshots", "diff_snapshots", "restore_snapshot", "render_preview",
+            "analyze_project", "subscribe_playback", "unsubscribe_playback", "get_pattern_notes",
             "load_instrument",
             "set_tempo",
             "play",
             "stop",
             "new_project",
             "save_project",
-            "get_instruments_list"
+            "get_instruments_list",
+            "batch",
+            "get_server_stats"
         ]
 
         for tool_name in expected_tools:
             assert tool_name in tool_names, f"Tool {tool_name} not found in registered tools"
 
+    @pytest.mark.asyncio
+    async def test_every_tool_is_benchmarked(self, tmp_path):
+        """Test that the end-to-end benchmark has arguments for every registered tool."""
+        from benchmarks.bench_e2e import missing_tool_args, write_fixtures
+
+        server = MCPServer()
+        tool_names = [tool.name for tool in await server.server.list_tools()]
+        assert missing_tool_args(tool_names, write_fixtures(str(tmp_path))) == []
+
     @pytest.mark.asyncio
     async def test_get_session_info(self):
         """Test get_session_info handler."""
@@ -185,12 +225,37 @@ class TestMCPServer:
         server.lmms_interface.save_project.assert_called_once_with("/path/to/project")
 
     @pytest.mark.asyncio
-    async def test_get_instruments_list(self):
+    async def test_get_instruments_list(self, tmp_path):
         """Test get_instruments_list handler."""
+        (tmp_path / "presets").mkdir()
+        (tmp_path / "presets" / "Bass.xpf").write_text("")
         server = MCPServer()
-        result = await server.get_instruments_list()
+        server.instrument_index = InstrumentIndex(str(tmp_path / "index.sqlite"), [str(tmp_path / "presets")])
+        result = await server.get_instruments_list("bas")
         assert isinstance(result, dict)
-        server.lmms_interface.get_instruments_list.assert_called_once()
+        assert [r["name"] for r in result["results"]] == ["Bass"]
+        server.lmms_interface.get_instruments_list.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_load_instrument_by_short_name(self, tmp_path):
+        """Test that load_instrument resolves short names through the index."""
+        (tmp_path / "libtripleoscillator.so").write_text("")
+        server = MCPServer()
+        server.instrument_index = InstrumentIndex(str(tmp_path / "index.sqlite"), [str(tmp_path)])
+        result = await server.load_instrument(0, "TripleOscillator")
+        server.lmms_interface.load_instrument.assert_called_once_with(0, "tripleoscillator")
+        assert result["instrument"] == "tripleoscillator"
+
+    @pytest.mark.asyncio
+    async def test_batch(self):
+        """Test that batch dispatches to the server's tools."""
+        server = MCPServer()
+        result = await server.batch([
+            {"id": "t", "tool": "create_track", "args": {"name": "Bass"}},
+            {"tool": "set_track_name", "args": {"track_index": "$t.track_index", "name": "Sub"}},
+        ])
+        assert result["success"]
+        server.lmms_interface.set_track_name.assert_called_once_with(0, "Sub")
 
     @pytest.mark.asyncio
     async def test_start_server(self):
@@ -211,8 +276,826 @@ class TestMCPServer:
             # But we expect it to try to start
             assert "start" in str(e).lower() or "run" in str(e).lower() or True
 
-        # Verify LMMS interface start was called
-        server.lmms_interface.start_server.assert_called_once()
+        # The LMMS endpoint is opened lazily by the first tool call, not at startup
+        server.lmms_interface.start_server.assert_not_called()
+
+
+class TestProjectFileTools:
+    """Test the offline project file tools."""
+
+    @pytest.mark.asyncio
+    async def test_read_project_file(self, tmp_path):
+        """Test reading a project file without LMMS."""
+        path = tmp_path / "song.mmp"
+        path.write_text('<lmms-project><head bpm="90"/><song><trackcontainer>'
+                        '<track type="0" name="Keys"><pattern name="A"><note key="48" pos="0" len="48"/>'
+                        '</pattern></track></trackcontainer></song></lmms-project>')
+        server = MCPServer()
+        info = await server.read_project_file(str(path))
+        track = await server.read_project_track(str(path), 0, include_notes=True)
+        assert info["tempo"] == 90.0
+        assert info["tracks"][0]["name"] == "Keys"
+        assert track["patterns"][0]["notes"][0]["note"] == 60
+        server.lmms_interface.get_session_info.assert_not_called()
+
+
+class TestSessionMirror:
+    """Test that reads are served from the session-state mirror."""
+
+    @pytest.mark.asyncio
+    async def test_session_info_is_cached(self):
+        """Test that repeated get_session_info calls hit LMMS once."""
+        server = MCPServer()
+        await server.get_session_info()
+        result = await server.get_session_info()
+        assert result["tempo"] == 120
+        server.lmms_interface.get_session_info.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_mutations_update_mirror(self):
+        """Test that mutating tools update the mirror without extra reads."""
+        server = MCPServer()
+        await server.get_session_info()
+        await server.create_track("instrument", "Lead")
+        await server.set_track_name(0, "Lead Synth")
+        await server.set_tempo(140.0)
+        track = await server.get_track_info(0)
+        session = await server.get_session_info()
+        assert track["name"] == "Lead Synth"
+        assert session["tempo"] == 140.0
+        server.lmms_interface.get_track_info.assert_not_called()
+        server.lmms_interface.get_session_info.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_new_project_forces_resync(self):
+        """Test that new_project drops the mirror."""
+        server = MCPServer()
+        await server.get_session_info()
+        await server.new_project()
+        await server.get_session_info()
+        assert server.lmms_interface.get_session_info.call_count == 2
+
+
+class TestSessionQueries:
+    """Test paginated, projected session queries over MCP."""
+
+    @pytest.mark.asyncio
+    async def test_compact_pages(self):
+        """Test that a page of a large session is sent as compact JSON text only."""
+        server = MCPServer()
+        server.lmms_interface.get_session_info.return_value = {"tempo": 120, "tracks": [
+            {"index": i, "name": f"Track {i}", "type": "instrument", "instrument": "tripleoscillator",
+             "patterns": [{"index": p, "steps": 16, "notes": 64} for p in range(8)]} for i in range(200)]}
+        result = await server.server.call_tool(
+            "get_session_info", {"fields": ["name", "note_count"], "offset": 190, "limit": 20})
+        assert len(result) == 1
+        text = result[0].text
+        assert "\n" not in text and ", " not in text
+        page = json.loads(text)
+        assert page["tracks"][0] == {"index": 190, "name": "Track 190", "note_count": 512}
+        assert (len(page["tracks"]), page["total"], page["next_offset"]) == (10, 200, None)
+
+        await server.set_track_name(7, "Lead")
+        changed = json.loads((await server.server.call_tool(
+            "get_session_info", {"since_version": page["version"], "fields": ["name"]}))[0].text)
+        assert changed["tracks"] == [{"index": 7, "name": "Lead"}]
+        track = json.loads((await server.server.call_tool(
+            "get_track_info", {"track_index": 7, "fields": ["instrument"]}))[0].text)
+        assert track == {"index": 7, "instrument": "tripleoscillator"}
+
+
+class TestJobs:
+    """Test long-running tools that continue as background jobs."""
+
+    @pytest.mark.asyncio
+    async def test_slow_save_becomes_a_job(self, tmp_path):
+        """Test that a slow save answers with a job id and can be followed to its result."""
+        server = MCPServer(job_log=str(tmp_path / "jobs.jsonl"), inline_timeout=0.05)
+        disk = asyncio.Event()
+
+        async def slow_save(path):
+            await disk.wait()
+            return {"success": True, "path": path}
+
+        server.lmms_interface.save_project.side_effect = slow_save
+        progress = []
+
+        async def collect(*update):
+            progress.append(update)
+
+        server.server.progress_sender = lambda: collect
+        answer = await server.save_project("/tmp/song.mmp")
+        assert answer["status"] == "running"
+        assert progress == [(0, 1, "Saving")]
+        status = await server.get_job_status(answer["job_id"])
+        assert status["status"] == "running"
+        assert [job["job_id"] for job in (await server.get_job_status())["jobs"]] == [answer["job_id"]]
+
+        disk.set()
+        status = await server.get_job_status(answer["job_id"], wait=1)
+        assert status["status"] == "succeeded"
+        assert status["result"] == {"success": True, "path": "/tmp/song.mmp"}
+        assert (await server.get_server_stats())["jobs"] == {"succeeded": 1}
+
+    @pytest.mark.asyncio
+    async def test_quick_calls_answer_inline(self, tmp_path):
+        """Test that fast operations return their result and are not logged as jobs."""
+        server = MCPServer(job_log=str(tmp_path / "jobs.jsonl"))
+        assert await server.save_project() == {"success": True}
+        assert (await server.get_job_status())["jobs"] == []
+        with pytest.raises(ValueError):
+            await server.get_job_status("nope")
+
+    @pytest.mark.asyncio
+    async def test_cancel_background_load(self, tmp_path):
+        """Test cancelling an instrument load started in the background."""
+        server = MCPServer(job_log=str(tmp_path / "jobs.jsonl"))
+        await server.get_session_info()
+        await server.create_track("instrument", "Lead")
+        async def slow_load(*args):
+            await asyncio.sleep(10)
+
+        server.lmms_interface.load_instrument.side_effect = slow_load
+        answer = await server.load_instrument(0, "/plugins/zynaddsubfx.so", background=True)
+        await asyncio.sleep(0.01)
+        assert (await server.get_job_status(answer["job_id"]))["message"] == "Loading /plugins/zynaddsubfx.so"
+        cancelled = await server.cancel_job(answer["job_id"])
+        assert cancelled["status"] == "cancelled"
+        # The load may or may not have happened, so the track is fetched again
+        assert server.session_state.track_info(0) is None
+
+
+class TestServerMetrics:
+    """Test the per-tool metrics."""
+
+    @pytest.mark.asyncio
+    async def test_tool_calls_are_counted(self):
+        """Test that calls made through MCP are counted per tool."""
+        server = MCPServer()
+        await server.server.call_tool("set_tempo", {"tempo": 130})
+        await server.server.call_tool("set_tempo", {"tempo": 131})
+        stats = await server.get_server_stats()
+        tempo = stats["tools"]["set_tempo"]
+        assert tempo["calls"] == 2
+        assert tempo["errors"] == 0
+        assert tempo["in_flight"] == 0
+        assert tempo["handler_mean_ms"] is not None
+        assert tempo["framing_mean_ms"] is not None
+        assert stats["tools"]["play"]["calls"] == 0
+
+    @pytest.mark.asyncio
+    async def test_tool_errors_are_counted(self):
+        """Test that a failing tool counts as an error."""
+        server = MCPServer()
+        server.lmms_interface.play.side_effect = RuntimeError("LMMS is gone")
+        with pytest.raises(Exception):
+            await server.server.call_tool("play", {})
+        stats = await server.get_server_stats()
+        assert stats["tools"]["play"]["errors"] == 1
+
+    @pytest.mark.asyncio
+    async def test_prometheus_endpoint(self):
+        """Test the Prometheus text served next to the HTTP transport."""
+        server = MCPServer()
+        await server.server.call_tool("stop", {})
+        response = await server._metrics_endpoint(None)
+        text = response.body.decode()
+        assert 'lmms_mcp_tool_calls_total{tool="stop"} 1' in text
+        assert 'lmms_mcp_tool_duration_seconds_count{tool="stop",phase="lmms"} 1' in text
+        assert "lmms_mcp_lmms_requests_in_flight 0" in text
+
+
+class TestSetPatternNotes:
+    """Test replacing pattern notes by sending only the difference."""
+
+    @staticmethod
+    def bassline(count: int):
+        return [{"note": 36 + i % 12, "velocity": 100, "start": i * 0.25, "length": 0.25} for i in range(count)]
+
+    @pytest.mark.asyncio
+    async def test_only_the_delta_is_sent(self):
+        """Test that an edit of a large pattern sends only the changed notes."""
+        server = MCPServer()
+        await server.create_pattern(0)
+        notes = self.bassline(1000)
+        result = await server.set_pattern_notes(0, 0, notes)
+        assert result["added"] == 1000
+        server.lmms_interface.remove_notes_from_pattern.assert_not_called()
+
+        # Change bar 3: move two notes up, make one quieter, drop one and add one
+        edited = [dict(n) for n in notes]
+        edited[32]["note"] += 12
+        edited[33]["note"] += 12
+        edited[34]["velocity"] = 60
+        del edited[35]
+        edited.append({"note": 48, "velocity": 100, "start": 8.125, "length": 0.125})
+        server.lmms_interface.add_notes_to_pattern.reset_mock()
+        result = await server.set_pattern_notes(0, 0, edited)
+        assert result == {"success": True, "notes": 1000, "added": 3, "removed": 3, "modified": 1, "unchanged": 996}
+        removed = server.lmms_interface.remove_notes_from_pattern.call_args[0][2]
+        added = server.lmms_interface.add_notes_to_pattern.call_args[0][2]
+        assert (len(removed), len(added)) == (4, 4)
+
+        server.lmms_interface.add_notes_to_pattern.reset_mock()
+        server.lmms_interface.remove_notes_from_pattern.reset_mock()
+        result = await server.set_pattern_notes(0, 0, edited)
+        assert result["unchanged"] == 1000
+        server.lmms_interface.add_notes_to_pattern.assert_not_called()
+        server.lmms_interface.remove_notes_from_pattern.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_add_and_remove_keep_the_notes_known(self):
+        """Test that the other note tools update the last-known notes."""
+        server = MCPServer()
+        await server.create_pattern(0)
+        await server.add_notes_to_pattern(0, 0, self.bassline(4))
+        await server.remove_notes_from_pattern(0, 0, self.bassline(1))
+        result = await server.set_pattern_notes(0, 0, self.bassline(4))
+        assert (result["added"], result["unchanged"]) == (1, 3)
+        await server.save_project("/tmp/song.mmp")
+        assert len(server.session_state.pattern_notes(0, 0)) == 4
+
+    @pytest.mark.asyncio
+    async def test_note_records(self):
+        """Test that the note tools take base64 note records and notes can be read back in either form."""
+        server = MCPServer()
+        await server.create_pattern(0)
+        records = Pattern.from_dicts(self.bassline(8)).to_base64()
+        await server.add_notes_to_pattern(0, 0, records=records)
+        sent = server.lmms_interface.add_notes_to_pattern.call_args[0][2]
+        assert isinstance(sent, Pattern) and len(sent) == 8
+        await server.remove_notes_from_pattern(0, 0, records=Pattern.from_dicts(self.bassline(2)).to_base64())
+        assert (await server.get_pattern_notes(0, 0))["count"] == 6
+
+        result = await server.set_pattern_notes(0, 0, records=records)
+        assert (result["added"], result["unchanged"]) == (2, 6)
+        read = await server.get_pattern_notes(0, 0, as_records=True)
+        assert read["records"] == records and "notes" not in read
+        notes = (await server.get_pattern_notes(0, 0))["notes"]
+        assert [n["note"] for n in notes] == [n["note"] for n in self.bassline(8)]
+
+        with pytest.raises(NoteValidationError, match="either"):
+            await server.add_notes_to_pattern(0, 0, self.bassline(1), records=records)
+        with pytest.raises(NoteValidationError, match="either"):
+            await server.add_notes_to_pattern(0, 0)
+        with pytest.raises(NoteValidationError, match="pitch"):
+            await server.add_notes_to_pattern(0, 0, records=base64.b64encode(NOTE_RECORD.pack(200, 1, 0, 1)).decode())
+
+    @pytest.mark.asyncio
+    async def test_empty_pattern_from_lmms(self):
+        """Test that a pattern LMMS reports as empty can be set without having been created here."""
+        server = MCPServer()
+        server.lmms_interface.get_track_info.return_value = {"name": "Bass", "patterns": [
+            {"index": 0, "steps": 16, "notes": 0}, {"index": 1, "steps": 16, "notes": 8}]}
+        result = await server.set_pattern_notes(0, 0, self.bassline(2))
+        assert result["added"] == 2
+        with pytest.raises(ValueError):
+            await server.set_pattern_notes(0, 1, self.bassline(2))
+
+    @pytest.mark.asyncio
+    async def test_failed_update_forgets_notes(self):
+        """Test that the notes are no longer trusted after a failed update."""
+        server = MCPServer()
+        await server.create_pattern(0)
+        server.lmms_interface.add_notes_to_pattern.side_effect = RuntimeError("LMMS is gone")
+        with pytest.raises(RuntimeError):
+            await server.set_pattern_notes(0, 0, self.bassline(2))
+        assert server.session_state.pattern_notes(0, 0) is None
+
+
+class TestGeneratePattern:
+    """Test expanding generator specs on the server."""
+
+    @pytest.mark.asyncio
+    async def test_generated_notes_are_sent_not_returned(self):
+        """Test that a one-line spec sends thousands of notes and returns a summary."""
+        server = MCPServer()
+        await server.create_pattern(0)
+        result = await server.generate_pattern(0, 0, "euclid pulses=5 steps=16 note=36 repeat=400")
+        assert result["generated"] == 2000
+        assert result["end_beat"] == pytest.approx(1599.5)
+        sent = server.lmms_interface.add_notes_to_pattern.call_args[0][2]
+        assert len(sent) == 2000
+        assert len(server.session_state.pattern_notes(0, 0)) == 2000
+
+    @pytest.mark.asyncio
+    async def test_replace_sends_the_difference(self):
+        """Test that regenerating with replace only sends the changed notes."""
+        server = MCPServer()
+        await server.create_pattern(0)
+        await server.generate_pattern(0, 0, {"type": "euclid", "pulses": 4, "steps": 16, "repeat": 16},
+                                      replace=True)
+        server.lmms_interface.add_notes_to_pattern.reset_mock()
+        result = await server.generate_pattern(0, 0, "euclid pulses=4 steps=16 repeat=17", replace=True)
+        assert (result["added"], result["removed"], result["unchanged"]) == (4, 0, 64)
+        assert len(server.lmms_interface.add_notes_to_pattern.call_args[0][2]) == 4
+
+    @pytest.mark.asyncio
+    async def test_bad_spec(self):
+        """Test that a bad spec is rejected before anything is sent."""
+        server = MCPServer()
+        with pytest.raises(ValueError):
+            await server.generate_pattern(0, 0, "euclid pulses=20 steps=16")
+        server.lmms_interface.add_notes_to_pattern.assert_not_called()
+
+
+class TestMidi:
+    """Test importing and exporting MIDI files."""
+
+    @staticmethod
+    def counting_tracks(server):
+        indices = itertools.count()
+        server.lmms_interface.create_track.side_effect = \
+            lambda *args: {"success": True, "track_index": next(indices)}
+
+    @pytest.mark.asyncio
+    async def test_import_midi(self, tmp_path):
+        """Test that each channel of each track becomes a track with one pattern of notes."""
+        from lmms_mcp.midi_file import MidiWriter
+        from lmms_mcp.pattern import Pattern
+        path = str(tmp_path / "in.mid")
+        with MidiWriter(path, tempo=100) as writer:
+            writer.write_track("Strings", Pattern.from_ticks([60] * 500, [90] * 500, range(0, 6000, 12), [12] * 500))
+            writer.write_track("Horns", Pattern.from_ticks([55, 59], [100, 100], [0, 48], [48, 48]))
+        server = MCPServer()
+        self.counting_tracks(server)
+        result = await server.import_midi(path)
+        assert result["tempo"] == 100.0 and result["events"] == 1010
+        assert [(t["name"], t["track_index"], t["notes"]) for t in result["tracks"]] == [
+            ("Strings", 0, 500), ("Horns", 1, 2)]
+        server.lmms_interface.create_pattern.assert_any_call(0, 512)
+        server.lmms_interface.set_tempo.assert_called_once_with(100.0)
+        sent = sorted(len(c[0][2]) for c in server.lmms_interface.add_notes_to_pattern.call_args_list)
+        assert sent == [2, 500]
+
+        server.lmms_interface.create_track.reset_mock()
+        result = await server.import_midi(path, tracks=[2], set_tempo=False)
+        assert [t["name"] for t in result["tracks"]] == ["Horns"]
+        assert server.lmms_interface.create_track.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_cancelled_import_waits_for_the_reading_thread(self, tmp_path, monkeypatch):
+        """Test that a cancelled import closes the file only once the thread reading it is done."""
+        import threading
+        from lmms_mcp.midi_file import MidiReader, MidiWriter
+        from lmms_mcp.pattern import Pattern
+        path = str(tmp_path / "in.mid")
+        with MidiWriter(path) as writer:
+            writer.write_track("Horns", Pattern.from_ticks([55, 59], [100, 100], [0, 48], [48, 48]))
+        reading, release = threading.Event(), threading.Event()
+        log = []
+        tracks, close = MidiReader.tracks, MidiReader.close
+
+        def slow_tracks(reader):
+            reading.set()
+            release.wait(5)
+            log.append("read")
+            yield from tracks(reader)
+
+        def logged_close(reader):
+            log.append("closed")
+            close(reader)
+
+        monkeypatch.setattr(MidiReader, "tracks", slow_tracks)
+        monkeypatch.setattr(MidiReader, "close", logged_close)
+        server = MCPServer()
+        task = asyncio.ensure_future(server.import_midi(path, background=False))
+        await asyncio.get_running_loop().run_in_executor(None, reading.wait, 5)
+        task.cancel()
+        await asyncio.sleep(0.05)
+        assert not task.done() and log == []
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert log == ["read", "closed"]
+
+    @pytest.mark.asyncio
+    async def test_export_known_patterns(self, tmp_path):
+        """Test exporting the patterns whose notes the server knows."""
+        from lmms_mcp.midi_file import MidiReader
+        server = MCPServer()
+        await server.create_track("instrument", "Bass")
+        await server.create_pattern(0)
+        notes = [{"note": 36, "velocity": 100, "start": i, "length": 0.5} for i in range(8)]
+        await server.set_pattern_notes(0, 0, notes)
+        path = str(tmp_path / "out.mid")
+        result = await server.export_midi(path)
+        assert result["tracks"] == [{"name": "Bass pattern 1", "notes": 8}]
+        with MidiReader(path) as reader:
+            exported = list(reader.tracks())[1].parts[0].notes.to_dicts()
+        assert [{k: n[k] for k in ("note", "velocity", "start", "length")} for n in exported] == notes
+
+
+class TestRenderPreview:
+    """Test rendering patterns to WAV previews."""
+
+    @pytest.mark.asyncio
+    async def test_session_pattern_inline(self):
+        """Test rendering a pattern whose notes the server knows, returned as WAV bytes."""
+        pytest.importorskip("numpy")
+        import base64
+        import io
+        import wave
+        server = MCPServer()
+        await server.create_track("instrument", "Bass")
+        await server.create_pattern(0)
+        await server.set_pattern_notes(0, 0, [{"note": 36 + i, "start": i, "length": 0.5} for i in range(4)])
+        result = await server.render_preview([{"track_index": 0, "pattern_index": 0, "waveform": "saw"}],
+                                             sample_rate=8000)
+        assert result["patterns"] == [{"track_index": 0, "pattern_index": 0, "notes": 4}]
+        # One 16-step bar at the mirror's default tempo of 120 BPM
+        assert (result["tempo"], result["seconds"], result["clipped"]) == (120.0, 2.0, 0)
+        with wave.open(io.BytesIO(base64.b64decode(result["wav_base64"]))) as decoded:
+            assert decoded.getnframes() == result["frames"] == 16000
+
+        with pytest.raises(ValueError, match="not known"):
+            await server.render_preview([{"track_index": 0, "pattern_index": 3}])
+
+    @pytest.mark.asyncio
+    async def test_project_patterns_mixed(self, tmp_path):
+        """Test rendering several patterns of a project file in worker processes into one WAV file."""
+        pytest.importorskip("numpy")
+        import wave
+        from tests.test_project_file import PROJECT_XML
+        project = tmp_path / "song.mmp"
+        project.write_text(PROJECT_XML)
+        path = str(tmp_path / "preview.wav")
+        server = MCPServer()
+        result = await server.render_preview([{"track_index": 0, "pattern_index": 0},
+                                              {"track_index": 0, "pattern_index": 1}],
+                                             project_path=str(project), path=path, sample_rate=8000)
+        assert result["path"] == path and result["tempo"] == 128.0
+        assert [p["notes"] for p in result["patterns"]] == [2, 1]
+        assert result["seconds"] == pytest.approx(1.875, abs=0.001)
+        with wave.open(path) as written:
+            assert written.getnframes() == result["frames"]
+        server.lmms_interface.get_session_info.assert_not_called()
+
+
+class TestAnalyzeProject:
+    """Test whole-project analysis and its cache."""
+
+    @pytest.mark.asyncio
+    async def test_session_cached_until_changed(self):
+        """Test analysing known session patterns, answered from the cache until the session changes."""
+        pytest.importorskip("numpy")
+        server = MCPServer()
+        await server.create_track("instrument", "Keys")
+        await server.create_pattern(0)
+        await server.set_pattern_notes(0, 0, [{"note": n, "start": 0, "length": 1} for n in (57, 60, 64, 64)])
+        first = await server.analyze_project()
+        assert not first["cached"] and first["notes"] == 4
+        assert first["collisions"]["duplicates"] == 1
+        assert [t["name"] for t in first["tracks"]] == ["Keys"]
+        with patch("lmms_mcp.server.analyze") as analyze:
+            again = await server.analyze_project()
+        analyze.assert_not_called()
+        assert again["cached"] and again["version"] == first["version"]
+
+        await server.add_notes_to_pattern(0, 0, [{"note": 67, "start": 1, "length": 1}])
+        changed = await server.analyze_project()
+        assert not changed["cached"] and changed["notes"] == 5
+        assert (await server.analyze_project(tracks=[1]))["notes"] == 0
+
+    @pytest.mark.asyncio
+    async def test_project_file(self, tmp_path):
+        """Test analysing a project file, cached until the file changes."""
+        pytest.importorskip("numpy")
+        from tests.test_project_file import PROJECT_XML
+        project = tmp_path / "song.mmp"
+        project.write_text(PROJECT_XML)
+        server = MCPServer()
+        result = await server.analyze_project(str(project))
+        assert (result["tempo"], result["notes"], result["cached"]) == (128.0, 3, False)
+        # The Verse pattern sits at bar 1 of the song
+        assert result["density"]["per_bar"] == [2, 1]
+        assert (await server.analyze_project(str(project)))["cached"]
+        project.write_text(PROJECT_XML.replace('key="60"', 'key="61"', 1) + " ")
+        assert not (await server.analyze_project(str(project)))["cached"]
+        server.lmms_interface.get_session_info.assert_not_called()
+
+
+class TestPlaybackSubscriptions:
+    """Test playback updates streamed to MCP sessions."""
+
+    @pytest.mark.asyncio
+    async def test_updates_reach_subscribed_sessions(self):
+        """Test that subscribed sessions are sent pushed updates as resource notifications."""
+        from mcp import types
+        from mcp.shared.memory import create_connected_server_and_client_session
+
+        server = MCPServer(snapshots=False)
+        hub = server.backends.backends[0].playback
+        received = asyncio.Queue()
+
+        async def on_message(message):
+            if isinstance(message, types.ServerNotification):
+                received.put_nowait(message.root)
+
+        async with create_connected_server_and_client_session(server.server, message_handler=on_message) as client:
+            hub.handle_notification("/lmms/notify/tempo", (140.0,))
+            result = await client.call_tool("subscribe_playback", {"topics": ["position"], "max_rate": 50})
+            subscribed = json.loads(result.content[0].text)
+            assert subscribed["resources"] == {"position": "lmms://playback/position"}
+            assert subscribed["current"] == {"position": None}
+
+            hub.handle_notification("/lmms/notify/position", (96, 1))
+            update = await asyncio.wait_for(received.get(), 2)
+            assert isinstance(update, types.ResourceUpdatedNotification)
+            assert str(update.params.uri) == "lmms://playback/position"
+            assert update.params.value["beats"] == 2.0 and update.params.value["playing"] is True
+
+            # Standard resource subscriptions follow the session's rate
+            await client.subscribe_resource("lmms://playback/tempo")
+            assert hub.stats()["subscribers"] == 1
+            hub.handle_notification("/lmms/notify/tempo", (150.0,))
+            topics = set()
+            while "lmms://playback/tempo" not in topics:
+                topics.add(str((await asyncio.wait_for(received.get(), 2)).params.uri))
+            read = await client.read_resource("lmms://playback/tempo")
+            assert json.loads(read.contents[0].text) == {"tempo": 150.0}
+
+            result = await client.call_tool("unsubscribe_playback", {})
+            assert json.loads(result.content[0].text)["unsubscribed"] == ["position", "tempo"]
+            assert hub.stats()["subscribers"] == 0
+
+    @pytest.mark.asyncio
+    async def test_subscribing_needs_a_session(self):
+        """Test that subscribing outside an MCP request is refused."""
+        from lmms_mcp.playback import SubscriptionError
+
+        server = MCPServer(snapshots=False)
+        with pytest.raises(SubscriptionError):
+            await server.subscribe_playback()
+        assert (await server.unsubscribe_playback())["unsubscribed"] == []
+
+
+class TestSnapshots:
+    """Test automatic snapshots, their diffs and restoring them."""
+
+    @staticmethod
+    def riff(count: int, note: int = 36):
+        return [{"note": note + i % 12, "velocity": 100, "start": i * 0.25, "length": 0.25} for i in range(count)]
+
+    @staticmethod
+    async def build(server):
+        """Make a track with a pattern of notes through MCP, then change the tempo."""
+        indices = itertools.count()
+        server.lmms_interface.create_track.side_effect = \
+            lambda *args: {"success": True, "track_index": next(indices)}
+        await server.get_session_info()
+        # Each change is snapshotted on its own rather than as one burst
+        for name, arguments in [("create_track", {"name": "Bass"}), ("create_pattern", {"track_index": 0}),
+                                ("set_pattern_notes", {"track_index": 0, "pattern_index": 0,
+                                                       "notes": TestSnapshots.riff(200)}),
+                                ("set_tempo", {"tempo": 140})]:
+            await server.server.call_tool(name, arguments)
+            await server.flush_snapshots()
+
+    @pytest.mark.asyncio
+    async def test_mutations_are_snapshotted(self, tmp_path):
+        """Test that each change made through MCP is snapshotted, and reads are not."""
+        server = MCPServer(snapshot_dir=str(tmp_path))
+        await self.build(server)
+        await server.server.call_tool("get_session_info", {})
+        await server.server.call_tool("set_tempo", {"tempo": 140})
+        listing = await server.list_snapshots()
+        assert [s["tool"] for s in listing["snapshots"]] == [
+            "set_tempo", "set_pattern_notes", "create_pattern", "create_track"]
+        assert [s["parent"] for s in listing["snapshots"]] == [3, 2, 1, None]
+        assert listing["head"] == 4
+        assert (await server.get_server_stats())["snapshots"]["snapshots"] == 4
+
+    @pytest.mark.asyncio
+    async def test_bursts_are_snapshotted_once_in_the_background(self, tmp_path):
+        """Test that tool results do not wait for snapshots and a burst of changes is snapshotted once."""
+        server = MCPServer(snapshot_dir=str(tmp_path), snapshot_delay=0.05)
+        await server.get_session_info()
+        await server.server.call_tool("create_track", {"name": "Bass"})
+        await server.server.call_tool("set_tempo", {"tempo": 90})
+        await server.server.call_tool("set_tempo", {"tempo": 100})
+        assert server._snapshot_store().snapshots()["total"] == 0
+        await asyncio.sleep(0.2)
+        snapshots = server._snapshot_store().snapshots()["snapshots"]
+        assert [s["tool"] for s in snapshots] == ["create_track, set_tempo"]
+        assert snapshots[0]["tempo"] == 100
+
+    @pytest.mark.asyncio
+    async def test_background_jobs_are_snapshotted_when_they_succeed(self, tmp_path):
+        """Test that a tool going on as a job is snapshotted by a task the server holds until the job ends."""
+        server = MCPServer(snapshot_dir=str(tmp_path), job_log=str(tmp_path / "jobs.jsonl"))
+        await server.get_session_info()
+        await server.server.call_tool("create_track", {"name": "Lead"})
+        await server.flush_snapshots()
+        loaded = asyncio.Event()
+
+        async def slow_load(*args):
+            await loaded.wait()
+            return {"success": True}
+
+        server.lmms_interface.load_instrument.side_effect = slow_load
+        await server.server.call_tool("load_instrument", {"track_index": 0, "instrument_path": "/plugins/lb302.so",
+                                                          "background": True})
+        waits = list(server._snapshot_waits)
+        assert len(waits) == 1
+        loaded.set()
+        await asyncio.wait(waits)
+        assert not server._snapshot_waits
+        listing = await server.list_snapshots()
+        assert [s["tool"] for s in listing["snapshots"]] == ["load_instrument", "create_track"]
+
+    @pytest.mark.asyncio
+    async def test_missing_tracks_are_fetched_at_once(self, tmp_path):
+        """Test that a snapshot asks LMMS for all the tracks missing from the mirror concurrently."""
+        server = MCPServer(snapshot_dir=str(tmp_path))
+        server.lmms_interface.get_session_info.return_value = {"tempo": 120, "tracks": 4}
+        in_flight = []
+
+        async def track_info(track_index):
+            in_flight.append(track_index)
+            await asyncio.sleep(0.01)
+            assert len(in_flight) == 4
+            return {"name": f"Track {track_index}", "type": "instrument", "patterns": []}
+
+        server.lmms_interface.get_track_info.side_effect = track_info
+        await server.server.call_tool("set_tempo", {"tempo": 90})
+        listing = await server.list_snapshots()
+        assert listing["total"] == 1 and listing["snapshots"][0]["tracks"] == 4
+        assert sorted(in_flight) == [0, 1, 2, 3]
+
+    @pytest.mark.asyncio
+    async def test_snapshots_can_be_disabled(self, tmp_path):
+        """Test that no snapshots are taken when they are turned off."""
+        server = MCPServer(snapshot_dir=str(tmp_path), snapshots=False)
+        await server.server.call_tool("set_tempo", {"tempo": 90})
+        assert (await server.list_snapshots())["total"] == 0
+
+    @pytest.mark.asyncio
+    async def test_diff(self, tmp_path):
+        """Test comparing snapshots with each other and with the current session."""
+        server = MCPServer(snapshot_dir=str(tmp_path))
+        await self.build(server)
+        diff = await server.diff_snapshots(3, 4)
+        assert diff["tempo"] == [120, 140] and diff["changed"] == [] and diff["unchanged"] == 1
+        notes = self.riff(200)
+        notes[5]["note"] = 80
+        await server.set_pattern_notes(0, 0, notes)
+        diff = await server.diff_snapshots(4)
+        assert diff["to"] is None
+        assert diff["changed"] == [{"index": 0, "patterns_changed": [
+            {"index": 0, "notes_added": 1, "notes_removed": 1}]}]
+
+    @pytest.mark.asyncio
+    async def test_restore_sends_only_the_difference(self, tmp_path):
+        """Test that restoring a snapshot sends LMMS only the notes that differ, and branches."""
+        server = MCPServer(snapshot_dir=str(tmp_path))
+        await self.build(server)
+        notes = self.riff(200)
+        notes[5]["note"] = 80
+        del notes[9]
+        await server.server.call_tool("set_pattern_notes", {"track_index": 0, "pattern_index": 0,
+                                                             "notes": notes})
+        interface = server.lmms_interface
+        for mock in (interface.add_notes_to_pattern, interface.remove_notes_from_pattern, interface.set_tempo):
+            mock.reset_mock()
+
+        await server.server.call_tool("restore_snapshot", {"snapshot_id": 3})
+        interface.set_tempo.assert_called_once_with(120)
+        assert len(interface.add_notes_to_pattern.call_args[0][2]) == 2
+        assert len(interface.remove_notes_from_pattern.call_args[0][2]) == 1
+        interface.create_track.assert_called_once()
+        assert server.session_state.pattern_notes(0, 0).to_dicts() == Pattern.from_dicts(self.riff(200)).to_dicts()
+        assert (await server.diff_snapshots(3))["changed"] == []
+        listing = await server.list_snapshots()
+        assert listing["head"] == 3 and listing["total"] == 5
+
+        await server.server.call_tool("set_track_name", {"track_index": 0, "name": "Sub"})
+        assert (await server.list_snapshots())["snapshots"][0]["parent"] == 3
+
+    @pytest.mark.asyncio
+    async def test_restore_tracks_and_patterns(self, tmp_path):
+        """Test that restoring brings back deleted tracks and removes added ones."""
+        server = MCPServer(snapshot_dir=str(tmp_path))
+        await self.build(server)
+        await server.server.call_tool("delete_track", {"track_index": 0})
+        # The project is empty again, so LMMS appends the new track at index 0
+        server.lmms_interface.create_track.side_effect = None
+        result = await server.restore_snapshot(4)
+        assert (result["tracks_created"], result["notes_added"], result["skipped"]) == (1, 200, [])
+        server.lmms_interface.create_track.assert_called_with("instrument", "Bass")
+        assert len(server.session_state.pattern_notes(0, 0)) == 200
+
+        result = await server.restore_snapshot(1)
+        assert result["tracks_changed"] == 1
+        server.lmms_interface.delete_pattern.assert_called_once_with(0, 0)
+        assert server.session_state.track_info(0)["patterns"] == []
+
+    @pytest.mark.asyncio
+    async def test_restore_unknown_snapshot(self, tmp_path):
+        """Test that an unknown snapshot is rejected."""
+        from lmms_mcp.snapshots import SnapshotError
+        server = MCPServer(snapshot_dir=str(tmp_path))
+        with pytest.raises(SnapshotError):
+            await server.restore_snapshot(7)
+
+
+class TestConcurrency:
+    """Test that concurrent clients edit different tracks in parallel without losing updates."""
+
+    LATENCY = 0.02
+
+    @classmethod
+    def slow_lmms(cls, server):
+        """Make every note upload take a while, as it would on a real LMMS."""
+        async def reply(*args):
+            await asyncio.sleep(cls.LATENCY)
+            return {"success": True}
+
+        server.lmms_interface.add_notes_to_pattern.side_effect = reply
+        server.lmms_interface.delete_track.side_effect = reply
+
+    @staticmethod
+    async def prepare(server, tracks: int):
+        for track in range(tracks):
+            server.lmms_interface.create_pattern.return_value = {"success": True, "pattern_index": 0}
+            await server.create_pattern(track)
+
+    @pytest.mark.asyncio
+    async def test_no_lost_updates(self):
+        """Test that concurrent additions to one pattern all end up in its last-known notes."""
+        server = MCPServer()
+        self.slow_lmms(server)
+        await self.prepare(server, 1)
+        await asyncio.gather(*(server.add_notes_to_pattern(0, 0, [{"note": 40 + i, "start": i}])
+                               for i in range(20)))
+        assert sorted(server.session_state.pattern_notes(0, 0).pitch.tolist()) == list(range(40, 60))
+        assert (await server.get_server_stats())["locks"]["contended"] > 0
+
+    @pytest.mark.asyncio
+    async def test_throughput_scales_with_clients(self):
+        """Test that clients editing their own tracks run in parallel rather than one at a time."""
+        server = MCPServer()
+        self.slow_lmms(server)
+        edits = 5
+
+        async def client(track):
+            for i in range(edits):
+                await server.add_notes_to_pattern(track, 0, [{"note": 60, "start": i}])
+
+        timings = {}
+        for clients in (1, 8):
+            await self.prepare(server, clients)
+            started = asyncio.get_running_loop().time()
+            await asyncio.gather(*(client(track) for track in range(clients)))
+            timings[clients] = asyncio.get_running_loop().time() - started
+        # Eight times the work in well under twice the time
+        assert timings[8] < 2 * timings[1]
+        for track in range(8):
+            assert len(server.session_state.pattern_notes(track, 0)) == edits
+
+    @pytest.mark.asyncio
+    async def test_structural_change_waits_for_edits(self):
+        """Test that delete_track waits for running note edits, and edits issued after it wait for it."""
+        server = MCPServer()
+        self.slow_lmms(server)
+        await self.prepare(server, 2)
+        order = []
+
+        async def logged(name, call):
+            await call
+            order.append(name)
+
+        first = asyncio.ensure_future(logged("edit 1", server.add_notes_to_pattern(1, 0, [{"note": 60}])))
+        await asyncio.sleep(0)
+        delete = asyncio.ensure_future(logged("delete", server.delete_track(0)))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(logged("edit 2", server.add_notes_to_pattern(1, 0, [{"note": 62}])))
+        await asyncio.gather(first, delete, second)
+        assert order == ["edit 1", "delete", "edit 2"]
+
+
+class TestSeveralLMMS:
+    """Test a server driving several LMMS instances."""
+
+    @pytest.mark.asyncio
+    async def test_sessions_use_their_own_instance(self):
+        """Test that each session's calls and mirror stay on its own instance."""
+        from lmms_mcp.backend_pool import session_scope
+
+        server = MCPServer(lmms_endpoints=[("127.0.0.1", 9000), ("127.0.0.1", 9002)])
+        with session_scope("a"):
+            await server.set_tempo(100.0)
+            first = server.lmms_interface
+        with session_scope("b"):
+            await server.set_tempo(150.0)
+            second = server.lmms_interface
+            assert server.session_state.tempo == 150.0
+        assert (first.port, second.port) == (9000, 9002)
+        first.set_tempo.assert_called_once_with(100.0)
+        second.set_tempo.assert_called_once_with(150.0)
+        with session_scope("a"):
+            stats = await server.get_server_stats()
+        assert [b["sessions"] for b in stats["backends"]] == [1, 1]
 
 
 class TestMCPImports:
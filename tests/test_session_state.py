@@ -0,0 +1,166 @@
+"""
+Unit tests for the session-state mirror.
+"""
+
+from lmms_mcp.pattern import Pattern
+from lmms_mcp.session_state import SessionState
+
+
+SESSION = {
+    "tempo": 128,
+    "tracks": [
+        {"index": 0, "name": "Drums", "type": "instrument", "instrument": "kicker",
+         "patterns": [{"index": 0, "steps": 16, "notes": 4}]},
+        {"index": 1, "name": "Bass", "type": "instrument", "instrument": None, "patterns": []},
+    ],
+}
+
+
+class TestSessionState:
+    """Test cases for SessionState."""
+
+    def test_load_session(self):
+        """Test that a full session description is mirrored."""
+        state = SessionState()
+        assert not state.synced
+        state.load_session(SESSION)
+        info = state.session_info()
+        assert state.synced
+        assert info["tempo"] == 128
+        assert info["track_count"] == 2
+        assert [t["name"] for t in info["tracks"]] == ["Drums", "Bass"]
+        assert state.track_info(0)["patterns"][0]["notes"] == 4
+
+    def test_track_count_only(self):
+        """Test that a session reporting only a track count fetches tracks lazily."""
+        state = SessionState()
+        state.load_session({"tracks": 3, "tempo": 120})
+        assert state.session_info()["track_count"] == 3
+        assert state.track_info(0) is None
+
+    def test_mutations_bump_versions(self):
+        """Test that mutations update entries and their versions."""
+        state = SessionState()
+        state.load_session(SESSION)
+        before = state.track_info(1)["version"]
+        state.track_renamed(1, "Sub Bass")
+        state.pattern_created(1, 0, 32)
+        state.notes_added(1, 0, 10)
+        state.instrument_loaded(1, "tripleoscillator")
+        track = state.track_info(1)
+        assert track["name"] == "Sub Bass"
+        assert track["patterns"] == [{"index": 0, "steps": 32, "notes": 10}]
+        assert track["instrument"] == "tripleoscillator"
+        assert track["version"] > before
+        assert state.track_info(0)["version"] < before
+
+    def test_uncached_changes_bump_version(self):
+        """Test that note changes bump the state version even when their track is not cached."""
+        state = SessionState()
+        state.load_session({"tracks": 3, "tempo": 120})
+        seen = state.version
+        state.notes_set(2, 0, Pattern.from_ticks([60], [100], [0], [12]))
+        assert state.version > seen
+        seen = state.version
+        state.notes_set(2, 0, None)
+        assert state.version > seen
+
+    def test_pages_and_fields(self):
+        """Test paging through tracks and keeping only some fields."""
+        state = SessionState()
+        state.load_session({"tempo": 120, "tracks": [
+            {"index": i, "name": f"T{i}", "patterns": [{"index": 0, "notes": i}, {"index": 1, "notes": 1}]}
+            for i in range(25)]})
+        first = state.session_info(fields=["name", "note_count", "pattern_count"], limit=10)
+        assert first["tracks"][3] == {"index": 3, "name": "T3", "note_count": 4, "pattern_count": 2}
+        assert (len(first["tracks"]), first["total"], first["next_offset"]) == (10, 25, 10)
+        last = state.session_info(fields=[], offset=20, limit=10)
+        assert last["tracks"] == [{"index": i} for i in range(20, 25)]
+        assert last["next_offset"] is None
+        assert state.track_info(2, ["name", "missing"]) == {"index": 2, "name": "T2"}
+
+    def test_since_version(self):
+        """Test asking only for tracks changed since an earlier answer."""
+        state = SessionState()
+        state.load_session(SESSION)
+        seen = state.session_info()["version"]
+        assert state.session_info(since_version=seen)["tracks"] == []
+        state.track_renamed(1, "Sub Bass")
+        changed = state.session_info(since_version=seen)
+        assert [t["name"] for t in changed["tracks"]] == ["Sub Bass"]
+        state.track_deleted(0)
+        changed = state.session_info(since_version=changed["version"])
+        assert [t["index"] for t in changed["tracks"]] == [0]
+        assert changed["track_count"] == 1
+
+    def test_track_created(self):
+        """Test that created tracks are added to the mirror."""
+        state = SessionState()
+        state.load_session(SESSION)
+        state.track_created(2, "sample", "Vox")
+        assert state.session_info()["track_count"] == 3
+        assert state.track_info(2)["name"] == "Vox"
+
+    def test_track_deleted(self):
+        """Test that deleting a track shifts later track indices down."""
+        state = SessionState()
+        state.load_session(SESSION)
+        state.track_deleted(0)
+        assert state.session_info()["track_count"] == 1
+        assert state.track_info(0)["name"] == "Bass"
+        assert state.track_info(1) is None
+
+    def test_returned_copies_are_detached(self):
+        """Test that callers cannot mutate the mirror through returned dicts."""
+        state = SessionState()
+        state.load_session(SESSION)
+        state.track_info(0)["patterns"].clear()
+        assert state.track_info(0)["patterns"]
+
+    def test_invalidate(self):
+        """Test per-track and full invalidation."""
+        state = SessionState()
+        state.load_session(SESSION)
+        state.invalidate(0)
+        assert state.track_info(0) is None
+        assert state.track_info(1) is not None
+        state.invalidate()
+        assert not state.synced
+        assert state.track_info(1) is None
+
+    def test_notifications(self):
+        """Test that LMMS change notifications update the mirror."""
+        state = SessionState()
+        state.load_session(SESSION)
+        state.handle_notification("/lmms/notify/tempo", (140.0,))
+        state.handle_notification("/lmms/notify/track_name", (0, "Perc"))
+        state.handle_notification("/lmms/notify/unknown", ())
+        assert state.tempo == 140.0
+        assert state.track_info(0)["name"] == "Perc"
+        state.handle_notification("/lmms/notify/track_name", ())
+        assert not state.synced
+
+    def test_pattern_notes_follow_indices(self):
+        """Test that last-known notes move with deleted tracks and patterns and are dropped on invalidation."""
+        state = SessionState()
+        state.load_session(SESSION)
+        for track in (0, 1, 2):
+            state.pattern_created(track, 0, 16)
+            state.pattern_created(track, 1, 16)
+        state.notes_set(1, 1, Pattern.from_dicts([{"note": 60}]))
+        state.notes_set(2, 1, Pattern.from_dicts([{"note": 62}, {"note": 64}]))
+        assert state.pattern_note_count(1, 1) == 1
+
+        state.pattern_deleted(1, 0)
+        assert len(state.pattern_notes(1, 0)) == 1
+        assert state.pattern_notes(1, 1) is None
+        state.track_deleted(0)
+        assert len(state.pattern_notes(0, 0)) == 1
+        assert len(state.pattern_notes(1, 1)) == 2
+
+        state.invalidate(keep_notes=True)
+        assert state.pattern_notes(0, 0) is not None
+        state.invalidate(1)
+        assert state.pattern_notes(1, 1) is None
+        state.invalidate()
+        assert state.pattern_notes(0, 0) is None
@@ -0,0 +1,255 @@
+"""
+Unit tests for the content-addressed snapshot store.
+"""
+
+import asyncio
+import os
+
+import pytest
+
+from lmms_mcp import notes, pattern as pattern_module, snapshots
+from lmms_mcp.pattern import Pattern
+from lmms_mcp.session_state import SessionState
+from lmms_mcp.snapshots import (SnapshotError, SnapshotScheduler, SnapshotStore, capture, pack_pattern,
+                                unpack_pattern)
+
+
+@pytest.fixture(params=["numpy", "array"], autouse=True)
+def backend(request, monkeypatch):
+    """Run every test with NumPy columns and with the pure-Python fallback."""
+    if request.param == "numpy":
+        if notes.np is None:
+            pytest.skip("NumPy is not installed")
+    else:
+        monkeypatch.setattr(notes, "np", None)
+        monkeypatch.setattr(pattern_module, "np", None)
+        monkeypatch.setattr(snapshots, "np", None)
+    return request.param
+
+
+def riff(count: int, note: int = 60, velocity: int = 100) -> Pattern:
+    return Pattern.from_dicts([{"note": note + i % 12, "velocity": velocity, "start": i * 0.25, "length": 0.25,
+                                "pan": i % 50 - 25} for i in range(count)])
+
+
+def session(tracks: int = 3, notes_per_pattern: int = 16) -> SessionState:
+    state = SessionState()
+    state.load_session({"tempo": 120, "tracks": [
+        {"index": i, "name": f"Track {i}", "type": "instrument", "instrument": "tripleoscillator",
+         "patterns": [{"index": 0, "steps": 16, "notes": notes_per_pattern}]} for i in range(tracks)]})
+    for i in range(tracks):
+        state.notes_set(i, 0, riff(notes_per_pattern, 40 + i % 48, 1 + i % 127))
+    return state
+
+
+def chunk_files(directory) -> int:
+    return sum(len(files) for _, _, files in os.walk(os.path.join(directory, "objects")))
+
+
+class TestPatternChunks:
+    """Test the serialization of pattern notes."""
+
+    def test_round_trip(self):
+        """Test that notes, including negative pan, survive packing."""
+        original = riff(40)
+        assert unpack_pattern(pack_pattern(original)).to_dicts() == original.to_dicts()
+        assert unpack_pattern(pack_pattern(Pattern.empty())).to_dicts() == []
+
+    def test_partial_note(self):
+        """Test that a truncated chunk is rejected."""
+        with pytest.raises(SnapshotError):
+            unpack_pattern(pack_pattern(riff(2))[:-1])
+
+
+class TestSnapshotStore:
+    """Test cases for SnapshotStore."""
+
+    def test_take_and_load(self, tmp_path):
+        """Test that a snapshot reads back as the state it was taken from."""
+        store = SnapshotStore(str(tmp_path), "127.0.0.1:9000")
+        state = session()
+        record = store.take(capture(state), "create_track")
+        assert record["id"] == 1 and record["parent"] is None and record["tool"] == "create_track"
+        assert store.head == 1
+        loaded = store.load(1)
+        assert loaded["tempo"] == 120
+        assert [t["name"] for t in loaded["tracks"]] == ["Track 0", "Track 1", "Track 2"]
+        assert store.pattern(loaded["tracks"][2]["patterns"][0]["notes"]).to_dicts() == riff(16, 42, 3).to_dicts()
+
+    def test_unchanged_state_is_not_recorded(self, tmp_path):
+        """Test that snapshotting the same state twice records one snapshot."""
+        store = SnapshotStore(str(tmp_path))
+        state = session()
+        assert store.take(capture(state)) is not None
+        assert store.take(capture(state)) is None
+        assert store.snapshots()["total"] == 1
+
+    def test_growth_follows_the_change(self, tmp_path):
+        """Test that an edit to one pattern of a large project stores only a few small chunks."""
+        store = SnapshotStore(str(tmp_path))
+        state = session(tracks=300, notes_per_pattern=500)
+        first = store.take(capture(state))
+        files = chunk_files(tmp_path)
+        notes_ = state.pattern_notes(7, 0)
+        state.notes_set(7, 0, notes_.concat([riff(1, 90)]))
+        second = store.take(capture(state))
+        # Pattern, track, block and root
+        assert chunk_files(tmp_path) == files + 4
+        assert second["bytes"] < first["bytes"] / 100
+        assert second["parent"] == first["id"]
+
+    def test_only_changed_tracks_are_encoded(self, tmp_path, monkeypatch):
+        """Test that tracks whose mirror version is unchanged are not encoded again."""
+        store = SnapshotStore(str(tmp_path))
+        state = session(tracks=10)
+        store.take(capture(state))
+        encoded = []
+        encode = snapshots._encode
+        monkeypatch.setattr(snapshots, "_encode", lambda value: encoded.append(value) or encode(value))
+        state.track_renamed(4, "Lead")
+        state.notes_set(6, 0, None)
+        record = store.take(capture(state))
+        # Tracks 4 and 6, the block and the root
+        assert [value["name"] for value in encoded[:2]] == ["Lead", "Track 6"] and len(encoded) == 4
+        loaded = store.load(record["id"])
+        assert loaded["tracks"][6]["patterns"][0]["notes"] is None
+        assert store.tree(capture(state), write=False)["root"] == record["root"]
+
+    def test_identical_patterns_share_a_chunk(self, tmp_path):
+        """Test that equal notes on different tracks are stored once."""
+        store = SnapshotStore(str(tmp_path))
+        state = session(tracks=2)
+        state.notes_set(1, 0, state.pattern_notes(0, 0))
+        store.take(capture(state))
+        tracks = store.load(1)["tracks"]
+        assert tracks[0]["patterns"][0]["notes"] == tracks[1]["patterns"][0]["notes"]
+
+    def test_history_survives_a_restart(self, tmp_path):
+        """Test that a new store continues the history on disk."""
+        store = SnapshotStore(str(tmp_path), "lmms")
+        state = session()
+        store.take(capture(state))
+        state.tempo_changed(90)
+        store.take(capture(state))
+        reopened = SnapshotStore(str(tmp_path), "lmms")
+        listing = reopened.snapshots(limit=1)
+        assert listing["head"] == 2 and listing["total"] == 2 and listing["next_offset"] == 1
+        assert [s["id"] for s in listing["snapshots"]] == [2]
+        assert reopened.load(1)["tempo"] == 120
+        assert SnapshotStore(str(tmp_path), "other").snapshots()["total"] == 0
+
+    def test_stores_sharing_a_history(self, tmp_path):
+        """Test that two servers' stores of one instance never give two snapshots the same id."""
+        first, second = SnapshotStore(str(tmp_path), "lmms"), SnapshotStore(str(tmp_path), "lmms")
+        state = session()
+        assert first.take(capture(state))["id"] == 1
+        first.snapshots()
+        second.snapshots()
+        state.tempo_changed(90)
+        assert second.take(capture(state))["id"] == 2
+        with open(first.index_path, "a") as f:
+            f.write('{"id": 3, "cut sho')
+        state.tempo_changed(100)
+        assert first.take(capture(state)) == first.get(3)
+        assert [s["id"] for s in second.snapshots()["snapshots"]] == [3, 2, 1]
+        assert second.get(2)["parent"] == 1 and first.get(3)["parent"] == 1
+
+    def test_checkout_branches(self, tmp_path):
+        """Test that a snapshot taken after a checkout follows the checked-out snapshot."""
+        store = SnapshotStore(str(tmp_path))
+        state = session()
+        store.take(capture(state))
+        state.tempo_changed(90)
+        store.take(capture(state))
+        store.checkout(1)
+        state.tempo_changed(100)
+        assert store.take(capture(state))["parent"] == 1
+        with pytest.raises(SnapshotError):
+            store.checkout(42)
+
+    def test_unknown_notes(self, tmp_path):
+        """Test that patterns whose notes the server does not know have no note chunk."""
+        store = SnapshotStore(str(tmp_path))
+        state = session(tracks=1)
+        state.notes_set(0, 0, None)
+        store.take(capture(state))
+        assert store.load(1)["tracks"][0]["patterns"][0]["notes"] is None
+
+    def test_diff(self, tmp_path):
+        """Test the changes reported between two snapshots."""
+        store = SnapshotStore(str(tmp_path))
+        state = session()
+        store.take(capture(state))
+        state.tempo_changed(140)
+        state.track_renamed(1, "Bass")
+        state.notes_set(2, 0, state.pattern_notes(2, 0).concat([riff(3, 90)]))
+        state.pattern_created(2, 1, 32)
+        state.track_created(3, "sample", "Kick")
+        store.take(capture(state))
+        diff = store.diff(store.load(1), store.load(2))
+        assert diff["tempo"] == [120, 140]
+        assert diff["added"] == [{"index": 3, "name": "Kick"}]
+        assert diff["removed"] == []
+        assert diff["unchanged"] == 1
+        renamed, edited = diff["changed"]
+        assert renamed == {"index": 1, "name": ["Track 1", "Bass"]}
+        assert edited["patterns_added"] == [1]
+        assert edited["patterns_changed"] == [{"index": 0, "notes_added": 3, "notes_removed": 0}]
+
+
+class TestSnapshotScheduler:
+    """Test cases for SnapshotScheduler."""
+
+    @pytest.mark.asyncio
+    async def test_burst_is_snapshotted_once(self):
+        """Test that changes in quick succession lead to one snapshot once they pause."""
+        taken = []
+
+        async def take(tools):
+            taken.append(tools)
+
+        scheduler = SnapshotScheduler(take, delay=0.05)
+        for tool in ("create_track", "set_tempo", "set_tempo"):
+            scheduler.changed(tool)
+            await asyncio.sleep(0.01)
+        assert taken == [] and scheduler.pending
+        await asyncio.sleep(0.1)
+        assert taken == ["create_track, set_tempo"] and not scheduler.pending
+
+    @pytest.mark.asyncio
+    async def test_stream_of_changes_is_not_put_off_forever(self):
+        """Test that a snapshot is taken after max_delay even while changes keep coming."""
+        taken = []
+
+        async def take(tools):
+            taken.append(tools)
+
+        scheduler = SnapshotScheduler(take, delay=0.05, max_delay=0.1)
+        for _ in range(15):
+            scheduler.changed("add_notes_to_pattern")
+            await asyncio.sleep(0.02)
+        assert len(taken) >= 2
+        await scheduler.close()
+
+    @pytest.mark.asyncio
+    async def test_flush(self):
+        """Test that flushing takes the pending snapshot now, including changes made while one is taken."""
+        taken = []
+
+        async def take(tools):
+            taken.append(tools)
+            await asyncio.sleep(0.02)
+
+        scheduler = SnapshotScheduler(take, delay=10)
+        scheduler.changed("create_track")
+        await asyncio.wait_for(scheduler.flush(), 1)
+        assert taken == ["create_track"]
+        scheduler.changed("set_tempo")
+        flushing = asyncio.ensure_future(scheduler.flush())
+        # While set_tempo's snapshot is being taken
+        await asyncio.sleep(0.01)
+        scheduler.changed("delete_track")
+        await asyncio.wait_for(scheduler.flush(), 1)
+        assert flushing.done()
+        assert taken == ["create_track", "set_tempo", "delete_track"]
+        await scheduler.flush()
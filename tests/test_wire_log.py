@@ -0,0 +1,86 @@
+"""
+Unit tests for recording and reading LMMS wire logs.
+"""
+
+import asyncio
+
+import pytest
+
+from lmms_mcp.lmms_interface import LMMSInterface
+from lmms_mcp.wire_log import (INCOMING, MAGIC, OUTGOING, RECORD, WireLog, WireLogError, WireRecorder,
+                               round_trips, summary, tool_calls)
+from tests.test_lmms_interface import FakeLMMSProtocol
+
+
+@pytest.fixture
+async def fake_lmms():
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.create_datagram_endpoint(FakeLMMSProtocol, local_addr=("127.0.0.1", 0))
+    protocol.port = transport.get_extra_info("sockname")[1]
+    yield protocol
+    transport.close()
+
+
+class TestRecording:
+    """Test recording the traffic of an LMMSInterface and rebuilding tool calls from it."""
+
+    @pytest.mark.asyncio
+    async def test_record_and_rebuild_calls(self, fake_lmms, tmp_path):
+        """Test that requests and replies are logged and turned back into the calls that sent them."""
+        path = str(tmp_path / "session.wire")
+        recorder = WireRecorder(path)
+        interface = LMMSInterface("127.0.0.1", fake_lmms.port, max_datagram_size=512, recorder=recorder)
+        notes = [{"note": 36 + i % 48, "velocity": 100, "start": i / 4, "length": 0.25} for i in range(300)]
+        await interface.set_track_name(2, "Bass")
+        await interface.add_notes_to_pattern(1, 0, notes)
+        await interface.create_track("sample")
+        await interface.load_instrument(1, "kicker")
+        await interface.close()
+        recorder.close()
+
+        bundles = len(fake_lmms.received) - 3
+        assert bundles > 1
+        with WireLog(path) as log:
+            directions = [message.direction for message in log]
+            calls = tool_calls(log)
+            trips = round_trips(log)
+        assert directions.count(OUTGOING) == directions.count(INCOMING) == bundles + 3
+        assert [(call.tool, call.arguments) for call in calls] == [
+            ("set_track_name", {"track_index": 2, "name": "Bass"}),
+            ("add_notes_to_pattern", {"track_index": 1, "pattern_index": 0, "notes": notes}),
+            ("create_track", {"track_type": "sample"}),
+            ("load_instrument", {"track_index": 1, "instrument_path": "kicker", "background": False}),
+        ]
+        assert calls[0].time == 0 and all(a.time <= b.time for a, b in zip(calls, calls[1:]))
+        assert len(trips["add_notes"]) == bundles
+        assert summary(path)["tool_calls"]["add_notes_to_pattern"] == 1
+
+    def test_append_across_runs_and_truncation(self, tmp_path):
+        """Test that later runs append to a log and a record cut short is ignored."""
+        path = tmp_path / "session.wire"
+        for run in range(2):
+            recorder = WireRecorder(str(path))
+            recorder.sent(LMMSInterface.build_message("play", run + 1))
+            recorder.received(b"reply")
+            recorder.close()
+        with open(path, "ab") as f:
+            f.write(RECORD.pack(0, 100, OUTGOING) + b"abc")
+        data = path.read_bytes()
+        assert data.startswith(MAGIC) and data.count(MAGIC) == 1
+
+        log = WireLog(str(path))
+        messages = [(m.direction, bytes(m.data)) for m in log]
+        assert len(messages) == 4 and messages[1] == (INCOMING, b"reply")
+        assert log.truncated
+        assert [call.tool for call in tool_calls(log)] == ["play", "play"]
+        log.close()
+
+    def test_not_a_wire_log(self, tmp_path):
+        """Test that other files are neither read nor appended to."""
+        path = tmp_path / "notes.txt"
+        path.write_text("hello")
+        with pytest.raises(WireLogError):
+            WireLog(str(path))
+        with pytest.raises(WireLogError):
+            WireRecorder(str(path))
+        assert path.read_text() == "hello"